@@ -3,6 +3,13 @@ ASGI config for airport_mgmt project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Streaming endpoints such as the live flight position feed
+(``/airline/flight-map/stream/``) and the operations event feed
+(``/airline/alerts/stream/``) are async views and should be served
+through this application, e.g. ``uvicorn airport_mgmt.asgi:application``.
+With more than one worker, set ``LIVE_EVENTS_BROKER`` to a shared broker
+such as ``core.live_events.RedisBroker`` so every worker sees every event.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
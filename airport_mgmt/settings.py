@@ -48,6 +48,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.query_budget.QueryBudgetMiddleware',
+    'core.request_profiler.RequestProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'airport_mgmt.urls'
@@ -113,6 +115,21 @@ USE_I18N = True
 
 USE_TZ = True
 
+# IATA code of the airport this system runs; flights arriving here are
+# treated as gate arrivals by the gate assignment solver
+HOME_AIRPORT = ''
+
+# Broker fanning live operations events out to dashboards. LocalBroker only
+# reaches clients of the same process; use core.live_events.RedisBroker with
+# LIVE_EVENTS_BROKER_OPTIONS = {'url': ...} when running several workers
+LIVE_EVENTS_BROKER = 'core.live_events.LocalBroker'
+LIVE_EVENTS_BROKER_OPTIONS = {}
+
+# Lets system admins profile a single request with ?profile=1 or an
+# X-Profile: 1 header; profiles are stored under MEDIA_ROOT/profiles.
+# When off the profiler middleware is dropped at startup.
+REQUEST_PROFILER_ENABLED = False
+
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
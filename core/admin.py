@@ -1,9 +1,33 @@
+from django import forms
 from django.contrib import admin
-from .models import Flight, Passenger, Booking, Staff, CheckIn
+from .airports import local_time
+from .models import Flight, Passenger, Booking, Staff, CheckIn, SchedulePattern
+from .schedule_patterns import expand_patterns
+
+class FlightAdminForm(forms.ModelForm):
+    class Meta:
+        model = Flight
+        fields = '__all__'
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        flight_number = cleaned_data.get('flight_number')
+        departure_time = cleaned_data.get('departure_time')
+        if flight_number and departure_time:
+            # service_date isn't on the form, so the unique pair is checked here rather than by the database
+            airport = cleaned_data.get('departure_airport') or self.instance.departure_airport
+            service_date = local_time(departure_time, airport).date()
+            if Flight.objects.filter(flight_number=flight_number, service_date=service_date).exclude(
+                    pk=self.instance.pk).exists():
+                self.add_error('flight_number', f'{flight_number} already operates on {service_date}.')
+        if 'estimated_departure' in self.changed_data:
+            self.instance.knock_on_delay = False  # an entered estimate is a root cause for delay propagation
+        return cleaned_data
 
 @admin.register(Flight)
 class FlightAdmin(admin.ModelAdmin):
-    list_display = ['flight_number', 'airline', 'departure_city', 'arrival_city', 'departure_time', 'status', 'available_seats']
+    form = FlightAdminForm
+    list_display = ['flight_number', 'service_date', 'airline', 'departure_city', 'arrival_city', 'departure_time', 'status', 'available_seats']
     list_filter = ['status', 'airline', 'departure_city', 'arrival_city']
     search_fields = ['flight_number', 'airline', 'departure_city', 'arrival_city']
     date_hierarchy = 'departure_time'
@@ -20,9 +44,43 @@ class FlightAdmin(admin.ModelAdmin):
             'fields': ('total_seats', 'available_seats', 'price')
         }),
         ('Status & Gate', {
-            'fields': ('status', 'gate_number')
+            'fields': ('status', 'gate_number', 'estimated_departure', 'delay_reason')
+        }),
+    )
+
+@admin.register(SchedulePattern)
+class SchedulePatternAdmin(admin.ModelAdmin):
+    list_display = ['flight_number', 'departure_airport', 'arrival_airport', 'departure_local_time', 'days_of_week', 'valid_from', 'valid_until', 'is_active']
+    list_filter = ['is_active', 'airline', 'departure_airport']
+    search_fields = ['flight_number', 'airline']
+    actions = ['expand_selected']
+    
+    fieldsets = (
+        ('Service', {
+            'fields': ('flight_number', 'airline', 'aircraft_type', 'total_seats')
+        }),
+        ('Route & Timing', {
+            'fields': ('departure_airport', 'arrival_airport', 'departure_city', 'arrival_city', 'departure_local_time', 'duration_minutes')
+        }),
+        ('Operating Period', {
+            'fields': ('days_of_week', 'valid_from', 'valid_until', 'is_active')
+        }),
+        ('Fares', {
+            'fields': ('economy_price', 'business_price')
         }),
     )
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        result = expand_patterns([obj])
+        self.message_user(request, f"{obj.flight_number}: {len(result['created'])} flights created, "
+                                   f"{len(result['updated'])} updated, {len(result['cancelled'])} cancelled.")
+    
+    @admin.action(description='Expand selected patterns into flights')
+    def expand_selected(self, request, queryset):
+        result = expand_patterns(queryset)
+        self.message_user(request, f"{len(result['created'])} flights created, {len(result['updated'])} updated, "
+                                   f"{len(result['cancelled'])} cancelled.")
 
 @admin.register(Passenger)
 class PassengerAdmin(admin.ModelAdmin):
@@ -75,7 +133,7 @@ class StaffAdmin(admin.ModelAdmin):
             'fields': ('user',)
         }),
         ('Employment Details', {
-            'fields': ('employee_id', 'role', 'department', 'hire_date', 'salary')
+            'fields': ('employee_id', 'role', 'department', 'base_airport', 'hire_date', 'salary')
         }),
         ('Contact Information', {
             'fields': ('phone_number', 'address')
@@ -0,0 +1,137 @@
+# Aircraft Utilization Index
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from .gate_assignment import GateTimeline
+from .gate_timeline import IntervalTree, Occupancy
+from .models import Aircraft, Flight
+from .turnaround import standard_turnaround
+
+# How far outside a window to look for flights whose turn time reaches into it
+UTILIZATION_LOOKAROUND = timedelta(days=1)
+MAINTENANCE_LABEL = 'Maintenance'
+UNAVAILABLE_STATUSES = ('maintenance', 'grounded', 'retired')
+
+
+def turn_time():
+    return timedelta(minutes=standard_turnaround()[1])
+
+
+def flight_block(flight, turn=None):
+    """Time an aircraft is committed to a flight: departure to arrival plus the turnaround"""
+    departure = flight.actual_departure or flight.estimated_departure or flight.departure_time
+    arrival = flight.actual_arrival or flight.estimated_arrival or flight.arrival_time
+    return departure, arrival + (turn if turn is not None else turn_time())
+
+
+def maintenance_window(aircraft):
+    """The whole local day of an aircraft's next scheduled maintenance"""
+    start = timezone.make_aware(datetime.combine(aircraft.next_maintenance, time.min))
+    return start, start + timedelta(days=1)
+
+
+class AircraftUtilizationIndex:
+    """Per-tail interval trees of flight blocks and maintenance windows
+
+    Built once per window, each check against a tail is O(log n + k). Rows
+    accepted during a bulk import are reserved in a per-tail sorted timeline
+    so later rows are checked against them too.
+    """
+
+    def __init__(self, aircraft, flights, reserved=None):
+        self.aircraft = {a.id: a for a in aircraft}
+        self.turn = turn_time()
+        by_tail = defaultdict(list)
+        for flight in flights:
+            if flight.aircraft_id in self.aircraft:
+                start, end = flight_block(flight, self.turn)
+                by_tail[flight.aircraft_id].append(Occupancy(start, end, flight.id, flight.flight_number))
+        for aircraft_id, plane in self.aircraft.items():
+            if plane.next_maintenance:
+                by_tail[aircraft_id].append(Occupancy(*maintenance_window(plane), None, MAINTENANCE_LABEL))
+        self.trees = {aircraft_id: IntervalTree(by_tail.get(aircraft_id, ())) for aircraft_id in self.aircraft}
+        self.reserved = reserved if reserved is not None else defaultdict(GateTimeline)
+
+    @classmethod
+    def for_window(cls, start, end, aircraft=None, reserved=None):
+        """Build the index for every flight whose block may touch [start, end)"""
+        if aircraft is None:
+            aircraft = Aircraft.objects.all()
+        aircraft = list(aircraft)
+        flights = Flight.objects.filter(
+            aircraft_id__in=[a.id for a in aircraft],
+            departure_time__lt=end + UTILIZATION_LOOKAROUND,
+            arrival_time__gte=start - UTILIZATION_LOOKAROUND,
+        ).exclude(status='cancelled').only(
+            'id', 'flight_number', 'aircraft_id', 'departure_time', 'arrival_time', 'actual_departure',
+            'actual_arrival', 'estimated_departure', 'estimated_arrival'
+        )
+        return cls(aircraft, flights, reserved)
+
+    def clashes(self, aircraft_id, start, end, exclude_flight=None):
+        """Reasons [start, end) cannot be flown by an aircraft; empty if it can"""
+        plane = self.aircraft.get(aircraft_id)
+        if plane is None:
+            return []
+        reasons = []
+        if plane.status in UNAVAILABLE_STATUSES:
+            reasons.append(f'{plane.registration} is {plane.get_status_display().lower()}')
+        for item in self.trees[aircraft_id].overlapping(start, end):
+            if item.flight_id is None:
+                reasons.append(f'{plane.registration} is due for maintenance on {plane.next_maintenance}')
+            elif item.flight_id != exclude_flight:
+                reasons.append(f'{plane.registration} already flies {item.flight_number} '
+                               f'({timezone.localtime(item.start):%d %b %H:%M}-{timezone.localtime(item.end):%H:%M})')
+        if aircraft_id in self.reserved and self.reserved[aircraft_id].gap_before(start, end) is None:
+            reasons.append(f'{plane.registration} is booked twice in this import')
+        return reasons
+
+    def reserve(self, aircraft_id, start, end, flight_id=None):
+        self.reserved[aircraft_id].add(start, end, flight_id)
+
+    def conflicts(self, start=None, end=None):
+        """Double bookings and maintenance clashes across the fleet, one sweep per tail"""
+        found = []
+        for aircraft_id, tree in self.trees.items():
+            for earlier, later in tree.overlapping_pairs():
+                if end is not None and earlier.start >= end or start is not None and later.end <= start:
+                    continue
+                found.append((self.aircraft[aircraft_id], earlier, later))
+        return found
+
+    def grounded_flights(self):
+        """Flights assigned to aircraft that are not in service"""
+        return [
+            (plane, item)
+            for aircraft_id, plane in self.aircraft.items() if plane.status in UNAVAILABLE_STATUSES
+            for item in self.trees[aircraft_id].items if item.flight_id is not None
+        ]
+
+    def timeline(self, start, end):
+        """Per-aircraft busy segments in [start, end) as offsets and widths in percent"""
+        span = (end - start).total_seconds()
+        rows = []
+        for aircraft_id, plane in sorted(self.aircraft.items(), key=lambda a: a[1].registration):
+            segments = []
+            busy = 0.0
+            for item in self.trees[aircraft_id].overlapping(start, end):
+                seg_start, seg_end = max(item.start, start), min(item.end, end)
+                seconds = (seg_end - seg_start).total_seconds()
+                busy += seconds if item.flight_id is not None else 0
+                segments.append({
+                    'label': item.flight_number,
+                    'start': seg_start,
+                    'end': seg_end,
+                    'offset': round((seg_start - start).total_seconds() / span * 100, 2),
+                    'width': round(seconds / span * 100, 2),
+                    'maintenance': item.flight_id is None,
+                })
+            rows.append({
+                'aircraft': plane,
+                'available': plane.status not in UNAVAILABLE_STATUSES,
+                'segments': segments,
+                'utilization': min(round(busy / span * 100, 1), 100.0),
+            })
+        return rows
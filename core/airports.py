@@ -0,0 +1,52 @@
+# Airport Reference Table
+import csv
+from collections import namedtuple
+from functools import lru_cache
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+from datetime import timezone as dt_timezone
+
+AIRPORTS_FILE = Path(__file__).resolve().parent / 'data' / 'airports.csv'
+
+Airport = namedtuple('Airport', ['iata', 'name', 'city', 'country', 'latitude', 'longitude', 'timezone'])
+
+
+@lru_cache(maxsize=None)
+def airport_table():
+    """All bundled airports keyed by IATA code"""
+    airports = {}
+    with open(AIRPORTS_FILE, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            airports[row['iata']] = Airport(
+                iata=row['iata'],
+                name=row['name'],
+                city=row['city'],
+                country=row['country'],
+                latitude=float(row['latitude']),
+                longitude=float(row['longitude']),
+                timezone=row['timezone'],
+            )
+    return airports
+
+
+def normalize_code(code):
+    return (code or '').strip().upper()
+
+
+def get_airport(code):
+    """Look up an airport by IATA code, or None if it is not in the table"""
+    return airport_table().get(normalize_code(code))
+
+
+def airport_timezone(code):
+    """Local timezone of an airport, falling back to UTC for unknown codes"""
+    airport = get_airport(code)
+    return ZoneInfo(airport.timezone) if airport else dt_timezone.utc
+
+
+def local_time(value, code):
+    """Convert an aware datetime to the local time of an airport"""
+    if value is None:
+        return None
+    return value.astimezone(airport_timezone(code))
@@ -0,0 +1,158 @@
+# Alert Deduplication and Rate Limiting
+import hashlib
+from collections import Counter, namedtuple
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .live_events import publish_alerts
+from .models import SystemAlert
+
+ALERT_RATE_LIMIT_SECONDS = 300  # at most one live notification per fingerprint in this window
+ALERT_REOPEN_WINDOW = timedelta(minutes=30)  # a recurrence this soon after recovery reopens the alert
+CLEAR_BATCH_SIZE = 500
+
+AlertSignal = namedtuple('AlertSignal', ['title', 'message', 'alert_type', 'affected_system', 'subject'])
+
+
+def alert_fingerprint(alert_type, affected_system, subject):
+    """Stable key of what an alert is about, independent of its wording"""
+    key = '\x1f'.join((part or '').strip().lower() for part in (alert_type, affected_system, subject))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def signal_fingerprint(signal):
+    return alert_fingerprint(signal.alert_type, signal.affected_system, signal.subject or signal.title)
+
+
+def _notify(alerts, event=None):
+    """Publish the alerts whose fingerprint has not been announced within the rate limit"""
+    due = [a for a in alerts if cache.add(f'alert-notified:{a.fingerprint}', True, ALERT_RATE_LIMIT_SECONDS)]
+    if due:
+        publish_alerts(due, event)
+
+
+def raise_alerts(signals, user, now=None):
+    """Record a batch of alert occurrences, one open alert per fingerprint
+
+    Repeats of an open alert only bump its occurrence count and last-seen
+    time; a recurrence shortly after recovery reopens the resolved alert
+    instead of adding a row. Existing alerts are found with one indexed
+    fingerprint lookup and all writes are batched.
+    """
+    now = now or timezone.now()
+    latest = {}
+    counts = Counter()
+    for signal in signals:
+        fingerprint = signal_fingerprint(signal)
+        latest[fingerprint] = signal
+        counts[fingerprint] += 1
+    if not latest:
+        return {'created': [], 'repeated': [], 'reopened': []}
+
+    try:
+        with transaction.atomic():
+            return _record(latest, counts, user, now)
+    except IntegrityError:
+        # Another worker opened one of these alerts first; its row is now a repeat
+        with transaction.atomic():
+            return _record(latest, counts, user, now)
+
+
+def _record(latest, counts, user, now):
+    existing = {}
+    for alert in SystemAlert.objects.select_for_update().filter(fingerprint__in=list(latest)).filter(
+        Q(is_resolved=False) | Q(resolved_at__gte=now - ALERT_REOPEN_WINDOW)
+    ).order_by('is_resolved', '-resolved_at'):
+        existing.setdefault(alert.fingerprint, alert)
+
+    created, repeated, reopened = [], [], []
+    seen = {}
+    for fingerprint, signal in latest.items():
+        alert = existing.get(fingerprint)
+        if alert is None:
+            created.append(SystemAlert(
+                title=signal.title,
+                message=signal.message,
+                alert_type=signal.alert_type,
+                affected_system=signal.affected_system,
+                created_by=user,
+                fingerprint=fingerprint,
+                occurrence_count=counts[fingerprint],
+                last_seen=now,
+                open_fingerprint=fingerprint,
+            ))
+            continue
+        (reopened if alert.is_resolved else repeated).append(alert)
+        seen[fingerprint] = alert.occurrence_count + counts[fingerprint]
+        alert.occurrence_count = F('occurrence_count') + counts[fingerprint]
+        alert.title, alert.message, alert.last_seen = signal.title, signal.message, now
+        alert.is_resolved, alert.resolved_at = False, None
+        alert.sync_open_fingerprint()
+
+    SystemAlert.objects.bulk_update(
+        repeated + reopened,
+        ['occurrence_count', 'title', 'message', 'last_seen', 'is_resolved', 'resolved_at', 'open_fingerprint'],
+        batch_size=500,
+    )
+    SystemAlert.objects.bulk_create(created, batch_size=500)
+    for alert in repeated + reopened:
+        alert.occurrence_count = seen[alert.fingerprint]
+
+    # New alerts are always announced and start the rate limit window
+    for alert in created:
+        cache.set(f'alert-notified:{alert.fingerprint}', True, ALERT_RATE_LIMIT_SECONDS)
+    publish_alerts(created)
+    _notify(reopened)
+    _notify(repeated, 'alert.repeated')
+    return {'created': created, 'repeated': repeated, 'reopened': reopened}
+
+
+def raise_alert(title, message, alert_type, affected_system, user, subject='', now=None):
+    """Record one alert occurrence and return the open alert it landed on"""
+    result = raise_alerts([AlertSignal(title, message, alert_type, affected_system, subject)], user, now)
+    return (result['created'] or result['repeated'] or result['reopened'])[0]
+
+
+def clear_alerts(affected_system, subjects, now=None):
+    """Auto-resolve the open alerts of subjects that have recovered, whatever their severity"""
+    now = now or timezone.now()
+    fingerprints = [
+        alert_fingerprint(alert_type, affected_system, subject)
+        for subject in subjects for alert_type, _ in SystemAlert.ALERT_TYPES
+    ]
+    resolved = []
+    for i in range(0, len(fingerprints), CLEAR_BATCH_SIZE):
+        resolved.extend(SystemAlert.objects.filter(
+            fingerprint__in=fingerprints[i:i + CLEAR_BATCH_SIZE], is_resolved=False
+        ))
+    return _resolve(resolved, now)
+
+
+def clear_unraised_alerts(affected_system, signals, now=None):
+    """Auto-resolve the open alerts of a system that a full scan no longer raised
+
+    Suits scanners that see every subject on each run: whatever is still
+    open but missing from ``signals`` has recovered.
+    """
+    now = now or timezone.now()
+    raised = {signal_fingerprint(signal) for signal in signals}
+    return _resolve([
+        alert for alert in SystemAlert.objects.filter(affected_system=affected_system, is_resolved=False)
+        if alert.fingerprint not in raised
+    ], now)
+
+
+def _resolve(resolved, now):
+    if not resolved:
+        return resolved
+    for alert in resolved:
+        alert.is_resolved, alert.resolved_at = True, now
+        alert.sync_open_fingerprint()
+    with transaction.atomic():
+        SystemAlert.objects.bulk_update(resolved, ['is_resolved', 'resolved_at', 'open_fingerprint'], batch_size=500)
+        publish_alerts(resolved)
+    return resolved
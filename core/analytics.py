@@ -0,0 +1,109 @@
+# Airline Analytics Aggregation Layer
+from math import isnan
+
+from django.core.cache import cache
+from django.db.models import (Q, F, Count, Sum, Avg, Case, When, Value, Subquery, OuterRef,
+                              DecimalField, FloatField, ExpressionWrapper)
+from django.db.models.functions import Coalesce
+
+from .geo import route_distances_km
+from .models import Flight, Booking
+
+# Booking statuses that occupy a seat
+BOOKED_STATUSES = ['confirmed', 'checked_in']
+
+ANALYTICS_CACHE_TIMEOUT = 300  # seconds
+
+
+def annotate_booked_seats(flights):
+    """Annotate each flight with booked seats, paid revenue and load factor"""
+    booked = Booking.objects.filter(
+        flight=OuterRef('pk'), status__in=BOOKED_STATUSES
+    ).order_by().values('flight').annotate(c=Count('id')).values('c')
+    revenue = Booking.objects.filter(
+        flight=OuterRef('pk'), payment_status=True
+    ).order_by().values('flight').annotate(s=Sum('total_amount')).values('s')
+
+    return flights.annotate(
+        booked_seats=Coalesce(Subquery(booked), 0),
+        flight_revenue=Coalesce(Subquery(revenue), Value(0), output_field=DecimalField(max_digits=12, decimal_places=2)),
+    ).annotate(
+        load_factor=Case(
+            When(total_seats__gt=0, then=ExpressionWrapper(
+                F('booked_seats') * 100.0 / F('total_seats'), output_field=FloatField()
+            )),
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+    )
+
+
+def _build_report(start_date, end_date):
+    flights_in_period = annotate_booked_seats(
+        Flight.objects.filter(departure_time__date__range=[start_date, end_date])
+    )
+
+    # Performance metrics and load factor in one pass over the flights
+    flight_totals = flights_in_period.aggregate(
+        total_flights=Count('id'),
+        on_time_flights=Count('id', filter=Q(actual_departure__lte=F('departure_time'))),
+        average_load_factor=Avg('load_factor'),
+    )
+
+    # Revenue analysis
+    revenue_totals = Booking.objects.filter(
+        booking_date__date__range=[start_date, end_date],
+        payment_status=True
+    ).aggregate(
+        total_revenue=Sum('total_amount'),
+        average_ticket_price=Avg('total_amount'),
+    )
+
+    # Route profitability
+    route_performance = list(
+        flights_in_period.order_by().values(
+            'departure_city', 'arrival_city', 'departure_airport', 'arrival_airport'
+        ).annotate(
+            flight_count=Count('id'),
+            total_bookings=Sum('booked_seats'),
+            total_seats=Sum('total_seats'),
+            revenue=Sum('flight_revenue'),
+            load_factor=Avg('load_factor'),
+        ).order_by('-flight_count', '-revenue')[:10]
+    )
+
+    # Route distances come from the cached great-circle table
+    distances = route_distances_km(
+        [r['departure_airport'] for r in route_performance],
+        [r['arrival_airport'] for r in route_performance],
+    )
+    for route, distance in zip(route_performance, distances):
+        route['distance_km'] = None if isnan(distance) else round(float(distance))
+        route['revenue_per_km'] = (
+            float(route['revenue']) / (route['distance_km'] * route['flight_count'])
+            if route['distance_km'] else None
+        )
+
+    total_flights = flight_totals['total_flights']
+    on_time_flights = flight_totals['on_time_flights']
+    return {
+        'total_flights': total_flights,
+        'on_time_flights': on_time_flights,
+        'on_time_percentage': (on_time_flights / total_flights * 100) if total_flights > 0 else 0,
+        'total_revenue': revenue_totals['total_revenue'] or 0,
+        'average_ticket_price': revenue_totals['average_ticket_price'] or 0,
+        'average_load_factor': flight_totals['average_load_factor'] or 0,
+        'route_performance': route_performance,
+    }
+
+
+def flight_performance_report(start_date, end_date, use_cache=True):
+    """Flight, revenue and route metrics for a date range, cached per range"""
+    if not use_cache:
+        return _build_report(start_date, end_date)
+    cache_key = f'analytics:report:{start_date.isoformat()}:{end_date.isoformat()}'
+    report = cache.get(cache_key)
+    if report is None:
+        report = _build_report(start_date, end_date)
+        cache.set(cache_key, report, ANALYTICS_CACHE_TIMEOUT)
+    return report
@@ -0,0 +1,133 @@
+# Crew Briefing Packets
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.db.models import Count, F, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .geo import route_distance_km
+from .models import Booking, BriefingPacket, CheckIn, CrewAssignment, Flight, Passenger
+from .rosters import bump_version
+
+SEAT_CLASSES = [value for value, _ in Booking.CLASS_CHOICES]
+BRIEFING_GENERATION_KEY = 'briefing:generation'  # bumped by bulk changes to outdate every stored packet
+CREW_ONLY_FIELDS = {'briefing_completed', 'check_in_time', 'post_flight_report'}  # not shown in the packet
+NEEDS_ASSISTANCE = Q(passenger__mobility_assistance=True) | (
+    Q(checkin__special_assistance__isnull=False) & ~Q(checkin__special_assistance='')
+)
+
+
+def passenger_counts(flight):
+    """Live passenger totals by cabin and assistance need, in one aggregate query"""
+    return Booking.objects.filter(flight=flight).exclude(status='cancelled').aggregate(
+        total=Count('id'),
+        checked_in=Count('checkin'),
+        mobility_assistance=Count('id', filter=Q(passenger__mobility_assistance=True)),
+        special_assistance=Count('id', filter=NEEDS_ASSISTANCE),
+        **{seat_class: Count('id', filter=Q(seat_class=seat_class)) for seat_class in SEAT_CLASSES},
+    )
+
+
+def assistance_list(flight):
+    """Seat, name and needs of every passenger who asked for help"""
+    rows = Booking.objects.filter(flight=flight).exclude(status='cancelled').filter(NEEDS_ASSISTANCE).values_list(
+        'seat_number', 'passenger__first_name', 'passenger__last_name',
+        'passenger__mobility_assistance', 'checkin__special_assistance',
+    ).order_by('seat_number')
+    return [
+        {
+            'seat': seat,
+            'name': f'{first_name} {last_name}',
+            'needs': '; '.join(filter(None, ['Mobility assistance' if mobility else '', notes or ''])),
+        }
+        for seat, first_name, last_name, mobility, notes in rows
+    ]
+
+
+def crew_list(flight):
+    return [
+        {
+            'name': assignment.staff.user.get_full_name() or assignment.staff.employee_id,
+            'employee_id': assignment.staff.employee_id,
+            'role': assignment.role_on_flight,
+        }
+        for assignment in CrewAssignment.objects.filter(flight=flight).exclude(status='cancelled').select_related(
+            'staff__user').order_by('id')
+    ]
+
+
+def build_packet(flight, generation=0):
+    """The briefing contents of a flight, assembled from live data"""
+    distance = route_distance_km(flight.departure_airport, flight.arrival_airport)
+    return {
+        'generation': generation,
+        'route': {
+            'origin': flight.departure_airport,
+            'destination': flight.arrival_airport,
+            'distance_km': round(distance) if distance is not None else None,
+        },
+        'passengers': passenger_counts(flight),
+        'assistance': assistance_list(flight),
+        'crew': crew_list(flight),
+    }
+
+
+def briefing_packet(flight):
+    """The stored packet of a flight, rebuilt first if any of its inputs changed"""
+    generation = cache.get(BRIEFING_GENERATION_KEY, 0)
+    try:
+        packet, _ = BriefingPacket.objects.get_or_create(flight=flight)
+    except IntegrityError:
+        # Another request created this flight's packet first
+        packet = BriefingPacket.objects.get(flight=flight)
+    if packet.is_current and packet.data.get('generation') == generation:
+        return packet
+    version = packet.version
+    packet.data = build_packet(flight, generation)
+    packet.built_version = version
+    packet.built_at = timezone.now()
+    # An input changing while the packet was built has moved the version on, leaving it stale
+    BriefingPacket.objects.filter(pk=packet.pk, version=version).update(
+        data=packet.data, built_version=version, built_at=packet.built_at)
+    return packet
+
+
+def invalidate_packets(flight_ids):
+    """Mark the packets of these flights for rebuilding on their next view"""
+    flight_ids = list(flight_ids)
+    if flight_ids:
+        BriefingPacket.objects.filter(flight_id__in=flight_ids).update(version=F('version') + 1)
+
+
+def invalidate_all_packets():
+    """Outdate every packet without touching the table; used after bulk changes, which skip save signals"""
+    bump_version(BRIEFING_GENERATION_KEY)
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+@receiver(post_save, sender=CrewAssignment)
+@receiver(post_delete, sender=CrewAssignment)
+def flight_input_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields and sender is CrewAssignment and set(update_fields) <= CREW_ONLY_FIELDS:
+        return
+    invalidate_packets([instance.flight_id])
+
+
+@receiver(post_save, sender=CheckIn)
+@receiver(post_delete, sender=CheckIn)
+def check_in_changed(sender, instance, **kwargs):
+    BriefingPacket.objects.filter(flight__booking__id=instance.booking_id).update(version=F('version') + 1)
+
+
+@receiver(post_save, sender=Passenger)
+def passenger_changed(sender, instance, created, **kwargs):
+    if not created:
+        BriefingPacket.objects.filter(flight__booking__passenger=instance).update(version=F('version') + 1)
+
+
+@receiver(post_save, sender=Flight)
+def flight_changed(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_packets([instance.id])
@@ -0,0 +1,53 @@
+# Bulk Inserts without Model Instances
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.constants import OnConflict
+
+
+class RowWriter:
+    """executemany inserts into one model's table, for imports and generated data at scale
+
+    ``bulk_create`` prepares every field of every object, which is most of
+    its cost at millions of rows. Here the fields outside ``fields`` take a
+    value from ``constants`` or their default, prepared once, and each row
+    is a tuple of the remaining values already in database form.
+
+    With ``unique_fields``, a row clashing with an existing one on them
+    overwrites that row's ``update_fields`` instead of failing.
+    """
+
+    def __init__(self, model, fields, *, update_fields=(), unique_fields=(), using=DEFAULT_DB_ALIAS, **constants):
+        self.connection = connections[using]
+        ops = self.connection.ops
+        meta = model._meta
+        columns, self.fixed = [], ()
+        for field in meta.concrete_fields:
+            if field.attname in fields or field.primary_key:
+                continue
+            if field.attname in constants:
+                value = constants[field.attname]
+            elif field.has_default() or field.null or field.empty_strings_allowed:
+                value = field.get_default()
+            else:
+                raise ValueError(f'{meta.label}.{field.name} needs a value')
+            columns.append(field)
+            self.fixed += (field.get_db_prep_save(value, self.connection),)
+        columns += [meta.get_field(name) for name in fields]
+        suffix = ''
+        if unique_fields:
+            suffix = ops.on_conflict_suffix_sql(
+                columns, OnConflict.UPDATE,
+                [meta.get_field(name).column for name in update_fields],
+                [meta.get_field(name).column for name in unique_fields],
+            ) or ''
+        self.sql = 'INSERT INTO {} ({}) VALUES ({}) {}'.format(
+            ops.quote_name(meta.db_table),
+            ', '.join(ops.quote_name(field.column) for field in columns),
+            ', '.join(['%s'] * len(columns)),
+            suffix,
+        ).rstrip()
+
+    def write(self, rows):
+        # No savepoint when the caller already holds a transaction
+        with transaction.atomic(using=self.connection.alias, savepoint=False), self.connection.cursor() as cursor:
+            cursor.executemany(self.sql, [self.fixed + row for row in rows])
+        return len(rows)
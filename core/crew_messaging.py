@@ -0,0 +1,142 @@
+# Crew Messaging
+import asyncio
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .flight_tracking import format_sse
+from .live_events import KEEPALIVE_SECONDS, publish_crew_message
+from .models import CrewAssignment, CrewMessage, InboxCounter, MessageRecipient, Staff
+from .rosters import CREW_ROLES
+
+INBOX_PAGE_SIZE = 20
+MAX_INBOX_PAGE = 100
+
+
+def audience_user_ids(audience, role='', flight=None, aircraft_type=''):
+    """User ids of the active crew a broadcast reaches, in one query"""
+    if audience == 'flight':
+        ids = CrewAssignment.objects.filter(flight=flight).exclude(status='cancelled').values_list(
+            'staff__user_id', flat=True)
+    elif audience == 'fleet':
+        # Everyone with duties still to fly on the aircraft type
+        ids = CrewAssignment.objects.filter(
+            flight__aircraft_type__iexact=aircraft_type, flight__departure_time__gte=timezone.now(),
+            status__in=['scheduled', 'confirmed'], staff__is_active=True,
+        ).values_list('staff__user_id', flat=True).distinct()
+    else:
+        roles = [role] if audience == 'role' else CREW_ROLES
+        ids = Staff.objects.filter(role__in=roles, is_active=True).values_list('user_id', flat=True)
+    return sorted(set(ids))
+
+
+def message_payload(message):
+    return {
+        'id': message.id,
+        'sender': message.sender_name,
+        'subject': message.subject,
+        'priority': message.priority,
+        'created_at': message.created_at.isoformat(),
+    }
+
+
+def send_message(user_ids, subject, body='', sender=None, sender_name='Crew Scheduling', priority='normal',
+                 audience='direct', audience_label='', flight=None):
+    """Deliver one message to many users with bulk inserts, however many there are
+
+    The message row is written once; each recipient gets a delivery row
+    and their unread counter moves with a single set-based update.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    with transaction.atomic():
+        message = CrewMessage.objects.create(
+            sender=sender, sender_name=sender_name, subject=subject, body=body, priority=priority,
+            audience=audience, audience_label=audience_label, flight=flight, recipient_count=len(user_ids),
+        )
+        MessageRecipient.objects.bulk_create(
+            [MessageRecipient(message=message, user_id=user_id) for user_id in user_ids], batch_size=500)
+        InboxCounter.objects.bulk_create(
+            [InboxCounter(user_id=user_id) for user_id in user_ids], batch_size=500, ignore_conflicts=True)
+        InboxCounter.objects.filter(
+            user_id__in=MessageRecipient.objects.filter(message=message).values('user_id')
+        ).update(unread=F('unread') + 1)
+        publish_crew_message(message_payload(message), user_ids)
+    return message
+
+
+def broadcast(sender, subject, body, audience, role='', flight=None, aircraft_type='', priority='normal'):
+    """Send a message to every crew member of a role, a flight or a fleet"""
+    if audience == 'role':
+        label = dict(Staff.ROLE_CHOICES)[role]
+    elif audience == 'flight':
+        label = f'{flight.flight_number} {flight.service_date:%d %b}'
+    elif audience == 'fleet':
+        label = aircraft_type
+    else:
+        label = 'All crew'
+    user_ids = audience_user_ids(audience, role, flight, aircraft_type)
+    if not user_ids:
+        raise ValueError(f'No active crew to message for {label}')
+    return send_message(user_ids, subject, body, sender=sender, sender_name=sender.get_full_name() or sender.username,
+                        priority=priority, audience=audience, audience_label=label, flight=flight)
+
+
+def inbox(user, before=None, limit=INBOX_PAGE_SIZE):
+    """Newest deliveries first, from the delivery id ``before``; returns (page, next before)
+
+    Paging on the (user, id) index keeps every page as cheap as the first,
+    whatever the inbox size.
+    """
+    limit = max(1, min(limit, MAX_INBOX_PAGE))
+    deliveries = MessageRecipient.objects.filter(user=user).select_related('message')
+    if before:
+        deliveries = deliveries.filter(id__lt=before)
+    page = list(deliveries.order_by('-id')[:limit + 1])
+    more = len(page) > limit
+    page = page[:limit]
+    return page, page[-1].id if more else None
+
+
+def unread_count(user):
+    return InboxCounter.objects.filter(user=user).values_list('unread', flat=True).first() or 0
+
+
+def mark_read(user, delivery_ids=None):
+    """Mark some or all of a user's deliveries read and move their counter by as many"""
+    with transaction.atomic():
+        deliveries = MessageRecipient.objects.filter(user=user, read_at__isnull=True)
+        if delivery_ids is not None:
+            deliveries = deliveries.filter(id__in=delivery_ids)
+        count = deliveries.update(read_at=timezone.now())
+        if count:
+            InboxCounter.objects.filter(user=user).update(unread=Greatest(F('unread') - count, 0))
+    return count
+
+
+def delivery_payload(delivery):
+    return {
+        **message_payload(delivery.message),
+        'delivery_id': delivery.id,
+        'body': delivery.message.body,
+        'read': delivery.read_at is not None,
+    }
+
+
+async def inbox_stream(hub, user_id):
+    """SSE frames of the new messages addressed to one user"""
+    queue = hub.subscribe()
+    try:
+        yield ': connected\n\n'
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if event['event'] == 'message.new' and user_id in event['data']['user_ids']:
+                data = {key: value for key, value in event['data'].items() if key != 'user_ids'}
+                yield format_sse(data, event='message.new')
+    finally:
+        hub.unsubscribe(queue)
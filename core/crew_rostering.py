@@ -0,0 +1,395 @@
+# Crew Pairing and Rostering
+import heapq
+import math
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter, defaultdict, namedtuple
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .airports import normalize_code
+from .briefings import invalidate_all_packets
+from .duty_limits import (FLIGHT_TIME_LIMITS, LOOKBACK, MAX_DUTY_PERIOD, MIN_REST, RELEASE_AFTER_ARRIVAL,
+                          REPORT_BEFORE_DEPARTURE, crew_legs, find_violations, flight_times)
+from .models import CrewAssignment, CrewBid, Flight, Staff
+from .rosters import CREW_ROLES, invalidate_rosters, month_bounds
+
+MIN_CONNECTION = 30 * 60  # crew sit time between legs of one duty, in seconds
+MAX_PAIRING_LEGS = 4
+SEATS_PER_CABIN_CREW = 50
+RECHECK_AFTER = 60 * 60  # crew over a limit are offered work again this much later
+ROLE_TITLES = {'pilot': 'Captain', 'copilot': 'First Officer', 'cabin_crew': 'Cabin Crew'}
+
+# Times are epoch seconds; ``complement`` is ((role, count), ...) in CREW_ROLES order. A crew member's
+# ``legs`` are (departure, arrival, origin, destination) and ``base`` is where they start; stations are
+# airport codes, or '' when unknown, which matches any station
+CrewLeg = namedtuple('CrewLeg', ['flight_id', 'origin', 'destination', 'departure', 'arrival', 'aircraft_id',
+                                 'complement'])
+CrewMember = namedtuple('CrewMember', ['staff_id', 'role', 'valid_until', 'legs', 'base'], defaults=[''])
+
+
+class Pairing(namedtuple('Pairing', ['legs', 'complement'])):
+    """Legs one crew flies together within a single duty"""
+    __slots__ = ()
+
+    @property
+    def start(self):
+        return self.legs[0].departure
+
+    @property
+    def end(self):
+        return self.legs[-1].arrival
+
+    @property
+    def block(self):
+        return sum(leg.arrival - leg.departure for leg in self.legs)
+
+
+def crew_complement(seats, crewed=None):
+    """Crew a flight needs: two pilots and one cabin crew member per 50 seats
+
+    ``crewed`` counts the crew already on the flight by role; only the
+    positions still open are returned.
+    """
+    crewed = crewed or {}
+    needed = (('pilot', 1), ('copilot', 1), ('cabin_crew', max(1, math.ceil(seats / SEATS_PER_CABIN_CREW))))
+    return tuple((role, count - crewed.get(role, 0)) for role, count in needed if count > crewed.get(role, 0))
+
+
+def same_station(a, b):
+    return not a or not b or a == b
+
+
+def build_pairings(legs):
+    """Chain legs into single-duty pairings in departure order
+
+    A leg extends an open pairing waiting at its origin when the crew have
+    had their minimum connection, the duty stays within its limit and the
+    block time within the 24-hour limit. The pairing following the same
+    aircraft is preferred, then the shortest sit; otherwise the leg opens a
+    new pairing. Pairings never mix legs needing a different crew complement.
+    """
+    daily_limit = FLIGHT_TIME_LIMITS[0][2]
+    waiting = defaultdict(list)
+    chains = []
+    for leg in sorted(legs, key=lambda l: (l.departure, l.flight_id)):
+        best, best_key = None, None
+        still_open = []
+        for chain in waiting[leg.origin]:
+            last = chain[-1]
+            sit = leg.departure - last.arrival
+            if sit >= MIN_REST:
+                continue  # that duty is over
+            still_open.append(chain)
+            if (sit < MIN_CONNECTION or len(chain) >= MAX_PAIRING_LEGS or chain[0].complement != leg.complement
+                    or leg.arrival - chain[0].departure + REPORT_BEFORE_DEPARTURE + RELEASE_AFTER_ARRIVAL
+                    > MAX_DUTY_PERIOD
+                    or sum(l.arrival - l.departure for l in chain) + leg.arrival - leg.departure > daily_limit):
+                continue
+            key = (leg.aircraft_id is None or last.aircraft_id != leg.aircraft_id, sit)
+            if best_key is None or key < best_key:
+                best, best_key = chain, key
+        if best is None:
+            best = []
+            chains.append(best)
+        else:
+            still_open.remove(best)
+        waiting[leg.origin] = still_open
+        best.append(leg)
+        waiting[leg.destination].append(best)
+    return [Pairing(tuple(chain), chain[0].complement) for chain in chains]
+
+
+class CrewTimeline:
+    """One crew member's legs in time order, extended as the roster is built
+
+    Legs behind the rostering front are kept as prefix sums of block time,
+    so each limit check is a binary search per leg and window. Fixed legs
+    further ahead are held aside until the front reaches them, and a new
+    pairing must leave full rest before them and keep their windows legal.
+    A pairing must also depart where the crew member is, and end where
+    their next fixed leg departs.
+    """
+
+    def __init__(self, legs, valid_until, base=''):
+        self.starts, self.ends, self.prefix = [], [], [0]
+        self.fixed = sorted(legs)
+        self.next_fixed = 0
+        self.valid_until = valid_until
+        self.base = base
+        self.moves = [(start, destination) for start, _, _, destination in self.fixed]
+
+    def station_at(self, t):
+        """Where the crew member is at instant ``t``: where their last leg before it went, else their base"""
+        i = bisect_left(self.moves, (t,))
+        return self.moves[i - 1][1] if i else self.base
+
+    def _append(self, start, end):
+        self.starts.append(start)
+        self.ends.append(end)
+        self.prefix.append(self.prefix[-1] + end - start)
+
+    def advance(self, t):
+        """Move fixed legs departing before ``t`` behind the front"""
+        while self.next_fixed < len(self.fixed) and self.fixed[self.next_fixed][0] < t:
+            self._append(*self.fixed[self.next_fixed][:2])
+            self.next_fixed += 1
+
+    def flown_since(self, t):
+        """Block time behind the front flown after instant ``t``"""
+        i = bisect_right(self.starts, t)
+        before = self.prefix[i] - max(0, self.ends[i - 1] - t) if i else 0
+        return self.prefix[-1] - before
+
+    def fits(self, pairing):
+        if pairing.end > self.valid_until:
+            return False
+        if not same_station(self.station_at(pairing.start), pairing.legs[0].origin):
+            return False
+        self.advance(pairing.start)
+        if self.ends and pairing.start - self.ends[-1] < MIN_REST:
+            return False
+        ahead = self.fixed[self.next_fixed:]
+        if ahead and (ahead[0][0] - pairing.end < MIN_REST
+                      or not same_station(pairing.legs[-1].destination, ahead[0][2])):
+            return False
+        for _, window, limit in FLIGHT_TIME_LIMITS:
+            flown = 0
+            for leg in pairing.legs:
+                flown += leg.arrival - leg.departure
+                if self.flown_since(leg.arrival - window) + flown > limit:
+                    return False
+            # Windows ending with the fixed legs ahead also hold this pairing
+            later = [(leg.departure, leg.arrival) for leg in pairing.legs]
+            for start, end, _, _ in ahead:
+                if start >= pairing.start + window:
+                    break
+                later.append((start, end))
+                since = end - window
+                if self.flown_since(since) + sum(max(0, b - max(a, since)) for a, b in later) > limit:
+                    return False
+        return True
+
+    def take(self, pairing):
+        self.advance(pairing.start)
+        for leg in pairing.legs:
+            self._append(leg.departure, leg.arrival)
+            insort(self.moves, (leg.departure, leg.destination))
+
+
+class CrewRosterSolver:
+    """Greedy assignment of crew to pairings in departure order
+
+    Every crew position of a pairing goes first to crew who bid for its
+    legs, then to the qualified crew member of the right role with the
+    least block time rostered so far, as long as the pairing departs where
+    they are, keeps them within flight time limits, leaves them their
+    minimum rest and ends before their licence or medical lapses. Crew
+    waiting for work are filed in heaps by role and station, and crew just
+    rostered rest in a heap keyed by when they may fly again, so each
+    position looks at available crew at the pairing's origin only.
+    """
+
+    def __init__(self, crew, bids=None, excluded=(), period_start=None):
+        self.crew = {c.staff_id: c for c in crew}
+        self.bids = bids or {}
+        self.excluded = set(excluded)  # (staff_id, flight_id) pairs never to roster again
+        self.timelines = {c.staff_id: CrewTimeline(c.legs, c.valid_until, c.base) for c in crew}
+        self.rostered = {
+            c.staff_id: sum(leg[1] - leg[0] for leg in c.legs if period_start is None or leg[0] >= period_start)
+            for c in crew
+        }
+        self.assignments = []
+        self.uncovered = []
+
+    def _allowed(self, staff_id, pairing):
+        return not any((staff_id, leg.flight_id) in self.excluded for leg in pairing.legs)
+
+    def solve(self, pairings):
+        """Roster every pairing; returns the (pairing, role, missing) positions left open"""
+        pairings = sorted(pairings, key=lambda p: (p.start, p.legs[0].flight_id))
+        ready = {role: defaultdict(list) for role in CREW_ROLES}
+        filed = {}  # staff_id: station heap holding their live entry
+        available = set()
+        resting = []
+        moving = []  # (departure, staff_id) of fixed legs, after which the crew member is elsewhere
+
+        def file(staff_id, t):
+            station = self.timelines[staff_id].station_at(t)
+            filed[staff_id] = station
+            heapq.heappush(ready[self.crew[staff_id].role][station], (self.rostered[staff_id], staff_id))
+
+        def rest(staff_id, until):
+            available.discard(staff_id)
+            heapq.heappush(resting, (until, staff_id))
+
+        first = pairings[0].start if pairings else 0
+        for staff_id, member in self.crew.items():
+            if member.role in ready:
+                available.add(staff_id)
+                file(staff_id, first)
+                moving.extend((leg[0], staff_id) for leg in member.legs if leg[0] >= first)
+        heapq.heapify(moving)
+
+        for pairing in pairings:
+            while resting and resting[0][0] <= pairing.start:
+                _, staff_id = heapq.heappop(resting)
+                if staff_id not in available:
+                    available.add(staff_id)
+                    file(staff_id, pairing.start)
+            while moving and moving[0][0] < pairing.start:
+                _, staff_id = heapq.heappop(moving)
+                if staff_id in available:
+                    file(staff_id, pairing.start)
+
+            origin = pairing.legs[0].origin
+            bidders = Counter(staff_id for leg in pairing.legs for staff_id in self.bids.get(leg.flight_id, ()))
+            for role, needed in pairing.complement:
+                chosen = []
+                for staff_id, _ in sorted(bidders.items(), key=lambda b: (-b[1], self.rostered[b[0]], b[0])):
+                    if len(chosen) == needed:
+                        break
+                    if (staff_id in available and self.crew[staff_id].role == role
+                            and self._allowed(staff_id, pairing) and self.timelines[staff_id].fits(pairing)):
+                        chosen.append(staff_id)
+                        available.discard(staff_id)
+
+                # Crew at the origin and crew whose station is unknown; anyone for a leg from an unknown station
+                heaps = [ready[role][origin], ready[role]['']] if origin else list(ready[role].values())
+                skipped = []
+                while len(chosen) < needed:
+                    heap = min((h for h in heaps if h), key=lambda h: h[0], default=None)
+                    if heap is None:
+                        break
+                    hours, staff_id = heapq.heappop(heap)
+                    if (staff_id not in available or hours != self.rostered[staff_id]
+                            or ready[role][filed[staff_id]] is not heap):
+                        continue  # stale entry
+                    timeline = self.timelines[staff_id]
+                    if not self._allowed(staff_id, pairing):
+                        skipped.append((heap, (hours, staff_id)))
+                    elif timeline.fits(pairing):
+                        chosen.append(staff_id)
+                        available.discard(staff_id)
+                    elif timeline.valid_until < pairing.end:
+                        available.discard(staff_id)  # qualifications have lapsed for good
+                    else:
+                        rest(staff_id, pairing.start + RECHECK_AFTER)
+                for heap, entry in skipped:
+                    heapq.heappush(heap, entry)
+
+                for staff_id in chosen:
+                    self.timelines[staff_id].take(pairing)
+                    self.rostered[staff_id] += pairing.block
+                    self.assignments.append((pairing, staff_id, role))
+                    rest(staff_id, pairing.end + MIN_REST)
+                if len(chosen) < needed:
+                    self.uncovered.append((pairing, role, needed - len(chosen)))
+        return self.uncovered
+
+
+def crew_leg(flight, crewed=None):
+    departure, arrival = flight_times(flight)
+    return CrewLeg(
+        flight_id=flight.id,
+        origin=normalize_code(flight.departure_airport),
+        destination=normalize_code(flight.arrival_airport),
+        departure=departure.timestamp(),
+        arrival=arrival.timestamp(),
+        aircraft_id=flight.aircraft_id,
+        complement=crew_complement(flight.total_seats, crewed),
+    )
+
+
+def qualified_until(staff):
+    """Epoch second the crew member's licence or medical lapses, or infinity"""
+    expiries = [d for d in (staff.license_expiry, staff.medical_expiry) if d]
+    if not expiries:
+        return math.inf
+    return timezone.make_aware(datetime.combine(min(expiries), time.min)).timestamp()
+
+
+def roster_crew(year, month):
+    """Pair the month's open crew positions and roster qualified crew onto them
+
+    Existing assignments are kept, count toward every limit and leave crew
+    where they land; a partly crewed flight has only its missing positions
+    filled. The plan is checked once more against the full limits before
+    the new assignments are written in bulk; any pairing that fails is left
+    open.
+    """
+    first_day, last_day = month_bounds(year, month)
+    start = timezone.make_aware(datetime.combine(first_day, time.min))
+    end = timezone.make_aware(datetime.combine(last_day + timedelta(days=1), time.min))
+    flights = list(Flight.objects.filter(departure_time__gte=start, departure_time__lt=end).exclude(
+        status='cancelled'))
+    crewed = defaultdict(Counter)
+    excluded = []
+    for staff_id, flight_id, role, status in CrewAssignment.objects.filter(
+            flight__departure_time__gte=start, flight__departure_time__lt=end).values_list(
+            'staff_id', 'flight_id', 'staff__role', 'status'):
+        excluded.append((staff_id, flight_id))
+        if status != 'cancelled':
+            crewed[flight_id][role] += 1
+    open_legs = [leg for leg in (crew_leg(f, crewed[f.id]) for f in flights) if leg.complement]
+    pairings = build_pairings(open_legs)
+    flight_ids = [leg.flight_id for leg in open_legs]
+
+    staff = list(Staff.objects.filter(role__in=CREW_ROLES, is_active=True, qualification_status='current').only(
+        'id', 'role', 'base_airport', 'license_expiry', 'medical_expiry'))
+    legs = defaultdict(list)
+    for staff_id, departure, arrival, origin, destination in crew_legs(
+            start - LOOKBACK, end + LOOKBACK, [s.id for s in staff]).values_list(
+            'staff_id', 'dep', 'arr', 'flight__departure_airport', 'flight__arrival_airport'):
+        legs[staff_id].append((departure.timestamp(), arrival.timestamp(), normalize_code(origin),
+                               normalize_code(destination)))
+    bids = defaultdict(set)
+    for flight_id, staff_id in CrewBid.objects.filter(flight_id__in=flight_ids).values_list('flight_id', 'staff_id'):
+        bids[flight_id].add(staff_id)
+
+    solver = CrewRosterSolver(
+        [CrewMember(s.id, s.role, qualified_until(s), legs[s.id], normalize_code(s.base_airport)) for s in staff],
+        bids, excluded, period_start=start.timestamp(),
+    )
+    uncovered = solver.solve(pairings)
+
+    # Full check, windows both ways, of every rostered crew member's new month
+    rows = []
+    for pairing, staff_id, _ in solver.assignments:
+        rows.extend((staff_id, leg.departure, leg.arrival, leg.flight_id) for leg in pairing.legs)
+    rostered = {row[0] for row in rows}
+    rows.extend((staff_id, leg[0], leg[1], None) for staff_id in rostered for leg in legs[staff_id])
+    failed = set()
+    if rows:
+        staff_ids, starts, ends, flight_of = zip(*rows)
+        for i, _, _ in find_violations(staff_ids, starts, ends, since=start.timestamp()):
+            if flight_of[i] is not None:
+                failed.add((staff_ids[i], flight_of[i]))
+
+    assignments = []
+    dropped = 0
+    for pairing, staff_id, role in solver.assignments:
+        if any((staff_id, leg.flight_id) in failed for leg in pairing.legs):
+            dropped += 1
+            uncovered.append((pairing, role, 1))
+            continue
+        assignments.extend(
+            CrewAssignment(staff_id=staff_id, flight_id=leg.flight_id, role_on_flight=ROLE_TITLES[role])
+            for leg in pairing.legs
+        )
+    with transaction.atomic():
+        CrewAssignment.objects.bulk_create(assignments, batch_size=500)
+    # Bulk inserts skip save signals, so drop the affected rosters and briefings here
+    invalidate_rosters({a.staff_id for a in assignments})
+    if assignments:
+        invalidate_all_packets()
+
+    by_id = {f.id: f for f in flights}
+    return {
+        'pairings': len(pairings),
+        'assigned': len(assignments),
+        'dropped': dropped,
+        'uncovered': sorted({by_id[leg.flight_id] for pairing, _, _ in uncovered for leg in pairing.legs},
+                            key=lambda f: f.departure_time),
+    }
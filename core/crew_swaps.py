@@ -0,0 +1,198 @@
+# Crew Swap Marketplace
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .airports import normalize_code
+from .crew_rostering import qualified_until
+from .duty_limits import crew_ledgers, flight_times
+from .models import CrewAssignment, Staff, SwapRequest
+from .rosters import invalidate_rosters
+
+SWAP_MIN_NOTICE = timedelta(days=7)  # assignments departing sooner can no longer change hands
+MAX_SWAP_MATCHES = 10
+MATCH_CANDIDATES = 50  # indexed candidates fetched per lookup before legality checks
+
+
+def swap_cutoff():
+    return timezone.now() + SWAP_MIN_NOTICE
+
+
+def wants(request, other):
+    """Whether ``request``'s crew member would take ``other``'s flight in return"""
+    return ((request.wanted_from is None or other.departure_date >= request.wanted_from)
+            and (request.wanted_until is None or other.departure_date <= request.wanted_until)
+            and (not request.wanted_destination or request.wanted_destination == other.destination))
+
+
+def counterparts(swap):
+    """Open trades that ``swap`` would take and that would take it back, by date
+
+    Role, date and destination filters run on the swap indexes, so the
+    lookup stays cheap however many requests are open.
+    """
+    candidates = SwapRequest.objects.filter(
+        status='open', kind='trade', role=swap.role, departure_date__gte=swap_cutoff().date()
+    ).exclude(requester_id=swap.requester_id)
+    if swap.wanted_from:
+        candidates = candidates.filter(departure_date__gte=swap.wanted_from)
+    if swap.wanted_until:
+        candidates = candidates.filter(departure_date__lte=swap.wanted_until)
+    if swap.wanted_destination:
+        candidates = candidates.filter(destination=swap.wanted_destination)
+    # ... and they must want this flight back
+    return candidates.filter(
+        Q(wanted_from__isnull=True) | Q(wanted_from__lte=swap.departure_date),
+        Q(wanted_until__isnull=True) | Q(wanted_until__gte=swap.departure_date),
+        Q(wanted_destination='') | Q(wanted_destination=swap.destination),
+    ).order_by('departure_date', 'id')
+
+
+def swap_legality(staff, ledger, flight, dropping=None):
+    """Reasons ``staff`` may not fly ``flight``, giving up ``dropping`` in exchange"""
+    departure, arrival = flight_times(flight)
+    reasons = []
+    if not staff.is_active or staff.qualification_status != 'current':
+        reasons.append('qualifications are not current')
+    elif qualified_until(staff) <= arrival.timestamp():
+        reasons.append('licence or medical expires before the flight')
+    problems = ledger.check(departure.timestamp(), arrival.timestamp())
+    if problems and dropping is not None:
+        # Only worth rebuilding the ledger without the flight given up when it is in the way
+        problems = ledger.without(flight_times(dropping)[0].timestamp()).check(
+            departure.timestamp(), arrival.timestamp())
+    reasons.extend(problems)
+    return [f'{staff.user.get_full_name() or staff.employee_id}: {reason}' for reason in reasons]
+
+
+def _ledgers(staff_ids, flights):
+    times = [t for flight in flights for t in flight_times(flight)]
+    return crew_ledgers(list(staff_ids), min(times), max(times))
+
+
+def find_matches(swap, limit=MAX_SWAP_MATCHES):
+    """Open trades both sides could legally fly in exchange for ``swap``"""
+    candidates = list(counterparts(swap).select_related('assignment__flight', 'requester__user')[:MATCH_CANDIDATES])
+    if not candidates:
+        return []
+    flight = swap.assignment.flight
+    ledgers = _ledgers({swap.requester_id, *(c.requester_id for c in candidates)},
+                       [flight, *(c.assignment.flight for c in candidates)])
+    matches = []
+    for candidate in candidates:
+        theirs = candidate.assignment.flight
+        if (swap_legality(swap.requester, ledgers[swap.requester_id], theirs, flight)
+                or swap_legality(candidate.requester, ledgers[candidate.requester_id], flight, theirs)):
+            continue
+        matches.append(candidate)
+        if len(matches) == limit:
+            break
+    return matches
+
+
+def open_giveaways(staff, limit=MAX_SWAP_MATCHES * 5):
+    """Open giveaways of ``staff``'s role that they could legally pick up"""
+    giveaways = list(SwapRequest.objects.filter(
+        status='open', kind='giveaway', role=staff.role, departure_date__gte=swap_cutoff().date()
+    ).exclude(requester=staff).select_related('assignment__flight', 'requester__user').order_by(
+        'departure_date', 'id')[:limit])
+    if not giveaways:
+        return []
+    ledger = _ledgers([staff.id], [g.assignment.flight for g in giveaways])[staff.id]
+    return [g for g in giveaways if not swap_legality(staff, ledger, g.assignment.flight)]
+
+
+def post_swap(assignment, kind='trade', wanted_from=None, wanted_until=None, wanted_destination=''):
+    """Offer an assignment to other crew; raises ValueError if it cannot be offered"""
+    flight = assignment.flight
+    if assignment.status != 'scheduled':
+        raise ValueError(f'{flight.flight_number} is {assignment.get_status_display().lower()}, not scheduled')
+    if flight.departure_time < swap_cutoff():
+        raise ValueError(f'{flight.flight_number} departs in less than {SWAP_MIN_NOTICE.days} days')
+    if SwapRequest.objects.filter(assignment=assignment, status='open').exists():
+        raise ValueError(f'{flight.flight_number} is already on offer')
+    return SwapRequest.objects.create(
+        requester=assignment.staff,
+        assignment=assignment,
+        kind=kind,
+        role=assignment.staff.role,
+        departure_date=flight.departure_time.date(),
+        origin=normalize_code(flight.departure_airport),
+        destination=normalize_code(flight.arrival_airport),
+        wanted_from=wanted_from if kind == 'trade' else None,
+        wanted_until=wanted_until if kind == 'trade' else None,
+        wanted_destination=normalize_code(wanted_destination) if kind == 'trade' else '',
+    )
+
+
+def accept_swap(swap, taker, counter=None):
+    """Hand a giveaway to ``taker``, or exchange ``swap`` with their matching trade ``counter``
+
+    Both requests and assignments are locked, legality is checked again and
+    the assignments change hands in one transaction. Raises ValueError with
+    the reason when the swap cannot go ahead.
+    """
+    if swap.kind == 'giveaway':
+        counter = None
+    with transaction.atomic():
+        ids = [swap.pk] + ([counter.pk] if counter else [])
+        locked = {s.pk: s for s in SwapRequest.objects.select_for_update().select_related(
+            'assignment__flight', 'requester__user').filter(pk__in=ids)}
+        swap = locked[swap.pk]
+        counter = locked.get(counter.pk) if counter else None
+        if any(s.status != 'open' for s in locked.values()):
+            raise ValueError('This swap is no longer open')
+        if swap.requester_id == taker.id:
+            raise ValueError('You cannot take your own swap')
+        if taker.role != swap.role:
+            raise ValueError(f'This swap is for {dict(Staff.ROLE_CHOICES)[swap.role]} crew')
+        if swap.kind == 'trade':
+            if counter is None or counter.requester_id != taker.id:
+                raise ValueError('A trade needs one of your own open trades in return')
+            if not (wants(swap, counter) and wants(counter, swap)):
+                raise ValueError('These trades do not match')
+
+        requests = [swap] + ([counter] if counter else [])
+        assignments = {a.pk: a for a in CrewAssignment.objects.select_for_update().filter(
+            pk__in=[r.assignment_id for r in requests])}
+        for request in requests:
+            if (assignments[request.assignment_id].staff_id != request.requester_id
+                    or assignments[request.assignment_id].status != 'scheduled'):
+                raise ValueError(f'{request.assignment.flight.flight_number} has changed since it was offered')
+            if request.assignment.flight.departure_time < swap_cutoff():
+                raise ValueError(f'{request.assignment.flight.flight_number} departs too soon to swap')
+
+        given = swap.assignment.flight
+        taken = counter.assignment.flight if counter else None
+        ledgers = _ledgers({swap.requester_id, taker.id}, [f for f in (given, taken) if f])
+        reasons = swap_legality(taker, ledgers[taker.id], given, taken)
+        if counter:
+            reasons += swap_legality(swap.requester, ledgers[swap.requester_id], taken, given)
+        if reasons:
+            raise ValueError('; '.join(reasons))
+
+        # Saved one at a time so roster caches follow the assignments
+        assignment = assignments[swap.assignment_id]
+        assignment.staff = taker
+        assignment.save(update_fields=['staff', 'updated_at'])
+        if counter:
+            returned = assignments[counter.assignment_id]
+            returned.staff = swap.requester
+            returned.save(update_fields=['staff', 'updated_at'])
+
+        now = timezone.now()
+        swap.status, swap.taker, swap.matched_request, swap.resolved_at = 'accepted', taker, counter, now
+        swap.save(update_fields=['status', 'taker', 'matched_request', 'resolved_at'])
+        if counter:
+            counter.status, counter.taker, counter.matched_request, counter.resolved_at = (
+                'accepted', swap.requester, swap, now)
+            counter.save(update_fields=['status', 'taker', 'matched_request', 'resolved_at'])
+        # The save signal only sees the new holder, so both sides' rosters move on once committed
+        transaction.on_commit(lambda: invalidate_rosters([swap.requester_id, taker.id]))
+    return swap
+
+
+def cancel_swap(swap):
+    SwapRequest.objects.filter(pk=swap.pk, status='open').update(status='cancelled', resolved_at=timezone.now())
@@ -0,0 +1,203 @@
+# Delay Propagation Across Aircraft Rotations and Crew
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .alert_ingestion import AlertSignal, clear_alerts, raise_alerts
+from .gate_assignment import flight_movement, reschedule_gates
+from .live_events import publish_flight_status
+from .models import Flight, CrewAssignment
+from .turnaround import MAX_TURNAROUND_GAP, standard_turnaround
+
+MIN_CREW_CONNECTION_MINUTES = 30
+PROPAGATION_HORIZON = timedelta(hours=36)  # how far downstream a disruption is followed
+MOVABLE_STATUSES = ('scheduled', 'boarding', 'delayed')
+DELAY_ALERT_SYSTEM = 'Flight Operations'
+
+Connection = namedtuple('Connection', ['kind', 'from_flight', 'min_gap', 'label'])
+BrokenConnection = namedtuple('BrokenConnection', ['kind', 'from_flight', 'to_flight', 'ready', 'label'])
+
+
+def min_turnaround():
+    return timedelta(minutes=standard_turnaround()[1])
+
+
+class DelayPropagator:
+    """Knock-on delays over the aircraft rotation and crew connection graph
+
+    Every connection links a leg to a later-departing leg, so one pass over
+    the flights in scheduled departure order settles each flight after all
+    of its predecessors.
+    """
+
+    def __init__(self, flights, crew_legs=(), turnaround=None,
+                 crew_connection=timedelta(minutes=MIN_CREW_CONNECTION_MINUTES)):
+        self.flights = sorted(flights, key=lambda f: (f.departure_time, f.id))
+        self.by_id = {f.id: f for f in self.flights}
+        self.incoming = defaultdict(list)
+        turnaround = turnaround if turnaround is not None else min_turnaround()
+
+        last_leg = {}
+        for flight in self.flights:
+            if flight.aircraft_id is None:
+                continue
+            previous = last_leg.get(flight.aircraft_id)
+            if previous is not None:
+                label = flight.aircraft.registration if flight.aircraft else f'aircraft {flight.aircraft_id}'
+                self.incoming[flight.id].append(Connection('aircraft', previous, turnaround, label))
+            last_leg[flight.aircraft_id] = flight
+
+        # crew_legs: (staff_id, crew member name, flight_id)
+        duties = defaultdict(list)
+        names = {}
+        for staff_id, name, flight_id in crew_legs:
+            if flight_id in self.by_id:
+                duties[staff_id].append(self.by_id[flight_id])
+                names[staff_id] = name
+        for staff_id, legs in duties.items():
+            legs.sort(key=lambda f: (f.departure_time, f.id))
+            for previous, flight in zip(legs, legs[1:]):
+                if previous.aircraft_id is not None and previous.aircraft_id == flight.aircraft_id:
+                    continue  # crew stays with the aircraft; the rotation already covers it
+                self.incoming[flight.id].append(Connection('crew', previous, crew_connection, names[staff_id]))
+
+    def propagate(self, delays=None):
+        """Estimated (departure, arrival) per flight plus the connections that broke
+
+        ``delays`` maps flight ids to new estimated departures; otherwise each
+        flight starts from its actual or entered estimated departure. Knock-on
+        estimates of an earlier run are recomputed, never built on, and the
+        flights held back by a connection end up in ``knock_on``.
+        """
+        delays = delays or {}
+        estimates = {}
+        broken = []
+        self.knock_on = set()
+        for flight in self.flights:
+            block = flight.arrival_time - flight.departure_time
+            if flight.actual_departure:
+                departure = flight.actual_departure
+                arrival = flight.actual_arrival or departure + block
+                estimates[flight.id] = (departure, arrival)
+                continue
+
+            departure = delays.get(flight.id)
+            if departure is None and not flight.knock_on_delay:
+                departure = flight.estimated_departure
+            departure = root = max(departure or flight.departure_time, flight.departure_time)
+            if flight.status in MOVABLE_STATUSES:
+                for connection in self.incoming[flight.id]:
+                    upstream = connection.from_flight
+                    upstream_arrival = estimates[upstream.id][1]
+                    ready = upstream_arrival + connection.min_gap
+                    if ready > flight.departure_time and upstream_arrival > upstream.arrival_time:
+                        broken.append(BrokenConnection(connection.kind, upstream, flight, ready, connection.label))
+                    departure = max(departure, ready)
+            if departure > root:
+                self.knock_on.add(flight.id)
+            estimates[flight.id] = (departure, departure + block)
+        return estimates, broken
+
+
+def connection_subject(flight):
+    return f'Broken connection {flight.flight_number} {flight.service_date}'
+
+
+def delay_alerts(broken):
+    """One alert signal per flight whose connections broke"""
+    by_flight = defaultdict(list)
+    for connection in broken:
+        by_flight[connection.to_flight].append(connection)
+
+    alerts = []
+    for flight, connections in by_flight.items():
+        lines = [
+            f"{c.kind.title()} {c.label} from {c.from_flight.flight_number} ready {c.ready:%H:%M}"
+            for c in connections
+        ]
+        alerts.append(AlertSignal(
+            title=f'Broken connection: {flight.flight_number}',
+            message=f"{flight.flight_number} scheduled {flight.departure_time:%H:%M} cannot depart on time.\n"
+                    + '\n'.join(lines),
+            alert_type='error' if any(c.kind == 'crew' for c in connections) else 'warning',
+            affected_system=DELAY_ALERT_SYSTEM,
+            subject=connection_subject(flight),
+        ))
+    return alerts
+
+
+def propagate_delays(start, end, user, delays=None):
+    """Propagate delays for flights departing in [start, end) and save the knock-on estimates
+
+    Loads the window's flights and crew legs in two queries, writes the
+    changed estimates with one bulk update and raises alerts in bulk.
+    Knock-on estimates clear once their cause does, returning the flight to
+    scheduled, and alerts of flights whose connections hold again are resolved.
+    Flights whose new times clash at their gate are moved to another one.
+    """
+    window_start = start - MAX_TURNAROUND_GAP
+    window_end = end + PROPAGATION_HORIZON
+    flights = list(
+        Flight.objects.filter(departure_time__gte=window_start, departure_time__lt=window_end)
+        .exclude(status='cancelled').select_related('aircraft')
+    )
+    crew_legs = (
+        (staff_id, f'{first_name} {last_name}'.strip(), flight_id)
+        for staff_id, first_name, last_name, flight_id in CrewAssignment.objects.filter(
+            flight__departure_time__gte=window_start, flight__departure_time__lt=window_end,
+        ).exclude(status='cancelled').values_list(
+            'staff_id', 'staff__user__first_name', 'staff__user__last_name', 'flight_id'
+        )
+    )
+
+    propagator = DelayPropagator(flights, crew_legs)
+    estimates, broken = propagator.propagate(delays)
+    now = timezone.now()
+
+    changed = []
+    before = {}
+    for flight in propagator.flights:
+        if flight.actual_departure:
+            continue
+        departure, arrival = estimates[flight.id]
+        if departure <= flight.departure_time:
+            departure = arrival = None
+        knock_on = departure is not None and flight.id in propagator.knock_on
+        if (flight.estimated_departure, flight.estimated_arrival, flight.knock_on_delay) == (
+                departure, arrival, knock_on):
+            continue
+        if flight.gate_id:
+            before[flight.id] = flight_movement(flight)
+        flight.estimated_departure, flight.estimated_arrival = departure, arrival
+        flight.knock_on_delay = knock_on
+        if departure is not None and flight.status == 'scheduled':
+            flight.status = 'delayed'
+        elif departure is None and flight.status == 'delayed':
+            flight.status = 'scheduled'  # the knock-on delay has been absorbed
+        flight.updated_at = now  # bulk_update skips auto_now
+        changed.append(flight)
+
+    alerts = delay_alerts(broken)
+    broken_flights = {c.to_flight.id for c in broken}
+    with transaction.atomic():
+        Flight.objects.bulk_update(
+            changed, ['estimated_departure', 'estimated_arrival', 'knock_on_delay', 'status', 'updated_at'],
+            batch_size=500
+        )
+        # bulk writes skip the save signals, so announce them here
+        publish_flight_status(changed)
+        regated = reschedule_gates(changed, before)
+        raise_alerts(alerts, user)
+        clear_alerts(DELAY_ALERT_SYSTEM, [
+            connection_subject(f) for f in propagator.flights if f.id not in broken_flights
+        ])
+
+    return {
+        'changed': changed,
+        'delayed': [f for f in changed if f.estimated_departure is not None],
+        'broken': broken,
+        'regated': regated,
+        'alerts': len(alerts),
+    }
@@ -0,0 +1,276 @@
+# Flight Time Limitations
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+import numpy as np
+from django.db.models.functions import Coalesce
+
+from .models import CrewAssignment
+
+HOUR = 3600
+# Maximum block time in any rolling window: (name, window, limit) in seconds
+FLIGHT_TIME_LIMITS = (
+    ('24 hours', 24 * HOUR, 10 * HOUR),
+    ('7 days', 7 * 24 * HOUR, 60 * HOUR),
+    ('28 days', 28 * 24 * HOUR, 100 * HOUR),
+    ('365 days', 365 * 24 * HOUR, 1000 * HOUR),
+)
+MIN_REST = 10 * HOUR  # a shorter gap between legs keeps the crew on the same duty
+MAX_DUTY_PERIOD = 13 * HOUR  # report to release
+REPORT_BEFORE_DEPARTURE = 60 * 60
+RELEASE_AFTER_ARRIVAL = 30 * 60
+LOOKBACK = timedelta(seconds=max(window for _, window, _ in FLIGHT_TIME_LIMITS))
+
+Violation = namedtuple('Violation', ['staff_id', 'flight_id', 'rule', 'detail'])
+
+
+def _hours(seconds):
+    return f'{seconds / HOUR:.1f}h'
+
+
+def _duty_length(first_departure, last_arrival):
+    return last_arrival - first_departure + REPORT_BEFORE_DEPARTURE + RELEASE_AFTER_ARRIVAL
+
+
+class RangeMax:
+    """Sparse table answering the maximum of any slice of a fixed array in O(1)"""
+
+    def __init__(self, values):
+        self.levels = [np.asarray(values, dtype=np.float64)]
+        width = 1
+        while 2 * width <= len(self.levels[0]):
+            previous = self.levels[-1]
+            self.levels.append(np.maximum(previous[:-width], previous[width:]))
+            width *= 2
+
+    def max(self, lo, hi):
+        """Maximum of ``values[lo:hi]``, or -inf for an empty slice"""
+        if hi <= lo:
+            return -np.inf
+        level = int(hi - lo).bit_length() - 1
+        table = self.levels[level]
+        return max(table[lo], table[hi - (1 << level)])
+
+
+class CrewLedger:
+    """One crew member's legs with cumulative block time, for O(log n) legality checks
+
+    ``prefix[i]`` is the block time of the first ``i`` legs, so the time
+    flown before any instant, and with it the total of any rolling window,
+    is a binary search away. The block time in a window is piecewise
+    linear in where the window sits, so its maximum over every window
+    holding a new leg is found among windows ending at a leg's arrival or
+    starting at a leg's departure; per-limit sparse tables over those give
+    the maximum of any range of them at once.
+    """
+
+    def __init__(self, legs=()):
+        legs = sorted(legs)
+        self.starts = np.array([start for start, _ in legs], dtype=np.float64)
+        self.ends = np.array([end for _, end in legs], dtype=np.float64)
+        self.prefix = np.concatenate(([0.0], np.cumsum(self.ends - self.starts)))
+        # First departure and last arrival of the duty each leg belongs to
+        joined = self.starts[1:] - self.ends[:-1] < MIN_REST
+        firsts = np.flatnonzero(np.concatenate(([True], ~joined)))
+        duty = np.cumsum(np.concatenate(([True], ~joined))) - 1
+        lasts = np.append(firsts[1:], len(legs)) - 1
+        self.duty_start = self.starts[firsts][duty] if len(legs) else self.starts
+        self.duty_end = self.ends[lasts][duty] if len(legs) else self.ends
+        self._tables = {}
+
+    def __len__(self):
+        return len(self.starts)
+
+    def without(self, start):
+        """Ledger with the leg departing at ``start`` dropped, as when it is handed to someone else"""
+        return CrewLedger((s, e) for s, e in zip(self.starts.tolist(), self.ends.tolist()) if s != start)
+
+    def flown_before(self, t):
+        """Block time flown before ``t``; ``t`` may be a number or an array"""
+        i = np.searchsorted(self.starts, t, side='right')
+        partial = np.maximum(0.0, self.ends[np.maximum(i - 1, 0)] - t) if len(self) else 0.0
+        return self.prefix[i] - np.where(i > 0, partial, 0.0)
+
+    def block_time(self, start, end):
+        return self.flown_before(end) - self.flown_before(start)
+
+    def _windows(self, window):
+        """Range-max tables of windows ending at each arrival and starting at each departure"""
+        if window not in self._tables:
+            self._tables[window] = (
+                RangeMax(self.block_time(self.ends - window, self.ends)),
+                RangeMax(self.block_time(self.starts, self.starts + window)),
+            )
+        return self._tables[window]
+
+    def busiest_window(self, start, end, window):
+        """Most block time already flown in any window of this length that would hold [start, end]"""
+        ending, starting = self._windows(window)
+        # Windows ending between this leg's arrival and its departure plus the window
+        lo = np.searchsorted(self.ends, end, side='left')
+        hi = np.searchsorted(self.ends, start + window, side='right')
+        # ... or, equivalently, starting between its arrival minus the window and its departure
+        lo_start = np.searchsorted(self.starts, end - window, side='left')
+        hi_start = np.searchsorted(self.starts, start, side='right')
+        return max(
+            float(self.block_time(end - window, end)),
+            float(self.block_time(start, start + window)),
+            ending.max(lo, hi),
+            starting.max(lo_start, hi_start),
+        )
+
+    def check(self, start, end):
+        """Reasons a leg from ``start`` to ``end`` (epoch seconds) would break the limits"""
+        i = int(np.searchsorted(self.starts, start))
+        previous_end = self.ends[i - 1] if i else None
+        next_start = self.starts[i] if i < len(self) else None
+        if previous_end is not None and previous_end > start or next_start is not None and next_start < end:
+            return ['overlaps another assignment']
+
+        reasons = []
+        block = end - start
+        for name, window, limit in FLIGHT_TIME_LIMITS:
+            total = self.busiest_window(start, end, window) + block
+            if total > limit:
+                reasons.append(f'{_hours(total)} block time in {name} exceeds {_hours(limit)}')
+
+        duty_start, duty_end = start, end
+        rest = []
+        if previous_end is not None and start - previous_end < MIN_REST:
+            duty_start = self.duty_start[i - 1]
+            rest.append(start - previous_end)
+        if next_start is not None and next_start - end < MIN_REST:
+            duty_end = self.duty_end[i]
+            rest.append(next_start - end)
+        duty = _duty_length(duty_start, duty_end)
+        if rest and duty > MAX_DUTY_PERIOD:
+            reasons.append(f'only {_hours(min(rest))} rest; duty would last {_hours(duty)} '
+                           f'(limit {_hours(MAX_DUTY_PERIOD)})')
+        return reasons
+
+
+def leg_times(prefix='flight__'):
+    """Departure and arrival of a flight as flown: actual, then estimated, then scheduled"""
+    return (
+        Coalesce(f'{prefix}actual_departure', f'{prefix}estimated_departure', f'{prefix}departure_time'),
+        Coalesce(f'{prefix}actual_arrival', f'{prefix}estimated_arrival', f'{prefix}arrival_time'),
+    )
+
+
+def flight_times(flight):
+    return (
+        flight.actual_departure or flight.estimated_departure or flight.departure_time,
+        flight.actual_arrival or flight.estimated_arrival or flight.arrival_time,
+    )
+
+
+def crew_legs(start, end, staff_ids=None):
+    """(staff_id, flight_id, departure, arrival) of live assignments departing in [start, end)"""
+    departure, arrival = leg_times()
+    assignments = CrewAssignment.objects.exclude(status='cancelled').exclude(flight__status='cancelled').filter(
+        flight__departure_time__gte=start, flight__departure_time__lt=end
+    )
+    if staff_ids is not None:
+        assignments = assignments.filter(staff_id__in=staff_ids)
+    return assignments.annotate(dep=departure, arr=arrival).order_by().values_list(
+        'staff_id', 'flight_id', 'dep', 'arr'
+    )
+
+
+def crew_ledgers(staff_ids, start, end, exclude_flights=()):
+    """{staff_id: CrewLedger} with every leg that can share a limit window with [start, end)"""
+    legs = defaultdict(list)
+    for staff_id, flight_id, departure, arrival in crew_legs(start - LOOKBACK, end + LOOKBACK, staff_ids):
+        if flight_id not in exclude_flights:
+            legs[staff_id].append((departure.timestamp(), arrival.timestamp()))
+    return {staff_id: CrewLedger(legs[staff_id]) for staff_id in staff_ids}
+
+
+def check_assignment(staff, flight):
+    """Reasons assigning ``staff`` to ``flight`` would break flight time or rest limits"""
+    departure, arrival = flight_times(flight)
+    ledger = crew_ledgers([staff.id], departure, arrival, exclude_flights={flight.id})[staff.id]
+    return ledger.check(departure.timestamp(), arrival.timestamp())
+
+
+def find_violations(staff_ids, starts, ends, since=None):
+    """Vectorized limit check of many rosters at once
+
+    Legs are sorted by crew and departure and every crew member is moved
+    onto a stretch of the time line of their own, far enough apart that no
+    window reaches another's legs, so a handful of array passes check all
+    crew together. Returns (leg index, rule, detail) for each breach of a
+    leg departing at or after ``since``; a window is reported against the
+    last leg it holds.
+    """
+    staff_ids = np.asarray(staff_ids)
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = np.asarray(ends, dtype=np.float64)
+    if not len(staff_ids):
+        return []
+    order = np.lexsort((starts, staff_ids))
+    staff = staff_ids[order]
+    new_crew = np.concatenate(([True], staff[1:] != staff[:-1]))
+    origin = starts.min()
+    spacing = ends.max() - origin + LOOKBACK.total_seconds() + 1
+    shift = (np.cumsum(new_crew) - 1) * spacing - origin
+    begin = starts[order] + shift
+    finish = ends[order] + shift
+    prefix = np.concatenate(([0.0], np.cumsum(finish - begin)))
+    # Earlier legs only feed the windows of the legs being reported
+    since = origin if since is None else since
+    reported = np.flatnonzero(starts[order] >= since)
+
+    def flown_before(t):
+        i = np.searchsorted(begin, t, side='right')
+        return prefix[i] - np.where(i > 0, np.maximum(0.0, finish[np.maximum(i - 1, 0)] - t), 0.0)
+
+    found = {}
+    for name, window, limit in FLIGHT_TIME_LIMITS:
+        ending = reported
+        opening = np.flatnonzero(starts[order] + window > since)
+        last_in = np.searchsorted(begin, begin[opening] + window, side='left') - 1
+        for legs, totals in (
+            (ending, flown_before(finish[ending]) - flown_before(finish[ending] - window)),
+            (last_in, flown_before(begin[opening] + window) - flown_before(begin[opening])),
+        ):
+            for k in np.flatnonzero(totals > limit):
+                if starts[order[legs[k]]] >= since:
+                    found.setdefault((int(order[legs[k]]), name), (
+                        f'{name} limit', f'{_hours(totals[k])} block time in {name} exceeds {_hours(limit)}'
+                    ))
+
+    gaps = np.concatenate(([np.inf], begin[1:] - finish[:-1]))
+    gaps[new_crew] = np.inf
+    for k in reported[gaps[reported] < 0]:
+        found[(int(order[k]), 'overlap')] = ('overlap', 'overlaps another assignment')
+
+    # Duties are runs of legs separated by less than the minimum rest
+    new_duty = gaps >= MIN_REST
+    firsts = np.flatnonzero(new_duty)
+    duty_ids = np.cumsum(new_duty) - 1
+    duty = _duty_length(begin[firsts], np.maximum.reduceat(finish, firsts))[duty_ids]
+    for k in reported[((duty > MAX_DUTY_PERIOD) & ~new_duty & (gaps >= 0))[reported]]:
+        found[(int(order[k]), 'rest')] = ('rest', f'only {_hours(gaps[k])} rest; duty lasts {_hours(duty[k])} '
+                                                  f'(limit {_hours(MAX_DUTY_PERIOD)})')
+    return [(index, rule, detail) for (index, _), (rule, detail) in found.items()]
+
+
+def validate_assignments(start, end, staff_ids=None):
+    """Flight time and rest violations of the assignments departing in [start, end)
+
+    A year of earlier legs is loaded as well so rolling windows see each
+    crew member's history; the check itself is one vectorized pass.
+    """
+    legs = list(crew_legs(start - LOOKBACK, end, staff_ids))
+    if not legs:
+        return []
+    staff, flights, departures, arrivals = zip(*legs)
+    starts = [d.timestamp() for d in departures]
+    first, last = start.timestamp(), end.timestamp()
+    found = sorted(
+        (staff[i], starts[i], rule, flights[i], detail)
+        for i, rule, detail in find_violations(staff, starts, [a.timestamp() for a in arrivals], since=first)
+        if starts[i] < last
+    )
+    return [Violation(staff_id, flight_id, rule, detail) for staff_id, _, rule, flight_id, detail in found]
@@ -0,0 +1,170 @@
+# Live Flight Position Tracking
+import asyncio
+import json
+import logging
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+
+from .geo import route_distances_km, great_circle_positions, altitude_profile, estimate_eta
+from .models import Flight
+
+logger = logging.getLogger(__name__)
+
+POSITION_TICK_SECONDS = 5
+SUBSCRIBER_QUEUE_SIZE = 10
+
+
+def airborne_flights(now=None):
+    """Departed flights that have not yet reached their scheduled arrival"""
+    now = now or timezone.now()
+    return Flight.objects.filter(
+        status='departed',
+        actual_departure__isnull=False,
+        arrival_time__gte=now
+    )
+
+
+def compute_progress(scheduled_departures, actual_departures, arrivals, now_ts):
+    """Vectorized progress (0-1) and minutes remaining from epoch-second arrays
+
+    Block time follows the schedule; elapsed time runs from the actual departure.
+    """
+    duration = np.asarray(arrivals, dtype=np.float64) - np.asarray(scheduled_departures, dtype=np.float64)
+    elapsed = now_ts - np.asarray(actual_departures, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        progress = np.where(duration > 0, elapsed / duration, 0.0)
+    progress = np.clip(progress, 0.0, 1.0)
+    remaining = np.maximum(duration - elapsed, 0.0) / 60.0
+    return progress, remaining
+
+
+def flight_positions(flights, now=None):
+    """Compute positions for all given flights in one NumPy pass"""
+    now = now or timezone.now()
+    rows = list(flights.values(
+        'flight_number', 'departure_city', 'arrival_city', 'departure_airport', 'arrival_airport',
+        'status', 'departure_time', 'arrival_time', 'actual_departure'
+    ))
+    if not rows:
+        return []
+
+    scheduled = np.fromiter((r['departure_time'].timestamp() for r in rows), dtype=np.float64, count=len(rows))
+    actual = np.fromiter(((r['actual_departure'] or r['departure_time']).timestamp() for r in rows),
+                         dtype=np.float64, count=len(rows))
+    arrivals = np.fromiter((r['arrival_time'].timestamp() for r in rows), dtype=np.float64, count=len(rows))
+    progress, remaining = compute_progress(scheduled, actual, arrivals, now.timestamp())
+
+    departure_codes = [r['departure_airport'] for r in rows]
+    arrival_codes = [r['arrival_airport'] for r in rows]
+    distances = route_distances_km(departure_codes, arrival_codes)
+    latitudes, longitudes = great_circle_positions(departure_codes, arrival_codes, progress)
+    altitudes = altitude_profile(progress, distances)
+    block_seconds = arrivals - scheduled
+    with np.errstate(divide='ignore', invalid='ignore'):
+        speeds = np.where(block_seconds > 0, distances / (block_seconds / 3600.0), np.nan)
+    etas = estimate_eta(actual, distances, block_seconds)
+
+    def optional(value, digits):
+        return None if np.isnan(value) else round(float(value), digits)
+
+    return [
+        {
+            'flight_number': r['flight_number'],
+            'departure_city': r['departure_city'],
+            'arrival_city': r['arrival_city'],
+            'status': r['status'],
+            'progress': round(float(p) * 100, 1),
+            'remaining_minutes': int(m),
+            'latitude': optional(lat, 4),
+            'longitude': optional(lon, 4),
+            'distance_km': optional(d, 0),
+            'altitude': int(round(alt, -2)),
+            'speed': optional(v, 0),
+            'eta': optional(eta, 0),
+        }
+        for r, p, m, lat, lon, d, alt, v, eta in zip(
+            rows, progress, remaining, latitudes, longitudes, distances, altitudes, speeds, etas
+        )
+    ]
+
+
+def position_delta(previous, current):
+    """Changed and removed flights between two {flight_number: position} snapshots"""
+    updated = [pos for number, pos in current.items() if previous.get(number) != pos]
+    removed = [number for number in previous if number not in current]
+    return {'updated': updated, 'removed': removed}
+
+
+def format_sse(data, event=None):
+    """Encode a payload as a server-sent event frame"""
+    frame = f'event: {event}\n' if event else ''
+    return f'{frame}data: {json.dumps(data)}\n\n'
+
+
+class PositionBroadcaster:
+    """Computes positions once per tick and fans the delta out to every subscriber"""
+
+    def __init__(self, interval=POSITION_TICK_SECONDS):
+        self.interval = interval
+        self.snapshot = {}
+        self._subscribers = set()
+        self._task = None
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        if self.snapshot:
+            queue.put_nowait(('snapshot', {'updated': list(self.snapshot.values()), 'removed': []}))
+        self._subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    async def tick(self, now=None):
+        """Recompute all positions and publish the delta to subscribers"""
+        positions = await sync_to_async(flight_positions)(airborne_flights(now), now)
+        current = {pos['flight_number']: pos for pos in positions}
+        delta = position_delta(self.snapshot, current)
+        self.snapshot = current
+        for queue in list(self._subscribers):
+            if queue.full():
+                # Slow client: drop its oldest frame rather than block the tick
+                queue.get_nowait()
+            queue.put_nowait(('positions', delta))
+        return delta
+
+    async def _run(self):
+        while self._subscribers:
+            try:
+                await self.tick()
+            except Exception:
+                # A failed tick (database hiccup, bad row) must not end the stream for every client
+                logger.exception('Flight position tick failed')
+            await asyncio.sleep(self.interval)
+        # Nobody listening; a stale snapshot would be sent to the next subscriber
+        self.snapshot = {}
+
+    async def stream(self):
+        """Async iterator of SSE frames for one client"""
+        queue = self.subscribe()
+        try:
+            while True:
+                try:
+                    event, payload = await asyncio.wait_for(queue.get(), timeout=self.interval * 3)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                yield format_sse(payload, event=event)
+        finally:
+            self.unsubscribe(queue)
+
+
+broadcaster = PositionBroadcaster()
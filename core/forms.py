@@ -2,7 +2,12 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from .models import (Flight, Passenger, Booking, Staff, CheckIn, Gate, Aircraft, 
-                    CrewAssignment, UserProfile)
+                    CrewAssignment, CrewMessage, UserProfile)
+from .aircraft_timeline import AircraftUtilizationIndex, flight_block
+from .airports import local_time
+from .duty_limits import check_assignment
+from .gate_assignment import flight_occupancy
+from .gate_timeline import GateOccupancyIndex
 
 class FlightForm(forms.ModelForm):
     class Meta:
@@ -29,6 +34,52 @@ class FlightForm(forms.ModelForm):
             'aircraft': forms.Select(attrs={'class': 'form-control'}),
             'gate': forms.Select(attrs={'class': 'form-control'}),
         }
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        gate = cleaned_data.get('gate')
+        departure_time = cleaned_data.get('departure_time')
+        arrival_time = cleaned_data.get('arrival_time')
+        flight_number = cleaned_data.get('flight_number')
+        if flight_number and departure_time:
+            # A flight number operates at most once per local service date
+            service_date = local_time(departure_time, cleaned_data.get('departure_airport')).date()
+            if Flight.objects.filter(flight_number=flight_number, service_date=service_date).exclude(
+                    pk=self.instance.pk).exists():
+                self.add_error('flight_number', f'{flight_number} already operates on {service_date}.')
+            else:
+                self.instance.service_date = service_date
+        aircraft = cleaned_data.get('aircraft')
+        if aircraft and departure_time and arrival_time:
+            # Reject double bookings, maintenance days and aircraft out of service
+            candidate = Flight(
+                departure_time=departure_time,
+                arrival_time=arrival_time,
+                actual_departure=self.instance.actual_departure,
+                actual_arrival=self.instance.actual_arrival,
+            )
+            start, end = flight_block(candidate)
+            index = AircraftUtilizationIndex.for_window(start, end, aircraft=[aircraft])
+            reasons = index.clashes(aircraft.id, start, end, exclude_flight=self.instance.pk)
+            if reasons:
+                self.add_error('aircraft', '; '.join(reasons) + '.')
+        if gate and departure_time and arrival_time:
+            # Reject the gate if another flight already occupies it in this window
+            candidate = Flight(
+                departure_time=departure_time,
+                arrival_time=arrival_time,
+                arrival_airport=cleaned_data.get('arrival_airport') or '',
+                actual_departure=self.instance.actual_departure,
+                actual_arrival=self.instance.actual_arrival,
+                boarding_time=self.instance.boarding_time,
+            )
+            start, end = flight_occupancy(candidate)
+            index = GateOccupancyIndex.for_window(start, end, gates=[gate])
+            clashes = index.overlapping(gate.id, start, end, exclude_flight=self.instance.pk)
+            if clashes:
+                self.add_error('gate', f"Gate {gate.gate_number} is occupied by "
+                                       f"{', '.join(o.flight_number for o in clashes)} during this flight's gate window.")
+        return cleaned_data
 
 class PassengerForm(forms.ModelForm):
     class Meta:
@@ -81,7 +132,7 @@ class BookingForm(forms.ModelForm):
 class StaffForm(forms.ModelForm):
     class Meta:
         model = Staff
-        fields = ['user', 'employee_id', 'role', 'department', 'hire_date', 'salary', 
+        fields = ['user', 'employee_id', 'role', 'department', 'base_airport', 'hire_date', 'salary', 
                  'phone_number', 'address', 'emergency_contact', 'emergency_phone',
                  'license_number', 'license_expiry', 'medical_certificate', 'medical_expiry',
                  'is_active']
@@ -90,6 +141,7 @@ class StaffForm(forms.ModelForm):
             'employee_id': forms.TextInput(attrs={'class': 'form-control'}),
             'role': forms.Select(attrs={'class': 'form-control'}),
             'department': forms.TextInput(attrs={'class': 'form-control'}),
+            'base_airport': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'IATA Code (e.g., DEL)'}),
             'hire_date': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
             'salary': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
             'phone_number': forms.TextInput(attrs={'class': 'form-control'}),
@@ -123,7 +175,7 @@ class CheckInForm(forms.ModelForm):
         checked_in_bookings = CheckIn.objects.values_list('booking_id', flat=True)
         self.fields['booking'].queryset = Booking.objects.filter(
             status='confirmed'
-        ).exclude(id__in=checked_in_bookings)
+        ).exclude(id__in=checked_in_bookings).select_related('passenger')
 
 class UserRegistrationForm(UserCreationForm):
     email = forms.EmailField(required=True, widget=forms.EmailInput(attrs={'class': 'form-control'}))
@@ -179,6 +231,19 @@ class GateAssignmentForm(forms.Form):
         widget=forms.Select(attrs={'class': 'form-control'})
     )
     
+class ScheduleImportForm(forms.Form):
+    schedule_file = forms.FileField(
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.ssim,.ssm'})
+    )
+    update_existing = forms.BooleanField(
+        required=False,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+    dry_run = forms.BooleanField(
+        required=False,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+    
 class CrewAssignmentForm(forms.ModelForm):
     class Meta:
         model = CrewAssignment
@@ -189,6 +254,72 @@ class CrewAssignmentForm(forms.ModelForm):
             'role_on_flight': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Captain, First Officer, etc.'}),
         }
 
+    def clean(self):
+        cleaned_data = super().clean()
+        staff = cleaned_data.get('staff')
+        flight = cleaned_data.get('flight')
+        if staff and flight:
+            # Reject assignments that would break flight time limits or minimum rest
+            reasons = check_assignment(staff, flight)
+            if reasons:
+                self.add_error('flight', f'{staff.user.get_full_name() or staff.employee_id}: '
+                                         + '; '.join(reasons) + '.')
+        return cleaned_data
+
+class CrewBroadcastForm(forms.Form):
+    audience = forms.ChoiceField(
+        choices=[c for c in CrewMessage.AUDIENCE_CHOICES if c[0] != 'direct'],
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    role = forms.ChoiceField(
+        choices=[('', '---------')] + [c for c in Staff.ROLE_CHOICES if c[0] in ('pilot', 'copilot', 'cabin_crew')],
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    flight_number = forms.CharField(
+        max_length=10,
+        required=False,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Flight number'})
+    )
+    service_date = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    aircraft_type = forms.CharField(
+        max_length=50,
+        required=False,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Aircraft type, e.g. Airbus A320'})
+    )
+    priority = forms.ChoiceField(
+        choices=CrewMessage.PRIORITY_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    subject = forms.CharField(
+        max_length=200,
+        widget=forms.TextInput(attrs={'class': 'form-control'})
+    )
+    body = forms.CharField(
+        required=False,
+        widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 3})
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        audience = cleaned_data.get('audience')
+        if audience == 'role' and not cleaned_data.get('role'):
+            self.add_error('role', 'Choose the role to message.')
+        elif audience == 'fleet' and not cleaned_data.get('aircraft_type'):
+            self.add_error('aircraft_type', 'Enter the aircraft type of the fleet.')
+        elif audience == 'flight':
+            flight = Flight.objects.filter(
+                flight_number__iexact=cleaned_data.get('flight_number') or '',
+                service_date=cleaned_data.get('service_date'),
+            ).first()
+            if flight is None:
+                self.add_error('flight_number', 'No flight with this number on that date.')
+            cleaned_data['flight'] = flight
+        return cleaned_data
+
 class PostFlightReportForm(forms.Form):
     flight_hours = forms.DecimalField(
         max_digits=5, 
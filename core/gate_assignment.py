@@ -0,0 +1,279 @@
+# Automatic Gate Assignment
+from bisect import bisect_left
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Flight, Gate
+
+# Gate occupancy buffers (minutes)
+DEPARTURE_GATE_OPEN_MINUTES = 45     # before departure, when boarding_time is unknown
+DEPARTURE_GATE_RELEASE_MINUTES = 15  # after departure, pushback and clearing
+ARRIVAL_GATE_OPEN_MINUTES = 10       # before arrival
+ARRIVAL_GATE_RELEASE_MINUTES = 30    # after arrival, deplaning
+GATE_SEPARATION_MINUTES = 10         # between consecutive occupants of a gate
+DELAY_SLACK_MINUTES = 30             # idle time preferred after an occupant to absorb delays
+
+# Aircraft / gate size classes; a gate accepts any aircraft up to its own class
+REGIONAL, NARROW_BODY, WIDE_BODY = 0, 1, 2
+GATE_TYPE_CLASSES = {'regional': REGIONAL, 'standard': NARROW_BODY, 'wide-body': WIDE_BODY, 'widebody': WIDE_BODY}
+WIDE_BODY_MARKERS = ('747', '767', '777', '787', 'A300', 'A310', 'A330', 'A340', 'A350', 'A380')
+REGIONAL_MARKERS = ('ATR', 'CRJ', 'Q400', 'DASH', 'E170', 'E175', 'E190', 'E195', 'ERJ')
+
+UNASSIGNABLE_GATE_STATUSES = ['maintenance']
+
+Movement = namedtuple('Movement', ['flight_id', 'start', 'end', 'size_class', 'current_gate', 'priority'])
+GateSlot = namedtuple('GateSlot', ['gate_id', 'size_class', 'capacity'])
+
+
+def aircraft_size_class(aircraft_type, seats=0):
+    """Classify an aircraft as regional, narrow-body or wide-body"""
+    name = (aircraft_type or '').upper().replace(' ', '').replace('-', '')
+    if any(marker in name for marker in WIDE_BODY_MARKERS) or seats > 250:
+        return WIDE_BODY
+    if any(marker in name for marker in REGIONAL_MARKERS) or (0 < seats <= 90):
+        return REGIONAL
+    return NARROW_BODY
+
+
+def gate_size_class(gate_type):
+    """Largest aircraft class a gate can handle"""
+    return GATE_TYPE_CLASSES.get((gate_type or '').strip().lower(), NARROW_BODY)
+
+
+class GateTimeline:
+    """Non-overlapping occupancy intervals of one gate, kept sorted by start"""
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.flight_ids = []
+
+    def gap_before(self, start, end):
+        """Idle time before [start, end) on this gate, or None if it conflicts"""
+        idx = bisect_left(self.starts, end)
+        if idx and self.ends[idx - 1] > start:
+            return None
+        return start - self.ends[idx - 1] if idx else float('inf')
+
+    def add(self, start, end, flight_id):
+        idx = bisect_left(self.starts, start)
+        self.starts.insert(idx, start)
+        self.ends.insert(idx, end)
+        self.flight_ids.insert(idx, flight_id)
+
+    def remove(self, flight_id):
+        idx = self.flight_ids.index(flight_id)
+        del self.starts[idx], self.ends[idx], self.flight_ids[idx]
+
+
+class GateAssignmentSolver:
+    """Greedy best-fit interval colouring of movements onto gates
+
+    Movements are placed in start order onto the compatible free gate that
+    leaves the smallest idle gap, preferring the smallest adequate gate class
+    and gaps of at least ``slack`` seconds so a late predecessor rarely
+    forces a gate change.
+    Existing assignments are kept whenever they are still feasible, so
+    re-solving after a delay only moves the flights that now conflict.
+    """
+
+    def __init__(self, gates, slack=DELAY_SLACK_MINUTES * 60):
+        self.slack = slack
+        self.gates = sorted(gates, key=lambda g: (g.size_class, g.capacity, g.gate_id))
+        self.gate_classes = {g.gate_id: g.size_class for g in self.gates}
+        self.timelines = {g.gate_id: GateTimeline() for g in self.gates}
+        self.assignments = {}
+        self.movements = {}
+
+    def _place(self, movement, gate_id):
+        self.timelines[gate_id].add(movement.start, movement.end, movement.flight_id)
+        self.assignments[movement.flight_id] = gate_id
+        self.movements[movement.flight_id] = movement
+
+    def _best_gate(self, movement):
+        best, best_key = None, None
+        for gate in self.gates:
+            if gate.size_class < movement.size_class:
+                continue
+            gap = self.timelines[gate.gate_id].gap_before(movement.start, movement.end)
+            if gap is None:
+                continue
+            key = (gate.size_class - movement.size_class, gap < self.slack, gap)
+            if best_key is None or key < best_key:
+                best, best_key = gate.gate_id, key
+        return best
+
+    def _fits(self, movement, gate_id):
+        gate_class = self.gate_classes.get(gate_id)
+        if gate_class is None or gate_class < movement.size_class:
+            return False
+        return self.timelines[gate_id].gap_before(movement.start, movement.end) is not None
+
+    def solve(self, movements):
+        """Assign all movements; returns the list of flight ids left without a gate"""
+        movements = sorted(movements, key=lambda m: (m.priority, m.start))
+
+        # Pass 1: keep still-feasible existing assignments (undisturbed flights first)
+        pending = []
+        for movement in movements:
+            if movement.current_gate is not None and self._fits(movement, movement.current_gate):
+                self._place(movement, movement.current_gate)
+            else:
+                pending.append(movement)
+
+        # Pass 2: best-fit the rest in start order
+        unassigned = []
+        for movement in sorted(pending, key=lambda m: m.start):
+            gate_id = self._best_gate(movement)
+            if gate_id is None:
+                unassigned.append(movement.flight_id)
+            else:
+                self._place(movement, gate_id)
+        return unassigned
+
+    def reschedule(self, flight_id, start, end):
+        """Move one assigned flight's window, changing its gate only if it must"""
+        old_gate = self.assignments.pop(flight_id)
+        self.timelines[old_gate].remove(flight_id)
+        movement = self.movements.pop(flight_id)._replace(start=start, end=end, current_gate=old_gate)
+        if self._fits(movement, old_gate):
+            self._place(movement, old_gate)
+            return old_gate
+        gate_id = self._best_gate(movement)
+        if gate_id is not None:
+            self._place(movement, gate_id)
+        return gate_id
+
+
+def is_arrival(flight, home_airport=None):
+    home_airport = home_airport if home_airport is not None else getattr(settings, 'HOME_AIRPORT', '')
+    return bool(home_airport) and flight.arrival_airport == home_airport
+
+
+def flight_occupancy(flight, home_airport=None):
+    """Gate occupancy window (start, end) of a flight, including the separation buffer"""
+    if is_arrival(flight, home_airport):
+        arrival = flight.actual_arrival or flight.estimated_arrival or flight.arrival_time
+        start = arrival - timedelta(minutes=ARRIVAL_GATE_OPEN_MINUTES)
+        end = arrival + timedelta(minutes=ARRIVAL_GATE_RELEASE_MINUTES)
+    else:
+        departure = flight.actual_departure or flight.estimated_departure or flight.departure_time
+        start = min(flight.boarding_time or departure, departure - timedelta(minutes=DEPARTURE_GATE_OPEN_MINUTES))
+        end = departure + timedelta(minutes=DEPARTURE_GATE_RELEASE_MINUTES)
+    return start, end + timedelta(minutes=GATE_SEPARATION_MINUTES)
+
+
+def flight_movement(flight, home_airport=None):
+    """Solver movement for a flight, with times as epoch seconds"""
+    start, end = flight_occupancy(flight, home_airport)
+    seats = flight.aircraft.total_seats if flight.aircraft_id else flight.total_seats
+    aircraft_type = flight.aircraft.aircraft_type if flight.aircraft_id else flight.aircraft_type
+    return Movement(
+        flight_id=flight.id,
+        start=start.timestamp(),
+        end=end.timestamp(),
+        size_class=aircraft_size_class(aircraft_type, seats),
+        current_gate=flight.gate_id,
+        priority=1 if flight.status == 'delayed' else 0,
+    )
+
+
+def gate_slots(gates):
+    return [GateSlot(g.id, gate_size_class(g.gate_type), g.capacity) for g in gates]
+
+
+def day_movements(day, home_airport=None):
+    """Flights that need a gate on the given day"""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    end = start + timedelta(days=1)
+    home_airport = home_airport if home_airport is not None else getattr(settings, 'HOME_AIRPORT', '')
+    flights = Flight.objects.filter(departure_time__gte=start, departure_time__lt=end)
+    if home_airport:
+        flights = (
+            flights.exclude(arrival_airport=home_airport)
+            | Flight.objects.filter(arrival_airport=home_airport, arrival_time__gte=start, arrival_time__lt=end)
+        )
+    return flights.exclude(status='cancelled').select_related('aircraft')
+
+
+def assign_gates_for_day(day, home_airport=None):
+    """Solve the day's gate plan and save only the flights whose gate changed
+
+    Flights the solver cannot place lose their previous gate, which may be
+    the one that now clashes, and are reported as unassigned.
+    """
+    flights = {f.id: f for f in day_movements(day, home_airport)}
+    gates = {g.id: g for g in Gate.objects.exclude(status__in=UNASSIGNABLE_GATE_STATUSES)}
+
+    solver = GateAssignmentSolver(gate_slots(gates.values()))
+    unassigned = solver.solve([flight_movement(f, home_airport) for f in flights.values()])
+
+    changed = []
+    now = timezone.now()
+    for flight_id, gate_id in solver.assignments.items():
+        flight = flights[flight_id]
+        if flight.gate_id != gate_id:
+            flight.gate_id = gate_id
+            flight.gate_number = gates[gate_id].gate_number
+            flight.updated_at = now  # bulk_update skips auto_now; roster feeds validate on it
+            changed.append(flight)
+    for flight_id in unassigned:
+        flight = flights[flight_id]
+        if flight.gate_id or flight.gate_number:
+            flight.gate_id, flight.gate_number, flight.updated_at = None, '', now
+            changed.append(flight)
+
+    with transaction.atomic():
+        Flight.objects.bulk_update(changed, ['gate', 'gate_number', 'updated_at'], batch_size=500)
+
+    return {
+        'assigned': len(solver.assignments),
+        'changed': len(changed),
+        'unassigned': [flights[flight_id] for flight_id in unassigned],
+    }
+
+
+def reschedule_gates(flights, previous, home_airport=None):
+    """Re-gate flights whose times moved, changing only the gates they now clash on
+
+    ``flights`` carry their new times and ``previous`` maps their ids to the
+    movements they had before. Every other gated flight around them keeps
+    its gate; a moved flight that no gate can take loses its own.
+    Returns the flights whose gate changed.
+    """
+    moved = {f.id: f for f in flights if f.gate_id and f.id in previous}
+    if not moved:
+        return []
+    windows = [flight_occupancy(f, home_airport) for f in moved.values()]
+    earliest = min(start for start, _ in windows) - timedelta(days=1)
+    latest = max(end for _, end in windows) + timedelta(days=1)
+    neighbours = (
+        Flight.objects.filter(gate__isnull=False, departure_time__lt=latest, arrival_time__gt=earliest)
+        .exclude(status='cancelled').exclude(id__in=list(moved)).select_related('aircraft')
+    )
+    gates = {g.id: g for g in Gate.objects.exclude(status__in=UNASSIGNABLE_GATE_STATUSES)}
+
+    solver = GateAssignmentSolver(gate_slots(gates.values()))
+    solver.solve([flight_movement(f, home_airport) for f in neighbours]
+                 + [previous[flight_id] for flight_id in moved])
+
+    changed = []
+    now = timezone.now()
+    for flight_id, flight in moved.items():
+        movement = flight_movement(flight, home_airport)
+        gate_id = None
+        if flight_id in solver.assignments:
+            gate_id = solver.reschedule(flight_id, movement.start, movement.end)
+        if gate_id != flight.gate_id:
+            flight.gate_id = gate_id
+            flight.gate_number = gates[gate_id].gate_number if gate_id is not None else ''
+            flight.updated_at = now  # bulk_update skips auto_now
+            changed.append(flight)
+
+    with transaction.atomic():
+        Flight.objects.bulk_update(changed, ['gate', 'gate_number', 'updated_at'], batch_size=500)
+    return changed
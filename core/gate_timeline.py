@@ -0,0 +1,201 @@
+# Gate Occupancy Timeline Index
+import heapq
+from collections import defaultdict, namedtuple
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .gate_assignment import flight_occupancy, UNASSIGNABLE_GATE_STATUSES
+from .models import Flight, Gate, FlightOperationsMetrics
+
+# How far outside a query window to look for flights whose buffers reach into it
+OCCUPANCY_LOOKAROUND = timedelta(hours=6)
+
+Occupancy = namedtuple('Occupancy', ['start', 'end', 'flight_id', 'flight_number'])
+
+
+class IntervalTree:
+    """Static augmented interval tree over half-open [start, end) intervals
+
+    Intervals are sorted by start and laid out as an implicit balanced binary
+    tree; every node stores the largest end in its subtree, so overlap
+    queries run in O(log n + k).
+    """
+
+    def __init__(self, intervals=()):
+        self.items = sorted(intervals, key=lambda i: (i.start, i.end))
+        self.max_end = [None] * len(self.items)
+        if self.items:
+            self._build(0, len(self.items) - 1)
+
+    def __len__(self):
+        return len(self.items)
+
+    def _build(self, lo, hi):
+        mid = (lo + hi) // 2
+        max_end = self.items[mid].end
+        if lo <= mid - 1:
+            max_end = max(max_end, self._build(lo, mid - 1))
+        if mid + 1 <= hi:
+            max_end = max(max_end, self._build(mid + 1, hi))
+        self.max_end[mid] = max_end
+        return max_end
+
+    def overlapping(self, start, end):
+        """All intervals overlapping [start, end), in start order"""
+        found = []
+        if self.items:
+            self._query(0, len(self.items) - 1, start, end, found)
+        return found
+
+    def _query(self, lo, hi, start, end, found):
+        if lo > hi:
+            return
+        mid = (lo + hi) // 2
+        if self.max_end[mid] <= start:
+            return
+        self._query(lo, mid - 1, start, end, found)
+        item = self.items[mid]
+        if item.start < end:
+            if item.end > start:
+                found.append(item)
+            self._query(mid + 1, hi, start, end, found)
+
+    def overlapping_pairs(self):
+        """Every (earlier, later) pair of overlapping intervals, in one sweep
+
+        Intervals still running when the next one starts are kept in a heap
+        by end, so the sweep costs O(n log n + k) for k pairs.
+        """
+        pairs = []
+        running = []  # (end, position, item)
+        for position, item in enumerate(self.items):
+            while running and running[0][0] <= item.start:
+                heapq.heappop(running)
+            pairs.extend((earlier, item) for _, _, earlier in sorted(running, key=lambda r: r[1]))
+            heapq.heappush(running, (item.end, position, item))
+        return pairs
+
+
+class GateOccupancyIndex:
+    """Per-gate interval trees of flight occupancy windows"""
+
+    def __init__(self, gates, occupancies):
+        self.gates = {gate.id: gate for gate in gates}
+        by_gate = defaultdict(list)
+        for gate_id, occupancy in occupancies:
+            by_gate[gate_id].append(occupancy)
+        self.trees = {gate_id: IntervalTree(by_gate.get(gate_id, ())) for gate_id in self.gates}
+
+    @classmethod
+    def for_window(cls, start, end, gates=None):
+        """Build the index for every flight whose gate window may touch [start, end)"""
+        if gates is None:
+            gates = Gate.objects.exclude(status__in=UNASSIGNABLE_GATE_STATUSES)
+        gates = list(gates)
+        flights = Flight.objects.filter(
+            gate_id__in=[gate.id for gate in gates],
+        ).filter(
+            Q(departure_time__gte=start - OCCUPANCY_LOOKAROUND, departure_time__lt=end + OCCUPANCY_LOOKAROUND)
+            | Q(arrival_time__gte=start - OCCUPANCY_LOOKAROUND, arrival_time__lt=end + OCCUPANCY_LOOKAROUND)
+        ).exclude(status='cancelled').only(
+            'id', 'flight_number', 'gate_id', 'arrival_airport', 'departure_time', 'arrival_time',
+            'actual_departure', 'actual_arrival', 'boarding_time'
+        )
+        return cls(gates, (
+            (flight.gate_id, Occupancy(*flight_occupancy(flight), flight.id, flight.flight_number))
+            for flight in flights
+        ))
+
+    def overlapping(self, gate_id, start, end, exclude_flight=None):
+        tree = self.trees.get(gate_id)
+        if tree is None:
+            return []
+        return [o for o in tree.overlapping(start, end) if o.flight_id != exclude_flight]
+
+    def is_free(self, gate_id, start, end, exclude_flight=None):
+        return not self.overlapping(gate_id, start, end, exclude_flight)
+
+    def free_gates(self, start, end, terminal=None, gate_type=None):
+        """Gates with no occupancy in [start, end), optionally filtered"""
+        return [
+            gate for gate_id, gate in sorted(self.gates.items(), key=lambda g: g[1].gate_number)
+            if (terminal is None or gate.terminal == terminal)
+            and (gate_type is None or gate.gate_type.lower() == gate_type.lower())
+            and self.is_free(gate_id, start, end)
+        ]
+
+    def conflicts(self):
+        """Overlapping occupancy pairs on the same gate, across the whole index"""
+        return [
+            (self.gates[gate_id], earlier, later)
+            for gate_id, tree in self.trees.items()
+            for earlier, later in tree.overlapping_pairs()
+        ]
+
+    def hourly_utilization(self, day):
+        """Percent of gate-time occupied in each hour of a day, by sweep line"""
+        day_start = timezone.make_aware(datetime.combine(day, time.min))
+        day_end = day_start + timedelta(days=1)
+        if not self.gates:
+            return [0.0] * 24
+
+        # +1/-1 events per gate; hour boundaries split the sweep into buckets
+        events = []
+        for gate_id, tree in self.trees.items():
+            for item in tree.overlapping(day_start, day_end):
+                events.append((max(item.start, day_start), 1, gate_id))
+                events.append((min(item.end, day_end), -1, gate_id))
+        events.extend((day_start + timedelta(hours=h), 0, None) for h in range(25))
+        events.sort(key=lambda e: (e[0], e[1]))
+
+        busy_seconds = [0.0] * 24
+        active = defaultdict(int)
+        busy_gates = 0
+        previous = day_start
+        for moment, delta, gate_id in events:
+            if moment > previous and busy_gates:
+                hour = min(int((previous - day_start).total_seconds() // 3600), 23)
+                busy_seconds[hour] += busy_gates * (moment - previous).total_seconds()
+            previous = moment
+            if delta:
+                before = active[gate_id]
+                active[gate_id] += delta
+                busy_gates += (active[gate_id] > 0) - (before > 0)
+
+        capacity = len(self.gates) * 3600.0
+        return [round(seconds / capacity * 100, 2) for seconds in busy_seconds]
+
+
+def day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def daily_gate_utilization(day):
+    """Average hourly gate utilization (percent) for a day"""
+    return gate_utilization_by_day([day])[day]
+
+
+def gate_utilization_by_day(days):
+    """{day: average hourly gate utilization} for many days from one occupancy index"""
+    days = sorted(days)
+    if not days:
+        return {}
+    index = GateOccupancyIndex.for_window(day_bounds(days[0])[0], day_bounds(days[-1])[1])
+    utilization = {}
+    for day in days:
+        hourly = index.hourly_utilization(day)
+        utilization[day] = round(sum(hourly) / len(hourly), 2)
+    return utilization
+
+
+def update_gate_utilization(day):
+    """Store the day's gate utilization on FlightOperationsMetrics"""
+    utilization = Decimal(str(daily_gate_utilization(day)))
+    metrics, _ = FlightOperationsMetrics.objects.update_or_create(
+        date=day, defaults={'gate_utilization': utilization}
+    )
+    return metrics
@@ -0,0 +1,107 @@
+# Vectorized Great-Circle Route Calculations
+import numpy as np
+
+from .airports import airport_table, normalize_code
+
+EARTH_RADIUS_KM = 6371.0088
+CRUISE_SPEED_KMH = 850
+CRUISE_ALTITUDE_FT = 35000
+TAXI_MINUTES = 15
+
+# (departure, arrival) -> distance in km; NaN for routes with unknown airports
+_route_distance_cache = {}
+
+
+def airport_coordinates(codes):
+    """Latitude and longitude arrays (degrees) for IATA codes; NaN where unknown"""
+    table = airport_table()
+    lat = np.full(len(codes), np.nan)
+    lon = np.full(len(codes), np.nan)
+    for i, code in enumerate(codes):
+        airport = table.get(normalize_code(code))
+        if airport:
+            lat[i] = airport.latitude
+            lon[i] = airport.longitude
+    return lat, lon
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km between arrays of points given in degrees"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def interpolate_great_circle(lat1, lon1, lat2, lon2, fraction):
+    """Points at a fraction (0-1) along the great circle between arrays of endpoints"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    fraction = np.asarray(fraction, dtype=np.float64)
+
+    # Spherical linear interpolation between the two unit vectors
+    p1 = np.stack([np.cos(lat1) * np.cos(lon1), np.cos(lat1) * np.sin(lon1), np.sin(lat1)])
+    p2 = np.stack([np.cos(lat2) * np.cos(lon2), np.cos(lat2) * np.sin(lon2), np.sin(lat2)])
+    omega = np.arccos(np.clip((p1 * p2).sum(axis=0), -1.0, 1.0))
+    sin_omega = np.sin(omega)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = np.where(sin_omega > 1e-12, np.sin((1 - fraction) * omega) / sin_omega, 1 - fraction)
+        b = np.where(sin_omega > 1e-12, np.sin(fraction * omega) / sin_omega, fraction)
+    point = a * p1 + b * p2
+
+    lat = np.degrees(np.arctan2(point[2], np.hypot(point[0], point[1])))
+    lon = np.degrees(np.arctan2(point[1], point[0]))
+    return lat, lon
+
+
+def route_distances_km(departure_codes, arrival_codes):
+    """Distances for many routes in one call, computing only uncached pairs"""
+    pairs = [(normalize_code(d), normalize_code(a)) for d, a in zip(departure_codes, arrival_codes)]
+    missing = list({pair for pair in pairs if pair not in _route_distance_cache})
+    if missing:
+        lat1, lon1 = airport_coordinates([d for d, _ in missing])
+        lat2, lon2 = airport_coordinates([a for _, a in missing])
+        for pair, distance in zip(missing, haversine_km(lat1, lon1, lat2, lon2)):
+            _route_distance_cache[pair] = float(distance)
+    return np.array([_route_distance_cache[pair] for pair in pairs], dtype=np.float64)
+
+
+def route_distance_km(departure_code, arrival_code):
+    """Cached distance for a single route, or None if either airport is unknown"""
+    distance = route_distances_km([departure_code], [arrival_code])[0]
+    return None if np.isnan(distance) else float(distance)
+
+
+def great_circle_positions(departure_codes, arrival_codes, fractions):
+    """Latitude/longitude of many flights at the given fractions of their routes"""
+    lat1, lon1 = airport_coordinates(departure_codes)
+    lat2, lon2 = airport_coordinates(arrival_codes)
+    return interpolate_great_circle(lat1, lon1, lat2, lon2, fractions)
+
+
+def estimate_block_minutes(distances_km, speed_kmh=CRUISE_SPEED_KMH, taxi_minutes=TAXI_MINUTES):
+    """Estimated gate-to-gate minutes for arrays of route distances"""
+    return np.asarray(distances_km, dtype=np.float64) / speed_kmh * 60.0 + taxi_minutes
+
+
+def estimate_eta(departure_ts, distances_km, block_seconds=None,
+                 speed_kmh=CRUISE_SPEED_KMH, taxi_minutes=TAXI_MINUTES):
+    """Epoch-second ETAs for arrays of (actual) departure times
+
+    Uses the scheduled block time where one is given and positive, otherwise
+    a block time estimated from the route distance.
+    """
+    departure_ts = np.asarray(departure_ts, dtype=np.float64)
+    estimated = estimate_block_minutes(distances_km, speed_kmh, taxi_minutes) * 60.0
+    if block_seconds is None:
+        return departure_ts + estimated
+    block_seconds = np.asarray(block_seconds, dtype=np.float64)
+    return departure_ts + np.where(block_seconds > 0, block_seconds, estimated)
+
+
+def altitude_profile(progress, distances_km, cruise_ft=CRUISE_ALTITUDE_FT):
+    """Approximate altitude in feet: linear climb and descent of ~150 km each"""
+    progress = np.asarray(progress, dtype=np.float64)
+    distances = np.nan_to_num(np.asarray(distances_km, dtype=np.float64), nan=1000.0)
+    ramp = np.maximum(np.minimum(150.0, distances / 2) / np.maximum(distances, 1.0), 1e-6)
+    climb = progress / ramp
+    descent = (1.0 - progress) / ramp
+    return np.clip(np.minimum(climb, descent), 0.0, 1.0) * cruise_ft
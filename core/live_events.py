@@ -0,0 +1,203 @@
+# Live Operations Event Stream
+import asyncio
+import json
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .flight_tracking import format_sse
+from .models import Flight, SystemAlert
+
+DEFAULT_BROKER = 'core.live_events.LocalBroker'
+EVENT_QUEUE_SIZE = 50
+KEEPALIVE_SECONDS = 15
+REDIS_CHANNEL = 'airport-ops-events'
+OPERATIONS_EVENTS = ('alert.', 'flight.status')  # name prefixes shown on ops dashboards; crew messages stay private
+
+
+class LocalBroker:
+    """In-process broker: events reach the subscribers of this worker only
+
+    Enough for a single ASGI worker and for tests, where publishing hands
+    the event straight to the hub.
+    """
+
+    def __init__(self, **options):
+        self._listeners = []
+
+    def attach(self, deliver):
+        self._listeners.append(deliver)
+
+    def publish(self, message):
+        for deliver in list(self._listeners):
+            deliver(message)
+
+
+class RedisBroker:
+    """Redis pub/sub broker so every worker sees events published by any other
+
+    Needs the ``redis`` package; a daemon thread per process relays the
+    channel to the local hub.
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', channel=REDIS_CHANNEL, **options):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured('RedisBroker requires the redis package')
+        self.client = redis.Redis.from_url(url)
+        self.channel = channel
+        self._listeners = []
+        self._thread = None
+
+    def attach(self, deliver):
+        self._listeners.append(deliver)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._listen, name='live-events-redis', daemon=True)
+            self._thread.start()
+
+    def _listen(self):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.channel)
+        for item in pubsub.listen():
+            message = json.loads(item['data'])
+            for deliver in list(self._listeners):
+                deliver(message)
+
+    def publish(self, message):
+        self.client.publish(self.channel, json.dumps(message))
+
+
+class EventHub:
+    """Fans broker messages out to the SSE clients connected to this process
+
+    Publishers are usually sync views running in a worker thread, so
+    messages are handed to each subscriber's event loop thread-safely.
+    """
+
+    def __init__(self, broker):
+        self.broker = broker
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        broker.attach(self._deliver)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, event, data):
+        self.broker.publish({'event': event, 'data': data})
+
+    def _deliver(self, message):
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, message)
+            except RuntimeError:
+                self.unsubscribe(queue)  # its event loop has gone away
+
+    @staticmethod
+    def _put(queue, message):
+        if queue.full():
+            # Slow client: drop its oldest event rather than grow without bound
+            queue.get_nowait()
+        queue.put_nowait(message)
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+    async def stream(self, events=None):
+        """Async iterator of SSE frames for one client, limited to event names starting with one of ``events``"""
+        queue = self.subscribe()
+        try:
+            yield ': connected\n\n'
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                if events is None or message['event'].startswith(events):
+                    yield format_sse(message['data'], event=message['event'])
+        finally:
+            self.unsubscribe(queue)
+
+
+@lru_cache(maxsize=None)
+def get_hub():
+    """The process-wide hub, on the broker named by ``LIVE_EVENTS_BROKER``"""
+    broker_class = import_string(getattr(settings, 'LIVE_EVENTS_BROKER', DEFAULT_BROKER))
+    return EventHub(broker_class(**getattr(settings, 'LIVE_EVENTS_BROKER_OPTIONS', {})))
+
+
+def alert_payload(alert):
+    return {
+        'id': alert.id,
+        'title': alert.title,
+        'message': alert.message,
+        'alert_type': alert.alert_type,
+        'affected_system': alert.affected_system,
+        'created_at': alert.created_at.isoformat() if alert.created_at else None,
+        'is_resolved': alert.is_resolved,
+        'occurrence_count': alert.occurrence_count,
+        'last_seen': alert.last_seen.isoformat() if alert.last_seen else None,
+    }
+
+
+def flight_payload(flight):
+    return {
+        'id': flight.id,
+        'flight_number': flight.flight_number,
+        'status': flight.status,
+        'status_display': flight.get_status_display(),
+        'estimated_departure': flight.estimated_departure.isoformat() if flight.estimated_departure else None,
+    }
+
+
+def publish_alerts(alerts, event=None):
+    """Announce alerts once the surrounding transaction commits"""
+    events = [(event or ('alert.resolved' if a.is_resolved else 'alert.created'), alert_payload(a)) for a in alerts]
+    if events:
+        transaction.on_commit(lambda: [get_hub().publish(name, data) for name, data in events])
+
+
+def publish_flight_status(flights):
+    """Announce flight status changes once the surrounding transaction commits"""
+    events = [flight_payload(f) for f in flights]
+    if events:
+        transaction.on_commit(lambda: [get_hub().publish('flight.status', data) for data in events])
+
+
+def publish_crew_message(payload, user_ids):
+    """Announce a new crew message to its recipients once the surrounding transaction commits"""
+    data = {**payload, 'user_ids': list(user_ids)}
+    transaction.on_commit(lambda: get_hub().publish('message.new', data))
+
+
+@receiver(post_save, sender=SystemAlert)
+def alert_saved(sender, instance, created, **kwargs):
+    if created or instance.is_resolved:
+        publish_alerts([instance])
+
+
+@receiver(post_save, sender=Flight)
+def flight_saved(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and 'status' not in update_fields:
+        return
+    if created or instance.status != getattr(instance, '_loaded_status', None):
+        instance._loaded_status = instance.status
+        publish_flight_status([instance])
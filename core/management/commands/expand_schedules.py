@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from core.models import SchedulePattern
+from core.schedule_patterns import SCHEDULE_HORIZON_DAYS, expand_patterns
+
+
+class Command(BaseCommand):
+    help = 'Materialize recurring schedule patterns into dated flights over a rolling horizon'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=SCHEDULE_HORIZON_DAYS, help='Horizon in days from today')
+        parser.add_argument('--flight-number', help='Only expand patterns for this flight number')
+
+    def handle(self, *args, **options):
+        patterns = SchedulePattern.objects.all()
+        if options['flight_number']:
+            patterns = patterns.filter(flight_number__iexact=options['flight_number'])
+        result = expand_patterns(patterns, horizon_days=options['days'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(result['created'])} flights created, {len(result['updated'])} updated, "
+            f"{len(result['cancelled'])} cancelled"
+        ))
+        for flight in result['conflicts']:
+            self.stdout.write(self.style.WARNING(
+                f'{flight.flight_number} on {flight.service_date} already belongs to another pattern'
+            ))
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.schedule_import import IMPORT_BATCH_SIZE, detect_format, import_schedule
+
+
+class Command(BaseCommand):
+    help = 'Import a flight schedule from a CSV or SSIM-style file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Schedule file to import')
+        parser.add_argument('--format', choices=['csv', 'ssim'], help='File format (default: from extension)')
+        parser.add_argument('--update-existing', action='store_true',
+                            help='Update flights already operating on the same date instead of rejecting them')
+        parser.add_argument('--dry-run', action='store_true', help='Validate without saving')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument('--errors', help='Write the row-level error report to this CSV file ("-" for stdout)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or detect_format(path)
+        started = time.perf_counter()
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as f:
+                result = import_schedule(
+                    f, fmt=fmt,
+                    update_existing=options['update_existing'],
+                    dry_run=options['dry_run'],
+                    batch_size=options['batch_size'],
+                )
+        except OSError as exc:
+            raise CommandError(f'Cannot read {path}: {exc}')
+        except UnicodeDecodeError as exc:
+            raise CommandError(f'{path} is not UTF-8 text ({exc.reason}); '
+                               'rows read before it may already have been imported')
+        elapsed = time.perf_counter() - started
+
+        if options['errors']:
+            if options['errors'] == '-':
+                result.write_error_report(self.stdout)
+            else:
+                with open(options['errors'], 'w', newline='', encoding='utf-8') as report:
+                    result.write_error_report(report)
+
+        verb = 'Validated' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {result.imported} of {result.rows} rows ({result.created} new, {result.updated} updated) '
+            f'in {elapsed:.2f}s; {len(result.errors)} rows rejected'
+        ))
+        for error in result.errors[:20]:
+            self.stdout.write(f'  line {error.line} {error.flight_number}: {error.message}')
+        if len(result.errors) > 20 and not options['errors']:
+            self.stdout.write(f'  ... use --errors to write all {len(result.errors)} errors')
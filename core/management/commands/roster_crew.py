@@ -0,0 +1,28 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from core.crew_rostering import roster_crew
+from core.rosters import add_months
+
+
+class Command(BaseCommand):
+    help = "Build pairings from a month's uncrewed flights and roster qualified crew onto them"
+
+    def add_arguments(self, parser):
+        following = add_months(date.today().year, date.today().month, 1)
+        parser.add_argument('--year', type=int, default=following[0], help='Defaults to next month')
+        parser.add_argument('--month', type=int, default=following[1])
+
+    def handle(self, *args, **options):
+        result = roster_crew(options['year'], options['month'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['assigned']} assignments across {result['pairings']} pairings"
+        ))
+        if result['dropped']:
+            self.stdout.write(self.style.WARNING(f"{result['dropped']} pairings failed the final limit check"))
+        for flight in result['uncovered']:
+            self.stdout.write(self.style.WARNING(
+                f'{flight.flight_number} on {flight.service_date} still needs crew'
+            ))
@@ -0,0 +1,30 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core.qualification_scan import scan_qualifications
+
+
+class Command(BaseCommand):
+    help = 'Expire lapsed qualifications, flag assignments flown on them and raise alerts; run daily'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help='User the alerts are raised as; defaults to the first superuser')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(is_active=True)
+        if options['username']:
+            user = users.filter(username=options['username']).first()
+        else:
+            user = users.filter(is_superuser=True).order_by('id').first()
+        if user is None:
+            raise CommandError('No user to raise the alerts as; pass --username')
+        result = scan_qualifications(user)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['expired']} staff expired, {result['renewed']} renewed, "
+            f"{result['alerts']} alerts raised, {result['resolved']} resolved"
+        ))
+        if result['flagged']:
+            self.stdout.write(self.style.WARNING(
+                f"{result['flagged']} future assignments would be flown on a lapsed qualification"
+            ))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_aircraft_flightoperationsmetrics_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flight',
+            name='estimated_arrival',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='estimated_departure',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
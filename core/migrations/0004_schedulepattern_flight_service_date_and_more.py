@@ -0,0 +1,76 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from core.airports import local_time
+
+
+def fill_service_dates(apps, schema_editor):
+    Flight = apps.get_model('core', 'Flight')
+    flights = list(Flight.objects.only('id', 'departure_time', 'departure_airport'))
+    for flight in flights:
+        flight.service_date = local_time(flight.departure_time, flight.departure_airport).date()
+    Flight.objects.bulk_update(flights, ['service_date'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_flight_estimated_arrival_flight_estimated_departure'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchedulePattern',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('flight_number', models.CharField(max_length=10)),
+                ('airline', models.CharField(max_length=100)),
+                ('departure_city', models.CharField(blank=True, max_length=100)),
+                ('arrival_city', models.CharField(blank=True, max_length=100)),
+                ('departure_airport', models.CharField(max_length=10)),
+                ('arrival_airport', models.CharField(max_length=10)),
+                ('departure_local_time', models.TimeField()),
+                ('duration_minutes', models.PositiveIntegerField()),
+                ('days_of_week', models.CharField(default='1234567', max_length=7)),
+                ('valid_from', models.DateField()),
+                ('valid_until', models.DateField()),
+                ('aircraft_type', models.CharField(max_length=50)),
+                ('total_seats', models.PositiveIntegerField()),
+                ('business_price', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('economy_price', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['flight_number', 'valid_from'],
+            },
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='service_date',
+            field=models.DateField(null=True),
+        ),
+        migrations.RunPython(fill_service_dates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='flight',
+            name='service_date',
+            field=models.DateField(),
+        ),
+        migrations.AlterField(
+            model_name='flight',
+            name='flight_number',
+            field=models.CharField(max_length=10),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='schedule_pattern',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='occurrences', to='core.schedulepattern'),
+        ),
+        migrations.AddConstraint(
+            model_name='flight',
+            constraint=models.UniqueConstraint(fields=('flight_number', 'service_date'), name='unique_flight_number_per_day'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_schedulepattern_flight_service_date_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='systemalert',
+            name='fingerprint',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='systemalert',
+            name='last_seen',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='systemalert',
+            name='occurrence_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddConstraint(
+            model_name='systemalert',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_resolved', False), models.Q(('fingerprint', ''), _negated=True)), fields=('fingerprint',), name='unique_open_alert_fingerprint'),
+        ),
+    ]
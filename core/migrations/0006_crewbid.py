@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_systemalert_fingerprint_systemalert_last_seen_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrewBid',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('flight', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='crew_bids', to='core.flight')),
+                ('staff', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bids', to='core.staff')),
+            ],
+            options={
+                'unique_together': {('staff', 'flight')},
+            },
+        ),
+    ]
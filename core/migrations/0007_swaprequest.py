@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_crewbid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SwapRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('giveaway', 'Give Away'), ('trade', 'Trade')], default='trade', max_length=20)),
+                ('status', models.CharField(choices=[('open', 'Open'), ('accepted', 'Accepted'), ('cancelled', 'Cancelled')], default='open', max_length=20)),
+                ('role', models.CharField(max_length=20)),
+                ('departure_date', models.DateField()),
+                ('origin', models.CharField(max_length=10)),
+                ('destination', models.CharField(max_length=10)),
+                ('wanted_from', models.DateField(blank=True, null=True)),
+                ('wanted_until', models.DateField(blank=True, null=True)),
+                ('wanted_destination', models.CharField(blank=True, max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('assignment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='swap_requests', to='core.crewassignment')),
+                ('matched_request', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.swaprequest')),
+                ('requester', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='swap_requests', to='core.staff')),
+                ('taker', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='swaps_taken', to='core.staff')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'role', 'departure_date'], name='swap_open_by_date'), models.Index(fields=['status', 'role', 'destination', 'departure_date'], name='swap_open_by_route')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status', 'open')), fields=('assignment',), name='unique_open_swap_per_assignment')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_swaprequest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BriefingPacket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('built_version', models.PositiveIntegerField(default=0)),
+                ('data', models.JSONField(default=dict)),
+                ('built_at', models.DateTimeField(blank=True, null=True)),
+                ('flight', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='briefing_packet', to='core.flight')),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-19 11:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_briefingpacket'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='crewassignment',
+            name='qualification_flag',
+            field=models.CharField(blank=True, choices=[('license', 'Licence lapsed'), ('medical', 'Medical lapsed'), ('training', 'Training overdue')], default='', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='staff',
+            name='license_expiry',
+            field=models.DateField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='staff',
+            name='medical_expiry',
+            field=models.DateField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='staff',
+            name='next_training_due',
+            field=models.DateField(blank=True, db_index=True, null=True),
+        ),
+    ]
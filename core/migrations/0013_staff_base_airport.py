@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 11:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_request_profiles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='staff',
+            name='base_airport',
+            field=models.CharField(blank=True, max_length=10),
+        ),
+    ]
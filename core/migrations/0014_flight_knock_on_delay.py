@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_staff_base_airport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flight',
+            name='knock_on_delay',
+            field=models.BooleanField(default=False),
+        ),
+    ]
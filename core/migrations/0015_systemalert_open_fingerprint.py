@@ -0,0 +1,40 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:32
+
+from django.db import migrations, models
+
+
+def fill_open_fingerprints(apps, schema_editor):
+    SystemAlert = apps.get_model('core', 'SystemAlert')
+    claimed = set()
+    opened, duplicates = [], []
+    # Backends that ignored the old conditional constraint may hold duplicates; the newest stays open
+    for alert in SystemAlert.objects.filter(is_resolved=False).exclude(fingerprint='').order_by('-created_at', '-id'):
+        if alert.fingerprint in claimed:
+            alert.is_resolved, alert.resolved_at = True, alert.last_seen or alert.created_at
+            duplicates.append(alert)
+        else:
+            claimed.add(alert.fingerprint)
+            alert.open_fingerprint = alert.fingerprint
+            opened.append(alert)
+    SystemAlert.objects.bulk_update(duplicates, ['is_resolved', 'resolved_at'], batch_size=500)
+    SystemAlert.objects.bulk_update(opened, ['open_fingerprint'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_flight_knock_on_delay'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='systemalert',
+            name='open_fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=40, null=True, unique=True),
+        ),
+        migrations.RunPython(fill_open_fingerprints, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='systemalert',
+            name='unique_open_alert_fingerprint',
+        ),
+    ]
@@ -1,10 +1,13 @@
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import User
 from django.core.validators import RegexValidator
 from datetime import datetime, date
 import random
 import string
 
+from .airports import local_time
+
 # Enhanced User Profile for Role-Based Access
 class UserProfile(models.Model):
     PORTAL_CHOICES = [
@@ -72,6 +75,36 @@ class Aircraft(models.Model):
     def __str__(self):
         return f"{self.registration} - {self.aircraft_type}"
 
+# Recurring Flight Schedules
+class SchedulePattern(models.Model):
+    flight_number = models.CharField(max_length=10)
+    airline = models.CharField(max_length=100)
+    departure_city = models.CharField(max_length=100, blank=True)
+    arrival_city = models.CharField(max_length=100, blank=True)
+    departure_airport = models.CharField(max_length=10)  # IATA code
+    arrival_airport = models.CharField(max_length=10)    # IATA code
+    departure_local_time = models.TimeField()  # Local time at the departure airport
+    duration_minutes = models.PositiveIntegerField()
+    days_of_week = models.CharField(max_length=7, default='1234567')  # ISO weekdays operated, e.g. '135'
+    valid_from = models.DateField()
+    valid_until = models.DateField()
+    aircraft_type = models.CharField(max_length=50)
+    total_seats = models.PositiveIntegerField()
+    business_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    economy_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.flight_number} {self.departure_airport}-{self.arrival_airport} ({self.days_of_week})"
+    
+    def operates_on(self, day):
+        return self.valid_from <= day <= self.valid_until and str(day.isoweekday()) in self.days_of_week
+    
+    class Meta:
+        ordering = ['flight_number', 'valid_from']
+
 class Flight(models.Model):
     FLIGHT_STATUS_CHOICES = [
         ('scheduled', 'Scheduled'),
@@ -82,7 +115,7 @@ class Flight(models.Model):
         ('cancelled', 'Cancelled'),
     ]
     
-    flight_number = models.CharField(max_length=10, unique=True)
+    flight_number = models.CharField(max_length=10)
     airline = models.CharField(max_length=100)
     aircraft = models.ForeignKey(Aircraft, on_delete=models.CASCADE, null=True, blank=True)
     departure_city = models.CharField(max_length=100)
@@ -91,8 +124,14 @@ class Flight(models.Model):
     arrival_airport = models.CharField(max_length=10, default='UNK')    # IATA code
     departure_time = models.DateTimeField()
     arrival_time = models.DateTimeField()
+    service_date = models.DateField()  # Local departure date; unique together with flight_number
+    schedule_pattern = models.ForeignKey(SchedulePattern, on_delete=models.SET_NULL, null=True, blank=True,
+                                         related_name='occurrences')
     actual_departure = models.DateTimeField(null=True, blank=True)
     actual_arrival = models.DateTimeField(null=True, blank=True)
+    estimated_departure = models.DateTimeField(null=True, blank=True)  # Knock-on delay estimates
+    estimated_arrival = models.DateTimeField(null=True, blank=True)
+    knock_on_delay = models.BooleanField(default=False)  # estimates derived by delay propagation, not entered
     aircraft_type = models.CharField(max_length=50)
     total_seats = models.PositiveIntegerField()
     available_seats = models.PositiveIntegerField()
@@ -112,6 +151,21 @@ class Flight(models.Model):
     def __str__(self):
         return f"{self.flight_number} - {self.departure_city} to {self.arrival_city}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')  # to detect status changes on save
+        return instance
+    
+    def save(self, *args, **kwargs):
+        if self.departure_time:
+            # Follows departure_time, so a rescheduled flight moves to its new service date
+            self.service_date = local_time(self.departure_time, self.departure_airport).date()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'departure_time' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'service_date'}
+        super().save(*args, **kwargs)
+    
     @property
     def is_delayed(self):
         if self.actual_departure and self.departure_time:
@@ -137,6 +191,9 @@ class Flight(models.Model):
     
     class Meta:
         ordering = ['departure_time']
+        constraints = [
+            models.UniqueConstraint(fields=['flight_number', 'service_date'], name='unique_flight_number_per_day'),
+        ]
 
 # Enhanced Passenger Model for Customer Portal
 class Passenger(models.Model):
@@ -277,6 +334,7 @@ class Staff(models.Model):
     employee_id = models.CharField(max_length=20, unique=True)
     role = models.CharField(max_length=20, choices=ROLE_CHOICES)
     department = models.CharField(max_length=100)
+    base_airport = models.CharField(max_length=10, blank=True)  # IATA code of the crew base; rostering starts here
     hire_date = models.DateField()
     salary = models.DecimalField(max_digits=10, decimal_places=2)
     phone_regex = RegexValidator(regex=r'^\+?1?\d{9,15}$', message="Phone number must be entered in the format: '+999999999'. Up to 15 digits allowed.")
@@ -285,14 +343,15 @@ class Staff(models.Model):
     emergency_contact = models.CharField(max_length=100, blank=True)
     emergency_phone = models.CharField(max_length=17, blank=True)
     license_number = models.CharField(max_length=50, blank=True)
-    license_expiry = models.DateField(null=True, blank=True)
+    license_expiry = models.DateField(null=True, blank=True, db_index=True)
     medical_certificate = models.CharField(max_length=50, blank=True)
-    medical_expiry = models.DateField(null=True, blank=True)
+    medical_expiry = models.DateField(null=True, blank=True, db_index=True)
     qualification_status = models.CharField(max_length=20, choices=QUALIFICATION_STATUS, default='current')
     flight_hours = models.PositiveIntegerField(default=0)
     last_training = models.DateField(null=True, blank=True)
-    next_training_due = models.DateField(null=True, blank=True)
+    next_training_due = models.DateField(null=True, blank=True, db_index=True)
     is_active = models.BooleanField(default=True)
+    calendar_token = models.CharField(max_length=64, unique=True, null=True, blank=True)  # secret of the roster .ics feed
     
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.employee_id}"
@@ -321,6 +380,12 @@ class CrewAssignment(models.Model):
         ('cancelled', 'Cancelled'),
     ]
     
+    QUALIFICATION_FLAGS = [
+        ('license', 'Licence lapsed'),
+        ('medical', 'Medical lapsed'),
+        ('training', 'Training overdue'),
+    ]
+    
     staff = models.ForeignKey(Staff, on_delete=models.CASCADE)
     flight = models.ForeignKey(Flight, on_delete=models.CASCADE)
     role_on_flight = models.CharField(max_length=50)  # Captain, First Officer, etc.
@@ -329,6 +394,8 @@ class CrewAssignment(models.Model):
     check_in_time = models.DateTimeField(null=True, blank=True)
     briefing_completed = models.BooleanField(default=False)
     post_flight_report = models.TextField(blank=True)
+    qualification_flag = models.CharField(max_length=20, choices=QUALIFICATION_FLAGS, blank=True, default='')  # set by the expiry scan
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.staff.user.get_full_name()} - {self.flight.flight_number}"
@@ -336,6 +403,114 @@ class CrewAssignment(models.Model):
     class Meta:
         unique_together = ['staff', 'flight']
 
+class CrewBid(models.Model):
+    """A crew member's request to fly a flight, honoured by the rostering engine where legal"""
+    staff = models.ForeignKey(Staff, on_delete=models.CASCADE, related_name='bids')
+    flight = models.ForeignKey(Flight, on_delete=models.CASCADE, related_name='crew_bids')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.staff.employee_id} bids for {self.flight.flight_number}"
+    
+    class Meta:
+        unique_together = ['staff', 'flight']
+
+class SwapRequest(models.Model):
+    """An assignment its crew member wants to give away or trade for another"""
+    KIND_CHOICES = [
+        ('giveaway', 'Give Away'),
+        ('trade', 'Trade'),
+    ]
+    STATUS_CHOICES = [
+        ('open', 'Open'),
+        ('accepted', 'Accepted'),
+        ('cancelled', 'Cancelled'),
+    ]
+    
+    requester = models.ForeignKey(Staff, on_delete=models.CASCADE, related_name='swap_requests')
+    assignment = models.ForeignKey(CrewAssignment, on_delete=models.CASCADE, related_name='swap_requests')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='trade')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='open')
+    # Copied from the assignment so open requests can be matched from the indexes alone
+    role = models.CharField(max_length=20)
+    departure_date = models.DateField()
+    origin = models.CharField(max_length=10)
+    destination = models.CharField(max_length=10)
+    # What a trade will take in return; blank means any date or destination
+    wanted_from = models.DateField(null=True, blank=True)
+    wanted_until = models.DateField(null=True, blank=True)
+    wanted_destination = models.CharField(max_length=10, blank=True)
+    taker = models.ForeignKey(Staff, on_delete=models.SET_NULL, null=True, blank=True, related_name='swaps_taken')
+    matched_request = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} of {self.assignment} ({self.status})"
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'role', 'departure_date'], name='swap_open_by_date'),
+            models.Index(fields=['status', 'role', 'destination', 'departure_date'], name='swap_open_by_route'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['assignment'], condition=Q(status='open'),
+                                    name='unique_open_swap_per_assignment'),
+        ]
+
+class CrewMessage(models.Model):
+    """A message to crew, written once and delivered to every recipient's inbox"""
+    PRIORITY_CHOICES = [
+        ('normal', 'Normal'),
+        ('high', 'High'),
+        ('urgent', 'Urgent'),
+    ]
+    
+    AUDIENCE_CHOICES = [
+        ('direct', 'Direct'),
+        ('role', 'Role'),
+        ('flight', 'Flight'),
+        ('fleet', 'Fleet'),
+        ('all', 'All Crew'),
+    ]
+    
+    sender = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='sent_crew_messages')
+    sender_name = models.CharField(max_length=100)  # Crew Scheduling, Operations, etc.
+    subject = models.CharField(max_length=200)
+    body = models.TextField(blank=True)
+    priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, default='normal')
+    audience = models.CharField(max_length=10, choices=AUDIENCE_CHOICES, default='direct')
+    audience_label = models.CharField(max_length=100, blank=True)  # role, flight number or aircraft type
+    flight = models.ForeignKey(Flight, on_delete=models.SET_NULL, null=True, blank=True, related_name='crew_messages')
+    recipient_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.subject} ({self.get_audience_display()})"
+
+class MessageRecipient(models.Model):
+    """One crew member's copy of a message; ids order the inbox for keyset paging"""
+    message = models.ForeignKey(CrewMessage, on_delete=models.CASCADE, related_name='deliveries')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='crew_inbox')
+    read_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.message.subject} to {self.user.username}"
+    
+    class Meta:
+        unique_together = ['message', 'user']
+        indexes = [
+            models.Index(fields=['user', '-id'], name='inbox_by_user'),
+        ]
+
+class InboxCounter(models.Model):
+    """Denormalized unread count, so badges never count deliveries"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='inbox_counter')
+    unread = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.user.username}: {self.unread} unread"
+
 # Enhanced Check-in Model
 class CheckIn(models.Model):
     CHECK_IN_STATUS_CHOICES = [
@@ -380,6 +555,25 @@ class CheckIn(models.Model):
         verbose_name = "Check-In"
         verbose_name_plural = "Check-Ins"
 
+class BriefingPacket(models.Model):
+    """Crew briefing for a flight, built once and shared by everyone crewing it
+
+    ``version`` moves on whenever an input changes; the packet is rebuilt
+    when it no longer matches ``built_version``.
+    """
+    flight = models.OneToOneField(Flight, on_delete=models.CASCADE, related_name='briefing_packet')
+    version = models.PositiveIntegerField(default=1)
+    built_version = models.PositiveIntegerField(default=0)
+    data = models.JSONField(default=dict)
+    built_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Briefing for {self.flight.flight_number} v{self.built_version}"
+    
+    @property
+    def is_current(self):
+        return self.built_version == self.version
+
 # System Administration Models
 class SystemAlert(models.Model):
     ALERT_TYPES = [
@@ -398,10 +592,27 @@ class SystemAlert(models.Model):
     is_resolved = models.BooleanField(default=False)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     assigned_to = models.ForeignKey(Staff, on_delete=models.SET_NULL, null=True, blank=True)
+    fingerprint = models.CharField(max_length=40, blank=True, default='', db_index=True)  # type + system + subject
+    # The fingerprint while the alert is open, else NULL: its plain unique index allows at most one open
+    # alert per fingerprint on every backend, MySQL included, which ignores conditional unique constraints
+    open_fingerprint = models.CharField(max_length=40, null=True, blank=True, unique=True, editable=False)
+    occurrence_count = models.PositiveIntegerField(default=1)
+    last_seen = models.DateTimeField(null=True, blank=True)
     
     def __str__(self):
         return f"{self.alert_type.upper()}: {self.title}"
     
+    def sync_open_fingerprint(self):
+        """Match open_fingerprint to the resolved state; bulk writes skip save and call this themselves"""
+        self.open_fingerprint = (self.fingerprint or None) if not self.is_resolved else None
+    
+    def save(self, *args, **kwargs):
+        self.sync_open_fingerprint()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'is_resolved', 'fingerprint'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'open_fingerprint'}
+        super().save(*args, **kwargs)
+    
     class Meta:
         ordering = ['-created_at']
 
@@ -433,6 +644,25 @@ class AuditLog(models.Model):
     class Meta:
         ordering = ['-timestamp']
 
+class RequestProfile(models.Model):
+    """A cProfile capture of one request, taken on demand by a system admin"""
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    path = models.CharField(max_length=255)
+    view_name = models.CharField(max_length=200, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    total_ms = models.FloatField()
+    sql_ms = models.FloatField()
+    query_count = models.PositiveIntegerField()
+    template_ms = models.FloatField()  # includes queries run while rendering
+    profile_file = models.FileField(upload_to='profiles/%Y/%m/')  # pstats dump
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.view_name or self.path} - {self.total_ms:.0f} ms"
+
+    class Meta:
+        ordering = ['-created_at']
+
 # Operational Dashboard Models
 class FlightOperationsMetrics(models.Model):
     date = models.DateField(unique=True)
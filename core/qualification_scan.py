@@ -0,0 +1,125 @@
+# Qualification Expiry Scanner
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .alert_ingestion import AlertSignal, clear_unraised_alerts, raise_alerts
+from .models import CrewAssignment, Staff
+from .rosters import invalidate_rosters
+
+QUALIFICATION_ALERT_SYSTEM = 'Crew Qualifications'
+EXPIRY_WARNING = timedelta(days=30)  # matches the crew dashboard's "expires soon"
+# (Staff date field, assignment flag, name), most serious first
+QUALIFICATIONS = [
+    ('license_expiry', 'license', 'Licence'),
+    ('medical_expiry', 'medical', 'Medical certificate'),
+    ('next_training_due', 'training', 'Recurrent training'),
+]
+
+
+def lapsed_by(day):
+    """Staff with any qualification lapsed on ``day``; each term is an indexed range lookup"""
+    q = Q()
+    for field, _, _ in QUALIFICATIONS:
+        q |= Q(**{f'{field}__lte': day})
+    return q
+
+
+def flown_after_lapse(field):
+    """Assignments whose flight lands on or after the crew member's ``field`` date"""
+    return Q(**{'flight__arrival_time__date__gte': F(f'staff__{field}')})
+
+
+def update_qualification_status(today):
+    """Move active staff between current and expired in two bulk updates
+
+    Only the two states the scan computes change hands; a 'pending'
+    renewal is a manual review state and is left for whoever set it.
+    """
+    active = Staff.objects.filter(is_active=True)
+    lapsed = lapsed_by(today)
+    expired = active.filter(lapsed, qualification_status='current').update(qualification_status='expired')
+    renewed = active.exclude(lapsed).filter(qualification_status='expired').update(qualification_status='current')
+    return expired, renewed
+
+
+def expiry_signals(today):
+    """An alert per lapsed or soon-lapsing qualification of active staff"""
+    horizon = today + EXPIRY_WARNING
+    rows = Staff.objects.filter(lapsed_by(horizon), is_active=True).values_list(
+        'employee_id', 'user__first_name', 'user__last_name', *(field for field, _, _ in QUALIFICATIONS))
+    signals = []
+    for employee_id, first_name, last_name, *dates in rows:
+        name = f'{first_name} {last_name}'.strip() or employee_id
+        for (field, _, label), expires in zip(QUALIFICATIONS, dates):
+            if expires is None or expires > horizon:
+                continue
+            if expires <= today:
+                title, alert_type = f'{label} of {name} has lapsed', 'critical'
+            else:
+                title, alert_type = f'{label} of {name} lapses in {(expires - today).days} days', 'warning'
+            signals.append(AlertSignal(title, f'{employee_id}: {label.lower()} due {expires:%d %b %Y}.',
+                                       alert_type, QUALIFICATION_ALERT_SYSTEM, f'{employee_id}:{field}'))
+    return signals
+
+
+def flag_assignments(now):
+    """Mark future assignments flown on a lapsed qualification; returns the flagged rows
+
+    One update per qualification, least serious first so the most serious
+    flag wins, plus one to clear assignments that are fine again.
+    """
+    future = CrewAssignment.objects.filter(status__in=['scheduled', 'confirmed'], flight__departure_time__gte=now)
+    lapsing = Q()
+    for field, _, _ in QUALIFICATIONS:
+        lapsing |= flown_after_lapse(field)
+    before = set(future.exclude(qualification_flag='').values_list('id', 'staff_id', 'qualification_flag'))
+
+    future.exclude(lapsing).exclude(qualification_flag='').update(qualification_flag='')
+    for field, flag, _ in reversed(QUALIFICATIONS):
+        future.filter(flown_after_lapse(field)).exclude(qualification_flag=flag).update(qualification_flag=flag)
+
+    flagged = list(future.exclude(qualification_flag='').values_list(
+        'id', 'staff_id', 'qualification_flag', 'staff__employee_id', 'flight__flight_number', 'flight__service_date'))
+    # Bulk updates skip save signals, so drop the rosters that show a changed flag
+    changed = before ^ {row[:3] for row in flagged}
+    invalidate_rosters({staff_id for _, staff_id, _ in changed})
+    return flagged
+
+
+def assignment_signals(flagged):
+    flags = dict(CrewAssignment.QUALIFICATION_FLAGS)
+    return [
+        AlertSignal(
+            f'{flight_number} on {service_date:%d %b} crewed with {flags[flag].lower()}',
+            f'{employee_id} cannot fly {flight_number} on {service_date:%d %b %Y}: {flags[flag].lower()}. Reassign the duty.',
+            'error', QUALIFICATION_ALERT_SYSTEM, f'assignment:{assignment_id}',
+        )
+        for assignment_id, _, flag, employee_id, flight_number, service_date in flagged
+    ]
+
+
+def scan_qualifications(user, now=None):
+    """Check every active staff member's licence, medical and training dates
+
+    Updates ``qualification_status`` in bulk, flags future assignments that
+    would be flown on a lapsed qualification and raises deduplicated alerts
+    for both. Alerts of qualifications since renewed are resolved.
+    """
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    with transaction.atomic():
+        expired, renewed = update_qualification_status(today)
+        flagged = flag_assignments(now)
+    signals = expiry_signals(today) + assignment_signals(flagged)
+    raise_alerts(signals, user, now)
+    resolved = clear_unraised_alerts(QUALIFICATION_ALERT_SYSTEM, signals, now)
+    return {
+        'expired': expired,
+        'renewed': renewed,
+        'flagged': len(flagged),
+        'alerts': len(signals),
+        'resolved': len(resolved),
+    }
@@ -0,0 +1,91 @@
+# Query Budget Instrumentation
+import logging
+import re
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUERY_BUDGET = 25
+REPEAT_THRESHOLD = 5  # the same statement this often in one request suggests an N+1
+# Views that legitimately need more than the default; settings.QUERY_BUDGETS overrides
+VIEW_QUERY_BUDGETS = {}
+
+IN_LIST = re.compile(r'\bIN \((?:%s, )*%s\)')
+NUMBER = re.compile(r'\b\d+\b')
+
+
+def query_fingerprint(sql):
+    """Statement text with literals and IN-list lengths folded away"""
+    return NUMBER.sub('?', IN_LIST.sub('IN (...)', sql))
+
+
+def query_budget(view_name):
+    budgets = getattr(settings, 'QUERY_BUDGETS', {})
+    return budgets.get(view_name, VIEW_QUERY_BUDGETS.get(view_name, DEFAULT_QUERY_BUDGET))
+
+
+class QueryStats:
+    """Counts, times and fingerprints the queries run while it is installed"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[query_fingerprint(sql)] += 1
+
+    @property
+    def repeated(self):
+        """(fingerprint, times) of statements run often enough to look like an N+1"""
+        return [(sql, n) for sql, n in self.fingerprints.most_common() if n >= REPEAT_THRESHOLD]
+
+
+class QueryBudgetMiddleware:
+    """Records each request's queries and logs views that exceed their budget
+
+    Stats are attached to the response as ``query_stats`` and, when
+    ``DEBUG`` is on, sent in ``X-Query-*`` headers. Queries run while a
+    streaming response is consumed happen after the view returns and are
+    not counted. The middleware is sync-only: under ASGI, Django runs it
+    and the sync views below it on one thread, whose connection carries
+    the execute wrapper.
+    """
+    sync_capable = True
+    async_capable = False
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        with connection.execute_wrapper(stats):
+            response = self.get_response(request)
+        view_name = request.resolver_match.view_name if request.resolver_match else request.path
+        self.report(view_name, stats, response)
+        return response
+
+    def report(self, view_name, stats, response):
+        budget = query_budget(view_name)
+        response.query_stats = stats
+        if stats.count > budget or stats.repeated:
+            logger.warning(
+                'Query budget exceeded by %s: %d queries (budget %d) in %.1f ms; repeated: %s',
+                view_name, stats.count, budget, stats.duration * 1000,
+                '; '.join(f'{n}x {sql[:200]}' for sql, n in stats.repeated) or 'none',
+            )
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(stats.count)
+            response['X-Query-Time-Ms'] = f'{stats.duration * 1000:.1f}'
+            response['X-Query-Budget'] = str(budget)
+            response['X-Query-Repeats'] = str(len(stats.repeated))
@@ -0,0 +1,83 @@
+# On-demand Request Profiler
+import cProfile
+import marshal
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.template.base import Template
+from django.utils import timezone
+
+from .models import RequestProfile
+from .query_budget import QueryStats
+from .views_admin import is_system_admin
+
+PROFILE_PARAM = 'profile'  # ?profile=1
+PROFILE_HEADER = 'X-Profile'
+TEMPLATE_RENDER = Template.render.__code__
+
+
+def profile_requested(request):
+    return request.GET.get(PROFILE_PARAM) == '1' or request.headers.get(PROFILE_HEADER) == '1'
+
+
+def template_seconds(profiler):
+    """Cumulative time in top-level Template.render calls; nested renders aren't counted twice"""
+    key = (TEMPLATE_RENDER.co_filename, TEMPLATE_RENDER.co_firstlineno, TEMPLATE_RENDER.co_name)
+    return profiler.stats[key][3] if key in profiler.stats else 0.0
+
+
+def save_profile(request, response, profiler, stats, elapsed):
+    profiler.create_stats()
+    match = request.resolver_match
+    profile = RequestProfile(
+        user=request.user,
+        path=request.get_full_path()[:255],
+        view_name=match.view_name if match else '',
+        status_code=response.status_code,
+        total_ms=elapsed * 1000,
+        sql_ms=stats.duration * 1000,
+        query_count=stats.count,
+        template_ms=template_seconds(profiler) * 1000,
+    )
+    name = f"{timezone.now():%Y%m%d-%H%M%S}-{(profile.view_name or 'request').replace(':', '-')}.prof"
+    profile.profile_file.save(name, ContentFile(marshal.dumps(profiler.stats)), save=False)
+    profile.save()
+    return profile
+
+
+class RequestProfilerMiddleware:
+    """Profiles a single request when a system admin asks for it
+
+    Send ``?profile=1`` or an ``X-Profile: 1`` header. The request runs
+    under cProfile and its pstats dump is stored under ``MEDIA_ROOT`` with
+    the SQL and template time split, for download from the admin portal.
+    Unless ``REQUEST_PROFILER_ENABLED`` is set the middleware removes itself
+    at startup, so it costs nothing. It is sync-only, so under ASGI the
+    request is profiled on the thread Django runs it on; streaming bodies
+    are consumed after the view returns and are not profiled.
+    """
+    sync_capable = True
+    async_capable = False
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILER_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profile_requested(request) or not is_system_admin(request.user):
+            return self.get_response(request)
+        profiler, stats = cProfile.Profile(), QueryStats()
+        started = time.perf_counter()
+        with connection.execute_wrapper(stats):
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        profile = save_profile(request, response, profiler, stats, time.perf_counter() - started)
+        response['X-Profile-Id'] = str(profile.id)
+        return response
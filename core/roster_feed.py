@@ -0,0 +1,112 @@
+# Crew Roster Calendar Feeds
+import hashlib
+import secrets
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import CrewAssignment
+
+FEED_HISTORY = timedelta(days=30)  # past duties kept in the feed
+FEED_CHUNK_SIZE = 500
+FEED_REFRESH = 'PT15M'
+ICAL_LINE_OCTETS = 75
+NEWLINE = '\n'
+
+
+def reset_calendar_token(staff):
+    """Issue a feed secret; subscriptions to any earlier feed URL stop working"""
+    staff.calendar_token = secrets.token_urlsafe(32)
+    staff.save(update_fields=['calendar_token'])
+    return staff.calendar_token
+
+
+def feed_assignments(staff, now=None):
+    """Duties shown in the feed: the last month and everything ahead, cancelled ones dropped"""
+    since = (now or timezone.now()) - FEED_HISTORY
+    return CrewAssignment.objects.filter(staff=staff, flight__departure_time__gte=since).exclude(status='cancelled')
+
+
+def feed_validators(staff, now=None):
+    """(ETag, Last-Modified) of a feed from one aggregate query
+
+    Assignment and flight change times catch edits; the count catches
+    duties that left the feed, which leave no timestamp behind.
+    """
+    latest = feed_assignments(staff, now).aggregate(
+        count=Count('id'), assignment=Max('updated_at'), flight=Max('flight__updated_at'))
+    changed = max(filter(None, [latest['assignment'], latest['flight']]), default=None)
+    key = f"{staff.calendar_token}:{latest['count']}:{changed.isoformat() if changed else ''}"
+    return f'"{hashlib.sha1(key.encode()).hexdigest()}"', changed
+
+
+def escape_text(value):
+    return (str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def fold(line):
+    """Split a content line into 75-octet pieces as RFC 5545 requires"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= ICAL_LINE_OCTETS:
+        return line + '\r\n'
+    pieces, start, limit = [], 0, ICAL_LINE_OCTETS
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1  # never split a multi-byte character
+        pieces.append(encoded[start:end].decode('utf-8'))
+        start, limit = end, ICAL_LINE_OCTETS - 1  # continuation lines start with a space
+    return '\r\n '.join(pieces) + '\r\n'
+
+
+def ical_time(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def event_lines(assignment, briefing_url, host):
+    flight = assignment.flight
+    description = [
+        f'{assignment.role_on_flight} on {flight.airline} {flight.flight_number}',
+        f'Duty: {assignment.get_status_display()}',
+        f'Flight: {flight.get_status_display()}',
+    ]
+    if flight.gate_number:
+        description.append(f'Gate: {flight.gate_number}')
+    description.append(f'Briefing: {briefing_url}')
+    summary = f'{flight.flight_number} {flight.departure_airport}-{flight.arrival_airport}'
+    yield 'BEGIN:VEVENT'
+    yield f'UID:assignment-{assignment.id}@{host}'
+    yield f'DTSTAMP:{ical_time(assignment.updated_at)}'
+    yield f'LAST-MODIFIED:{ical_time(max(assignment.updated_at, flight.updated_at))}'
+    yield f'DTSTART:{ical_time(flight.departure_time)}'
+    yield f'DTEND:{ical_time(flight.arrival_time)}'
+    yield f'SUMMARY:{escape_text(summary)}'
+    yield f'LOCATION:{escape_text(flight.departure_airport)}'
+    yield f'DESCRIPTION:{escape_text(NEWLINE.join(description))}'
+    yield f'URL:{briefing_url}'
+    if flight.status == 'cancelled':
+        yield 'STATUS:CANCELLED'
+    yield 'END:VEVENT'
+
+
+def ical_feed(staff, briefing_url, host, now=None):
+    """The crew member's roster as iCalendar text, one folded line at a time
+
+    Rows are read in chunks with ``iterator()``, so memory stays flat
+    however long the roster is.
+    """
+    yield fold('BEGIN:VCALENDAR')
+    yield fold('VERSION:2.0')
+    yield fold('PRODID:-//Airport Management//Crew Roster//EN')
+    yield fold('CALSCALE:GREGORIAN')
+    yield fold('METHOD:PUBLISH')
+    yield fold(f'X-WR-CALNAME:Roster {escape_text(staff.employee_id)}')
+    yield fold(f'REFRESH-INTERVAL;VALUE=DURATION:{FEED_REFRESH}')
+    yield fold(f'X-PUBLISHED-TTL:{FEED_REFRESH}')
+    assignments = feed_assignments(staff, now).select_related('flight').order_by('flight__departure_time', 'id')
+    for assignment in assignments.iterator(chunk_size=FEED_CHUNK_SIZE):
+        for line in event_lines(assignment, briefing_url(assignment), host):
+            yield fold(line)
+    yield fold('END:VCALENDAR')
@@ -0,0 +1,194 @@
+# Crew Roster Aggregation
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import CrewAssignment, Flight, Staff
+
+CREW_ROLES = ['pilot', 'copilot', 'cabin_crew']
+ROSTER_CACHE_TIMEOUT = 900  # seconds; changes invalidate sooner
+MAX_ROSTER_MONTHS = 12
+ROSTER_GENERATION_KEY = 'roster:generation'  # bumped by bulk schedule changes to drop every cached roster
+
+BLOCK_TIME = ExpressionWrapper(F('flight__arrival_time') - F('flight__departure_time'), output_field=DurationField())
+
+
+def month_bounds(year, month):
+    """First and last day of a month"""
+    first = date(year, month, 1)
+    following = date(year + month // 12, month % 12 + 1, 1)
+    return first, following - timedelta(days=1)
+
+
+def add_months(year, month, count):
+    index = year * 12 + month - 1 + count
+    return index // 12, index % 12 + 1
+
+
+def roster_period(params):
+    """(year, month, months) from query parameters, falling back to this month for anything invalid"""
+    today = date.today()
+    try:
+        year, month = int(params.get('year', today.year)), int(params.get('month', today.month))
+        months = int(params.get('months', 1))
+    except ValueError:
+        return today.year, today.month, 1
+    if not (1 <= month <= 12 and date.min.year < year < date.max.year - 1):
+        return today.year, today.month, 1
+    return year, month, max(1, min(months, MAX_ROSTER_MONTHS))
+
+
+def hours(duration):
+    return round(duration.total_seconds() / 3600, 1) if duration else 0.0
+
+
+def roster_assignments(staff_ids, start_date, end_date):
+    """Assignments of the given crew departing in [start_date, end_date], with their flights"""
+    return CrewAssignment.objects.filter(
+        staff_id__in=staff_ids, flight__departure_time__date__range=[start_date, end_date]
+    )
+
+
+def daily_block_hours(staff_ids, start_date, end_date):
+    """{staff_id: {date: (block hours, legs)}} summed in the database; cancelled duties do not count"""
+    totals = defaultdict(dict)
+    for row in roster_assignments(staff_ids, start_date, end_date).exclude(status='cancelled').annotate(
+        day=TruncDate('flight__departure_time')
+    ).order_by().values('staff_id', 'day').annotate(block=Sum(BLOCK_TIME), legs=Count('id')):
+        totals[row['staff_id']][row['day']] = (hours(row['block']), row['legs'])
+    return totals
+
+
+def monthly_block_hours(staff_ids, start_date, end_date):
+    """{staff_id: {first of month: (block hours, legs)}} summed in the database"""
+    totals = defaultdict(dict)
+    for row in roster_assignments(staff_ids, start_date, end_date).exclude(status='cancelled').annotate(
+        month=TruncMonth('flight__departure_time')
+    ).order_by().values('staff_id', 'month').annotate(block=Sum(BLOCK_TIME), legs=Count('id')):
+        totals[row['staff_id']][row['month'].date()] = (hours(row['block']), row['legs'])
+    return totals
+
+
+def build_rosters(staff_ids, year, month):
+    """Uncached monthly rosters of several crew members in two queries"""
+    start_date, end_date = month_bounds(year, month)
+    by_staff = defaultdict(lambda: defaultdict(list))
+    for assignment in roster_assignments(staff_ids, start_date, end_date).select_related(
+        'flight'
+    ).order_by('flight__departure_time'):
+        # Local dates, as TruncDate gives the block-hour totals
+        by_staff[assignment.staff_id][timezone.localdate(assignment.flight.departure_time)].append(assignment)
+    daily = daily_block_hours(staff_ids, start_date, end_date)
+
+    rosters = {}
+    for staff_id in staff_ids:
+        days = [
+            {
+                'date': day,
+                'assignments': assignments,
+                'block_hours': daily[staff_id].get(day, (0.0, 0))[0],
+            }
+            for day, assignments in sorted(by_staff[staff_id].items())
+        ]
+        rosters[staff_id] = {
+            'year': year,
+            'month': month,
+            'start_date': start_date,
+            'end_date': end_date,
+            'days': days,
+            'total_hours': round(sum(h for h, _ in daily[staff_id].values()), 1),
+            'legs': sum(legs for _, legs in daily[staff_id].values()),
+        }
+    return rosters
+
+
+def _version_keys(staff_ids):
+    return {f'roster:version:{staff_id}': staff_id for staff_id in staff_ids}
+
+
+def monthly_rosters(staff_ids, year, month, use_cache=True):
+    """Monthly rosters keyed by staff id, served from the per-crew cache where possible
+
+    Crew missing from the cache are built together in one batch.
+    """
+    staff_ids = list(staff_ids)
+    if not use_cache:
+        return build_rosters(staff_ids, year, month)
+    version_keys = _version_keys(staff_ids)
+    versions = cache.get_many([*version_keys, ROSTER_GENERATION_KEY])
+    generation = versions.get(ROSTER_GENERATION_KEY, 0)
+    keys = {
+        f'roster:{staff_id}:{year}-{month:02d}:v{generation}.{versions.get(key, 0)}': staff_id
+        for key, staff_id in version_keys.items()
+    }
+    rosters = {keys[key]: roster for key, roster in cache.get_many(keys).items()}
+    missing = [staff_id for staff_id in staff_ids if staff_id not in rosters]
+    if missing:
+        built = build_rosters(missing, year, month)
+        cache.set_many({key: built[staff_id] for key, staff_id in keys.items() if staff_id in built},
+                       ROSTER_CACHE_TIMEOUT)
+        rosters.update(built)
+    return rosters
+
+
+def crew_roster(staff, year, month, months=1):
+    """Consecutive monthly rosters of one crew member"""
+    months = max(1, min(months, MAX_ROSTER_MONTHS))
+    return [
+        monthly_rosters([staff.id], *add_months(year, month, offset))[staff.id]
+        for offset in range(months)
+    ]
+
+
+def fleet_roster(year, month, crew=None):
+    """(staff, roster) for every active crew member, ordered by name"""
+    if crew is None:
+        crew = Staff.objects.filter(role__in=CREW_ROLES, is_active=True)
+    crew = list(crew.select_related('user').order_by('user__last_name', 'user__first_name'))
+    rosters = monthly_rosters([s.id for s in crew], year, month)
+    return [(staff, rosters[staff.id]) for staff in crew]
+
+
+def bump_version(key):
+    """Increment a version counter kept in the cache, starting it at 1"""
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+
+def invalidate_rosters(staff_ids):
+    """Drop every cached month of these crew members by moving them to a new version"""
+    for key in _version_keys(set(staff_ids)):
+        bump_version(key)
+
+
+def invalidate_all_rosters():
+    """Drop every cached roster; used after bulk schedule changes, which skip save signals"""
+    bump_version(ROSTER_GENERATION_KEY)
+
+
+def invalidate_flight_rosters(flight_ids):
+    """Invalidate the rosters of everyone crewing these flights"""
+    flight_ids = list(flight_ids)
+    if flight_ids:
+        invalidate_rosters(CrewAssignment.objects.filter(flight_id__in=flight_ids).values_list('staff_id', flat=True))
+
+
+@receiver(post_save, sender=CrewAssignment)
+@receiver(post_delete, sender=CrewAssignment)
+def assignment_changed(sender, instance, **kwargs):
+    invalidate_rosters([instance.staff_id])
+
+
+@receiver(post_save, sender=Flight)
+def flight_changed(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_flight_rosters([instance.id])
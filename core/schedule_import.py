@@ -0,0 +1,357 @@
+# Bulk Schedule Import (CSV and SSIM-style files)
+import csv
+import re
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, DateTimeField, DecimalField, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .aircraft_timeline import AircraftUtilizationIndex, turn_time
+from .airports import airport_table, airport_timezone, normalize_code
+from .briefings import invalidate_all_packets
+from .bulk_insert import RowWriter
+from .gate_assignment import GateTimeline
+from .models import Aircraft, Booking, Flight
+from .rosters import invalidate_all_rosters
+
+IMPORT_BATCH_SIZE = 2000
+MAX_BLOCK_TIME = timedelta(hours=20)
+FLIGHT_NUMBER_PATTERN = re.compile(r'^[A-Z0-9]{2}[A-Z]?\d{1,5}[A-Z]?$')
+SEAT_CONFIG_PATTERN = re.compile(r'[A-Z](\d+)')
+
+CSV_COLUMNS = ['flight_number', 'airline', 'departure_airport', 'arrival_airport', 'departure_time',
+               'arrival_time', 'aircraft', 'aircraft_type', 'total_seats', 'economy_price', 'business_price']
+REQUIRED_COLUMNS = ['flight_number', 'departure_airport', 'arrival_airport', 'departure_time', 'arrival_time']
+
+# Fields refreshed when an imported leg already exists; available_seats follows total_seats afterwards
+UPSERT_FIELDS = ['airline', 'aircraft', 'departure_city', 'arrival_city', 'departure_airport',
+                 'arrival_airport', 'departure_time', 'arrival_time', 'aircraft_type', 'total_seats',
+                 'economy_price', 'business_price', 'price', 'updated_at']
+
+RowError = namedtuple('RowError', ['line', 'flight_number', 'message'])
+SourceRow = namedtuple('SourceRow', ['line', 'fields', 'error'])
+
+
+class ImportResult:
+    """Counts and row-level errors of one import run"""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+
+    @property
+    def imported(self):
+        return self.created + self.updated
+
+    def write_error_report(self, stream):
+        writer = csv.writer(stream)
+        writer.writerow(['line', 'flight_number', 'error'])
+        writer.writerows(self.errors)
+
+
+def detect_format(filename):
+    return 'ssim' if filename.lower().endswith(('.ssim', '.ssm')) else 'csv'
+
+
+def read_csv_rows(lines):
+    """SourceRows from a CSV file with a header row"""
+    reader = csv.DictReader(lines)
+    missing = [c for c in REQUIRED_COLUMNS if c not in (reader.fieldnames or [])]
+    if missing:
+        yield SourceRow(1, {}, f"Missing columns: {', '.join(missing)}")
+        return
+    for row in reader:
+        yield SourceRow(reader.line_num, row, None)
+
+
+def _ssim_datetime(day, hhmm, utc_offset):
+    """Aware datetime from an SSIM date (DDMMMYY), local time (HHMM) and offset (+HHMM)"""
+    local = datetime.strptime(day + hhmm, '%d%b%y%H%M')
+    sign = -1 if utc_offset.startswith('-') else 1
+    offset = timedelta(hours=int(utc_offset[1:3]), minutes=int(utc_offset[3:5])) * sign
+    return local.replace(tzinfo=dt_timezone(offset))
+
+
+def _ssim_day(value):
+    return datetime.strptime(value, '%d%b%y').date()
+
+
+def read_ssim_rows(lines):
+    """SourceRows from the type 3 (flight leg) records of an SSIM-style file
+
+    Each record's period of operation is expanded into one row per operated
+    day; rows keep the record's line number for the error report.
+    """
+    for line_number, line in enumerate(lines, start=1):
+        if not line.startswith('3'):
+            continue
+        line = line.rstrip('\r\n').ljust(200)
+        designator = line[2:5].strip()
+        flight_number = f"{designator}{line[5:9].strip().lstrip('0')}"
+        try:
+            first_day, last_day = _ssim_day(line[14:21]), _ssim_day(line[21:28])
+            first_departure = _ssim_datetime(line[14:21], line[39:43], line[47:52])
+            first_arrival = _ssim_datetime(line[14:21], line[61:65], line[65:70])
+        except ValueError:
+            yield SourceRow(line_number, {'flight_number': flight_number}, 'Invalid date, time or UTC offset')
+            continue
+        if first_arrival <= first_departure:
+            first_arrival += timedelta(days=1)
+        days_of_operation = line[28:35]
+        seats = sum(int(n) for n in SEAT_CONFIG_PATTERN.findall(line[172:192]))
+        for offset in range((last_day - first_day).days + 1):
+            day = first_day + timedelta(days=offset)
+            if str(day.isoweekday()) not in days_of_operation:
+                continue
+            yield SourceRow(line_number, {
+                'flight_number': flight_number,
+                'airline': designator,
+                'departure_airport': line[36:39],
+                'arrival_airport': line[54:57],
+                'departure_time': first_departure + timedelta(days=offset),
+                'arrival_time': first_arrival + timedelta(days=offset),
+                'aircraft_type': line[72:75].strip(),
+                'total_seats': seats or '',
+            }, None)
+
+
+def _parse_time(value, default_tz):
+    if isinstance(value, datetime):
+        return value
+    value = datetime.fromisoformat((value or '').strip())
+    return value if value.tzinfo else value.replace(tzinfo=default_tz)
+
+
+def _parse_money(value):
+    return Decimal(value.strip()) if value and value.strip() else Decimal('0')
+
+
+class ScheduleValidator:
+    """Turns source rows into unsaved Flights, collecting row errors
+
+    Reference data (airports, fleet) is loaded once; existing flights (same
+    number on the same service date) are checked per batch with a single query.
+    """
+
+    def __init__(self):
+        self.airports = airport_table()
+        self.fleet = {a.registration.upper(): a for a in Aircraft.objects.all()}
+        self.seen = set()
+        self.tz = timezone.get_current_timezone()
+        self.zones = {}
+        self.turn = turn_time()
+        self.reserved = defaultdict(GateTimeline)  # aircraft blocks accepted so far in this import
+
+    def flight_from_row(self, fields):
+        """Flight field values for a row, or raise ValueError with the reason"""
+        number = (fields.get('flight_number') or '').strip().upper()
+        if not FLIGHT_NUMBER_PATTERN.match(number):
+            raise ValueError(f'Invalid flight number {number!r}')
+        origin = self.airports.get(normalize_code(fields.get('departure_airport')))
+        destination = self.airports.get(normalize_code(fields.get('arrival_airport')))
+        if origin is None:
+            raise ValueError(f"Unknown departure airport {fields.get('departure_airport')!r}")
+        if destination is None:
+            raise ValueError(f"Unknown arrival airport {fields.get('arrival_airport')!r}")
+        if origin == destination:
+            raise ValueError('Departure and arrival airports are the same')
+
+        try:
+            departure = _parse_time(fields.get('departure_time'), self.tz)
+            arrival = _parse_time(fields.get('arrival_time'), self.tz)
+        except ValueError:
+            raise ValueError('Invalid departure or arrival time')
+        if not timedelta(0) < arrival - departure <= MAX_BLOCK_TIME:
+            raise ValueError('Arrival must be after departure and within 20 hours')
+        if origin.iata not in self.zones:
+            self.zones[origin.iata] = airport_timezone(origin.iata)
+        service_date = departure.astimezone(self.zones[origin.iata]).date()
+        if (number, service_date) in self.seen:
+            raise ValueError(f'Duplicate flight {number} on {service_date} in file')
+
+        aircraft = None
+        registration = (fields.get('aircraft') or '').strip().upper()
+        if registration:
+            aircraft = self.fleet.get(registration)
+            if aircraft is None:
+                raise ValueError(f'Unknown aircraft {registration}')
+        aircraft_type = (fields.get('aircraft_type') or '').strip() or (aircraft.aircraft_type if aircraft else '')
+        if not aircraft_type:
+            raise ValueError('Missing aircraft type')
+
+        try:
+            seats = int(fields.get('total_seats') or (aircraft.total_seats if aircraft else 0))
+            economy_price = _parse_money(fields.get('economy_price'))
+            business_price = _parse_money(fields.get('business_price'))
+        except (ValueError, InvalidOperation):
+            raise ValueError('Invalid seat count or price')
+        if seats <= 0:
+            raise ValueError('Missing seat count')
+
+        self.seen.add((number, service_date))
+        return {
+            'flight_number': number,
+            'service_date': service_date,
+            'airline': (fields.get('airline') or '').strip() or number[:2],
+            'aircraft_id': aircraft.id if aircraft else None,
+            'departure_city': origin.city,
+            'arrival_city': destination.city,
+            'departure_airport': origin.iata,
+            'arrival_airport': destination.iata,
+            'departure_time': departure,
+            'arrival_time': arrival,
+            'aircraft_type': aircraft_type,
+            'total_seats': seats,
+            'available_seats': seats,
+            'economy_price': economy_price,
+            'business_price': business_price,
+            'price': economy_price,
+        }
+
+    def validate_batch(self, rows, result, update_existing=False):
+        """Valid rows of a batch; invalid rows are appended to ``result.errors``"""
+        flights = []
+        for row in rows:
+            result.rows += 1
+            if row.error:
+                result.errors.append(RowError(row.line, row.fields.get('flight_number', ''), row.error))
+                continue
+            try:
+                flights.append((row.line, self.flight_from_row(row.fields)))
+            except ValueError as exc:
+                result.errors.append(RowError(row.line, row.fields.get('flight_number', ''), str(exc)))
+
+        existing = {
+            (number, service_date): pk for pk, number, service_date in Flight.objects.filter(
+                flight_number__in={flight['flight_number'] for _, flight in flights},
+                service_date__in={flight['service_date'] for _, flight in flights},
+            ).values_list('id', 'flight_number', 'service_date')
+        }
+        if not update_existing:
+            valid = []
+            for line, flight in flights:
+                if (flight['flight_number'], flight['service_date']) in existing:
+                    result.errors.append(RowError(line, flight['flight_number'],
+                                                  f"Flight already scheduled on {flight['service_date']}"))
+                else:
+                    valid.append((line, flight))
+            flights = valid
+        return self.check_aircraft(flights, existing, result), existing
+
+    def check_aircraft(self, flights, existing, result):
+        """Drop rows whose aircraft is double-booked, due for maintenance or out of service"""
+        blocks = {
+            id(flight): (flight['departure_time'], flight['arrival_time'] + self.turn)
+            for _, flight in flights if flight['aircraft_id']
+        }
+        if not blocks:
+            return [flight for _, flight in flights]
+        tails = {flight['aircraft_id'] for _, flight in flights if flight['aircraft_id']}
+        index = AircraftUtilizationIndex.for_window(
+            min(start for start, _ in blocks.values()),
+            max(end for _, end in blocks.values()),
+            aircraft=[a for a in self.fleet.values() if a.id in tails],
+            reserved=self.reserved,
+        )
+        valid = []
+        for line, flight in flights:
+            if flight['aircraft_id']:
+                start, end = blocks[id(flight)]
+                reasons = index.clashes(flight['aircraft_id'], start, end,
+                                        exclude_flight=existing.get((flight['flight_number'], flight['service_date'])))
+                if reasons:
+                    result.errors.append(RowError(line, flight['flight_number'], '; '.join(reasons)))
+                    continue
+                index.reserve(flight['aircraft_id'], start, end)
+            valid.append(flight)
+        return valid
+
+
+class FlightWriter:
+    """Inserts validated rows by running one prepared statement over the whole batch
+
+    Goes straight to the cursor: building and compiling a model instance per
+    row costs more than the insert itself at timetable scale.
+    """
+
+    def __init__(self, update_existing=False, using=DEFAULT_DB_ALIAS):
+        fields = [f for f in Flight._meta.concrete_fields if not f.primary_key]
+        self.rows = RowWriter(
+            Flight, [f.attname for f in fields], using=using,
+            update_fields=UPSERT_FIELDS if update_existing else (),
+            unique_fields=['flight_number', 'service_date'] if update_existing else (),
+        )
+        self.connection = self.rows.connection
+        ops = self.connection.ops
+        self.defaults = {f.attname: f.get_default() for f in fields}
+        self.adapters = [(f.attname, self._adapter(f, ops)) for f in fields]
+
+    @staticmethod
+    def _adapter(field, ops):
+        if isinstance(field, DateTimeField):
+            return ops.adapt_datetimefield_value
+        if isinstance(field, DecimalField):
+            return lambda value: ops.adapt_decimalfield_value(value, field.max_digits, field.decimal_places)
+        return None
+
+    def params(self, row, now):
+        values = []
+        for attname, adapt in self.adapters:
+            if attname in row:
+                value = row[attname]
+            elif attname in ('created_at', 'updated_at'):
+                value = now
+            else:
+                value = self.defaults[attname]
+            values.append(adapt(value) if adapt is not None and value is not None else value)
+        return tuple(values)
+
+    def write(self, rows):
+        now = timezone.now()
+        return self.rows.write([self.params(row, now) for row in rows])
+
+
+def recount_available_seats(flight_ids):
+    """Set available seats from capacity less live bookings, in one UPDATE"""
+    booked = Booking.objects.filter(flight=OuterRef('pk')).exclude(status='cancelled').order_by().values(
+        'flight').annotate(c=Count('id')).values('c')
+    return Flight.objects.filter(id__in=flight_ids).update(
+        available_seats=Greatest(F('total_seats') - Coalesce(Subquery(booked), 0), 0))
+
+
+def import_schedule(lines, fmt='csv', update_existing=False, dry_run=False, batch_size=IMPORT_BATCH_SIZE):
+    """Stream-import a schedule file; each batch is validated and saved in its own transaction
+
+    ``lines`` is any iterable of text lines, so files are never read into
+    memory whole. With ``update_existing`` rows whose flight number already
+    operates on that date update the flight instead of being rejected.
+    """
+    rows = read_ssim_rows(lines) if fmt == 'ssim' else read_csv_rows(lines)
+    validator = ScheduleValidator()
+    writer = FlightWriter(update_existing)
+    result = ImportResult()
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        flights, existing = validator.validate_batch(batch, result, update_existing)
+        updated = [existing[key] for key in ((f['flight_number'], f['service_date']) for f in flights)
+                   if key in existing]
+        result.updated += len(updated)
+        result.created += len(flights) - len(updated)
+        if dry_run or not flights:
+            continue
+        with transaction.atomic(using=writer.connection.alias):
+            writer.write(flights)
+            if updated:
+                recount_available_seats(updated)  # the upsert may have changed their capacity
+                invalidate_all_rosters()
+                invalidate_all_packets()
+    return result
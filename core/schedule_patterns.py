@@ -0,0 +1,137 @@
+# Recurring Schedule Pattern Expansion
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .airports import airport_timezone, get_airport
+from .briefings import invalidate_all_packets
+from .models import Flight, SchedulePattern
+from .rosters import invalidate_all_rosters
+
+SCHEDULE_HORIZON_DAYS = 60
+# Occurrences in these states are still plannable; anything later is left alone
+PLANNABLE_STATUSES = ('scheduled', 'delayed')
+OCCURRENCE_FIELDS = ['airline', 'departure_city', 'arrival_city', 'departure_airport', 'arrival_airport',
+                     'departure_time', 'arrival_time', 'aircraft_type', 'total_seats', 'available_seats',
+                     'economy_price', 'business_price', 'price', 'schedule_pattern', 'status', 'updated_at']
+
+
+def pattern_dates(pattern, start, end):
+    """Operating dates of a pattern within [start, end]"""
+    day = max(pattern.valid_from, start)
+    last = min(pattern.valid_until, end)
+    dates = []
+    while day <= last:
+        if str(day.isoweekday()) in pattern.days_of_week:
+            dates.append(day)
+        day += timedelta(days=1)
+    return dates
+
+
+def occurrence_values(pattern, day):
+    """Field values of a pattern's flight on a given service date"""
+    departure = datetime.combine(day, pattern.departure_local_time, tzinfo=airport_timezone(pattern.departure_airport))
+    origin = get_airport(pattern.departure_airport)
+    destination = get_airport(pattern.arrival_airport)
+    return {
+        'airline': pattern.airline,
+        'departure_city': pattern.departure_city or (origin.city if origin else ''),
+        'arrival_city': pattern.arrival_city or (destination.city if destination else ''),
+        'departure_airport': pattern.departure_airport,
+        'arrival_airport': pattern.arrival_airport,
+        'departure_time': departure,
+        'arrival_time': departure + timedelta(minutes=pattern.duration_minutes),
+        'aircraft_type': pattern.aircraft_type,
+        'total_seats': pattern.total_seats,
+        'economy_price': pattern.economy_price,
+        'business_price': pattern.business_price,
+        'price': pattern.economy_price,
+    }
+
+
+def _apply(flight, values):
+    """Copy pattern values onto an existing occurrence; True if anything changed"""
+    changed = False
+    seat_change = values['total_seats'] - flight.total_seats
+    for field, value in values.items():
+        if getattr(flight, field) != value:
+            setattr(flight, field, value)
+            changed = True
+    if seat_change:
+        flight.available_seats = max(0, flight.available_seats + seat_change)
+    return changed
+
+
+def expand_patterns(patterns=None, start=None, horizon_days=SCHEDULE_HORIZON_DAYS):
+    """Materialize pattern occurrences from ``start`` over the rolling horizon
+
+    Missing occurrences are created, plannable ones are updated to match
+    their pattern and those the pattern no longer operates are cancelled;
+    a cancelled occurrence the pattern operates again is reinstated. Only
+    the [start, end] window is touched, so a shorter run leaves occurrences
+    beyond its horizon alone. Existing flights are read in one query and
+    written with bulk_create / bulk_update, whatever the number of patterns.
+    """
+    start = start or timezone.localdate()
+    end = start + timedelta(days=horizon_days)
+    patterns = list(patterns if patterns is not None else SchedulePattern.objects.all())
+    pattern_ids = [p.id for p in patterns]
+    numbers = {p.flight_number for p in patterns}
+
+    existing = {}
+    linked = []
+    for flight in Flight.objects.filter(service_date__range=(start, end)).filter(
+        Q(schedule_pattern_id__in=pattern_ids) | Q(flight_number__in=numbers)
+    ):
+        existing[(flight.flight_number, flight.service_date)] = flight
+        if flight.schedule_pattern_id in pattern_ids:
+            linked.append(flight)
+
+    created, updated, conflicts = [], [], []
+    wanted = set()
+    now = timezone.now()
+    for pattern in patterns:
+        if not pattern.is_active:
+            continue
+        for day in pattern_dates(pattern, start, end):
+            values = occurrence_values(pattern, day)
+            if values['departure_time'] <= now:
+                continue
+            flight = existing.get((pattern.flight_number, day))
+            if flight is None:
+                flight = Flight(flight_number=pattern.flight_number, service_date=day, schedule_pattern=pattern,
+                                available_seats=pattern.total_seats, **values)
+                existing[(pattern.flight_number, day)] = flight
+                created.append(flight)
+            elif flight.schedule_pattern_id not in (None, pattern.id):
+                conflicts.append(flight)  # the number is already flown by another pattern that day
+                continue
+            else:
+                adopted = flight.schedule_pattern_id is None  # hand-entered flight the pattern now covers
+                reinstated = flight.status == 'cancelled' and not adopted  # operated again after a cancellation
+                flight.schedule_pattern = pattern
+                if reinstated:
+                    flight.status = 'scheduled'
+                changed = flight.status in PLANNABLE_STATUSES and _apply(flight, values)
+                if changed or adopted or reinstated:
+                    updated.append(flight)
+            wanted.add(id(flight))
+
+    cancelled = []
+    for flight in linked:
+        if id(flight) not in wanted and flight.status in PLANNABLE_STATUSES and flight.departure_time > now:
+            flight.status = 'cancelled'
+            cancelled.append(flight)
+
+    for flight in updated + cancelled:
+        flight.updated_at = now  # bulk_update skips auto_now
+    with transaction.atomic():
+        Flight.objects.bulk_create(created, batch_size=500)
+        Flight.objects.bulk_update(updated + cancelled, OCCURRENCE_FIELDS, batch_size=500)
+        if updated or cancelled:
+            invalidate_all_rosters()
+            invalidate_all_packets()
+
+    return {'created': created, 'updated': updated, 'cancelled': cancelled, 'conflicts': conflicts}
@@ -0,0 +1,403 @@
+# Synthetic Dataset Generator
+import math
+import random
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from itertools import combinations
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .airports import airport_table, airport_timezone, local_time
+from .alert_ingestion import alert_fingerprint
+from .briefings import invalidate_all_packets
+from .bulk_insert import RowWriter
+from .geo import estimate_block_minutes, route_distances_km
+from .models import (Aircraft, AuditLog, Booking, CheckIn, CrewAssignment, Flight, Passenger, Staff,
+                     SystemAlert)
+from .rosters import invalidate_all_rosters
+
+SYNTHETIC_DOMAIN = 'synthetic.example.com'  # marks generated passengers and users
+ROTATIONS_PER_SCALE = 4  # daily out-and-back rotations at scale 1
+SCHEDULE_DAYS = 30  # centred on today, so half the schedule has flown
+TRIPS_PER_PASSENGER = 4  # bookings per passenger, on average
+CHUNK_SIZE = 20000  # rows built in memory before they are written
+TURNAROUND = timedelta(minutes=45)
+CHECK_IN_WINDOW = timedelta(hours=24)
+DELAY_ALERT_MINUTES = 60
+CREW_PASSWORD = 'crew'
+SEATS_PER_ROW = 'ABCDEF'
+TAXES = Decimal('0.12')
+
+# Varying columns of the rows written without bulk_create, in tuple order
+PASSENGER_FIELDS = ['id', 'title', 'first_name', 'last_name', 'email', 'phone_number', 'date_of_birth', 'gender',
+                    'passport_number', 'nationality', 'address', 'mobility_assistance']
+BOOKING_FIELDS = ['id', 'booking_reference', 'passenger_id', 'flight_id', 'seat_number', 'seat_class', 'status',
+                  'base_price', 'taxes_fees', 'total_amount', 'payment_status', 'payment_method']
+CHECKIN_FIELDS = ['booking_id', 'gate_number', 'seat_number', 'baggage_weight', 'status']
+
+AIRLINES = [('AI', 'Air India'), ('6E', 'IndiGo'), ('SG', 'SpiceJet'), ('UK', 'Vistara'), ('QP', 'Akasa Air')]
+# (type, manufacturer, seats, business seats, longest route in km), shortest range first
+FLEET = [
+    ('ATR 72', 'ATR', 72, 0, 700),
+    ('Airbus A320', 'Airbus', 180, 12, 3000),
+    ('Boeing 737', 'Boeing', 189, 12, 4000),
+    ('Airbus A330', 'Airbus', 290, 30, 20000),
+]
+FIRST_NAMES = ['Aarav', 'Priya', 'Amit', 'Sunita', 'Vikram', 'Anita', 'Rajesh', 'Meera', 'Suresh', 'Kavita',
+               'Arjun', 'Pooja', 'Manoj', 'Deepa', 'Ravi', 'Shalini', 'John', 'Emma', 'Liam', 'Sofia']
+LAST_NAMES = ['Sharma', 'Patel', 'Singh', 'Kumar', 'Gupta', 'Agarwal', 'Verma', 'Jain', 'Shah', 'Rao',
+              'Reddy', 'Nair', 'Iyer', 'Chopra', 'Malhotra', 'Sinha', 'Smith', 'Brown', 'Khan', 'Das']
+NATIONALITIES = ['Indian'] * 8 + ['British', 'American']
+
+
+def chunked_create(model, objs, chunk_size=CHUNK_SIZE):
+    """bulk_create an iterable of unsaved rows, one transaction per chunk; returns the saved rows"""
+    objs = list(objs)
+    for start in range(0, len(objs), chunk_size):
+        with transaction.atomic():
+            model.objects.bulk_create(objs[start:start + chunk_size], batch_size=500)
+    return objs
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+
+def seat_label(index):
+    return f'{index // len(SEATS_PER_ROW) + 1}{SEATS_PER_ROW[index % len(SEATS_PER_ROW)]}'
+
+
+def plan_rotations(count, rng):
+    """Route, airline, aircraft type and timing of each daily rotation
+
+    Rotations spread over every airport pair before any pair gets a second
+    frequency, and the aircraft is the smallest type with the range.
+    """
+    codes = sorted(airport_table())
+    pairs = list(combinations(codes, 2))
+    rng.shuffle(pairs)
+    pairs = [pairs[i % len(pairs)] for i in range(count)]
+    distances = route_distances_km([a for a, _ in pairs], [b for _, b in pairs])
+    blocks = estimate_block_minutes(distances)
+    numbers = {code: 0 for code, _ in AIRLINES}
+    rotations = []
+    for i, ((origin, destination), distance, block) in enumerate(zip(pairs, distances, blocks)):
+        code, airline = AIRLINES[i % len(AIRLINES)]
+        numbers[code] += 2
+        fleet = next(f for f in FLEET if distance <= f[4] or f is FLEET[-1])
+        economy = Decimal(round(2000 + distance * 4.5, -1))
+        rotations.append({
+            'index': i,
+            'airline': airline,
+            'numbers': (f'{code}{numbers[code] - 1}', f'{code}{numbers[code]}'),
+            'airports': (origin, destination),
+            'block': timedelta(minutes=int(block)),
+            'departs': time(rng.randrange(5, 20), rng.choice([0, 15, 30, 45])),
+            'fleet': fleet,
+            'economy': economy,
+            'business': economy * 3,
+            'load_factor': rng.uniform(0.6, 0.95),  # some routes sell better than others
+        })
+    return rotations
+
+
+class SyntheticDataset:
+    """Writes a deterministic, internally consistent operating history
+
+    Scale 1 flies ``ROTATIONS_PER_SCALE`` out-and-back rotations a day over
+    ``days`` days; everything else (fleet, crew, passengers, bookings up to
+    each route's load factor, check-ins, delay alerts and audit entries)
+    follows from the schedule. Rows are written a chunk at a time, so
+    memory stays flat at any scale: ``bulk_create`` for the small tables,
+    and a ``RowWriter`` for passengers, bookings and check-ins, which carry
+    their own ids so check-ins can point at bookings without reading them
+    back.
+    """
+
+    def __init__(self, scale=1, seed=0, start=None, days=SCHEDULE_DAYS, now=None, chunk_size=CHUNK_SIZE,
+                 log=None):
+        if scale <= 0 or days <= 0:
+            raise ValueError('Scale and days must be positive')
+        self.rng = random.Random(seed)
+        self.now = now or timezone.now()
+        self.days = days
+        self.start = start or timezone.localdate(self.now) - timedelta(days=days // 2)
+        self.chunk_size = chunk_size
+        self.log = log or (lambda message: None)
+        self.rotations = plan_rotations(max(1, round(scale * ROTATIONS_PER_SCALE)), self.rng)
+        self.counts = dict.fromkeys(['aircraft', 'staff', 'passengers', 'flights', 'bookings', 'checkins',
+                                     'assignments', 'alerts', 'audit_logs'], 0)
+        self.next_reference = 0
+        self.service_dates = {}  # flight number -> latest service date
+        self.baggage = [connection.ops.adapt_decimalfield_value(Decimal(n) / 10, 5, 2) for n in range(250)]
+
+    def generate(self):
+        if Passenger.objects.filter(email__endswith=f'@{SYNTHETIC_DOMAIN}').exists():
+            raise ValueError('Synthetic data is already loaded; flush the database first')
+        self.ops = User.objects.create_user(f'ops@{SYNTHETIC_DOMAIN}', is_staff=True, is_superuser=True)
+        self.create_fleet()
+        self.create_crew()
+        self.create_passengers()
+        self.booking_writer = RowWriter(Booking, BOOKING_FIELDS, booking_date=self.now)
+        self.checkin_writer = RowWriter(CheckIn, CHECKIN_FIELDS, check_in_time=self.now)
+        self.booking_id = next_id(Booking)
+        for offset in range(self.days):
+            self.fly_day(self.start + timedelta(days=offset))
+            self.log(f'{self.start + timedelta(days=offset)}: {self.counts["bookings"]} bookings so far')
+        # Rows written with their own ids leave sequences behind on backends that have them
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Passenger, Booking]):
+                cursor.execute(sql)
+        # Bulk inserts skip save signals, so drop every cached roster and briefing
+        invalidate_all_rosters()
+        invalidate_all_packets()
+        return self.counts
+
+    def create_fleet(self):
+        """An aircraft per rotation, of the type its route needs"""
+        today = timezone.localdate(self.now)
+        self.tails = {}
+        for rotation in self.rotations:
+            aircraft_type, manufacturer, seats, business, _ = rotation['fleet']
+            self.tails[rotation['index']] = Aircraft(
+                registration=f'VT-S{rotation["index"]:05d}', aircraft_type=aircraft_type,
+                manufacturer=manufacturer, model=aircraft_type.split()[-1], total_seats=seats,
+                business_seats=business, economy_seats=seats - business,
+                year_manufactured=self.rng.randrange(2005, 2024),
+                last_maintenance=today - timedelta(days=self.rng.randrange(1, 120)),
+                next_maintenance=today + timedelta(days=self.rng.randrange(10, 180)),
+            )
+        chunked_create(Aircraft, self.tails.values(), self.chunk_size)
+        self.counts['aircraft'] = len(self.tails)
+
+    def create_crew(self):
+        """Two crews per rotation working alternate days
+
+        A crew flies both legs of its rotation, so no one is rostered twice
+        at once. About 2% of staff carry a lapsed qualification.
+        """
+        password = make_password(CREW_PASSWORD)
+        today = timezone.localdate(self.now)
+        users, staff = [], []
+        self.crews = {}
+        for rotation in self.rotations:
+            cabin = max(1, rotation['fleet'][2] // 50)
+            for group in (0, 1):
+                crew = []
+                for role, role_on_flight in [('pilot', 'Captain'), ('copilot', 'First Officer')] + \
+                        [('cabin_crew', 'Cabin Crew')] * cabin:
+                    n = len(staff)
+                    lapsed = self.rng.random() < 0.02
+                    user = User(username=f'crew{n:06d}@{SYNTHETIC_DOMAIN}', password=password,
+                                first_name=self.rng.choice(FIRST_NAMES), last_name=self.rng.choice(LAST_NAMES))
+                    users.append(user)
+                    staff.append(Staff(
+                        user=user, employee_id=f'SYN{n:06d}', role=role, department='Flight Operations',
+                        hire_date=today - timedelta(days=self.rng.randrange(200, 7000)),
+                        salary=Decimal(self.rng.randrange(60, 400) * 1000), phone_number=f'+91{9000000000 + n}',
+                        address='Crew base', license_number=f'LIC{n:06d}',
+                        license_expiry=today + timedelta(days=-5 if lapsed else self.rng.randrange(60, 1500)),
+                        medical_expiry=today + timedelta(days=self.rng.randrange(30, 365)),
+                        next_training_due=today + timedelta(days=self.rng.randrange(30, 365)),
+                        flight_hours=self.rng.randrange(500, 15000),
+                    ))
+                    crew.append((len(staff) - 1, role_on_flight))
+                self.crews[rotation['index'], group] = crew
+        chunked_create(User, users, self.chunk_size)
+        self.staff_ids = [member.id for member in chunked_create(Staff, staff, self.chunk_size)]
+        self.counts['staff'] = len(staff)
+
+    def create_passengers(self):
+        """Enough passengers for ``TRIPS_PER_PASSENGER`` bookings each"""
+        seats = sum(r['fleet'][2] * r['load_factor'] for r in self.rotations) * 2 * self.days
+        count = max(1, math.ceil(seats / TRIPS_PER_PASSENGER))
+        writer = RowWriter(Passenger, PASSENGER_FIELDS, created_at=self.now)
+        self.first_passenger = next_id(Passenger)
+        rows = []
+        for n in range(count):
+            first_name, last_name = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+            born = date(1950, 1, 1) + timedelta(days=self.rng.randrange(0, 20000))
+            rows.append((
+                self.first_passenger + n, self.rng.choice(['Mr', 'Mrs', 'Ms', 'Dr']), first_name, last_name,
+                f'{first_name.lower()}.{last_name.lower()}.{n}@{SYNTHETIC_DOMAIN}', f'+91{7000000000 + n}',
+                connection.ops.adapt_datefield_value(born), self.rng.choice('MF'), f'S{n:09d}',
+                self.rng.choice(NATIONALITIES), f'{self.rng.randrange(1, 999)} Main Street',
+                self.rng.random() < 0.01,
+            ))
+            if len(rows) == self.chunk_size:
+                writer.write(rows)
+                rows = []
+        writer.write(rows)
+        self.counts['passengers'] = count
+
+    def pick_passenger(self):
+        # Skewed towards the first ids, so some passengers fly far more than others
+        return self.first_passenger + int(self.counts['passengers'] * self.rng.random() ** 1.5)
+
+    def make_flight(self, rotation, leg, departure):
+        """An unsaved flight with a delay and status consistent with ``now``"""
+        origin, destination = rotation['airports'][::-1] if leg else rotation['airports']
+        aircraft_type, _, seats, _, _ = rotation['fleet']
+        flight = Flight(
+            flight_number=rotation['numbers'][leg], airline=rotation['airline'],
+            aircraft=self.tails[rotation['index']],
+            departure_city=airport_table()[origin].city, arrival_city=airport_table()[destination].city,
+            departure_airport=origin, arrival_airport=destination, departure_time=departure,
+            arrival_time=departure + rotation['block'], service_date=local_time(departure, origin).date(),
+            aircraft_type=aircraft_type, total_seats=seats, available_seats=seats,
+            economy_price=rotation['economy'], business_price=rotation['business'], price=rotation['economy'],
+            gate_number=f'{self.rng.choice("AB")}{self.rng.randrange(1, 30)}',
+        )
+        delay = timedelta(minutes=int(self.rng.expovariate(1 / 25))) if self.rng.random() < 0.3 else timedelta()
+        flight.delay = delay  # kept on the instance for the delay alerts
+        if self.rng.random() < 0.015:
+            flight.status = 'cancelled'
+        elif departure + delay + rotation['block'] <= self.now:
+            flight.status = 'arrived'
+            flight.actual_departure, flight.actual_arrival = departure + delay, departure + delay + rotation['block']
+        elif departure + delay <= self.now:
+            flight.status = 'departed'
+            flight.actual_departure = departure + delay
+        elif delay >= timedelta(minutes=15):
+            flight.status = 'delayed'
+            flight.estimated_departure = departure + delay
+            flight.estimated_arrival = departure + delay + rotation['block']
+            flight.delay_reason = 'Late inbound aircraft'
+        return flight
+
+    def fly_day(self, day):
+        flights, rotations, crews = [], [], []
+        for rotation in self.rotations:
+            departure = datetime.combine(day, rotation['departs'], tzinfo=airport_timezone(rotation['airports'][0]))
+            outbound = self.make_flight(rotation, 0, departure)
+            inbound = self.make_flight(rotation, 1, outbound.arrival_time + TURNAROUND)
+            for flight in (outbound, inbound):
+                # A clock change can put two days' late legs on one local date; that leg is dropped
+                if self.service_dates.get(flight.flight_number) == flight.service_date:
+                    continue
+                self.service_dates[flight.flight_number] = flight.service_date
+                flights.append(flight)
+                rotations.append(rotation)
+                crews.append(self.crews[rotation['index'], day.toordinal() % 2])
+        # Seats are counted before the flights are written so available_seats is right on insert
+        sold = [self.sell_seats(flight, rotation) for flight, rotation in zip(flights, rotations)]
+        chunked_create(Flight, flights, self.chunk_size)
+        self.counts['flights'] += len(flights)
+
+        gates = {flight.id: flight.gate_number for flight in flights}
+        bookings, assignments = [], []
+        for flight, seat_map, crew in zip(flights, sold, crews):
+            bookings += self.make_bookings(flight, seat_map)
+            assignments += self.make_assignments(flight, crew)
+            if len(bookings) >= self.chunk_size:
+                self.write_bookings(bookings, gates)
+                bookings = []
+        self.write_bookings(bookings, gates)
+        chunked_create(CrewAssignment, assignments, self.chunk_size)
+        self.counts['assignments'] += len(assignments)
+        self.write_events(flights)
+
+    def sell_seats(self, flight, rotation):
+        """Seat indices sold on a flight, up to the route's load factor give or take"""
+        load = min(1.0, max(0.0, self.rng.gauss(rotation['load_factor'], 0.08)))
+        seats = self.rng.sample(range(flight.total_seats), round(flight.total_seats * load))
+        if flight.status == 'cancelled':
+            cancelled = len(seats)
+        else:
+            cancelled = sum(self.rng.random() < 0.03 for _ in seats)  # the first ones sold are cancelled
+        flight.available_seats = flight.total_seats - len(seats) + cancelled
+        return seats, cancelled
+
+    def make_bookings(self, flight, seat_map):
+        """Booking rows in ``BOOKING_FIELDS`` order"""
+        seats, cancelled = seat_map
+        business_seats = flight.aircraft.business_seats
+        flown = flight.status in ('departed', 'arrived')
+        check_in_open = flight.departure_time - CHECK_IN_WINDOW <= self.now
+        prices = {}
+        for seat_class, base in [('business', flight.business_price), ('economy', flight.economy_price)]:
+            total = (base * (1 + TAXES)).quantize(Decimal('0.01'))
+            prices[seat_class] = tuple(connection.ops.adapt_decimalfield_value(value, 10, 2)
+                                       for value in (base, total - base, total))
+        rows = []
+        for i, seat in enumerate(seats):
+            seat_class = 'business' if seat < business_seats else 'economy'
+            if i < cancelled:
+                status = 'cancelled'
+            elif flown:
+                status = 'completed'
+            elif check_in_open and self.rng.random() < 0.6:
+                status = 'checked_in'
+            else:
+                status = 'pending' if self.rng.random() < 0.05 else 'confirmed'
+            paid = status != 'pending'
+            self.next_reference += 1
+            rows.append((
+                self.booking_id, f'S{self.next_reference:09X}', self.pick_passenger(), flight.id, seat_label(seat),
+                seat_class, status, *prices[seat_class], paid, 'card' if paid else '',
+            ))
+            self.booking_id += 1
+        return rows
+
+    def write_bookings(self, bookings, gates):
+        """Bookings, then a check-in for each one that flew or checked in online"""
+        checkins = []
+        for booking_id, _, _, flight_id, seat_number, _, status, *_ in bookings:
+            if status == 'completed':
+                checkin_status = 'no_show' if self.rng.random() < 0.02 else 'boarded'
+            elif status == 'checked_in':
+                checkin_status = self.rng.choice(['checked_in', 'boarding_pass_issued'])
+            else:
+                continue
+            checkins.append((booking_id, gates[flight_id], seat_number,
+                             self.baggage[self.rng.randrange(0, 250)], checkin_status))
+        self.counts['bookings'] += self.booking_writer.write(bookings)
+        self.counts['checkins'] += self.checkin_writer.write(checkins)
+
+    def make_assignments(self, flight, crew):
+        if flight.status in ('departed', 'arrived'):
+            status = 'completed'
+        elif flight.status == 'cancelled':
+            status = 'cancelled'
+        else:
+            status = 'confirmed' if flight.departure_time - self.now < timedelta(days=7) else 'scheduled'
+        return [
+            CrewAssignment(staff_id=self.staff_ids[member], flight=flight, role_on_flight=role_on_flight,
+                           status=status, briefing_completed=status == 'completed')
+            for member, role_on_flight in crew
+        ]
+
+    def write_events(self, flights):
+        """A delay alert for long delays, resolved once the flight is off; an audit entry per flight"""
+        alerts, logs = [], []
+        for flight in flights:
+            logs.append(AuditLog(user=self.ops, action_type='create', model_name='Flight', object_id=str(flight.id),
+                                 description=f'Scheduled flight {flight.flight_number}', portal_used='airline'))
+            minutes = int(flight.delay.total_seconds() // 60)
+            if flight.status == 'cancelled' or minutes < DELAY_ALERT_MINUTES:
+                continue
+            subject = f'{flight.flight_number} {flight.service_date}'
+            resolved = flight.status in ('departed', 'arrived')
+            alerts.append(SystemAlert(
+                title=f'{flight.flight_number} delayed {minutes} minutes', alert_type='warning',
+                message=f'{flight.flight_number} {flight.departure_airport}-{flight.arrival_airport} on '
+                        f'{flight.service_date:%d %b} expected to depart {minutes} minutes late.',
+                affected_system='Flight Operations', created_by=self.ops, is_resolved=resolved,
+                resolved_at=flight.actual_departure if resolved else None,
+                fingerprint=alert_fingerprint('warning', 'Flight Operations', subject),
+                last_seen=flight.departure_time,
+            ))
+            if resolved:
+                logs.append(AuditLog(user=self.ops, action_type='update', model_name='SystemAlert',
+                                     description=f'Resolved delay alert for {subject}', portal_used='airline'))
+        for alert in alerts:
+            alert.sync_open_fingerprint()  # bulk_create skips save
+        chunked_create(SystemAlert, alerts, self.chunk_size)
+        chunked_create(AuditLog, logs, self.chunk_size)
+        self.counts['alerts'] += len(alerts)
+        self.counts['audit_logs'] += len(logs)
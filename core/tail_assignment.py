@@ -0,0 +1,244 @@
+# Tail Assignment Optimizer
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .aircraft_timeline import UNAVAILABLE_STATUSES, flight_block, maintenance_window, turn_time
+from .airports import get_airport, normalize_code
+from .analytics import annotate_booked_seats
+from .models import Aircraft, Flight
+from .schedule_patterns import PLANNABLE_STATUSES
+
+TAIL_ASSIGNMENT_HORIZON_DAYS = 7
+
+# Times are epoch seconds; ``station`` is an airport code, or None when unknown
+Leg = namedtuple('Leg', ['flight_id', 'origin', 'destination', 'departure', 'arrival', 'booked',
+                         'current_tail', 'fixed'])
+Tail = namedtuple('Tail', ['aircraft_id', 'seats', 'station', 'ready', 'maintenance_start', 'maintenance_end'])
+
+
+class TailAssignmentSolver:
+    """Greedy chain building of legs onto aircraft in departure order
+
+    Each leg goes to an aircraft standing at its origin, turned and ready by
+    departure, with enough seats for the passengers already booked and not
+    due for maintenance during the leg. Among those the aircraft that
+    flew the previous leg of its planned rotation is kept, then aircraft
+    whose own next planned leg is not put at risk, then the smallest adequate aircraft, then the one
+    that became ready last so idle time stays short. Aircraft whose
+    location is unknown may start their chain anywhere, but located ones are
+    preferred. Legs that are no longer plannable are fixed to their aircraft.
+
+    ``resolve`` re-plans only from the earliest changed departure; earlier
+    legs keep their aircraft and later ones follow their planned rotation,
+    so a delay moves a rotation between aircraft rather than unravelling it.
+    """
+
+    def __init__(self, tails, turn=None):
+        self.turn = turn if turn is not None else turn_time().total_seconds()
+        self.tails = {t.aircraft_id: t for t in tails}
+        self.legs = {}
+        self.assignments = {}
+        self.unassigned = []
+
+    def _reset(self):
+        self.station = {}
+        self.ready = {}
+        self.at_station = defaultdict(set)
+        for tail in self.tails.values():
+            self.station[tail.aircraft_id] = tail.station
+            self.ready[tail.aircraft_id] = tail.ready
+            self.at_station[tail.station].add(tail.aircraft_id)
+
+    def _place(self, leg, aircraft_id):
+        self.at_station[self.station[aircraft_id]].discard(aircraft_id)
+        self.at_station[leg.destination].add(aircraft_id)
+        self.station[aircraft_id] = leg.destination
+        self.ready[aircraft_id] = leg.arrival + self.turn
+        self.assignments[leg.flight_id] = aircraft_id
+        # Whoever flies a leg is the natural choice for the rest of its planned rotation
+        following = self.successor.get(leg.flight_id)
+        self.next_leg[aircraft_id] = following
+        if following is not None:
+            self.preferred[following] = aircraft_id
+
+    def _fits(self, leg, tail):
+        if tail.seats < leg.booked or self.ready[tail.aircraft_id] > leg.departure:
+            return False
+        return leg.arrival + self.turn <= tail.maintenance_start or leg.departure >= tail.maintenance_end
+
+    def _disrupts(self, leg, aircraft_id):
+        """Whether flying ``leg`` stops an aircraft from flying the next leg planned for it"""
+        following = self.next_leg.get(aircraft_id)
+        if following is None or following in self.done:
+            return False
+        upcoming = self.legs[following]
+        return leg.destination != upcoming.origin or leg.arrival + self.turn > upcoming.departure
+
+    def _best_tail(self, leg, preferred):
+        best, best_key = None, None
+        for floating, candidates in ((False, self.at_station[leg.origin]), (True, self.at_station[None])):
+            for aircraft_id in candidates:
+                tail = self.tails[aircraft_id]
+                if not self._fits(leg, tail):
+                    continue
+                kept = aircraft_id == preferred
+                key = (not kept, not kept and self._disrupts(leg, aircraft_id), floating, tail.seats,
+                       -self.ready[aircraft_id], aircraft_id)
+                if best_key is None or key < best_key:
+                    best, best_key = aircraft_id, key
+        return best
+
+    def _run(self, cutoff=None):
+        ordered = sorted(self.legs.values(), key=lambda l: (l.departure, l.flight_id))
+        self.preferred = {leg.flight_id: self.assignments.get(leg.flight_id, leg.current_tail) for leg in ordered}
+        # Planned rotations as leg-to-leg links, and the first planned leg of each aircraft
+        self.successor = {}
+        self.next_leg = {}
+        for leg in reversed(ordered):
+            aircraft_id = self.preferred[leg.flight_id]
+            if aircraft_id is not None:
+                if aircraft_id in self.next_leg:
+                    self.successor[leg.flight_id] = self.next_leg[aircraft_id]
+                self.next_leg[aircraft_id] = leg.flight_id
+        self.done = set()
+        self._reset()
+        self.assignments = {}
+        self.unassigned = []
+        for leg in ordered:
+            preferred = self.preferred[leg.flight_id]
+            if leg.fixed or cutoff is not None and leg.departure < cutoff:
+                aircraft_id = preferred if preferred in self.tails else None
+            else:
+                aircraft_id = self._best_tail(leg, preferred)
+            self.done.add(leg.flight_id)
+            if aircraft_id is None:
+                if not leg.fixed:
+                    self.unassigned.append(leg.flight_id)
+            else:
+                self._place(leg, aircraft_id)
+        return self.unassigned
+
+    def solve(self, legs):
+        """Assign every leg; returns the flight ids left without an aircraft"""
+        self.legs = {leg.flight_id: leg for leg in legs}
+        self.assignments = {}
+        return self._run()
+
+    def resolve(self, changed=(), removed=()):
+        """Re-plan after legs were added, moved or cancelled; returns the flight ids whose aircraft changed"""
+        before = dict(self.assignments)
+        times = []
+        for flight_id in removed:
+            leg = self.legs.pop(flight_id, None)
+            if leg is not None:
+                times.append(leg.departure)
+        for leg in changed:
+            old = self.legs.get(leg.flight_id)
+            if old is not None:
+                times.append(old.departure)
+            times.append(leg.departure)
+            self.legs[leg.flight_id] = leg
+        if not times:
+            return []
+        self._run(cutoff=min(times))
+        return [flight_id for flight_id in self.legs if self.assignments.get(flight_id) != before.get(flight_id)]
+
+    def chains(self):
+        """Rotation of each aircraft as flight ids in departure order"""
+        rotations = defaultdict(list)
+        for flight_id, aircraft_id in sorted(self.assignments.items(), key=lambda a: self.legs[a[0]].departure):
+            rotations[aircraft_id].append(flight_id)
+        return dict(rotations)
+
+
+def resolve_station(location, cities):
+    """Airport code of a free-text aircraft location, or None if it cannot be placed"""
+    code = normalize_code(location)
+    if not code:
+        return None
+    if code in cities.values() or get_airport(code):
+        return code
+    return cities.get(location.strip().lower())
+
+
+def flight_leg(flight, turn=timedelta(0)):
+    departure, arrival = flight_block(flight, turn)
+    return Leg(
+        flight_id=flight.id,
+        origin=normalize_code(flight.departure_airport),
+        destination=normalize_code(flight.arrival_airport),
+        departure=departure.timestamp(),
+        arrival=arrival.timestamp(),
+        booked=flight.booked_seats,
+        current_tail=flight.aircraft_id,
+        fixed=flight.status not in PLANNABLE_STATUSES,
+    )
+
+
+def aircraft_tail(aircraft, cities, ready):
+    maintenance_start, maintenance_end = maintenance_window(aircraft)
+    return Tail(
+        aircraft_id=aircraft.id,
+        seats=aircraft.total_seats,
+        station=resolve_station(aircraft.current_location, cities),
+        ready=ready.timestamp(),
+        maintenance_start=maintenance_start.timestamp(),
+        maintenance_end=maintenance_end.timestamp(),
+    )
+
+
+def assign_tails(start=None, days=TAIL_ASSIGNMENT_HORIZON_DAYS):
+    """Solve the tail plan for flights departing over the horizon and save the changes
+
+    Aircraft are taken to be at their ``current_location`` at ``start``.
+    Flights the solver cannot cover lose their aircraft, which may now fly
+    an overlapping leg. A flight moved to another aircraft takes on its type
+    and seat count, keeping the seats already booked.
+    """
+    start = start or timezone.now()
+    end = start + timedelta(days=days)
+    flights = {f.id: f for f in annotate_booked_seats(
+        Flight.objects.filter(departure_time__gte=start, departure_time__lt=end).exclude(status='cancelled')
+    )}
+    cities = {}
+    for flight in flights.values():
+        cities.setdefault(flight.departure_city.strip().lower(), normalize_code(flight.departure_airport))
+        cities.setdefault(flight.arrival_city.strip().lower(), normalize_code(flight.arrival_airport))
+    fleet = {a.id: a for a in Aircraft.objects.exclude(status__in=UNAVAILABLE_STATUSES)}
+
+    solver = TailAssignmentSolver([aircraft_tail(a, cities, start) for a in fleet.values()])
+    unassigned = solver.solve([flight_leg(f) for f in flights.values()])
+
+    changed = []
+    now = timezone.now()
+    for flight_id, aircraft_id in solver.assignments.items():
+        flight = flights[flight_id]
+        if flight.aircraft_id != aircraft_id:
+            aircraft = fleet[aircraft_id]
+            flight.aircraft_id = aircraft_id
+            flight.aircraft_type = aircraft.aircraft_type
+            flight.available_seats = max(0, flight.available_seats + aircraft.total_seats - flight.total_seats)
+            flight.total_seats = aircraft.total_seats
+            flight.updated_at = now  # bulk_update skips auto_now
+            changed.append(flight)
+    for flight_id in unassigned:
+        flight = flights[flight_id]
+        if flight.aircraft_id is not None:
+            flight.aircraft_id = None
+            flight.updated_at = now
+            changed.append(flight)
+
+    with transaction.atomic():
+        Flight.objects.bulk_update(changed, ['aircraft', 'aircraft_type', 'total_seats', 'available_seats',
+                                             'updated_at'], batch_size=500)
+
+    return {
+        'assigned': len(solver.assignments),
+        'changed': len(changed),
+        'unassigned': [flights[flight_id] for flight_id in unassigned],
+        'chains': {fleet[aircraft_id]: [flights[flight_id] for flight_id in legs]
+                   for aircraft_id, legs in solver.chains().items()},
+    }
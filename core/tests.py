@@ -1,3 +1,2052 @@
-from django.test import TestCase
+import asyncio
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+import io
+from itertools import combinations
+import marshal
+import random
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Q
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver, reverse
+from django.utils import timezone
+
+from .aircraft_timeline import AircraftUtilizationIndex
+from .alert_ingestion import clear_alerts, raise_alert
+from .airports import get_airport, airport_timezone
+from .analytics import flight_performance_report
+from .briefings import briefing_packet, invalidate_all_packets
+from .flight_tracking import PositionBroadcaster, compute_progress, flight_positions
+from .live_events import EventHub, LocalBroker
+from .gate_assignment import (GateAssignmentSolver, GateSlot, Movement, NARROW_BODY, WIDE_BODY,
+                              assign_gates_for_day)
+from .gate_timeline import (GateOccupancyIndex, IntervalTree, Occupancy, day_bounds,
+                            update_gate_utilization)
+from .geo import route_distances_km, route_distance_km, great_circle_positions
+from .query_budget import REPEAT_THRESHOLD, QueryBudgetMiddleware, query_budget
+from .request_profiler import RequestProfilerMiddleware
+from .qualification_scan import QUALIFICATION_ALERT_SYSTEM, scan_qualifications
+from .forms import CrewAssignmentForm, FlightForm
+from .crew_rostering import (CrewLeg, CrewMember, CrewRosterSolver, Pairing, build_pairings, crew_complement,
+                             roster_crew)
+from .crew_swaps import accept_swap, find_matches, open_giveaways, post_swap
+from .crew_messaging import broadcast, inbox, inbox_stream, mark_read, send_message, unread_count
+from .delay_propagation import propagate_delays
+from .duty_limits import FLIGHT_TIME_LIMITS, CrewLedger, find_violations, validate_assignments
+from .synthetic_data import SyntheticDataset
+from .schedule_import import import_schedule, read_ssim_rows
+from .rosters import monthly_rosters
+from .schedule_patterns import expand_patterns
+from .tail_assignment import Leg, Tail, TailAssignmentSolver, assign_tails
+from .models import (Flight, Passenger, Booking, CheckIn, Gate, Aircraft, Staff, CrewAssignment, CrewBid,
+                     SystemAlert, SchedulePattern, SwapRequest, BriefingPacket, CrewMessage, InboxCounter,
+                     MessageRecipient, AuditLog, RequestProfile)
+from .turnaround import (TurnaroundPlan, critical_path_analysis, plan_turnarounds,
+                         standard_turnaround)
+
+
+def make_flight(number, departure_time, total_seats=2, **kwargs):
+    """Create a flight with sensible defaults for tests"""
+    defaults = {
+        'flight_number': number,
+        'airline': 'Test Air',
+        'departure_city': 'Delhi',
+        'arrival_city': 'Mumbai',
+        'departure_airport': 'DEL',
+        'arrival_airport': 'BOM',
+        'departure_time': departure_time,
+        'arrival_time': departure_time + timedelta(hours=2),
+        'aircraft_type': 'Airbus A320',
+        'total_seats': total_seats,
+        'available_seats': total_seats,
+        'price': Decimal('5000.00'),
+    }
+    defaults.update(kwargs)
+    return Flight.objects.create(**defaults)
+
+
+def make_passenger(index):
+    """Create a passenger with unique email and passport"""
+    return Passenger.objects.create(
+        first_name=f'Pax{index}',
+        last_name='Test',
+        email=f'pax{index}@example.com',
+        phone_number='+919999999999',
+        date_of_birth=date(1990, 1, 1),
+        gender='O',
+        passport_number=f'P{index:07d}',
+        nationality='Indian',
+        address='Test address',
+    )
+
+
+def make_booking(passenger, flight, seat, status='confirmed', **kwargs):
+    """Create a booking for a passenger on a flight"""
+    return Booking.objects.create(
+        passenger=passenger,
+        flight=flight,
+        seat_number=seat,
+        status=status,
+        total_amount=kwargs.pop('total_amount', Decimal('5000.00')),
+        **kwargs
+    )
+
+
+def make_aircraft(registration, aircraft_type='Airbus A320', total_seats=180, **kwargs):
+    """Create an active aircraft"""
+    defaults = {
+        'registration': registration,
+        'aircraft_type': aircraft_type,
+        'manufacturer': 'Airbus',
+        'model': aircraft_type.split()[-1],
+        'total_seats': total_seats,
+        'business_seats': 12,
+        'economy_seats': total_seats - 12,
+        'year_manufactured': 2015,
+        'last_maintenance': date.today() - timedelta(days=30),
+        'next_maintenance': date.today() + timedelta(days=90),
+    }
+    defaults.update(kwargs)
+    return Aircraft.objects.create(**defaults)
+
+
+def make_staff(username, role='pilot', **kwargs):
+    """Create a staff member with a linked user"""
+    user = User.objects.create_user(username, password='pw', first_name=username.title(), last_name='Crew')
+    defaults = {
+        'user': user,
+        'employee_id': f'EMP-{username}',
+        'role': role,
+        'department': 'Flight Operations',
+        'hire_date': date(2015, 1, 1),
+        'salary': Decimal('100000.00'),
+        'phone_number': '+919999999999',
+        'address': 'Crew base',
+    }
+    defaults.update(kwargs)
+    return Staff.objects.create(**defaults)
+
+
+class PassengerAssistanceTests(TestCase):
+    """Exception view must stay set-based regardless of flight volume"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('ops', password='pw', is_staff=True)
+        self.client.force_login(self.user)
+        self.today_noon = timezone.make_aware(datetime.combine(date.today(), time(12, 0)))
+        self.passenger_count = 0
+
+    def add_flights(self, count, prefix):
+        """Add overbooked flights today and unchecked-in flights in the next hours"""
+        for i in range(count):
+            flight = make_flight(f'{prefix}O{i}', self.today_noon, total_seats=1)
+            for seat in ('1A', '1B'):
+                self.passenger_count += 1
+                make_booking(make_passenger(self.passenger_count), flight, seat, status='checked_in')
+            upcoming = make_flight(f'{prefix}U{i}', timezone.now() + timedelta(hours=2))
+            self.passenger_count += 1
+            make_booking(make_passenger(self.passenger_count), upcoming, '2A')
+            self.passenger_count += 1
+            checked = make_booking(make_passenger(self.passenger_count), upcoming, '2B')
+            CheckIn.objects.create(booking=checked, gate_number='A1', seat_number='2B',
+                                   special_assistance='Wheelchair')
+
+    def render_page(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('airline:passenger_assistance'))
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx.captured_queries)
+
+    def test_query_count_is_independent_of_flight_volume(self):
+        self.add_flights(2, 'S')
+        response, small = self.render_page()
+        self.assertEqual(len(response.context['overbooked_flights']), 2)
+        self.assertEqual(len(response.context['failed_checkins']), 2)
+        self.assertEqual(len(response.context['special_assistance']), 2)
+
+        self.add_flights(25, 'L')
+        response, large = self.render_page()
+        self.assertEqual(len(response.context['overbooked_flights']), 27)
+        self.assertEqual(len(response.context['failed_checkins']), 27)
+        self.assertEqual(small, large)
+
+    def test_overbooked_by_is_annotated(self):
+        flight = make_flight('OB1', self.today_noon, total_seats=1)
+        for i, seat in enumerate(('1A', '1B', '1C')):
+            make_booking(make_passenger(100 + i), flight, seat, status='checked_in')
+        make_booking(make_passenger(200), flight, '1D', status='cancelled')
+        response, _ = self.render_page()
+        overbooked = list(response.context['overbooked_flights'])
+        self.assertEqual([f.flight_number for f in overbooked], ['OB1'])
+        self.assertEqual(overbooked[0].overbooked_by, 2)
+
+
+class AnalyticsReportTests(TestCase):
+    """Load factor, revenue and routes come from grouped SQL"""
+
+    def setUp(self):
+        cache.clear()
+        departure = timezone.now() - timedelta(days=1)
+        self.full = make_flight('AN1', departure, total_seats=2)
+        self.half = make_flight('AN2', departure + timedelta(hours=3), total_seats=4,
+                                arrival_city='Chennai', arrival_airport='MAA')
+        make_booking(make_passenger(1), self.full, '1A', payment_status=True, total_amount=Decimal('100.00'))
+        make_booking(make_passenger(2), self.full, '1B', status='checked_in', payment_status=True,
+                     total_amount=Decimal('300.00'))
+        make_booking(make_passenger(3), self.half, '1A')
+        make_booking(make_passenger(4), self.half, '1B')
+        make_booking(make_passenger(5), self.half, '1C', status='cancelled')
+
+    def test_report_aggregates(self):
+        today = date.today()
+        report = flight_performance_report(today - timedelta(days=7), today, use_cache=False)
+        self.assertEqual(report['total_flights'], 2)
+        self.assertAlmostEqual(report['average_load_factor'], 75.0)
+        self.assertEqual(report['total_revenue'], Decimal('400.00'))
+        routes = {r['arrival_city']: r for r in report['route_performance']}
+        self.assertEqual(routes['Mumbai']['total_bookings'], 2)
+        self.assertEqual(routes['Mumbai']['revenue'], Decimal('400.00'))
+        self.assertAlmostEqual(routes['Chennai']['load_factor'], 50.0)
+
+    def test_report_query_count_is_constant_and_cached(self):
+        today = date.today()
+        start = today - timedelta(days=90)
+        for i in range(20):
+            make_flight(f'AX{i}', timezone.now() - timedelta(days=2, hours=i))
+        with self.assertNumQueries(3):
+            flight_performance_report(start, today)
+        with self.assertNumQueries(0):
+            flight_performance_report(start, today)
+
+    def test_view_renders_report(self):
+        self.client.force_login(User.objects.create_user('analyst', is_staff=True))
+        response = self.client.get(reverse('airline:analytics_reporting'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Delhi → Chennai')
+
+
+class FlightTrackingTests(TestCase):
+    """Positions are computed once per tick and shared by every subscriber"""
+
+    def test_compute_progress_is_vectorized(self):
+        progress, remaining = compute_progress(
+            [0, 0, 100], [0, 600, 100], [3600, 3600, 100], 1800
+        )
+        self.assertEqual(list(progress), [0.5, 1200 / 3600, 0.0])
+        self.assertEqual(list(remaining), [30.0, 40.0, 0.0])
+
+    async def test_broadcaster_shares_one_computation(self):
+        now = timezone.now()
+        await Flight.objects.acreate(
+            flight_number='LV1', airline='Test Air', departure_city='Delhi', arrival_city='Mumbai',
+            departure_time=now - timedelta(hours=1), arrival_time=now + timedelta(hours=1),
+            actual_departure=now - timedelta(hours=1), aircraft_type='A320', total_seats=10,
+            available_seats=10, price=Decimal('1.00'), status='departed',
+        )
+        hub = PositionBroadcaster(interval=3600)
+        queues = [hub.subscribe() for _ in range(3)]
+        # Drive ticks by hand instead of the background loop
+        hub._task.cancel()
+        with mock.patch('core.flight_tracking.flight_positions', wraps=flight_positions) as compute:
+            delta = await hub.tick(now)
+            self.assertEqual(compute.call_count, 1)
+        self.assertEqual([p['flight_number'] for p in delta['updated']], ['LV1'])
+        self.assertEqual(delta['updated'][0]['progress'], 50.0)
+        for queue in queues:
+            self.assertEqual(queue.get_nowait(), ('positions', delta))
+
+        # An unchanged tick publishes an empty delta
+        self.assertEqual((await hub.tick(now))['updated'], [])
+
+    async def test_broadcaster_survives_a_failed_tick(self):
+        calls = []
+
+        def flaky(flights, now):
+            calls.append(now)
+            if len(calls) == 1:
+                raise RuntimeError('database went away')
+            return []
+
+        hub = PositionBroadcaster(interval=0.01)
+        with mock.patch('core.flight_tracking.flight_positions', flaky), \
+                self.assertLogs('core.flight_tracking', 'ERROR'):
+            queue = hub.subscribe()
+            frame = await asyncio.wait_for(queue.get(), timeout=1)
+            self.assertEqual(frame, ('positions', {'updated': [], 'removed': []}))
+            self.assertFalse(hub._task.done())
+            hub.unsubscribe(queue)
+            await asyncio.wait_for(hub._task, timeout=1)
+
+
+class GeoTests(TestCase):
+    """Great-circle helpers work on whole arrays of routes"""
+
+    def test_route_distances_are_vectorized_and_cached(self):
+        distances = route_distances_km(['DEL', 'BOM', 'xxx'], ['BOM', 'del', 'DEL'])
+        self.assertAlmostEqual(distances[0], 1138, delta=10)
+        self.assertAlmostEqual(distances[0], distances[1])
+        self.assertTrue(np.isnan(distances[2]))
+        self.assertIsNone(route_distance_km('XXX', 'DEL'))
+        self.assertAlmostEqual(route_distance_km('LHR', 'JFK'), 5540, delta=15)
+
+    def test_great_circle_positions(self):
+        lat, lon = great_circle_positions(['DEL', 'DEL', 'LHR'], ['BOM', 'BOM', 'JFK'], [0.0, 1.0, 0.5])
+        self.assertAlmostEqual(lat[0], 28.5665, places=3)
+        self.assertAlmostEqual(lon[1], 72.8656, places=3)
+        # The LHR-JFK great circle bows north of both endpoints
+        self.assertGreater(lat[2], 51.47)
+
+    def test_airport_lookup_and_timezone(self):
+        self.assertEqual(get_airport(' del ').city, 'Delhi')
+        self.assertEqual(str(airport_timezone('BOM')), 'Asia/Kolkata')
+        self.assertIsNone(get_airport('UNK'))
+
+
+class GateAssignmentTests(TestCase):
+    """Gate solver respects size classes, avoids overlaps and keeps gates stable"""
+
+    def test_solver_respects_gate_class_and_overlaps(self):
+        gates = [GateSlot(1, NARROW_BODY, 200), GateSlot(2, WIDE_BODY, 300)]
+        movements = [
+            Movement(10, 0, 3600, WIDE_BODY, None, 0),
+            Movement(11, 0, 3600, NARROW_BODY, None, 0),
+            Movement(12, 1800, 5400, NARROW_BODY, None, 0),
+            Movement(13, 1800, 5400, WIDE_BODY, None, 0),
+        ]
+        solver = GateAssignmentSolver(gates)
+        unassigned = solver.solve(movements)
+        self.assertEqual(solver.assignments[10], 2)
+        self.assertEqual(solver.assignments[11], 1)
+        self.assertEqual(sorted(unassigned), [12, 13])
+
+    def test_existing_assignments_are_kept_and_delays_move_one_flight(self):
+        gates = [GateSlot(1, NARROW_BODY, 200), GateSlot(2, NARROW_BODY, 200)]
+        movements = [
+            Movement(1, 0, 3600, NARROW_BODY, 2, 0),
+            Movement(2, 3600, 7200, NARROW_BODY, 2, 0),
+        ]
+        solver = GateAssignmentSolver(gates)
+        self.assertEqual(solver.solve(movements), [])
+        self.assertEqual(solver.assignments, {1: 2, 2: 2})
+
+        # A small slip that still fits keeps the gate; a big one moves only that flight
+        self.assertEqual(solver.reschedule(2, 3700, 7300), 2)
+        self.assertEqual(solver.reschedule(1, 1800, 5400), 1)
+        self.assertEqual(solver.assignments[2], 2)
+
+    def test_assign_gates_for_day_saves_changes(self):
+        standard = Gate.objects.create(gate_number='A1', terminal='1')
+        wide = Gate.objects.create(gate_number='B1', terminal='1', gate_type='Wide-body')
+        Gate.objects.create(gate_number='C1', terminal='1', status='maintenance')
+        noon = timezone.make_aware(datetime.combine(date.today(), time(12, 0)))
+        narrow = make_flight('GA1', noon, aircraft_type='Airbus A320')
+        heavy = make_flight('GA2', noon, aircraft_type='Boeing 777')
+        result = assign_gates_for_day(date.today(), home_airport='')
+        self.assertEqual((result['assigned'], result['changed'], result['unassigned']), (2, 2, []))
+        narrow.refresh_from_db()
+        heavy.refresh_from_db()
+        self.assertEqual((narrow.gate, narrow.gate_number), (standard, 'A1'))
+        self.assertEqual(heavy.gate, wide)
+        self.assertEqual(assign_gates_for_day(date.today(), home_airport='')['changed'], 0)
+
+    def test_unplaced_flight_loses_its_stale_gate(self):
+        wide = Gate.objects.create(gate_number='B1', terminal='1', gate_type='Wide-body')
+        noon = timezone.make_aware(datetime.combine(date.today(), time(12, 0)))
+        heavies = [make_flight(f'GA{i}', noon, aircraft_type='Boeing 777', gate=wide, gate_number='B1')
+                   for i in range(2)]
+        result = assign_gates_for_day(date.today(), home_airport='')
+        self.assertEqual(len(result['unassigned']), 1)
+        for flight in heavies:
+            flight.refresh_from_db()
+        self.assertEqual(sorted((f.gate_number, f.gate_id is None) for f in heavies), [('', True), ('B1', False)])
+
+    def test_delay_moves_only_the_clashing_flight(self):
+        first = Gate.objects.create(gate_number='A1', terminal='1')
+        spare = Gate.objects.create(gate_number='A2', terminal='1')
+        noon = timezone.make_aware(datetime.combine(date.today(), time(12, 0)))
+        late = make_flight('GA1', noon, gate=first, gate_number='A1')
+        next_out = make_flight('GA2', noon + timedelta(minutes=90), gate=first, gate_number='A1')
+        user = User.objects.create_user('ops', password='pw', is_staff=True)
+        start, end = day_bounds(date.today())
+
+        # Twenty minutes still clears the next departure; an hour does not
+        result = propagate_delays(start, end, user, delays={late.id: noon + timedelta(minutes=20)})
+        self.assertEqual(result['regated'], [])
+        result = propagate_delays(start, end, user, delays={late.id: noon + timedelta(hours=1)})
+        self.assertEqual([f.flight_number for f in result['regated']], ['GA1'])
+        late.refresh_from_db()
+        next_out.refresh_from_db()
+        self.assertEqual((late.gate, late.gate_number), (spare, 'A2'))
+        self.assertEqual(next_out.gate, first)
+
+
+class GateTimelineTests(TestCase):
+    """Interval-tree occupancy index answers availability and utilization"""
+
+    def setUp(self):
+        self.noon = timezone.make_aware(datetime.combine(date.today(), time(12, 0)))
+        self.wide = Gate.objects.create(gate_number='T2W', terminal='2', gate_type='Wide-body')
+        self.narrow = Gate.objects.create(gate_number='T2N', terminal='2')
+        make_flight('TL1', self.noon, gate=self.wide, gate_number='T2W')
+
+    def test_interval_tree_matches_brute_force(self):
+        rng = random.Random(3)
+        items = [Occupancy(s, s + rng.randint(1, 50), i, str(i))
+                 for i, s in enumerate(rng.randint(0, 1000) for _ in range(300))]
+        tree = IntervalTree(items)
+        for _ in range(100):
+            start = rng.randint(0, 1000)
+            end = start + rng.randint(1, 80)
+            expected = {o.flight_id for o in items if o.start < end and o.end > start}
+            self.assertEqual({o.flight_id for o in tree.overlapping(start, end)}, expected)
+
+        expected = {frozenset((a.flight_id, b.flight_id)) for a, b in combinations(items, 2)
+                    if a.start < b.end and b.start < a.end}
+        pairs = tree.overlapping_pairs()
+        self.assertEqual(len(pairs), len(expected))
+        self.assertEqual({frozenset((a.flight_id, b.flight_id)) for a, b in pairs}, expected)
+
+    def test_three_way_overlap_reports_every_pair(self):
+        tree = IntervalTree([Occupancy(0, 30, 1, 'A'), Occupancy(5, 20, 2, 'B'), Occupancy(10, 25, 3, 'C')])
+        self.assertEqual([(a.flight_number, b.flight_number) for a, b in tree.overlapping_pairs()],
+                         [('A', 'B'), ('A', 'C'), ('B', 'C')])
+
+    def test_free_gates_query(self):
+        index = GateOccupancyIndex.for_window(*day_bounds(date.today()))
+        busy = (self.noon - timedelta(minutes=20), self.noon + timedelta(minutes=5))
+        self.assertEqual(index.free_gates(*busy, terminal='2'), [self.narrow])
+        self.assertEqual(index.free_gates(*busy, gate_type='wide-body'), [])
+        later = (self.noon + timedelta(hours=2), self.noon + timedelta(hours=3))
+        self.assertEqual(index.free_gates(*later, terminal='2', gate_type='Wide-body'), [self.wide])
+
+    def test_flight_form_rejects_gate_conflict(self):
+        data = {
+            'flight_number': 'TL2', 'airline': 'Test Air', 'departure_city': 'Delhi',
+            'arrival_city': 'Goa', 'departure_airport': 'DEL', 'arrival_airport': 'GOI',
+            'departure_time': (self.noon + timedelta(minutes=30)).strftime('%Y-%m-%dT%H:%M'),
+            'arrival_time': (self.noon + timedelta(hours=3)).strftime('%Y-%m-%dT%H:%M'),
+            'aircraft_type': 'Boeing 777', 'total_seats': 300, 'available_seats': 300,
+            'economy_price': '100', 'business_price': '200', 'status': 'scheduled',
+            'gate': self.wide.id,
+        }
+        form = FlightForm(data)
+        self.assertFalse(form.is_valid())
+        self.assertIn('TL1', form.errors['gate'][0])
+        data['gate'] = self.narrow.id
+        self.assertTrue(FlightForm(data).is_valid())
+
+    def test_hourly_utilization_feeds_metrics(self):
+        index = GateOccupancyIndex.for_window(*day_bounds(date.today()))
+        hourly = index.hourly_utilization(date.today())
+        # TL1 holds one of two gates from 11:15 to 12:25 (buffers included)
+        self.assertEqual(hourly[11], 37.5)
+        self.assertAlmostEqual(hourly[12], round(25 / 120 * 100, 2))
+        self.assertEqual(hourly[13], 0.0)
+        metrics = update_gate_utilization(date.today())
+        self.assertEqual(metrics.gate_utilization, Decimal(str(round(sum(hourly) / 24, 2))))
+
+
+class TurnaroundTests(TestCase):
+    """Critical-path turnaround plans follow aircraft rotations"""
+
+    def setUp(self):
+        self.aircraft = make_aircraft('VT-TRN')
+        self.start = timezone.now().replace(microsecond=0) + timedelta(hours=1)
+        self.inbound = make_flight('TR1', self.start - timedelta(hours=2), aircraft=self.aircraft,
+                                   departure_airport='BOM', arrival_airport='DEL')
+        self.outbound = make_flight('TR2', self.start + timedelta(hours=2), aircraft=self.aircraft)
+
+    def test_standard_critical_path(self):
+        timings, length = standard_turnaround()
+        self.assertEqual(length, 95)
+        by_key = {t.key: t for t in timings}
+        self.assertEqual([t.key for t in timings if t.critical],
+                         ['deboarding', 'cleaning', 'safety_check', 'boarding'])
+        # Catering runs alongside cleaning and has its difference as slack
+        self.assertEqual(by_key['catering'].earliest_start, 20)
+        self.assertEqual(by_key['catering'].slack, 15)
+        self.assertEqual(by_key['loading'].slack, 95 - 45)
+
+    def test_dependency_cycle_is_rejected(self):
+        tasks = [{'key': 'a', 'task': 'A', 'duration': 1, 'depends_on': ['b']},
+                 {'key': 'b', 'task': 'B', 'duration': 1, 'depends_on': ['a']}]
+        with self.assertRaises(ValueError):
+            critical_path_analysis(tasks)
+
+    def test_rotations_pair_by_aircraft(self):
+        make_flight('TR3', self.start + timedelta(hours=2))  # no aircraft
+        plans = plan_turnarounds(self.start, self.start + timedelta(hours=4))
+        self.assertEqual(len(plans), 1)
+        plan = plans[0]
+        self.assertEqual((plan.inbound, plan.outbound), (self.inbound, self.outbound))
+        self.assertEqual(plan.earliest_off_block, self.start + timedelta(minutes=95))
+        self.assertEqual((plan.buffer_minutes, plan.projected_delay_minutes), (25, 0))
+
+    def test_late_arrival_replans_off_block(self):
+        plan = TurnaroundPlan(self.aircraft, self.inbound, self.outbound)
+        plan.replan(self.start + timedelta(minutes=40))
+        self.assertEqual(plan.projected_delay_minutes, 15)
+        self.assertEqual(plan.planned_off_block, self.start + timedelta(minutes=135))
+        self.assertEqual(plan.tasks[-1]['finish'], plan.earliest_off_block)
+
+    def test_dashboard_lists_turnarounds(self):
+        User.objects.create_user('ops', password='pw', is_staff=True)
+        self.client.login(username='ops', password='pw')
+        with mock.patch('django.utils.timezone.now', return_value=self.start):
+            response = self.client.get(reverse('airline:turnaround_coordination'))
+        self.assertContains(response, 'VT-TRN')
+        self.assertContains(response, '25 min buffer')
+
+
+class DelayPropagationTests(TestCase):
+    """Delays flow down aircraft rotations and crew connections in one pass"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('ops', password='pw', is_staff=True)
+        self.day_start = timezone.make_aware(datetime.combine(date.today(), time(0, 0)))
+        first, second = make_aircraft('VT-DPA'), make_aircraft('VT-DPB')
+        at = lambda h, m=0: self.day_start + timedelta(hours=h, minutes=m)
+        self.d1 = make_flight('DP1', at(10), aircraft=first)
+        self.d2 = make_flight('DP2', at(13, 40), aircraft=first, departure_airport='BOM', arrival_airport='DEL')
+        self.d3 = make_flight('DP3', at(12, 40), aircraft=second, departure_airport='BOM', arrival_airport='GOI')
+        self.d4 = make_flight('DP4', at(17, 30), aircraft=first)
+        self.quiet = make_flight('DP5', at(9), aircraft=second, departure_airport='GOI', arrival_airport='BOM')
+        captain = make_staff('captain')
+        CrewAssignment.objects.create(staff=captain, flight=self.d1, role_on_flight='Captain')
+        CrewAssignment.objects.create(staff=captain, flight=self.d3, role_on_flight='Captain')
+
+    def test_knock_on_delays_and_alerts(self):
+        start, end = day_bounds(date.today())
+        with CaptureQueriesContext(connection) as queries:
+            result = propagate_delays(start, end, self.user,
+                                      delays={self.d1.id: self.d1.departure_time + timedelta(hours=1)})
+        # Two reads, the estimate and alert writes, and the alert fingerprint lookups
+        self.assertLessEqual(len(queries), 10)
+
+        for flight in (self.d1, self.d2, self.d3, self.d4, self.quiet):
+            flight.refresh_from_db()
+        # DP1 lands 13:00; aircraft needs 95 minutes, crew 30
+        self.assertEqual(self.d2.estimated_departure, self.d1.estimated_arrival + timedelta(minutes=95))
+        self.assertEqual(self.d3.estimated_departure, self.d1.estimated_arrival + timedelta(minutes=30))
+        self.assertEqual(self.d4.estimated_departure, self.d2.estimated_arrival + timedelta(minutes=95))
+        self.assertEqual(self.d4.estimated_arrival - self.d4.estimated_departure, timedelta(hours=2))
+        self.assertEqual((self.d2.status, self.quiet.status), ('delayed', 'scheduled'))
+        self.assertIsNone(self.quiet.estimated_departure)
+
+        self.assertEqual(len(result['broken']), 3)
+        alerts = {a.title: a for a in SystemAlert.objects.all()}
+        self.assertEqual(set(alerts), {f'Broken connection: {n}' for n in ('DP2', 'DP3', 'DP4')})
+        self.assertEqual(alerts['Broken connection: DP3'].alert_type, 'error')
+        self.assertIn('Captain Crew', alerts['Broken connection: DP3'].message)
+
+        # Re-running with nothing new changes nothing
+        self.assertEqual(propagate_delays(start, end, self.user)['changed'], [])
+
+    def test_knock_on_delays_clear_with_their_cause(self):
+        start, end = day_bounds(date.today())
+        propagate_delays(start, end, self.user, delays={self.d1.id: self.d1.departure_time + timedelta(hours=1)})
+        self.assertEqual(Flight.objects.filter(status='delayed').count(), 4)
+
+        result = propagate_delays(start, end, self.user, delays={self.d1.id: self.d1.departure_time})
+        self.assertEqual(sorted(f.flight_number for f in result['changed']), ['DP1', 'DP2', 'DP3', 'DP4'])
+        self.assertEqual(result['broken'], [])
+        for flight in (self.d1, self.d2, self.d3, self.d4):
+            flight.refresh_from_db()
+            self.assertEqual((flight.status, flight.estimated_departure, flight.knock_on_delay),
+                             ('scheduled', None, False))
+        self.assertFalse(SystemAlert.objects.filter(is_resolved=False).exists())
+
+    def test_small_delay_absorbed_by_buffer(self):
+        start, end = day_bounds(date.today())
+        result = propagate_delays(start, end, self.user,
+                                  delays={self.d1.id: self.d1.departure_time + timedelta(minutes=5)})
+        self.assertEqual([f.flight_number for f in result['delayed']], ['DP1'])
+        self.assertEqual(result['broken'], [])
+
+        # Back on schedule: the estimate clears and the flight is scheduled again
+        result = propagate_delays(start, end, self.user, delays={self.d1.id: self.d1.departure_time})
+        self.assertEqual([f.flight_number for f in result['changed']], ['DP1'])
+        self.d1.refresh_from_db()
+        self.assertEqual((self.d1.status, self.d1.estimated_departure), ('scheduled', None))
+
+
+def ssim_leg(designator, number, day, origin, std, destination, sta, aircraft_type, config, offset='+0530',
+             last_day=None, days='1234567'):
+    """One fixed-width SSIM type 3 flight leg record"""
+    line = [' '] * 200
+    def put(col, text):
+        line[col:col + len(text)] = text
+    put(0, '3')
+    put(2, designator.ljust(3))
+    put(5, number.rjust(4))
+    put(9, '01')
+    put(11, '01')
+    put(13, 'J')
+    put(14, day + (last_day or day))
+    put(28, days)
+    put(36, origin + std + std + offset)
+    put(54, destination + sta + sta + offset)
+    put(72, aircraft_type)
+    put(172, config)
+    return ''.join(line)
+
+
+class ScheduleImportTests(TestCase):
+    """Bulk import validates rows in batches and reports errors per line"""
+
+    HEADER = 'flight_number,airline,departure_airport,arrival_airport,departure_time,arrival_time,aircraft,aircraft_type,total_seats,economy_price,business_price\n'
+
+    def setUp(self):
+        make_aircraft('VT-IMP')
+
+    def test_csv_import_reports_row_errors(self):
+        make_flight('IM9', datetime(2030, 1, 2, 8, 0, tzinfo=dt_timezone.utc))
+        rows = [
+            'IM1,Test Air,DEL,BOM,2030-01-01 08:00,2030-01-01 10:10,VT-IMP,,,4500,9000',
+            'IM2,Test Air,DEL,XXX,2030-01-01 09:00,2030-01-01 11:00,,Airbus A320,180,4500,9000',
+            'IM3,Test Air,BOM,DEL,2030-01-01 12:00,2030-01-01 11:00,,Airbus A320,180,4500,9000',
+            'IM4,Test Air,BOM,DEL,2030-01-01 12:00,2030-01-01 14:00,VT-NONE,,,4500,9000',
+            'IM1,Test Air,DEL,BOM,2030-01-01 18:00,2030-01-01 20:10,,Airbus A320,180,4500,9000',
+            'IM9,Test Air,DEL,BOM,2030-01-02 08:00,2030-01-02 10:10,,Airbus A320,180,4500,9000',
+            'IM5,Test Air,BOM,GOI,2030-01-01 12:00+05:30,2030-01-01 13:20+05:30,,ATR 72,70,,',
+        ]
+        result = import_schedule(io.StringIO(self.HEADER + '\n'.join(rows)), batch_size=3)
+        self.assertEqual((result.rows, result.created, result.updated), (7, 2, 0))
+        self.assertEqual([(e.line, e.flight_number) for e in result.errors],
+                         [(3, 'IM2'), (4, 'IM3'), (5, 'IM4'), (6, 'IM1'), (7, 'IM9')])
+        self.assertIn('Unknown arrival airport', result.errors[0].message)
+
+        imported = Flight.objects.get(flight_number='IM1')
+        self.assertEqual((imported.aircraft.registration, imported.total_seats), ('VT-IMP', 180))
+        self.assertEqual((imported.departure_city, imported.arrival_city), ('Delhi', 'Mumbai'))
+        late = Flight.objects.get(flight_number='IM5')
+        self.assertEqual(late.departure_time, datetime(2030, 1, 1, 6, 30, tzinfo=dt_timezone.utc))
+
+        report = io.StringIO()
+        result.write_error_report(report)
+        self.assertEqual(report.getvalue().splitlines()[0], 'line,flight_number,error')
+
+    def test_update_existing_upserts(self):
+        make_flight('IM9', datetime(2030, 1, 2, 8, 0, tzinfo=dt_timezone.utc))
+        row = 'IM9,Test Air,DEL,GOI,2030-01-02 08:00,2030-01-02 10:30,,Airbus A321,200,4500,9000'
+        with CaptureQueriesContext(connection) as queries:
+            result = import_schedule(io.StringIO(self.HEADER + row), update_existing=True)
+        self.assertLessEqual(len(queries), 6)
+        self.assertEqual((result.created, result.updated, result.errors), (0, 1, []))
+        flight = Flight.objects.get(flight_number='IM9')
+        self.assertEqual((flight.arrival_airport, flight.total_seats), ('GOI', 200))
+
+    def test_update_existing_recounts_available_seats(self):
+        flight = make_flight('IM9', datetime(2030, 1, 2, 8, 0, tzinfo=dt_timezone.utc), total_seats=10)
+        make_booking(make_passenger(1), flight, '1A')
+        make_booking(make_passenger(2), flight, '1B')
+        make_booking(make_passenger(3), flight, '1C', status='cancelled')
+        row = 'IM9,Test Air,DEL,BOM,2030-01-02 08:00,2030-01-02 10:10,,Airbus A320,180,4500,9000'
+        import_schedule(io.StringIO(self.HEADER + row), update_existing=True)
+        flight.refresh_from_db()
+        self.assertEqual((flight.total_seats, flight.available_seats), (180, 178))
+
+    def test_ssim_legs(self):
+        lines = [
+            '1AIRLINE STANDARD SCHEDULE DATA SET',
+            ssim_leg('AI', '101', '01JAN30', 'DEL', '0800', 'BOM', '1010', '320', 'C12Y168'),
+            ssim_leg('AI', '2957', '01JAN30', 'BOM', '2330', 'DEL', '0140', '321', 'Y200'),
+            # Mondays, Wednesdays and Fridays through January: 4 + 5 + 4 flights
+            ssim_leg('AI', '102', '01JAN30', 'BOM', '1100', 'DEL', '1310', '320', 'Y180',
+                     last_day='31JAN30', days='1 3 5  '),
+            ssim_leg('AI', '103', '01JAN30', 'BOM', '2500', 'DEL', '1310', '320', 'Y180'),
+        ]
+        rows = list(read_ssim_rows(lines))
+        self.assertEqual(rows[0].fields['flight_number'], 'AI101')
+        self.assertEqual(rows[0].fields['total_seats'], 180)
+        self.assertEqual(rows[1].fields['arrival_time'] - rows[1].fields['departure_time'], timedelta(hours=2, minutes=10))
+        weekly = [row.fields['departure_time'] for row in rows if row.fields['flight_number'] == 'AI102']
+        self.assertEqual(len(weekly), 13)
+        self.assertEqual({d.isoweekday() for d in weekly}, {1, 3, 5})
+        self.assertEqual(rows[-1].error, 'Invalid date, time or UTC offset')
+
+        result = import_schedule(lines, fmt='ssim')
+        self.assertEqual((result.created, len(result.errors)), (15, 1))
+        self.assertEqual(Flight.objects.filter(flight_number='AI102').values('service_date').distinct().count(), 13)
+        self.assertEqual(Flight.objects.get(flight_number='AI101').departure_time,
+                         datetime(2030, 1, 1, 2, 30, tzinfo=dt_timezone.utc))
+
+    def test_upload_view(self):
+        User.objects.create_user('ops', password='pw', is_staff=True)
+        self.client.login(username='ops', password='pw')
+        upload = SimpleUploadedFile('summer.csv', (self.HEADER + 'IM1,Test Air,DEL,BOM,2030-01-01 08:00,'
+                                    '2030-01-01 10:10,VT-IMP,,,4500,9000\n').encode())
+        response = self.client.post(reverse('airline:schedule_import'), {'schedule_file': upload})
+        self.assertContains(response, '1 of 1 flights imported')
+        self.assertTrue(Flight.objects.filter(flight_number='IM1').exists())
+
+    def test_undecodable_file_is_reported(self):
+        # A cp1252 export: the airline name is not valid UTF-8
+        content = (self.HEADER + 'IM1,Aéro Test,DEL,BOM,2030-01-01 08:00,2030-01-01 10:10,VT-IMP,,,4500,9000\n'
+                   ).encode('cp1252')
+        User.objects.create_user('ops', password='pw', is_staff=True)
+        self.client.login(username='ops', password='pw')
+        response = self.client.post(reverse('airline:schedule_import'),
+                                    {'schedule_file': SimpleUploadedFile('winter.csv', content)})
+        self.assertContains(response, 'winter.csv is not UTF-8 text')
+
+        with tempfile.NamedTemporaryFile(suffix='.csv') as f:
+            f.write(content)
+            f.flush()
+            with self.assertRaisesMessage(CommandError, 'is not UTF-8 text'):
+                call_command('import_schedule', f.name, stdout=io.StringIO())
+        self.assertFalse(Flight.objects.filter(flight_number='IM1').exists())
+
+
+class SchedulePatternTests(TestCase):
+    """Recurring patterns expand into dated flights keyed by number and service date"""
+
+    def setUp(self):
+        self.pattern = SchedulePattern.objects.create(
+            flight_number='SP100', airline='Test Air', departure_airport='DEL', arrival_airport='BOM',
+            departure_local_time=time(23, 30), duration_minutes=130, days_of_week='135',
+            valid_from=date(2030, 1, 1), valid_until=date(2030, 1, 31), aircraft_type='Airbus A320',
+            total_seats=180, economy_price=Decimal('4500'), business_price=Decimal('9000'),
+        )
+        self.start = date(2030, 1, 1)
+
+    def test_expansion_creates_dated_occurrences(self):
+        with CaptureQueriesContext(connection) as queries:
+            result = expand_patterns(start=self.start, horizon_days=13)
+        self.assertLessEqual(len(queries), 5)
+        flights = list(Flight.objects.filter(flight_number='SP100').order_by('service_date'))
+        # Wed 2, Fri 4, Mon 7, Wed 9, Fri 11, Mon 14 January
+        self.assertEqual([f.service_date.day for f in flights], [2, 4, 7, 9, 11, 14])
+        self.assertEqual(len(result['created']), 6)
+        first = flights[0]
+        # 23:30 in Delhi is 18:00 UTC the same day
+        self.assertEqual(first.departure_time, datetime(2030, 1, 2, 18, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual((first.departure_city, first.arrival_city), ('Delhi', 'Mumbai'))
+        self.assertEqual(first.schedule_pattern, self.pattern)
+
+        again = expand_patterns(start=self.start, horizon_days=13)
+        self.assertEqual((again['created'], again['updated'], again['cancelled']), ([], [], []))
+
+    def test_pattern_change_updates_and_cancels(self):
+        expand_patterns(start=self.start, horizon_days=13)
+        booked = Flight.objects.get(flight_number='SP100', service_date=date(2030, 1, 9))
+        booked.available_seats = 170
+        booked.save()
+
+        self.pattern.days_of_week = '13'
+        self.pattern.departure_local_time = time(22, 0)
+        self.pattern.total_seats = 186
+        self.pattern.save()
+        result = expand_patterns([self.pattern], start=self.start, horizon_days=13)
+        self.assertEqual(len(result['updated']), 4)
+        self.assertEqual(sorted(f.service_date.day for f in result['cancelled']), [4, 11])
+        booked.refresh_from_db()
+        self.assertEqual((booked.departure_time.hour, booked.total_seats, booked.available_seats), (16, 186, 176))
+        self.assertEqual(Flight.objects.get(flight_number='SP100', service_date=date(2030, 1, 4)).status, 'cancelled')
+
+    def test_shorter_horizon_leaves_later_occurrences(self):
+        expand_patterns(start=self.start, horizon_days=30)
+        result = expand_patterns(start=self.start, horizon_days=7)
+        self.assertEqual(result['cancelled'], [])
+        self.assertFalse(Flight.objects.filter(flight_number='SP100', status='cancelled').exists())
+
+    def test_operated_again_reinstates_cancelled_occurrence(self):
+        expand_patterns(start=self.start, horizon_days=13)
+        self.pattern.days_of_week = '13'
+        self.pattern.save()
+        expand_patterns([self.pattern], start=self.start, horizon_days=13)
+
+        self.pattern.days_of_week = '135'
+        self.pattern.save()
+        result = expand_patterns([self.pattern], start=self.start, horizon_days=13)
+        self.assertEqual(sorted(f.service_date.day for f in result['updated']), [4, 11])
+        self.assertFalse(Flight.objects.filter(flight_number='SP100', status='cancelled').exists())
+
+    def test_rescheduling_moves_service_date(self):
+        flight = make_flight('SP300', datetime(2030, 1, 2, 8, 0, tzinfo=dt_timezone.utc))
+        flight.departure_time += timedelta(days=1)
+        flight.save(update_fields=['departure_time'])
+        flight.refresh_from_db()
+        self.assertEqual(flight.service_date, date(2030, 1, 3))
+
+    def test_admin_form_rejects_duplicate_service_date(self):
+        departure = datetime(2030, 1, 2, 8, 0, tzinfo=dt_timezone.utc)
+        make_flight('SP400', departure)
+        request = RequestFactory().get('/')
+        request.user = User.objects.create_superuser('flightadmin', 'fa@example.com', 'pw')
+        form_class = admin.site._registry[Flight].get_form(request)
+
+        def data(day):
+            return {
+                'flight_number': 'SP400', 'airline': 'Test Air', 'aircraft_type': 'Airbus A320',
+                'departure_city': 'Mumbai', 'arrival_city': 'Delhi',
+                'departure_time_0': f'2030-01-0{day}', 'departure_time_1': '16:30',
+                'arrival_time_0': f'2030-01-0{day}', 'arrival_time_1': '18:30',
+                'total_seats': 180, 'available_seats': 180, 'price': '100', 'status': 'scheduled',
+            }
+
+        form = form_class(data(2))
+        self.assertFalse(form.is_valid())
+        self.assertIn('already operates', form.errors['flight_number'][0])
+        self.assertTrue(form_class(data(3)).is_valid())
+
+    def test_number_unique_per_service_date(self):
+        departure = datetime(2030, 1, 2, 8, 0, tzinfo=dt_timezone.utc)
+        make_flight('SP200', departure)
+        make_flight('SP200', departure + timedelta(days=1))
+        with self.assertRaises(IntegrityError):
+            make_flight('SP200', departure + timedelta(hours=3))
+
+    def test_status_page_picks_the_requested_service_date(self):
+        departure = datetime(2030, 1, 2, 8, 0, tzinfo=dt_timezone.utc)
+        first = make_flight('SP200', departure)
+        second = make_flight('SP200', departure + timedelta(days=1))
+        url = reverse('customer:flight_status')
+        response = self.client.get(url, {'flight_number': 'SP200', 'date': '2030-01-03'})
+        self.assertEqual(response.context['flight'], second)
+        # An impossible date is ignored rather than failing the page
+        response = self.client.get(url, {'flight_number': 'SP200', 'date': '2030-02-30'})
+        self.assertEqual(response.context['flight'], first)
+
+    def test_expansion_adopts_hand_entered_flight(self):
+        manual = make_flight('SP100', datetime(2030, 1, 2, 18, 0, tzinfo=dt_timezone.utc),
+                             departure_airport='DEL', arrival_airport='BOM')
+        result = expand_patterns(start=self.start, horizon_days=2)
+        self.assertEqual((len(result['created']), [f.id for f in result['updated']]), (0, [manual.id]))
+        manual.refresh_from_db()
+        self.assertEqual((manual.schedule_pattern, manual.total_seats), (self.pattern, 180))
+
+
+class AircraftUtilizationTests(TestCase):
+    """Per-tail index catches double bookings, maintenance days and grounded aircraft"""
+
+    def setUp(self):
+        self.day = date.today() + timedelta(days=2)
+        self.noon = timezone.make_aware(datetime.combine(self.day, time(12, 0)))
+        self.plane = make_aircraft('VT-UTL', next_maintenance=self.day + timedelta(days=1))
+        self.flight = make_flight('UT1', self.noon, aircraft=self.plane)
+
+    def form_data(self, departure, aircraft):
+        return {
+            'flight_number': 'UT2', 'airline': 'Test Air', 'departure_city': 'Mumbai',
+            'arrival_city': 'Delhi', 'departure_airport': 'BOM', 'arrival_airport': 'DEL',
+            'departure_time': departure.strftime('%Y-%m-%dT%H:%M'),
+            'arrival_time': (departure + timedelta(hours=2)).strftime('%Y-%m-%dT%H:%M'),
+            'aircraft_type': 'Airbus A320', 'total_seats': 180, 'available_seats': 180,
+            'economy_price': '100', 'business_price': '200', 'status': 'scheduled',
+            'aircraft': aircraft.id,
+        }
+
+    def test_flight_form_checks_aircraft(self):
+        # UT1 lands 14:00 and needs 95 minutes to turn
+        form = FlightForm(self.form_data(self.noon + timedelta(hours=3), self.plane))
+        self.assertFalse(form.is_valid())
+        self.assertIn('already flies UT1', form.errors['aircraft'][0])
+        self.assertTrue(FlightForm(self.form_data(self.noon + timedelta(hours=4), self.plane)).is_valid())
+
+        form = FlightForm(self.form_data(self.noon + timedelta(days=1), self.plane))
+        self.assertIn('due for maintenance', form.errors['aircraft'][0])
+
+        self.plane.status = 'grounded'
+        self.plane.save()
+        form = FlightForm(self.form_data(self.noon + timedelta(hours=4), self.plane))
+        self.assertIn('VT-UTL is grounded', form.errors['aircraft'][0])
+
+    def test_fleet_conflicts_in_one_pass(self):
+        other = make_aircraft('VT-UT2')
+        make_flight('UT3', self.noon + timedelta(hours=1), aircraft=self.plane)
+        make_flight('UT4', self.noon + timedelta(hours=1), aircraft=other)
+        make_flight('UT5', self.noon + timedelta(days=1), aircraft=self.plane)
+        start, end = day_bounds(self.day)
+        index = AircraftUtilizationIndex.for_window(start, end + timedelta(days=1))
+        found = {(a.registration, x.flight_number, y.flight_number) for a, x, y in index.conflicts()}
+        self.assertEqual(found, {('VT-UTL', 'UT1', 'UT3'), ('VT-UTL', 'Maintenance', 'UT5')})
+        row = next(r for r in index.timeline(start, end) if r['aircraft'] == other)
+        self.assertEqual(row['segments'][0]['label'], 'UT4')
+        # 13:00 to 16:35 of a 24 hour day
+        self.assertEqual(row['utilization'], round(215 / 1440 * 100, 1))
+
+    def test_import_rejects_double_booked_rows(self):
+        header = 'flight_number,departure_airport,arrival_airport,departure_time,arrival_time,aircraft\n'
+        departure = self.noon.astimezone(dt_timezone.utc).replace(tzinfo=None)
+        rows = [
+            f'UT6,BOM,DEL,{departure + timedelta(hours=1):%Y-%m-%d %H:%M},{departure + timedelta(hours=3):%Y-%m-%d %H:%M},VT-UTL',
+            f'UT7,BOM,DEL,{departure + timedelta(hours=6):%Y-%m-%d %H:%M},{departure + timedelta(hours=8):%Y-%m-%d %H:%M},VT-UTL',
+            f'UT8,DEL,BOM,{departure + timedelta(hours=8):%Y-%m-%d %H:%M},{departure + timedelta(hours=10):%Y-%m-%d %H:%M},VT-UTL',
+        ]
+        result = import_schedule(io.StringIO(header + '\n'.join(rows)))
+        self.assertEqual(result.created, 1)
+        self.assertEqual([(e.flight_number, 'UT1' in e.message) for e in result.errors], [('UT6', True), ('UT8', False)])
+        self.assertIn('booked twice in this import', result.errors[1].message)
+
+    def test_scheduling_page_shows_timeline(self):
+        User.objects.create_user('ops', password='pw', is_staff=True)
+        self.client.login(username='ops', password='pw')
+        make_flight('UT3', self.noon + timedelta(hours=1), aircraft=self.plane)
+        response = self.client.get(reverse('airline:flight_scheduling'))
+        self.assertContains(response, 'VT-UTL')
+        self.assertContains(response, 'UT1 (')
+
+
+class TailAssignmentTests(TestCase):
+    """Aircraft rotations respect location, turn time, seats and maintenance"""
+
+    HOUR = 3600
+
+    def leg(self, flight_id, origin, destination, departure, booked=100, current_tail=None):
+        return Leg(flight_id, origin, destination, departure * self.HOUR, (departure + 2) * self.HOUR,
+                   booked, current_tail, False)
+
+    def tail(self, aircraft_id, station, seats=180, maintenance=1000):
+        return Tail(aircraft_id, seats, station, 0, maintenance * self.HOUR, (maintenance + 24) * self.HOUR)
+
+    def test_solver_builds_feasible_chains(self):
+        solver = TailAssignmentSolver([self.tail(1, 'DEL'), self.tail(2, 'BOM', seats=300),
+                                       self.tail(3, 'DEL', seats=150, maintenance=20)], turn=self.HOUR)
+        unassigned = solver.solve([
+            self.leg(10, 'DEL', 'BOM', 8, booked=160),  # too many passengers for aircraft 3
+            self.leg(11, 'BOM', 'DEL', 10),   # 10 lands at 10:00 and is not turned yet
+            self.leg(12, 'BOM', 'DEL', 11),
+            self.leg(13, 'DEL', 'BLR', 9, booked=250),  # no DEL aircraft is big enough
+            self.leg(14, 'DEL', 'BOM', 19),   # aircraft 3 is in maintenance from 20:00
+        ])
+        self.assertEqual(unassigned, [13])
+        self.assertEqual(solver.chains(), {1: [10, 12, 14], 2: [11]})
+
+    def test_resolve_only_moves_what_it_must(self):
+        solver = TailAssignmentSolver([self.tail(1, 'DEL'), self.tail(2, 'DEL')], turn=self.HOUR)
+        legs = [self.leg(20, 'DEL', 'BOM', 6), self.leg(21, 'BOM', 'DEL', 9),
+                self.leg(22, 'DEL', 'BOM', 7), self.leg(23, 'BOM', 'DEL', 12)]
+        self.assertEqual(solver.solve(legs), [])
+        before = dict(solver.assignments)
+        self.assertEqual(before, {20: 1, 21: 1, 22: 2, 23: 2})
+
+        # A later departure that both aircraft can still make changes nothing
+        self.assertEqual(solver.resolve([legs[1]._replace(departure=11 * self.HOUR, arrival=13 * self.HOUR)]), [])
+        self.assertEqual(solver.assignments, before)
+
+        # An extra BOM departure takes aircraft 1 away from 21, which falls to aircraft 2
+        moved = solver.resolve([self.leg(24, 'BOM', 'DEL', 9.5)])
+        self.assertEqual(sorted(moved), [21, 23, 24])
+        self.assertEqual(solver.unassigned, [23])
+        # Once it is cancelled 21 keeps its new aircraft and 23 is covered again
+        self.assertEqual(solver.resolve(removed=[24]), [23])
+        self.assertEqual(solver.assignments, {20: 1, 21: 2, 22: 2, 23: 1})
+
+    def test_assign_tails_saves_rotations(self):
+        start = timezone.now().replace(microsecond=0) + timedelta(hours=1)
+        small = make_aircraft('VT-TA1', total_seats=2, business_seats=0, economy_seats=2, current_location='Delhi')
+        large = make_aircraft('VT-TA2', total_seats=180, current_location='BOM')
+        make_aircraft('VT-TA3', current_location='DEL', status='grounded')
+        mumbai = {'departure_city': 'Mumbai', 'arrival_city': 'Delhi', 'departure_airport': 'BOM',
+                  'arrival_airport': 'DEL'}
+        out = make_flight('TA1', start, aircraft=large)
+        full = make_flight('TA2', start + timedelta(hours=1), **mumbai)
+        back = make_flight('TA3', start + timedelta(hours=4), **mumbai)
+        for i in range(3):
+            make_booking(make_passenger(i), full, f'{i + 1}A')
+
+        result = assign_tails(start - timedelta(minutes=1))
+        self.assertEqual(result['changed'], 3)
+        self.assertEqual(result['unassigned'], [])
+        self.assertEqual(result['chains'], {small: [out, back], large: [full]})
+        self.assertEqual(Flight.objects.get(pk=out.pk).aircraft, small)
+        self.assertEqual(Flight.objects.get(pk=full.pk).aircraft, large)
+
+        User.objects.create_user('ops', password='pw', is_staff=True)
+        self.client.login(username='ops', password='pw')
+        response = self.client.post(reverse('airline:flight_scheduling'), {'action': 'assign_tails'}, follow=True)
+        self.assertContains(response, 'Tail plan updated')
+
+    def test_uncovered_flight_gives_up_its_aircraft(self):
+        start = timezone.now().replace(microsecond=0) + timedelta(hours=1)
+        plane = make_aircraft('VT-X1', total_seats=180, aircraft_type='Boeing 737', current_location='DEL')
+        first = make_flight('X1', start, available_seats=1)
+        make_booking(make_passenger(1), first, '1A')
+        overlapping = make_flight('Y1', start + timedelta(minutes=30), aircraft=plane, arrival_airport='GOI')
+
+        result = assign_tails(start - timedelta(minutes=1))
+        self.assertEqual(result['unassigned'], [overlapping])
+        first.refresh_from_db()
+        overlapping.refresh_from_db()
+        self.assertEqual((first.aircraft, first.aircraft_type, first.total_seats, first.available_seats),
+                         (plane, 'Boeing 737', 180, 179))
+        self.assertIsNone(overlapping.aircraft)
+        self.assertEqual(AircraftUtilizationIndex.for_window(start, start + timedelta(days=1)).conflicts(), [])
+
+
+class LiveEventTests(TestCase):
+    """Alert and flight status changes are pushed to connected dashboards"""
+
+    async def test_hub_fans_out_from_worker_threads(self):
+        hub = EventHub(LocalBroker())
+        queues = [hub.subscribe() for _ in range(2)]
+        stream = hub.stream()
+        self.assertEqual(await stream.__anext__(), ': connected\n\n')
+        # Sync views publish from a worker thread, not the event loop
+        await asyncio.to_thread(hub.publish, 'alert.created', {'id': 7})
+        for queue in queues:
+            message = await asyncio.wait_for(queue.get(), timeout=1)
+            self.assertEqual(message, {'event': 'alert.created', 'data': {'id': 7}})
+        frame = await asyncio.wait_for(stream.__anext__(), timeout=1)
+        self.assertEqual(frame, 'event: alert.created\ndata: {"id": 7}\n\n')
+        await stream.aclose()
+        self.assertEqual(hub.subscriber_count, 2)
+
+    def test_saves_publish_after_commit(self):
+        broker = LocalBroker()
+        received = []
+        broker.attach(received.append)
+        user = User.objects.create_user('ops', password='pw', is_staff=True)
+        flight = make_flight('LE1', timezone.now() + timedelta(hours=3))
+        with mock.patch('core.live_events.get_hub', return_value=EventHub(broker)):
+            with self.captureOnCommitCallbacks(execute=True):
+                alert = SystemAlert.objects.create(title='Gate feed down', message='No data', alert_type='error',
+                                                   affected_system='Gates', created_by=user)
+                self.assertEqual(received, [])  # nothing leaks before commit
+            flight = Flight.objects.get(pk=flight.pk)
+            with self.captureOnCommitCallbacks(execute=True):
+                flight.gate_number = 'A1'
+                flight.save()
+                flight.status = 'boarding'
+                flight.save()
+            self.client.login(username='ops', password='pw')
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse('airline:resolve_alert', args=[alert.id]))
+
+        self.assertEqual([m['event'] for m in received], ['alert.created', 'flight.status', 'alert.resolved'])
+        self.assertEqual(received[1]['data']['status'], 'boarding')
+        self.assertTrue(received[2]['data']['is_resolved'])
+
+    async def test_operations_stream_skips_crew_messages(self):
+        ops = await User.objects.acreate_user('ops', password='pw', is_staff=True)
+        await self.async_client.aforce_login(ops)
+        hub = EventHub(LocalBroker())
+        with mock.patch('core.views_airline.get_hub', return_value=hub):
+            response = await self.async_client.get(reverse('airline:operations_event_stream'))
+        frames = aiter(response.streaming_content)
+        self.assertEqual(await anext(frames), b': connected\n\n')
+        hub.publish('message.new', {'id': 1, 'subject': 'Roster change', 'user_ids': [5]})
+        hub.publish('alert.created', {'id': 7})
+        frame = await asyncio.wait_for(anext(frames), timeout=1)
+        self.assertEqual(frame, b'event: alert.created\ndata: {"id": 7}\n\n')
+        await frames.aclose()
+
+    def test_dashboards_subscribe_to_stream(self):
+        User.objects.create_user('ops', password='pw', is_staff=True)
+        self.client.login(username='ops', password='pw')
+        stream_url = reverse('airline:operations_event_stream')
+        for name in ('operations_dashboard', 'system_alerts'):
+            self.assertContains(self.client.get(reverse(f'airline:{name}')), stream_url)
+
+
+class AlertIngestionTests(TestCase):
+    """Repeated alerts collapse onto one open row per fingerprint"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('ops', password='pw', is_staff=True)
+        self.events = []
+        broker = LocalBroker()
+        broker.attach(self.events.append)
+        patcher = mock.patch('core.live_events.get_hub', return_value=EventHub(broker))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def feed_down(self, now=None, alert_type='error'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return raise_alert('Weather feed down', f'Timeout at {now}', alert_type, 'Weather Service',
+                               self.user, subject='weather-api', now=now)
+
+    def test_one_open_alert_per_fingerprint_without_partial_indexes(self):
+        alert = self.feed_down()
+        self.assertEqual(alert.open_fingerprint, alert.fingerprint)
+        duplicate = dict(title='Weather feed down', message='', alert_type='error', affected_system='Weather Service',
+                         created_by=self.user, fingerprint=alert.fingerprint)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            SystemAlert.objects.create(**duplicate)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            clear_alerts('Weather Service', ['weather-api'])
+        alert.refresh_from_db()
+        self.assertEqual((alert.is_resolved, alert.open_fingerprint), (True, None))
+        reopened = self.feed_down()
+        self.assertEqual((reopened.pk, SystemAlert.objects.get(pk=alert.pk).open_fingerprint),
+                         (alert.pk, alert.fingerprint))
+        reopened.is_resolved = True
+        reopened.save(update_fields=['is_resolved'])
+        SystemAlert.objects.create(**duplicate)  # the resolved row no longer holds the fingerprint
+
+    def test_repeats_are_counted_and_rate_limited(self):
+        start = timezone.now()
+        first = self.feed_down(start)
+        with self.assertNumQueries(4):  # savepoint, indexed lookup, counter update, release
+            self.feed_down(start + timedelta(minutes=1))
+        self.feed_down(start + timedelta(minutes=2))
+        self.assertEqual(SystemAlert.objects.count(), 1)
+        alert = SystemAlert.objects.get()
+        self.assertEqual((alert.pk, alert.occurrence_count), (first.pk, 3))
+        self.assertEqual(alert.last_seen, start + timedelta(minutes=2))
+        self.assertEqual(alert.message, f'Timeout at {start + timedelta(minutes=2)}')
+        # Another severity or subject is a different alert
+        self.feed_down(start, alert_type='critical')
+        self.assertEqual(SystemAlert.objects.filter(is_resolved=False).count(), 2)
+
+        # Only the first occurrence was pushed; repeats wait for the rate limit window
+        self.assertEqual([e['event'] for e in self.events], ['alert.created', 'alert.created'])
+        cache.clear()
+        self.feed_down(start + timedelta(minutes=10))
+        self.assertEqual(self.events[-1]['event'], 'alert.repeated')
+        self.assertEqual(self.events[-1]['data']['occurrence_count'], 4)
+
+    def test_recovery_resolves_and_flapping_reopens(self):
+        start = timezone.now()
+        alert = self.feed_down(start)
+        with self.captureOnCommitCallbacks(execute=True):
+            resolved = clear_alerts('Weather Service', ['weather-api'], now=start + timedelta(minutes=5))
+        self.assertEqual(resolved, [alert])
+        self.assertTrue(SystemAlert.objects.get(pk=alert.pk).is_resolved)
+        self.assertEqual(self.events[-1]['event'], 'alert.resolved')
+
+        # Back within the reopen window: the same row, not a new one
+        reopened = self.feed_down(start + timedelta(minutes=10))
+        self.assertEqual(reopened.pk, alert.pk)
+        alert.refresh_from_db()
+        self.assertEqual((alert.is_resolved, alert.resolved_at, alert.occurrence_count), (False, None, 2))
+
+        clear_alerts('Weather Service', ['weather-api'], now=start + timedelta(minutes=15))
+        later = self.feed_down(start + timedelta(hours=2))
+        self.assertNotEqual(later.pk, alert.pk)
+        self.assertEqual(SystemAlert.objects.count(), 2)
+
+    def test_delay_alerts_deduplicate_and_clear(self):
+        first, second = make_aircraft('VT-AIA'), make_aircraft('VT-AIB')
+        day_start = timezone.make_aware(datetime.combine(date.today(), time(0, 0)))
+        lead = make_flight('AI1', day_start + timedelta(hours=10), aircraft=first)
+        make_flight('AI2', day_start + timedelta(hours=13, minutes=40), aircraft=first,
+                    departure_airport='BOM', arrival_airport='DEL')
+        make_flight('AI3', day_start + timedelta(hours=15), aircraft=second)
+        start, end = day_bounds(date.today())
+        late = {lead.id: lead.departure_time + timedelta(hours=1)}
+        propagate_delays(start, end, self.user, delays=late)
+        propagate_delays(start, end, self.user, delays=late)
+        alert = SystemAlert.objects.get()
+        self.assertEqual((alert.title, alert.occurrence_count), ('Broken connection: AI2', 2))
+
+        propagate_delays(start, end, self.user, delays={lead.id: lead.departure_time})
+        alert.refresh_from_db()
+        self.assertTrue(alert.is_resolved)
+
+
+class CrewRosterTests(TestCase):
+    """Rosters are aggregated in SQL and cached per crew member and month"""
+
+    def setUp(self):
+        cache.clear()
+        self.first = date(2031, 3, 1)
+        at = lambda day, hour: timezone.make_aware(datetime.combine(self.first.replace(day=day), time(hour, 0)))
+        self.pilot = make_staff('roster')
+        self.flights = [
+            make_flight('RS1', at(3, 6)),
+            make_flight('RS2', at(3, 10), arrival_time=at(3, 13)),
+            make_flight('RS3', at(20, 8)),
+            make_flight('RS4', at(21, 8)),
+            make_flight('RS5', at(1, 8) + timedelta(days=31)),  # next month
+        ]
+        for flight in self.flights:
+            CrewAssignment.objects.create(staff=self.pilot, flight=flight, role_on_flight='Captain',
+                                          status='cancelled' if flight.flight_number == 'RS4' else 'scheduled')
+
+    def test_block_hours_summed_per_day(self):
+        with self.assertNumQueries(2):
+            roster = monthly_rosters([self.pilot.id], 2031, 3, use_cache=False)[self.pilot.id]
+            flight_numbers = [a.flight.flight_number for d in roster['days'] for a in d['assignments']]
+        self.assertEqual(flight_numbers, ['RS1', 'RS2', 'RS3', 'RS4'])
+        self.assertEqual([(d['date'].day, d['block_hours']) for d in roster['days']], [(3, 5.0), (20, 2.0), (21, 0.0)])
+        self.assertEqual((roster['total_hours'], roster['legs']), (7.0, 3))
+
+    def test_days_follow_local_time(self):
+        with timezone.override('Asia/Kolkata'):
+            # 20:30 UTC on the 20th is 02:00 on the 21st in Kolkata
+            late = make_flight('RS6', timezone.make_aware(datetime(2031, 3, 20, 20, 30), dt_timezone.utc))
+            CrewAssignment.objects.create(staff=self.pilot, flight=late, role_on_flight='Captain')
+            roster = monthly_rosters([self.pilot.id], 2031, 3, use_cache=False)[self.pilot.id]
+        days = {d['date'].day: ([a.flight.flight_number for a in d['assignments']], d['block_hours'])
+                for d in roster['days']}
+        self.assertEqual(days[21], (['RS6', 'RS4'], 2.0))
+
+    def test_roster_cached_until_assignments_change(self):
+        monthly_rosters([self.pilot.id], 2031, 3)
+        with self.assertNumQueries(0):
+            roster = monthly_rosters([self.pilot.id], 2031, 3)[self.pilot.id]
+        self.assertEqual(roster['total_hours'], 7.0)
+
+        extra = make_flight('RS6', timezone.make_aware(datetime(2031, 3, 25, 9, 0)))
+        CrewAssignment.objects.create(staff=self.pilot, flight=extra, role_on_flight='Captain')
+        self.assertEqual(monthly_rosters([self.pilot.id], 2031, 3)[self.pilot.id]['total_hours'], 9.0)
+
+        # Retiming a flight invalidates everyone crewing it
+        extra.arrival_time += timedelta(hours=1)
+        extra.save()
+        self.assertEqual(monthly_rosters([self.pilot.id], 2031, 3)[self.pilot.id]['total_hours'], 10.0)
+
+    def test_roster_pages_without_n_plus_one(self):
+        self.client.login(username='roster', password='pw')
+        with self.assertNumQueries(5):  # session, user, staff, then the two roster queries
+            response = self.client.get(reverse('crew:my_roster'), {'year': 2031, 'month': 3})
+        self.assertContains(response, 'RS2')
+        self.assertEqual(response.context['total_hours'], 7.0)
+        response = self.client.get(reverse('crew:my_roster'), {'year': 2031, 'month': 3, 'months': 2})
+        self.assertEqual(response.context['total_hours'], 9.0)
+
+        User.objects.create_user('ops', password='pw', is_staff=True)
+        self.client.login(username='ops', password='pw')
+        counts = []
+        for i in range(3):
+            other = make_staff(f'crew{i}', role='cabin_crew')
+            CrewAssignment.objects.create(staff=other, flight=self.flights[i], role_on_flight='Purser')
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('airline:crew_rosters'), {'year': 2031, 'month': 3, 'months': 2})
+            counts.append(len(queries))
+        self.assertEqual(len(set(counts)), 1)  # the same queries however many crew there are
+        hours = {row['staff'].employee_id: row['months'] for row in response.context['crew']}
+        self.assertEqual(hours['EMP-roster'], [7.0, 2.0])
+        self.assertEqual(hours['EMP-crew1'], [3.0, 0.0])
+
+
+def busiest_window_brute_force(legs, leg, window):
+    """Most block time in any window of this length holding ``leg``, trying every window edge"""
+    edges = [end for _, end in legs] + [start + window for start, _ in legs]
+    edges = [t for t in edges if leg[1] <= t <= leg[0] + window]
+    return max(sum(max(0, min(end, t) - max(start, t - window)) for start, end in legs) for t in edges)
+
+
+class DutyLimitTests(TestCase):
+    """Flight time limits and rest are checked from cumulative block time"""
+
+    def setUp(self):
+        self.base = timezone.make_aware(datetime(2031, 5, 1, 6, 0))
+        self.pilot = make_staff('ftl')
+
+    def assign(self, number, hours_from_base, block_hours=2, staff=None):
+        departure = self.base + timedelta(hours=hours_from_base)
+        flight = make_flight(number, departure, arrival_time=departure + timedelta(hours=block_hours))
+        CrewAssignment.objects.create(staff=staff or self.pilot, flight=flight, role_on_flight='Captain')
+        return flight
+
+    def test_ledger_finds_the_busiest_window(self):
+        rng = random.Random(41)
+        hour = 3600
+        for _ in range(30):
+            legs, t = [], 0
+            for _ in range(rng.randint(1, 25)):
+                t += rng.choice([1, 2, 3, 12, 30, 90]) * hour
+                legs.append((t, t + rng.randint(1, 5) * hour))
+                t = legs[-1][1]
+            ledger = CrewLedger(legs)
+            start = rng.randint(0, t)
+            end = start + rng.randint(1, 4) * hour
+            if any(s < end and start < e for s, e in legs):
+                self.assertEqual(ledger.check(start, end), ['overlaps another assignment'])
+                continue
+            for name, window, limit in FLIGHT_TIME_LIMITS:
+                expected = busiest_window_brute_force(legs + [(start, end)], (start, end), window)
+                self.assertEqual(ledger.busiest_window(start, end, window) + end - start, expected, name)
+
+    def test_assignment_form_rejects_limit_breaches(self):
+        self.assign('FT1', 0, block_hours=5)
+        self.assign('FT2', 6, block_hours=4)
+        late = make_flight('FT3', self.base + timedelta(hours=11), arrival_time=self.base + timedelta(hours=13))
+        form = CrewAssignmentForm(data={'staff': self.pilot.id, 'flight': late.id, 'role_on_flight': 'Captain'})
+        self.assertFalse(form.is_valid())
+        error = form.errors['flight'][0]
+        self.assertIn('11.0h block time in 24 hours exceeds 10.0h', error)
+        self.assertIn('rest', error)  # report 05:00 to release 19:30 is over the duty limit
+
+        rested = make_flight('FT4', self.base + timedelta(hours=30))
+        form = CrewAssignmentForm(data={'staff': self.pilot.id, 'flight': rested.id, 'role_on_flight': 'Captain'})
+        self.assertTrue(form.is_valid(), form.errors)
+
+    def test_bulk_validation_reports_each_breach(self):
+        self.assign('FV1', 0, block_hours=6)
+        self.assign('FV2', 7, block_hours=5)  # 11h in 24h, 14.5h duty
+        self.assign('FV3', 22, block_hours=1)  # rested, but the 24h window starting with FV1 holds 12h
+        other = make_staff('ftl2', role='copilot')
+        self.assign('FV4', 0, block_hours=2, staff=other)
+        self.assign('FV5', 3, block_hours=2, staff=other)
+
+        violations = validate_assignments(self.base - timedelta(days=1), self.base + timedelta(days=2))
+        found = {(Flight.objects.get(pk=v.flight_id).flight_number, v.rule) for v in violations}
+        self.assertEqual(found, {('FV2', '24 hours limit'), ('FV2', 'rest'), ('FV3', '24 hours limit')})
+        self.assertEqual({v.staff_id for v in violations}, {self.pilot.id})
+
+        # Legs before the period count toward windows but are not reported themselves
+        self.assertEqual(validate_assignments(self.base + timedelta(hours=19), self.base + timedelta(days=2))[0].rule,
+                         '24 hours limit')
+
+    def test_vectorized_check_keeps_crew_apart(self):
+        hour = 3600
+        # Two crew with back-to-back heavy days that would breach limits only if mixed together
+        staff = [1, 1, 2, 2]
+        starts = [0, 24 * hour, 10 * hour, 40 * hour]
+        ends = [6 * hour, 30 * hour, 16 * hour, 46 * hour]
+        self.assertEqual(find_violations(staff, starts, ends), [])
+        self.assertEqual(find_violations([1, 1], [0, 8 * hour], [6 * hour, 13 * hour]),
+                         [(1, '24 hours limit', '11.0h block time in 24 hours exceeds 10.0h'),
+                          (1, 'rest', 'only 2.0h rest; duty lasts 14.5h (limit 13.0h)')])
+
+    def test_roster_page_flags_violations(self):
+        self.assign('FR1', 0, block_hours=6)
+        self.assign('FR2', 7, block_hours=5)
+        User.objects.create_user('ops', password='pw', is_staff=True)
+        self.client.login(username='ops', password='pw')
+        response = self.client.get(reverse('airline:crew_rosters'), {'year': 2031, 'month': 5})
+        self.assertNotContains(response, 'violations')  # checked only on request
+        response = self.client.get(reverse('airline:crew_rosters'), {'year': 2031, 'month': 5, 'validate': '1'})
+        row = next(r for r in response.context['crew'] if r['staff'] == self.pilot)
+        self.assertEqual([v.rule for v in row['violations']], ['24 hours limit', 'rest'])
+        self.assertContains(response, '2 violations')
+
+    def test_roster_pages_fall_back_to_this_month(self):
+        make_staff('paged')
+        User.objects.create_user('ops', password='pw', is_staff=True)
+        for url, username in ((reverse('airline:crew_rosters'), 'ops'), (reverse('crew:my_roster'), 'paged')):
+            self.client.login(username=username, password='pw')
+            for params in ({'month': 'x'}, {'year': '2031', 'month': '13'}, {'months': 'all'}):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 200, (url, params))
+
+
+class CrewRosteringTests(TestCase):
+    """Pairings are built from legs and crewed within limits, qualifications and bids"""
+
+    def setUp(self):
+        cache.clear()
+
+    def leg(self, flight_id, origin, destination, departure_hour, block_hours=2, aircraft_id=1, seats=100):
+        departure = departure_hour * 3600
+        return CrewLeg(flight_id, origin, destination, departure, departure + block_hours * 3600, aircraft_id,
+                       crew_complement(seats))
+
+    def test_pairings_follow_aircraft_within_one_duty(self):
+        legs = [
+            self.leg(1, 'DEL', 'BOM', 6),
+            self.leg(2, 'BOM', 'DEL', 9),
+            self.leg(3, 'BOM', 'MAA', 9, aircraft_id=2),
+            self.leg(4, 'DEL', 'BOM', 11.5, seats=300),  # needs a bigger cabin crew
+            self.leg(5, 'DEL', 'BOM', 13),
+            self.leg(6, 'BOM', 'DEL', 30),  # after a night's rest
+        ]
+        pairings = sorted([[leg.flight_id for leg in p.legs] for p in build_pairings(legs)])
+        self.assertEqual(pairings, [[1, 2, 5], [3], [4], [6]])
+        self.assertEqual(crew_complement(300), (('pilot', 1), ('copilot', 1), ('cabin_crew', 6)))
+
+    def test_solver_respects_rest_qualifications_and_bids(self):
+        complement = (('pilot', 1),)
+        early = Pairing((self.leg(1, 'DEL', 'BOM', 6)._replace(complement=complement),), complement)
+        soon = Pairing((self.leg(2, 'BOM', 'DEL', 12)._replace(complement=complement),), complement)
+        later = Pairing((self.leg(3, 'DEL', 'BOM', 30)._replace(complement=complement),), complement)
+        crew = [
+            CrewMember(1, 'pilot', float('inf'), []),
+            CrewMember(2, 'pilot', 20 * 3600, []),  # licence lapses before the last pairing
+            CrewMember(3, 'pilot', float('inf'), [(-20 * 3600, -12 * 3600, 'BOM', 'DEL')]),  # heavy day just before
+            CrewMember(4, 'copilot', float('inf'), []),
+        ]
+        solver = CrewRosterSolver(crew, bids={3: {3}}, period_start=0)
+        uncovered = solver.solve([early, soon, later])
+        flown = {pairing.legs[0].flight_id: staff_id for pairing, staff_id, _ in solver.assignments}
+        self.assertEqual(uncovered, [])
+        self.assertEqual(flown[1], 1)  # pilot 3 is still over the 24-hour limit
+        self.assertEqual(flown[2], 2)  # pilot 1 has not rested
+        self.assertEqual(flown[3], 3)  # the bidder
+
+        # With nobody left who may fly, the position stays open
+        solver = CrewRosterSolver(crew[:1], period_start=0)
+        self.assertEqual([(p.legs[0].flight_id, role, missing) for p, role, missing in solver.solve([early, soon])],
+                         [(2, 'pilot', 1)])
+
+    def test_solver_keeps_crew_where_they_are(self):
+        complement = (('pilot', 1),)
+
+        def pairing(flight_id, origin, destination, hour):
+            leg = self.leg(flight_id, origin, destination, hour)._replace(complement=complement)
+            return Pairing((leg,), complement)
+
+        crew = [
+            CrewMember(1, 'pilot', float('inf'), [], 'DEL'),
+            CrewMember(2, 'pilot', float('inf'), [(-30 * 3600, -28 * 3600, 'DEL', 'BOM')], 'DEL'),  # positioned
+            CrewMember(3, 'pilot', float('inf'), [(80 * 3600, 82 * 3600, 'DEL', 'BOM')], 'DEL'),  # due back at DEL
+        ]
+        solver = CrewRosterSolver(crew, period_start=0)
+        uncovered = solver.solve([pairing(1, 'BOM', 'DEL', 6), pairing(2, 'DEL', 'MAA', 30),
+                                  pairing(3, 'MAA', 'DEL', 60), pairing(4, 'BLR', 'DEL', 62)])
+        flown = {p.legs[0].flight_id: staff_id for p, staff_id, _ in solver.assignments}
+        self.assertEqual(flown, {1: 2, 2: 1, 3: 1})  # pilot 3 would be left at MAA before their DEL departure
+        self.assertEqual([(p.legs[0].flight_id, missing) for p, _, missing in uncovered], [(4, 1)])
+
+    def test_partly_crewed_flight_needs_only_open_positions(self):
+        self.assertEqual(crew_complement(120, {'pilot': 1, 'cabin_crew': 1}), (('copilot', 1), ('cabin_crew', 2)))
+        self.assertEqual(crew_complement(50, {'pilot': 1, 'copilot': 1, 'cabin_crew': 1}), ())
+
+    def test_month_rostered_in_bulk(self):
+        at = lambda day, hour: timezone.make_aware(datetime(2031, 6, day, hour, 0))
+        outbound = make_flight('RO1', at(3, 6), total_seats=60)
+        inbound = make_flight('RO2', at(3, 9), total_seats=60, departure_airport='BOM', arrival_airport='DEL')
+        next_day = make_flight('RO3', at(4, 7), total_seats=60)
+        crewed = make_flight('RO4', at(5, 7), total_seats=60)
+
+        captain = make_staff('cap1')
+        bidder = make_staff('cap2')
+        make_staff('cap3', medical_expiry=date(2031, 6, 1))
+        first_officer = make_staff('fo1', role='copilot')
+        make_staff('fo2', role='copilot')
+        cabin = [make_staff(f'cc{i}', role='cabin_crew') for i in range(4)]
+        CrewAssignment.objects.create(staff=captain, flight=crewed, role_on_flight='Captain')
+        CrewBid.objects.create(staff=bidder, flight=next_day)
+        monthly_rosters([bidder.id], 2031, 6)
+
+        with self.assertNumQueries(8):  # five reads, then one bulk insert in a savepoint
+            result = roster_crew(2031, 6)
+        self.assertEqual(result['pairings'], 3)
+        self.assertEqual(result['uncovered'], [])
+        crew = {}
+        for assignment in CrewAssignment.objects.filter(flight__in=[outbound, inbound, next_day, crewed]):
+            crew.setdefault(assignment.flight.flight_number, set()).add((assignment.staff.employee_id,
+                                                                          assignment.role_on_flight))
+        self.assertEqual(crew['RO1'], crew['RO2'])  # one pairing, one crew
+        self.assertEqual(len(crew['RO1']), 4)  # captain, first officer and two cabin crew for 60 seats
+        self.assertIn(('EMP-cap2', 'Captain'), crew['RO3'])
+        self.assertIn(('EMP-fo2', 'First Officer'), crew['RO3'])  # fewest hours
+        self.assertNotIn('EMP-cap3', {employee_id for members in crew.values() for employee_id, _ in members})
+        # The partly crewed flight keeps its captain and gets the rest of its crew
+        self.assertEqual(sorted(role for _, role in crew['RO4']), ['Cabin Crew', 'Cabin Crew', 'Captain', 'First Officer'])
+        self.assertIn(('EMP-cap1', 'Captain'), crew['RO4'])
+        self.assertIn(('EMP-fo1', 'First Officer'), crew['RO4'])  # back at DEL after RO2; fo2 is at BOM
+        self.assertEqual(validate_assignments(at(1, 0), at(30, 0)), [])
+        self.assertEqual(monthly_rosters([bidder.id], 2031, 6)[bidder.id]['legs'], 3)  # cache invalidated
+
+
+class CrewSwapTests(TestCase):
+    """Crew trade and give away assignments that stay legal for whoever flies them"""
+
+    def setUp(self):
+        cache.clear()
+        self.day = timezone.now().replace(hour=8, minute=0, second=0, microsecond=0) + timedelta(days=20)
+        self.alice = make_staff('alice')
+        self.bob = make_staff('bob')
+        self.flight_a = make_flight('SW1', self.day)
+        self.flight_b = make_flight('SW2', self.day + timedelta(days=2), departure_airport='BOM',
+                                    arrival_airport='DEL')
+        self.mine = CrewAssignment.objects.create(staff=self.alice, flight=self.flight_a, role_on_flight='Captain')
+        self.theirs = CrewAssignment.objects.create(staff=self.bob, flight=self.flight_b, role_on_flight='Captain')
+
+    def test_matching_trades_are_exchanged(self):
+        mine = post_swap(self.mine, wanted_destination='del')
+        theirs = post_swap(self.theirs, wanted_from=self.day.date(), wanted_until=self.day.date())
+        post_swap(CrewAssignment.objects.create(  # wants a date Alice's flight is not on
+            staff=make_staff('carol'), flight=make_flight('SW3', self.day + timedelta(days=3),
+                                                          arrival_airport='DEL'), role_on_flight='Captain'
+        ), wanted_from=self.day.date() + timedelta(days=5))
+        with self.assertNumQueries(2):  # indexed candidates, then everyone's legs
+            self.assertEqual(find_matches(mine), [theirs])
+
+        accept_swap(theirs, self.alice, counter=mine)
+        self.mine.refresh_from_db()
+        self.theirs.refresh_from_db()
+        self.assertEqual((self.mine.staff, self.theirs.staff), (self.bob, self.alice))
+        self.assertEqual(set(SwapRequest.objects.values_list('status', 'taker__user__username').filter(
+            pk__in=[mine.pk, theirs.pk])), {('accepted', 'alice'), ('accepted', 'bob')})
+        with self.assertRaisesMessage(ValueError, 'no longer open'):
+            accept_swap(theirs, self.alice, counter=mine)
+
+    def test_giveaways_only_go_to_legal_qualified_crew(self):
+        giveaway = post_swap(self.mine, kind='giveaway')
+        busy = make_staff('busy')
+        CrewAssignment.objects.create(staff=busy, role_on_flight='Captain', flight=make_flight(
+            'SW4', self.day + timedelta(hours=1), departure_airport='BLR', arrival_airport='MAA'))
+        lapsing = make_staff('lapsing', medical_expiry=self.day.date())
+        first_officer = make_staff('fo', role='copilot')
+
+        self.assertEqual(open_giveaways(self.bob), [giveaway])
+        self.assertEqual(open_giveaways(busy), [])
+        self.assertEqual(open_giveaways(lapsing), [])
+        self.assertEqual(open_giveaways(first_officer), [])
+        with self.assertRaisesMessage(ValueError, 'overlaps another assignment'):
+            accept_swap(giveaway, busy)
+        with self.assertRaisesMessage(ValueError, 'licence or medical expires before the flight'):
+            accept_swap(giveaway, lapsing)
+        with self.assertRaisesMessage(ValueError, 'for Pilot crew'):
+            accept_swap(giveaway, first_officer)
+        self.assertEqual(CrewAssignment.objects.get(pk=self.mine.pk).staff, self.alice)
+
+        month = (self.day.year, self.day.month)
+        before = monthly_rosters([self.alice.id, self.bob.id], *month)  # cached
+        with self.captureOnCommitCallbacks(execute=True):
+            accept_swap(giveaway, self.bob)
+        self.assertEqual(CrewAssignment.objects.get(pk=self.mine.pk).staff, self.bob)
+        after = monthly_rosters([self.alice.id, self.bob.id], *month)
+        self.assertEqual(after[self.alice.id]['legs'], before[self.alice.id]['legs'] - 1)
+        self.assertEqual(after[self.bob.id]['legs'], before[self.bob.id]['legs'] + 1)
+
+    def test_swaps_need_notice_and_one_open_offer(self):
+        post_swap(self.mine)
+        with self.assertRaisesMessage(ValueError, 'already on offer'):
+            post_swap(self.mine)
+        soon = CrewAssignment.objects.create(staff=self.alice, role_on_flight='Captain',
+                                             flight=make_flight('SW5', timezone.now() + timedelta(days=2)))
+        with self.assertRaisesMessage(ValueError, 'departs in less than 7 days'):
+            post_swap(soon)
+
+    def test_swap_marketplace_page(self):
+        self.client.login(username='alice', password='pw')
+        self.client.post(reverse('crew:bidding_swaps'), {'action': 'post_swap', 'assignment_id': self.mine.id,
+                                                         'kind': 'trade'})
+        self.client.login(username='bob', password='pw')
+        self.client.post(reverse('crew:bidding_swaps'), {'action': 'post_swap', 'assignment_id': self.theirs.id,
+                                                         'kind': 'trade'})
+        response = self.client.get(reverse('crew:bidding_swaps'))
+        [item] = response.context['my_swaps']
+        self.assertEqual([m.assignment for m in item['matches']], [self.mine])
+
+        response = self.client.post(reverse('crew:bidding_swaps'), {
+            'action': 'accept_swap', 'swap_id': item['matches'][0].id, 'counter_id': item['swap'].id,
+        }, follow=True)
+        self.assertContains(response, 'Swap completed')
+        self.assertEqual(CrewAssignment.objects.get(pk=self.mine.pk).staff, self.bob)
+
+
+class BriefingPacketTests(TestCase):
+    """Briefings are built once per flight from live data and rebuilt only when it changes"""
+
+    def setUp(self):
+        cache.clear()
+        self.flight = make_flight('BR1', timezone.now() + timedelta(days=1), total_seats=10)
+        self.captain = make_staff('captain')
+        self.purser = make_staff('purser', role='cabin_crew')
+        self.mine = CrewAssignment.objects.create(staff=self.captain, flight=self.flight, role_on_flight='Captain')
+        CrewAssignment.objects.create(staff=self.purser, flight=self.flight, role_on_flight='Purser')
+        for i, (seat, seat_class) in enumerate([('1A', 'first'), ('2A', 'business'), ('2B', 'business'),
+                                                ('10A', 'economy'), ('10B', 'economy')]):
+            make_booking(make_passenger(i), self.flight, seat, seat_class=seat_class)
+        make_booking(make_passenger(9), self.flight, '10C', status='cancelled')
+        wheelchair = Booking.objects.get(seat_number='10A')
+        wheelchair.passenger.mobility_assistance = True
+        wheelchair.passenger.save()
+        CheckIn.objects.create(booking=Booking.objects.get(seat_number='2A'), gate_number='A1', seat_number='2A',
+                               special_assistance='Travelling with an infant')
+
+    def test_packet_counts_live_passengers_and_crew(self):
+        packet = briefing_packet(self.flight).data
+        self.assertEqual(packet['passengers'], {
+            'total': 5, 'checked_in': 1, 'first': 1, 'business': 2, 'economy': 2,
+            'mobility_assistance': 1, 'special_assistance': 2,
+        })
+        self.assertEqual([(p['seat'], p['needs']) for p in packet['assistance']],
+                         [('10A', 'Mobility assistance'), ('2A', 'Travelling with an infant')])
+        self.assertEqual([(c['name'], c['role']) for c in packet['crew']],
+                         [('Captain Crew', 'Captain'), ('Purser Crew', 'Purser')])
+        self.assertEqual(packet['route']['origin'], 'DEL')
+
+    def test_packet_is_shared_until_an_input_changes(self):
+        first = briefing_packet(self.flight)
+        with self.assertNumQueries(1):
+            self.assertEqual(briefing_packet(self.flight).data, first.data)
+
+        self.mine.briefing_completed = True
+        self.mine.save(update_fields=['briefing_completed'])
+        self.assertTrue(BriefingPacket.objects.get(flight=self.flight).is_current)
+
+        make_booking(make_passenger(20), self.flight, '11A')
+        self.assertFalse(BriefingPacket.objects.get(flight=self.flight).is_current)
+        rebuilt = briefing_packet(self.flight)
+        self.assertEqual(rebuilt.data['passengers']['total'], 6)
+        self.assertEqual(rebuilt.built_version, first.built_version + 1)
+
+        # Bulk writes skip signals and outdate every packet at once instead
+        Booking.objects.filter(seat_number='11A').update(status='cancelled')
+        invalidate_all_packets()
+        self.assertEqual(briefing_packet(self.flight).data['passengers']['total'], 5)
+
+    def test_packet_created_concurrently_is_reread(self):
+        def create_first(**kwargs):
+            BriefingPacket.objects.create(**kwargs)
+            raise IntegrityError('UNIQUE constraint failed: core_briefingpacket.flight_id')
+
+        with mock.patch.object(BriefingPacket.objects, 'get_or_create', side_effect=create_first):
+            packet = briefing_packet(self.flight)
+        self.assertEqual(packet.data['passengers']['total'], 5)
+        self.assertEqual(BriefingPacket.objects.filter(flight=self.flight).count(), 1)
+
+    def test_briefing_page_reads_the_packet(self):
+        briefing_packet(self.flight)
+        self.client.login(username='purser', password='pw')
+        assignment = CrewAssignment.objects.get(staff=self.purser)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('crew:flight_briefing', args=[assignment.id]))
+        self.assertContains(response, 'First: 1 · Business: 2 · Economy: 2')
+        self.assertContains(response, 'Captain Crew — Captain')
+        self.assertFalse(any('core_booking' in q['sql'] for q in ctx.captured_queries))
+
+
+class QualificationScanTests(TestCase):
+    """The expiry scan updates the whole workforce and its assignments in bulk"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('ops', password='pw', is_staff=True)
+        self.today = timezone.localdate()
+        self.current = make_staff('current', license_expiry=self.today + timedelta(days=400))
+        self.lapsed = make_staff('lapsed', medical_expiry=self.today - timedelta(days=1))
+        self.soon = make_staff('soon', license_expiry=self.today + timedelta(days=10),
+                               next_training_due=self.today + timedelta(days=12))
+        departure = timezone.now() + timedelta(days=20)
+        self.after_lapse = CrewAssignment.objects.create(
+            staff=self.soon, flight=make_flight('QS1', departure), role_on_flight='Captain')
+        self.before_lapse = CrewAssignment.objects.create(
+            staff=self.soon, flight=make_flight('QS2', timezone.now() + timedelta(days=2)), role_on_flight='Captain')
+        self.grounded = CrewAssignment.objects.create(
+            staff=self.lapsed, flight=make_flight('QS3', departure + timedelta(days=1)), role_on_flight='Captain')
+
+    def open_alerts(self):
+        return set(SystemAlert.objects.filter(affected_system=QUALIFICATION_ALERT_SYSTEM, is_resolved=False)
+                   .values_list('alert_type', 'title'))
+
+    def test_scan_expires_staff_flags_assignments_and_alerts(self):
+        with self.assertNumQueries(16):
+            result = scan_qualifications(self.user)
+        self.assertEqual((result['expired'], result['renewed'], result['flagged']), (1, 0, 2))
+        self.assertEqual(dict(Staff.objects.values_list('employee_id', 'qualification_status')), {
+            'EMP-current': 'current', 'EMP-lapsed': 'expired', 'EMP-soon': 'current',
+        })
+        self.assertEqual(dict(CrewAssignment.objects.values_list('flight__flight_number', 'qualification_flag')), {
+            'QS1': 'license', 'QS2': '', 'QS3': 'medical',
+        })
+        self.assertEqual({alert_type for alert_type, _ in self.open_alerts()}, {'critical', 'warning', 'error'})
+        self.assertEqual(len(self.open_alerts()), 5)
+
+        # A second run repeats the same alerts rather than adding rows
+        scan_qualifications(self.user)
+        self.assertEqual(SystemAlert.objects.filter(affected_system=QUALIFICATION_ALERT_SYSTEM).count(), 5)
+
+    def test_renewal_clears_status_flags_and_alerts(self):
+        scan_qualifications(self.user)
+        Staff.objects.filter(pk=self.lapsed.pk).update(medical_expiry=self.today + timedelta(days=365))
+        result = scan_qualifications(self.user)
+        self.assertEqual(result['renewed'], 1)
+        self.assertEqual(Staff.objects.get(pk=self.lapsed.pk).qualification_status, 'current')
+        self.assertEqual(CrewAssignment.objects.get(pk=self.grounded.pk).qualification_flag, '')
+        self.assertFalse(any('Lapsed Crew' in title or 'QS3' in title for _, title in self.open_alerts()))
+        self.assertEqual(result['resolved'], 2)
+
+    def test_pending_review_is_left_alone(self):
+        Staff.objects.filter(pk__in=[self.current.pk, self.lapsed.pk]).update(qualification_status='pending')
+        self.assertEqual(scan_qualifications(self.user)['renewed'], 0)
+        self.assertEqual(set(Staff.objects.filter(pk__in=[self.current.pk, self.lapsed.pk]).values_list(
+            'qualification_status', flat=True)), {'pending'})
+
+
+class CrewMessagingTests(TestCase):
+    """Messages are delivered in bulk and inboxes page by delivery id"""
+
+    def setUp(self):
+        cache.clear()
+        self.ops = User.objects.create_user('ops', password='pw', is_staff=True, first_name='Crew', last_name='Control')
+        self.crew = [make_staff(f'crew{i}', role='cabin_crew') for i in range(3)]
+        self.departure = timezone.now() + timedelta(days=3)
+
+    def fly(self, staff, number, aircraft_type='Airbus A320'):
+        CrewAssignment.objects.create(staff=staff, role_on_flight='Cabin Crew',
+                                      flight=make_flight(number, self.departure, aircraft_type=aircraft_type))
+
+    def test_fleet_broadcast_is_bulk_inserted(self):
+        for i, staff in enumerate(self.crew):
+            self.fly(staff, f'MS{i}')
+        self.fly(make_staff('widebody'), 'MS9', aircraft_type='Boeing 777')
+        with self.captureOnCommitCallbacks():
+            broadcast(self.ops, 'Schedule change', 'New times', 'fleet', aircraft_type='airbus a320')
+        more = [make_staff(f'extra{i}', role='cabin_crew') for i in range(20)]
+        for i, staff in enumerate(more):
+            self.fly(staff, f'MX{i}')
+        with self.captureOnCommitCallbacks(), self.assertNumQueries(7):  # audience, message, deliveries, counters
+            message = broadcast(self.ops, 'Schedule change', 'Later times', 'fleet', aircraft_type='Airbus A320')
+
+        self.assertEqual((message.recipient_count, message.sender_name), (23, 'Crew Control'))
+        self.assertEqual(unread_count(self.crew[0].user), 2)
+        self.assertEqual(unread_count(more[0].user), 1)
+        self.assertEqual(unread_count(User.objects.get(username='widebody')), 0)
+        with self.assertRaisesMessage(ValueError, 'No active crew'):
+            broadcast(self.ops, 'Hello', '', 'fleet', aircraft_type='Concorde')
+
+    def test_inbox_pages_by_keyset_and_counts_reads(self):
+        user = self.crew[0].user
+        with self.captureOnCommitCallbacks():
+            for i in range(5):
+                send_message([user.id, self.crew[1].user_id], f'Notice {i}')
+        page, before = inbox(user, limit=2)
+        self.assertEqual([d.message.subject for d in page], ['Notice 4', 'Notice 3'])
+        with self.assertNumQueries(1):
+            page, before = inbox(user, before=before, limit=2)
+            self.assertEqual([d.message.subject for d in page], ['Notice 2', 'Notice 1'])
+        page, before = inbox(user, before=before, limit=2)
+        self.assertEqual(([d.message.subject for d in page], before), (['Notice 0'], None))
+
+        self.assertEqual(mark_read(user, [page[0].id]), 1)
+        self.assertEqual(mark_read(user, [page[0].id]), 0)  # already read; the counter stays put
+        self.assertEqual(unread_count(user), 4)
+        self.assertEqual(unread_count(self.crew[1].user), 5)
+
+        self.client.login(username='crew0', password='pw')
+        response = self.client.get(reverse('crew:message_inbox'), {'limit': 3})
+        data = response.json()
+        self.assertEqual(([m['subject'] for m in data['messages']], data['unread']),
+                         (['Notice 4', 'Notice 3', 'Notice 2'], 4))
+        data = self.client.get(reverse('crew:message_inbox'), {'before': data['next_before']}).json()
+        self.assertEqual([m['read'] for m in data['messages']], [False, True])
+        response = self.client.post(reverse('crew:messages'), {'action': 'mark_read', 'delivery_id': 'x'})
+        self.assertEqual(response.status_code, 302)
+        self.client.post(reverse('crew:messages'), {'action': 'mark_all_read'})
+        self.assertEqual(InboxCounter.objects.get(user=user).unread, 0)
+        self.assertContains(self.client.get(reverse('crew:messages')), 'Notice 4')
+
+    async def test_stream_only_carries_own_messages(self):
+        hub = EventHub(LocalBroker())
+        stream = inbox_stream(hub, 7)
+        self.assertEqual(await stream.__anext__(), ': connected\n\n')
+        hub.publish('alert.created', {'id': 1})
+        hub.publish('message.new', {'id': 2, 'subject': 'Not yours', 'user_ids': [8]})
+        hub.publish('message.new', {'id': 3, 'subject': 'Yours', 'user_ids': [7, 8]})
+        frame = await asyncio.wait_for(stream.__anext__(), timeout=1)
+        self.assertEqual(frame, 'event: message.new\ndata: {"id": 3, "subject": "Yours"}\n\n')
+        await stream.aclose()
+        self.assertEqual(hub.subscriber_count, 0)
+
+    def test_operations_message_a_flight_crew(self):
+        self.fly(self.crew[0], 'MF1')
+        flight = Flight.objects.get(flight_number='MF1')
+        self.client.login(username='ops', password='pw')
+        response = self.client.post(reverse('airline:crew_rosters'), {
+            'action': 'message_crew', 'audience': 'flight', 'flight_number': 'mf1',
+            'service_date': flight.service_date.isoformat(), 'priority': 'high', 'subject': 'Gate change',
+        }, follow=True)
+        self.assertContains(response, 'Message sent to 1 crew members.')
+        message = CrewMessage.objects.get()
+        self.assertEqual((message.flight, message.audience_label[:3]), (flight, 'MF1'))
+        self.assertEqual(list(MessageRecipient.objects.values_list('user__username', flat=True)), ['crew0'])
+
+        response = self.client.post(reverse('airline:crew_rosters'), {
+            'action': 'message_crew', 'audience': 'role', 'priority': 'normal', 'subject': 'Hello',
+        })
+        self.assertContains(response, 'Choose the role to message.')
+
+
+class RosterFeedTests(TestCase):
+    """Calendar apps poll a tokenized roster feed and mostly get 304s"""
+
+    def setUp(self):
+        cache.clear()
+        self.staff = make_staff('feeder')
+        departure = timezone.now() + timedelta(days=2)
+        self.flight = make_flight('CF1', departure, airline='Test Air, Regional')
+        self.assignment = CrewAssignment.objects.create(staff=self.staff, flight=self.flight,
+                                                        role_on_flight='Captain')
+        self.dropped = CrewAssignment.objects.create(staff=self.staff, role_on_flight='Captain',
+                                                     flight=make_flight('CF2', departure + timedelta(days=1)))
+        CrewAssignment.objects.create(staff=self.staff, role_on_flight='Captain', status='cancelled',
+                                      flight=make_flight('CF3', departure + timedelta(days=2)))
+        self.client.login(username='feeder', password='pw')
+        self.assertIsNone(self.client.get(reverse('crew:my_roster')).context['feed_url'])
+        self.client.post(reverse('crew:my_roster'), {'action': 'reset_calendar_token'})
+        self.url = self.client.get(reverse('crew:my_roster')).context['feed_url']
+        self.client.logout()
+
+    def fetch(self, **extra):
+        return self.client.get(self.url, **extra)
+
+    def test_feed_streams_events_with_briefing_links(self):
+        response = self.fetch()
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = b''.join(response.streaming_content).decode()
+        lines = body.split('\r\n')
+        self.assertTrue(all(len(line.encode()) <= 75 for line in lines))
+        unfolded = body.replace('\r\n ', '')
+        self.assertEqual(unfolded.count('BEGIN:VEVENT'), 2)
+        self.assertIn(f'UID:assignment-{self.assignment.id}@testserver', unfolded)
+        self.assertIn(f'DTSTART:{self.flight.departure_time.astimezone(dt_timezone.utc):%Y%m%dT%H%M%SZ}', unfolded)
+        self.assertIn(f'Briefing: http://testserver/crew/briefing/{self.assignment.id}/', unfolded)
+        self.assertIn('Captain on Test Air\\, Regional CF1', unfolded)
+        self.assertNotIn('CF3', unfolded)
+
+    def test_unchanged_feed_answers_304(self):
+        response = self.fetch()
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        with self.assertNumQueries(2):  # token lookup and one aggregate
+            self.assertEqual(self.fetch(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.fetch(HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        self.flight.gate_number = 'B7'
+        self.flight.save()
+        response = self.fetch(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # Removed duties leave no timestamp behind but still change the feed
+        etag = response['ETag']
+        self.dropped.delete()
+        self.assertEqual(self.fetch(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_gate_assignment_changes_feed(self):
+        etag = self.fetch()['ETag']
+        Gate.objects.create(gate_number='F9', terminal='1')
+        assign_gates_for_day(timezone.localdate(self.flight.departure_time), home_airport='')
+        response = self.fetch(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Gate: F9', b''.join(response.streaming_content).decode().replace('\r\n ', ''))
+
+    def test_reset_link_retires_old_feed(self):
+        self.client.login(username='feeder', password='pw')
+        self.client.post(reverse('crew:my_roster'), {'action': 'reset_calendar_token'})
+        self.client.logout()
+        self.assertEqual(self.fetch().status_code, 404)
+        self.staff.refresh_from_db()
+        self.assertEqual(self.client.get(reverse('crew:roster_feed', args=[self.staff.calendar_token])).status_code,
+                         200)
+
+
+def core_url_patterns(patterns=None, namespace=''):
+    """(view name, pattern) of every route in the core urlconfs"""
+    for entry in get_resolver('core.urls').url_patterns if patterns is None else patterns:
+        if isinstance(entry, URLResolver):
+            yield from core_url_patterns(entry.url_patterns, entry.namespace or namespace)
+        elif entry.name:
+            yield f'{namespace}:{entry.name}' if namespace else entry.name, entry
+
+
+class QueryBudgetTests(TestCase):
+    """Every page stays within its query budget however many rows it shows"""
+
+    # Infinite event streams never finish a request
+    SKIPPED_VIEWS = {'airline:flight_position_stream', 'airline:operations_event_stream', 'crew:message_stream'}
+
+    def setUp(self):
+        cache.clear()
+        self.ops = User.objects.create_user('ops', password='pw', is_staff=True, is_superuser=True)
+        self.crew = make_staff('budget', calendar_token='budget-token')
+        self.customer = User.objects.create_user('flyer', password='pw')
+        self.passenger = make_passenger(0)
+        self.passenger.user = self.customer
+        self.passenger.save()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = self.settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.profile = RequestProfile(path='/', status_code=200, total_ms=1, sql_ms=0, query_count=0, template_ms=0)
+        self.profile.profile_file.save('budget.prof', ContentFile(marshal.dumps({})))
+        self.rows = 0
+        self.add_rows(1)
+
+    def add_rows(self, count):
+        """Another flight per row, with bookings, a check-in, crew, an alert and an audit entry"""
+        departure = timezone.now() + timedelta(hours=3)
+        for _ in range(count):
+            self.rows += 1
+            i = self.rows
+            flight = make_flight(f'QB{i}', departure + timedelta(hours=i), total_seats=10, gate_number=f'A{i}')
+            booking = make_booking(self.passenger, flight, f'{i}A')
+            for seat in 'BC':
+                make_booking(make_passenger(i * 10 + ord(seat)), flight, f'{i}{seat}')
+            CheckIn.objects.create(booking=booking, gate_number=flight.gate_number, seat_number=booking.seat_number)
+            make_staff(f'crew{i}', role='cabin_crew')
+            assignment = CrewAssignment.objects.create(staff=self.crew, flight=flight, role_on_flight='Captain')
+            SystemAlert.objects.create(title=f'Alert {i}', message='Check', alert_type='warning',
+                                       affected_system='Test', created_by=self.ops)
+            AuditLog.objects.create(user=self.ops, action_type='update', description=f'Change {i}',
+                                    portal_used='airline')
+        self.flight, self.booking, self.assignment = flight, booking, assignment
+
+    def url_kwargs(self):
+        return {
+            'flight_id': self.flight.id,
+            'passenger_id': self.passenger.id,
+            'booking_reference': self.booking.booking_reference,
+            'chart_type': 'destinations',
+            'alert_id': SystemAlert.objects.latest('id').id,
+            'assignment_id': self.assignment.id,
+            'token': self.crew.calendar_token,
+            'user_id': self.customer.id,
+            'profile_id': self.profile.id,
+        }
+
+    def user_for(self, view_name):
+        if view_name.startswith('customer:') or view_name == 'home':
+            return self.customer
+        if view_name.startswith('crew:'):
+            return self.crew.user
+        return self.ops
+
+    def assert_query_budgets(self):
+        """GET every core URL as a user who may see it; returns {view name: queries}"""
+        counts = {}
+        kwargs = self.url_kwargs()
+        for view_name, pattern in core_url_patterns():
+            if view_name in self.SKIPPED_VIEWS:
+                continue
+            self.client.force_login(self.user_for(view_name))
+            url = reverse(view_name, kwargs={name: kwargs[name] for name in pattern.pattern.converters})
+            response = self.client.get(url)
+            self.assertLess(response.status_code, 500, url)
+            stats = response.query_stats
+            self.assertLessEqual(stats.count, query_budget(view_name), url)
+            self.assertEqual(stats.repeated, [], url)
+            counts[view_name] = stats.count
+        return counts
+
+    def test_every_url_within_budget(self):
+        few = self.assert_query_budgets()
+        self.add_rows(REPEAT_THRESHOLD + 2)
+        many = self.assert_query_budgets()
+        grown = {view_name: (few[view_name], count) for view_name, count in many.items() if count > few[view_name]}
+        self.assertEqual(grown, {})
+
+    async def test_budget_recorded_under_asgi(self):
+        await self.async_client.aforce_login(self.ops)
+        response = await self.async_client.get(reverse('flight_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(response.query_stats.count, 0)
+
+    def test_repeated_queries_logged_and_reported(self):
+        def per_flight(request):
+            return HttpResponse(str(sum(Flight.objects.filter(id=flight.id).count() for flight in Flight.objects.all())))
+
+        self.add_rows(REPEAT_THRESHOLD)
+        middleware = QueryBudgetMiddleware(per_flight)
+        request = RequestFactory().get('/flights/')
+        request.resolver_match = None
+        with self.settings(DEBUG=True), self.assertLogs('core.query_budget', 'WARNING') as logs:
+            response = middleware(request)
+        self.assertEqual(response['X-Query-Count'], str(Flight.objects.count() + 1))
+        self.assertEqual(response['X-Query-Repeats'], '1')
+        self.assertEqual(response.query_stats.repeated[0][1], Flight.objects.count())
+        self.assertIn('/flights/', logs.output[0])
+
+
+class RequestProfilerTests(TestCase):
+    """System admins can profile one request; everyone else pays nothing"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = self.settings(REQUEST_PROFILER_ENABLED=True, MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.admin = User.objects.create_user('root', password='pw', is_staff=True, is_superuser=True)
+        make_flight('RP1', timezone.now() + timedelta(days=1))
+
+    def test_admin_request_is_profiled(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('flight_list'), {'profile': '1'})
+        self.assertEqual(response.status_code, 200)
+        profile = RequestProfile.objects.get(id=response['X-Profile-Id'])
+        self.assertEqual((profile.user, profile.view_name, profile.status_code), (self.admin, 'flight_list', 200))
+        self.assertGreater(profile.query_count, 0)
+        self.assertGreater(profile.template_ms, 0)
+        self.assertLessEqual(profile.sql_ms, profile.total_ms)
+
+        download = self.client.get(reverse('admin_portal:download_profile', args=[profile.id]))
+        self.assertIn('attachment', download['Content-Disposition'])
+        functions = marshal.loads(b''.join(download.streaming_content))  # the pstats dump format
+        self.assertTrue(any(name == 'flight_list' for _, _, name in functions))
+        self.assertContains(self.client.get(reverse('admin_portal:request_profiles')), 'flight_list')
+
+    async def test_admin_request_is_profiled_under_asgi(self):
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get(reverse('flight_list'), {'profile': '1'})
+        profile = await RequestProfile.objects.aget(id=response['X-Profile-Id'])
+        self.assertGreater(profile.query_count, 0)
+
+    def test_only_requested_admin_requests_are_profiled(self):
+        make_staff('flyer', role='pilot')
+        self.client.login(username='flyer', password='pw')
+        self.assertNotIn('X-Profile-Id', self.client.get(reverse('crew:my_roster'), HTTP_X_PROFILE='1'))
+        self.client.force_login(self.admin)
+        self.client.get(reverse('flight_list'))
+        self.assertFalse(RequestProfile.objects.exists())
+        self.client.get(reverse('flight_list'), HTTP_X_PROFILE='1')
+        self.assertEqual(RequestProfile.objects.count(), 1)
+
+    def test_disabled_profiler_leaves_the_chain(self):
+        with self.settings(REQUEST_PROFILER_ENABLED=False), self.assertRaises(MiddlewareNotUsed):
+            RequestProfilerMiddleware(lambda request: HttpResponse())
+
+
+class SyntheticDataTests(TestCase):
+    """Generated data is deterministic, consistent and written in bulk"""
+
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.make_aware(datetime(2030, 6, 15, 12, 0))
+
+    def generate(self, seed=7, **kwargs):
+        dataset = SyntheticDataset(scale=0.5, seed=seed, days=4, now=self.now, chunk_size=200, **kwargs)
+        return dataset.generate()
+
+    def snapshot(self, seed):
+        """Bookings generated from a seed, rolled back afterwards"""
+        with transaction.atomic():
+            self.generate(seed)
+            bookings = sorted(Booking.objects.values_list(
+                'flight__flight_number', 'flight__service_date', 'seat_number', 'status', 'passenger__email'))
+            transaction.set_rollback(True)
+        return bookings
+
+    def test_same_seed_same_data(self):
+        first = self.snapshot(7)
+        self.assertTrue(first)
+        self.assertEqual(self.snapshot(7), first)
+        self.assertNotEqual(self.snapshot(8), first)
+
+    def test_rows_are_consistent(self):
+        with CaptureQueriesContext(connection) as queries:
+            counts = self.generate()
+        self.assertEqual(counts['bookings'], Booking.objects.count())
+        self.assertLess(len(queries), counts['bookings'] / 10)
+
+        flights = Flight.objects.annotate(
+            sold=Count('booking', filter=~Q(booking__status='cancelled'), distinct=True),
+            crew=Count('crewassignment', distinct=True))
+        for flight in flights:
+            self.assertEqual(flight.available_seats, flight.total_seats - flight.sold)
+            self.assertGreaterEqual(flight.crew, 3)
+            if flight.status == 'cancelled':
+                self.assertEqual(flight.sold, 0)
+            elif flight.arrival_time + timedelta(hours=12) < self.now:
+                self.assertEqual(flight.status, 'arrived')
+        self.assertFalse(CheckIn.objects.exclude(booking__status__in=['completed', 'checked_in']).exists())
+        self.assertFalse(Booking.objects.filter(status='checked_in', checkin__isnull=True).exists())
+        self.assertFalse(CrewAssignment.objects.filter(flight__status='arrived').exclude(status='completed').exists())
+        self.assertEqual(AuditLog.objects.filter(model_name='Flight').count(), counts['flights'])
+        # Sequences still hand out fresh ids after rows written with their own
+        self.assertGreater(make_booking(make_passenger(1), Flight.objects.first(), '99Z').id, counts['bookings'])
+
+    def test_command_refuses_to_load_twice(self):
+        out = io.StringIO()
+        call_command('generate_synthetic_data', scale=0.25, days=2, seed=1, stdout=out)
+        self.assertIn('bookings', out.getvalue())
+        with self.assertRaisesMessage(CommandError, 'already loaded'):
+            call_command('generate_synthetic_data', scale=0.25, days=2, stdout=io.StringIO())
@@ -0,0 +1,166 @@
+# Aircraft Turnaround Critical-Path Scheduler
+from collections import namedtuple
+from datetime import timedelta
+from functools import lru_cache
+
+from .models import Flight
+
+# Standard turnaround tasks; durations in minutes. Tasks whose dependencies
+# are met run in parallel (e.g. cleaning, catering and fuelling).
+TURNAROUND_TASKS = [
+    {'key': 'deboarding', 'task': 'Passenger Disembarkation', 'duration': 20, 'depends_on': []},
+    {'key': 'unloading', 'task': 'Baggage Unloading', 'duration': 20, 'depends_on': []},
+    {'key': 'cleaning', 'task': 'Cabin Cleaning', 'duration': 30, 'depends_on': ['deboarding']},
+    {'key': 'catering', 'task': 'Catering Service', 'duration': 15, 'depends_on': ['deboarding']},
+    {'key': 'fuelling', 'task': 'Fuel Service', 'duration': 25, 'depends_on': ['deboarding']},
+    {'key': 'loading', 'task': 'Baggage Loading', 'duration': 25, 'depends_on': ['unloading']},
+    {'key': 'safety_check', 'task': 'Safety Check', 'duration': 15,
+     'depends_on': ['cleaning', 'catering', 'fuelling']},
+    {'key': 'boarding', 'task': 'Passenger Boarding', 'duration': 30, 'depends_on': ['safety_check']},
+]
+
+# Inbound and outbound legs further apart than this are not one turnaround
+MAX_TURNAROUND_GAP = timedelta(hours=12)
+
+TaskTiming = namedtuple('TaskTiming', ['key', 'task', 'duration', 'earliest_start', 'earliest_finish',
+                                       'latest_start', 'slack', 'critical'])
+
+
+def topological_order(tasks):
+    """Task keys ordered so every task follows its dependencies"""
+    by_key = {t['key']: t for t in tasks}
+    order, state = [], {}
+
+    def visit(key):
+        if state.get(key) == 'done':
+            return
+        if state.get(key) == 'visiting':
+            raise ValueError(f'Turnaround task dependency cycle at {key}')
+        state[key] = 'visiting'
+        for dependency in by_key[key]['depends_on']:
+            visit(dependency)
+        state[key] = 'done'
+        order.append(key)
+
+    for task in tasks:
+        visit(task['key'])
+    return order
+
+
+def critical_path_analysis(tasks):
+    """Earliest/latest times (minutes after on-block), slack and total length"""
+    by_key = {t['key']: t for t in tasks}
+    order = topological_order(tasks)
+
+    earliest_finish = {}
+    for key in order:
+        start = max((earliest_finish[d] for d in by_key[key]['depends_on']), default=0)
+        earliest_finish[key] = start + by_key[key]['duration']
+    length = max(earliest_finish.values(), default=0)
+
+    successors = {key: [] for key in order}
+    for key in order:
+        for dependency in by_key[key]['depends_on']:
+            successors[dependency].append(key)
+    latest_start = {}
+    for key in reversed(order):
+        latest_finish = min((latest_start[s] for s in successors[key]), default=length)
+        latest_start[key] = latest_finish - by_key[key]['duration']
+
+    timings = []
+    for key in order:
+        task = by_key[key]
+        es = earliest_finish[key] - task['duration']
+        slack = latest_start[key] - es
+        timings.append(TaskTiming(key, task['task'], task['duration'], es, earliest_finish[key],
+                                  latest_start[key], slack, slack == 0))
+    return timings, length
+
+
+@lru_cache(maxsize=1)
+def standard_turnaround():
+    """Critical-path analysis of the standard task list, computed once"""
+    return critical_path_analysis(TURNAROUND_TASKS)
+
+
+class TurnaroundPlan:
+    """One aircraft rotation: inbound on-block to outbound off-block
+
+    Task offsets from on-block are fixed, so re-planning after an arrival slip
+    only shifts the plan instead of re-running the analysis.
+    """
+
+    def __init__(self, aircraft, inbound, outbound, on_block=None):
+        self.aircraft = aircraft
+        self.inbound = inbound
+        self.outbound = outbound
+        self.timings, self.critical_minutes = standard_turnaround()
+        self.replan(on_block)
+
+    def replan(self, on_block=None):
+        self.on_block = (on_block or self.inbound.actual_arrival or self.inbound.estimated_arrival
+                         or self.inbound.arrival_time)
+        self.earliest_off_block = self.on_block + timedelta(minutes=self.critical_minutes)
+        self.scheduled_off_block = self.outbound.departure_time
+        self.planned_off_block = max(self.earliest_off_block, self.scheduled_off_block)
+        return self
+
+    @property
+    def projected_delay_minutes(self):
+        return max(0, int((self.earliest_off_block - self.scheduled_off_block).total_seconds() // 60))
+
+    @property
+    def buffer_minutes(self):
+        return int((self.scheduled_off_block - self.earliest_off_block).total_seconds() // 60)
+
+    @property
+    def tasks(self):
+        return [
+            {
+                'task': t.task,
+                'duration': t.duration,
+                'start': self.on_block + timedelta(minutes=t.earliest_start),
+                'finish': self.on_block + timedelta(minutes=t.earliest_finish),
+                'slack': t.slack,
+                'critical': t.critical,
+            }
+            for t in self.timings
+        ]
+
+    @property
+    def critical_path(self):
+        return [t.task for t in self.timings if t.critical]
+
+
+def pair_rotations(flights):
+    """Pair consecutive legs of each aircraft into (inbound, outbound) turnarounds
+
+    ``flights`` must be ordered by aircraft and departure time.
+    """
+    pairs = []
+    previous = None
+    for flight in flights:
+        if (previous is not None and previous.aircraft_id == flight.aircraft_id
+                and flight.departure_time >= previous.arrival_time
+                and flight.departure_time - previous.arrival_time <= MAX_TURNAROUND_GAP
+                and (previous.arrival_airport == flight.departure_airport
+                     or 'UNK' in (previous.arrival_airport, flight.departure_airport))):
+            pairs.append((previous, flight))
+        previous = flight
+    return pairs
+
+
+def plan_turnarounds(start, end):
+    """Plans for every turnaround whose outbound leg departs in [start, end)"""
+    flights = Flight.objects.filter(
+        aircraft__isnull=False,
+        departure_time__gte=start - MAX_TURNAROUND_GAP,
+        departure_time__lt=end,
+    ).exclude(status='cancelled').select_related('aircraft').order_by('aircraft_id', 'departure_time')
+    plans = [
+        TurnaroundPlan(outbound.aircraft, inbound, outbound)
+        for inbound, outbound in pair_rotations(flights)
+        if outbound.departure_time >= start
+    ]
+    plans.sort(key=lambda p: p.scheduled_off_block)
+    return plans
@@ -28,6 +28,10 @@ urlpatterns = [
     # System Metrics
     path('metrics/', views_admin.system_metrics, name='system_metrics'),
     
+    # Request Profiles
+    path('profiles/', views_admin.request_profiles, name='request_profiles'),
+    path('profiles/<int:profile_id>/download/', views_admin.download_profile, name='download_profile'),
+    
     # Database Management
     path('database/', views_admin.database_backup, name='database_backup'),
 ]
@@ -10,6 +10,7 @@ urlpatterns = [
     
     # Flight Management
     path('flights/schedule/', views_airline.flight_scheduling, name='flight_scheduling'),
+    path('flights/import/', views_airline.schedule_import, name='schedule_import'),
     
     # Gate Management
     path('gates/', views_airline.gate_management, name='gate_management'),
@@ -20,13 +21,18 @@ urlpatterns = [
     # Turnaround Operations
     path('turnaround/', views_airline.turnaround_coordination, name='turnaround_coordination'),
     
+    # Crew Rosters
+    path('crew/rosters/', views_airline.crew_rosters, name='crew_rosters'),
+    
     # Analytics and Reporting
     path('analytics/', views_airline.analytics_reporting, name='analytics_reporting'),
     
     # Live Flight Map
     path('flight-map/', views_airline.live_flight_map, name='live_flight_map'),
+    path('flight-map/stream/', views_airline.flight_position_stream, name='flight_position_stream'),
     
     # System Alerts
     path('alerts/', views_airline.system_alerts, name='system_alerts'),
     path('alerts/<int:alert_id>/resolve/', views_airline.resolve_alert, name='resolve_alert'),
+    path('alerts/stream/', views_airline.operations_event_stream, name='operations_event_stream'),
 ]
@@ -10,6 +10,7 @@ urlpatterns = [
     
     # Roster Management
     path('roster/', views_crew.my_roster, name='my_roster'),
+    path('roster/<str:token>/roster.ics', views_crew.roster_feed, name='roster_feed'),
     
     # Flight Briefing
     path('briefing/<int:assignment_id>/', views_crew.flight_briefing, name='flight_briefing'),
@@ -25,6 +26,8 @@ urlpatterns = [
     
     # Messages
     path('messages/', views_crew.crew_messages, name='messages'),
+    path('messages/inbox/', views_crew.message_inbox, name='message_inbox'),
+    path('messages/stream/', views_crew.message_stream, name='message_stream'),
     
     # Training Center
     path('training/', views_crew.training_center, name='training_center'),
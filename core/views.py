@@ -223,7 +223,7 @@ def staff_list(request):
 @user_passes_test(is_staff_user)
 def checkin_list(request):
     """List all check-ins"""
-    checkins = CheckIn.objects.select_related('booking__passenger', 'booking__flight').order_by('-check_in_time')
+    checkins = CheckIn.objects.select_related('booking__passenger', 'booking__flight', 'staff__user').order_by('-check_in_time')
     
     paginator = Paginator(checkins, 15)
     page_number = request.GET.get('page')
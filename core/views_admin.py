@@ -3,16 +3,21 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.models import User, Group, Permission
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
-from django.db.models import Q, Count
+from django.conf import settings
+from django.http import FileResponse, JsonResponse, HttpResponse
+from django.db.models import Q, Count, Sum
+from django.db.models.functions import TruncDate
 from django.core.paginator import Paginator
 from django.utils import timezone
 from datetime import datetime, timedelta, date
+from decimal import Decimal
 import json
+import os
 
 from .models import (UserProfile, Staff, SystemAlert, AuditLog, FlightOperationsMetrics,
-                    Flight, Booking, Passenger, Gate, Aircraft)
+                    Flight, Booking, Passenger, Gate, Aircraft, RequestProfile)
 from .forms import UserManagementForm, SystemConfigForm
+from .gate_timeline import gate_utilization_by_day
 
 def is_system_admin(user):
     """Check if user has system admin access"""
@@ -348,7 +353,7 @@ def integration_monitor(request):
 @user_passes_test(is_system_admin)
 def audit_log(request):
     """Audit Log Viewer"""
-    logs = AuditLog.objects.all().order_by('-timestamp')
+    logs = AuditLog.objects.select_related('user').order_by('-timestamp')
     
     # Filter by action type
     action_type = request.GET.get('action_type')
@@ -403,29 +408,34 @@ def system_metrics(request):
     if request.GET.get('end_date'):
         end_date = datetime.strptime(request.GET.get('end_date'), '%Y-%m-%d').date()
     
-    # Generate or retrieve metrics
-    metrics = []
-    current_date = start_date
-    while current_date <= end_date:
-        # Get or create metrics for this date
-        metric, created = FlightOperationsMetrics.objects.get_or_create(
-            date=current_date,
-            defaults={
-                'total_flights': Flight.objects.filter(departure_time__date=current_date).count(),
-                'total_passengers': Booking.objects.filter(
-                    flight__departure_time__date=current_date,
-                    status__in=['confirmed', 'checked_in']
-                ).count(),
-                'revenue': sum(
-                    booking.total_amount for booking in Booking.objects.filter(
-                        flight__departure_time__date=current_date,
-                        payment_status=True
-                    )
-                ),
-            }
-        )
-        metrics.append(metric)
-        current_date += timedelta(days=1)
+    # Retrieve stored metrics; days without any are computed together and stored
+    days = [start_date + timedelta(days=n) for n in range((end_date - start_date).days + 1)]
+    stored = {m.date: m for m in FlightOperationsMetrics.objects.filter(date__range=(start_date, end_date))}
+    missing = [day for day in days if day not in stored]
+    if missing:
+        flights = Flight.objects.filter(departure_time__date__in=missing).annotate(
+            day=TruncDate('departure_time')).values('day')
+        bookings = Booking.objects.filter(flight__departure_time__date__in=missing).annotate(
+            day=TruncDate('flight__departure_time')).values('day')
+        flight_counts = dict(flights.annotate(count=Count('id')).values_list('day', 'count'))
+        passenger_counts = dict(bookings.filter(status__in=['confirmed', 'checked_in']).annotate(
+            count=Count('id')).values_list('day', 'count'))
+        revenue = dict(bookings.filter(payment_status=True).annotate(
+            total=Sum('total_amount')).values_list('day', 'total'))
+        utilization = gate_utilization_by_day(missing)
+        created = [
+            FlightOperationsMetrics(
+                date=day,
+                total_flights=flight_counts.get(day, 0),
+                total_passengers=passenger_counts.get(day, 0),
+                revenue=revenue.get(day) or Decimal('0'),
+                gate_utilization=Decimal(str(utilization[day])),
+            )
+            for day in missing
+        ]
+        FlightOperationsMetrics.objects.bulk_create(created, batch_size=500, ignore_conflicts=True)
+        stored.update((metric.date, metric) for metric in created)
+    metrics = [stored[day] for day in days]
     
     # Calculate summary statistics
     total_revenue = sum(m.revenue for m in metrics)
@@ -444,6 +454,31 @@ def system_metrics(request):
     }
     return render(request, 'admin/system_metrics.html', context)
 
+@user_passes_test(is_system_admin)
+def request_profiles(request):
+    """Request profiles captured with ?profile=1, newest first"""
+    profiles = RequestProfile.objects.select_related('user')
+    view_name = request.GET.get('view')
+    if view_name:
+        profiles = profiles.filter(view_name=view_name)
+    
+    paginator = Paginator(profiles, 50)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    
+    context = {
+        'page_obj': page_obj,
+        'profiles': page_obj,
+        'profiler_enabled': getattr(settings, 'REQUEST_PROFILER_ENABLED', False),
+    }
+    return render(request, 'admin/request_profiles.html', context)
+
+@user_passes_test(is_system_admin)
+def download_profile(request, profile_id):
+    """Send a stored pstats dump"""
+    profile = get_object_or_404(RequestProfile, id=profile_id)
+    return FileResponse(profile.profile_file.open('rb'), as_attachment=True,
+                        filename=os.path.basename(profile.profile_file.name))
+
 @user_passes_test(is_system_admin)
 def database_backup(request):
     """Database Backup and Maintenance"""
@@ -1,17 +1,32 @@
 # Airline Operations Portal Views
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
-from django.db.models import Q, Count, Avg
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.db.models import Q, F, Count, Exists, OuterRef
 from django.core.paginator import Paginator
 from django.utils import timezone
 from datetime import datetime, timedelta, date
-import json
+import io
 
 from .models import (Flight, Passenger, Booking, Staff, CheckIn, Gate, Aircraft, 
                     CrewAssignment, SystemAlert, FlightOperationsMetrics, AuditLog)
-from .forms import FlightForm, GateAssignmentForm, CrewAssignmentForm
+from .forms import FlightForm, GateAssignmentForm, CrewAssignmentForm, CrewBroadcastForm, ScheduleImportForm
+from .analytics import flight_performance_report
+from .gate_assignment import assign_gates_for_day
+from .gate_timeline import GateOccupancyIndex, day_bounds
+from .aircraft_timeline import AircraftUtilizationIndex
+from .tail_assignment import assign_tails
+from .turnaround import plan_turnarounds, standard_turnaround
+from .delay_propagation import propagate_delays
+from .schedule_import import CSV_COLUMNS, detect_format, import_schedule
+from .flight_tracking import airborne_flights, flight_positions, broadcaster
+from .live_events import OPERATIONS_EVENTS, get_hub
+from .duty_limits import validate_assignments
+from .crew_rostering import roster_crew
+from .crew_messaging import broadcast
+from .rosters import add_months, fleet_roster, month_bounds, monthly_block_hours, roster_period
 
 def is_airline_staff(user):
     """Check if user has airline operations access"""
@@ -31,7 +46,7 @@ def operations_dashboard(request):
     # Real-time flight metrics
     flights_today = Flight.objects.filter(departure_time__date=today)
     total_flights = flights_today.count()
-    on_time_flights = flights_today.filter(status='departed', actual_departure__lte=timezone.F('departure_time')).count()
+    on_time_flights = flights_today.filter(status='departed', actual_departure__lte=F('departure_time')).count()
     delayed_flights = flights_today.filter(status='delayed').count()
     cancelled_flights = flights_today.filter(status='cancelled').count()
     
@@ -79,17 +94,40 @@ def operations_dashboard(request):
 @user_passes_test(is_airline_staff)
 def flight_scheduling(request):
     """Interactive Flight Scheduling Dashboard"""
+    if request.method == 'POST' and request.POST.get('action') == 'assign_tails':
+        result = assign_tails()
+        
+        # Log the action
+        AuditLog.objects.create(
+            user=request.user,
+            action_type='update',
+            model_name='Flight',
+            description=f"Auto-assigned aircraft: {result['assigned']} assigned, {result['changed']} changed",
+            portal_used='airline'
+        )
+        
+        if result['unassigned']:
+            messages.warning(request, f"No feasible aircraft for: {', '.join(f.flight_number for f in result['unassigned'])}")
+        messages.success(request, f"Tail plan updated: {result['changed']} of {result['assigned']} assignments changed "
+                                  f"across {len(result['chains'])} rotations.")
+        return redirect('airline:flight_scheduling')
+    
     # Get flights for the next 7 days
     start_date = timezone.now().date()
     end_date = start_date + timedelta(days=7)
     
     flights = Flight.objects.filter(
         departure_time__date__range=[start_date, end_date]
-    ).order_by('departure_time')
+    ).select_related('aircraft').order_by('departure_time')
     
     # Available aircraft
     available_aircraft = Aircraft.objects.filter(status='active')
     
+    # Fleet availability and double bookings over the same week
+    window_start, _ = day_bounds(start_date)
+    _, window_end = day_bounds(end_date)
+    fleet_index = AircraftUtilizationIndex.for_window(window_start, window_end)
+    
     # Gate availability
     gates = Gate.objects.all().order_by('gate_number')
     
@@ -109,13 +147,16 @@ def flight_scheduling(request):
             )
             
             messages.success(request, f'Flight {flight.flight_number} scheduled successfully!')
-            return redirect('flight_scheduling')
+            return redirect('airline:flight_scheduling')
     else:
         form = FlightForm()
     
     context = {
         'flights': flights,
         'available_aircraft': available_aircraft,
+        'fleet_timeline': fleet_index.timeline(window_start, window_end),
+        'aircraft_conflicts': fleet_index.conflicts(window_start, window_end),
+        'grounded_flights': fleet_index.grounded_flights(),
         'gates': gates,
         'form': form,
         'start_date': start_date,
@@ -123,62 +164,144 @@ def flight_scheduling(request):
     }
     return render(request, 'airline/flight_scheduling.html', context)
 
+@user_passes_test(is_airline_staff)
+def schedule_import(request):
+    """Bulk Schedule Import from CSV or SSIM-style files"""
+    result = None
+    if request.method == 'POST':
+        form = ScheduleImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['schedule_file']
+            lines = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+            try:
+                result = import_schedule(
+                    lines,
+                    fmt=detect_format(upload.name),
+                    update_existing=form.cleaned_data['update_existing'],
+                    dry_run=form.cleaned_data['dry_run'],
+                )
+            except UnicodeDecodeError:
+                form.add_error('schedule_file', f'{upload.name} is not UTF-8 text; save it as UTF-8 and upload it '
+                                                'again. Rows read before the error may already have been imported.')
+            
+            if result and not form.cleaned_data['dry_run']:
+                # Log the action
+                AuditLog.objects.create(
+                    user=request.user,
+                    action_type='create',
+                    model_name='Flight',
+                    description=f'Imported schedule {upload.name}: {result.created} created, '
+                                f'{result.updated} updated, {len(result.errors)} rejected',
+                    portal_used='airline'
+                )
+                messages.success(request, f'{result.imported} of {result.rows} flights imported.')
+    else:
+        form = ScheduleImportForm()
+    
+    context = {
+        'form': form,
+        'result': result,
+        'errors': result.errors[:500] if result else [],
+        'csv_columns': CSV_COLUMNS,
+    }
+    return render(request, 'airline/schedule_import.html', context)
+
 @user_passes_test(is_airline_staff)
 def gate_management(request):
     """Automated Gate Management Dashboard"""
-    gates = Gate.objects.all().order_by('terminal', 'gate_number')
+    if request.method == 'POST' and request.POST.get('action') == 'auto_assign':
+        result = assign_gates_for_day(date.today())
+        
+        # Log the action
+        AuditLog.objects.create(
+            user=request.user,
+            action_type='update',
+            model_name='Flight',
+            description=f"Auto-assigned gates: {result['assigned']} assigned, {result['changed']} changed",
+            portal_used='airline'
+        )
+        
+        if result['unassigned']:
+            messages.warning(request, f"No compatible gate for: {', '.join(f.flight_number for f in result['unassigned'])}")
+        messages.success(request, f"Gate plan updated: {result['changed']} of {result['assigned']} assignments changed.")
+        return redirect('airline:gate_management')
+    
+    gates = Gate.objects.select_related('current_flight').order_by('terminal', 'gate_number')
     
     # Current gate assignments
     current_assignments = Flight.objects.filter(
         gate__isnull=False,
         departure_time__date=date.today(),
         status__in=['scheduled', 'boarding', 'delayed']
-    ).order_by('departure_time')
+    ).select_related('gate').order_by('departure_time')
     
     # Boarding timeline for next 4 hours
     boarding_timeline = Flight.objects.filter(
         departure_time__gte=timezone.now(),
         departure_time__lte=timezone.now() + timedelta(hours=4),
         gate__isnull=False
-    ).order_by('departure_time')
+    ).select_related('gate').order_by('departure_time')
+    
+    # Free gate search, e.g. wide-body gates in Terminal 2 free from 14:10 to 15:05
+    today_index = GateOccupancyIndex.for_window(*day_bounds(date.today()))
+    free_gates = None
+    free_from = request.GET.get('free_from')
+    free_to = request.GET.get('free_to')
+    if free_from and free_to:
+        try:
+            window_start = timezone.make_aware(datetime.strptime(free_from, '%Y-%m-%dT%H:%M'))
+            window_end = timezone.make_aware(datetime.strptime(free_to, '%Y-%m-%dT%H:%M'))
+        except ValueError:
+            messages.error(request, 'Invalid time window.')
+        else:
+            free_gates = GateOccupancyIndex.for_window(window_start, window_end).free_gates(
+                window_start, window_end,
+                terminal=request.GET.get('terminal') or None,
+                gate_type=request.GET.get('gate_type') or None,
+            )
     
     context = {
         'gates': gates,
         'current_assignments': current_assignments,
         'boarding_timeline': boarding_timeline,
+        'free_gates': free_gates,
+        'gate_conflicts': today_index.conflicts(),
+        'hourly_utilization': today_index.hourly_utilization(date.today()),
     }
     return render(request, 'airline/gate_management.html', context)
 
 @user_passes_test(is_airline_staff)
 def passenger_assistance(request):
     """Passenger Exception Handling Interface"""
-    # Passengers needing assistance
-    assistance_needed = []
+    now = timezone.now()
     
-    # Failed check-ins
+    # Failed check-ins: confirmed bookings departing within 24h with no CheckIn row
     failed_checkins = Booking.objects.filter(
-        flight__departure_time__gte=timezone.now(),
-        flight__departure_time__lte=timezone.now() + timedelta(hours=24),
+        flight__departure_time__gte=now,
+        flight__departure_time__lte=now + timedelta(hours=24),
         status='confirmed'
-    ).exclude(
-        id__in=CheckIn.objects.values_list('booking_id', flat=True)
-    )
+    ).filter(
+        ~Exists(CheckIn.objects.filter(booking=OuterRef('pk')))
+    ).select_related('passenger', 'flight').order_by('flight__departure_time')
     
     # Special assistance requests
     special_assistance = CheckIn.objects.filter(
-        booking__flight__departure_time__gte=timezone.now(),
+        booking__flight__departure_time__gte=now,
         special_assistance__isnull=False
-    ).exclude(special_assistance='')
-    
-    # Overbooked flights
-    overbooked_flights = []
-    for flight in Flight.objects.filter(departure_time__date=date.today()):
-        booked_seats = Booking.objects.filter(flight=flight, status__in=['confirmed', 'checked_in']).count()
-        if booked_seats > flight.total_seats:
-            overbooked_flights.append({
-                'flight': flight,
-                'overbooked_by': booked_seats - flight.total_seats
-            })
+    ).exclude(special_assistance='').select_related(
+        'booking__passenger', 'booking__flight'
+    ).order_by('booking__flight__departure_time')
+    
+    # Overbooked flights, counted in one grouped query
+    overbooked_flights = Flight.objects.filter(
+        departure_time__date=date.today()
+    ).annotate(
+        booked_seats=Count('booking', filter=Q(booking__status__in=['confirmed', 'checked_in']))
+    ).filter(
+        booked_seats__gt=F('total_seats')
+    ).annotate(
+        overbooked_by=F('booked_seats') - F('total_seats')
+    ).order_by('departure_time')
     
     context = {
         'failed_checkins': failed_checkins,
@@ -190,6 +313,27 @@ def passenger_assistance(request):
 @user_passes_test(is_airline_staff)
 def turnaround_coordination(request):
     """Aircraft Turnaround Coordination Dashboard"""
+    if request.method == 'POST' and request.POST.get('action') == 'propagate_delays':
+        start, end = day_bounds(date.today())
+        result = propagate_delays(start, end, request.user)
+        
+        # Log the action
+        AuditLog.objects.create(
+            user=request.user,
+            action_type='update',
+            model_name='Flight',
+            description=f"Propagated delays: {len(result['delayed'])} flights delayed, "
+                        f"{len(result['broken'])} connections broken",
+            portal_used='airline'
+        )
+        
+        if result['alerts']:
+            messages.warning(request, f"{result['alerts']} flights have broken aircraft or crew connections.")
+        messages.success(request, f"Delay estimates updated for {len(result['changed'])} flights.")
+        if result['regated']:
+            messages.info(request, f"{len(result['regated'])} flights changed gate for their new times.")
+        return redirect('airline:turnaround_coordination')
+    
     # Flights arriving in next 2 hours
     arriving_flights = Flight.objects.filter(
         arrival_time__gte=timezone.now(),
@@ -204,25 +348,114 @@ def turnaround_coordination(request):
         status='scheduled'
     ).order_by('departure_time')
     
-    # Turnaround tasks template
-    turnaround_tasks = [
-        {'task': 'Passenger Disembarkation', 'duration': 20, 'status': 'pending'},
-        {'task': 'Cabin Cleaning', 'duration': 30, 'status': 'pending'},
-        {'task': 'Catering Service', 'duration': 15, 'status': 'pending'},
-        {'task': 'Fuel Service', 'duration': 25, 'status': 'pending'},
-        {'task': 'Baggage Unloading', 'duration': 20, 'status': 'pending'},
-        {'task': 'Baggage Loading', 'duration': 25, 'status': 'pending'},
-        {'task': 'Safety Check', 'duration': 15, 'status': 'pending'},
-        {'task': 'Passenger Boarding', 'duration': 30, 'status': 'pending'},
-    ]
+    # Rotations turning in the next 4 hours, with critical-path plans
+    turnarounds = plan_turnarounds(timezone.now(), timezone.now() + timedelta(hours=4))
+    turnaround_tasks, turnaround_minutes = standard_turnaround()
     
     context = {
         'arriving_flights': arriving_flights,
         'departing_flights': departing_flights,
+        'turnarounds': turnarounds,
         'turnaround_tasks': turnaround_tasks,
+        'turnaround_minutes': turnaround_minutes,
     }
     return render(request, 'airline/turnaround_coordination.html', context)
 
+@user_passes_test(is_airline_staff)
+def crew_rosters(request):
+    """Fleet-wide Crew Rosters"""
+    if request.method == 'POST' and request.POST.get('action') == 'roster_crew':
+        year, month = int(request.POST['year']), int(request.POST['month'])
+        result = roster_crew(year, month)
+        
+        # Log the action
+        AuditLog.objects.create(
+            user=request.user,
+            action_type='create',
+            model_name='CrewAssignment',
+            description=f"Rostered crew for {year}-{month:02d}: {result['assigned']} assignments "
+                        f"over {result['pairings']} pairings",
+            portal_used='airline'
+        )
+        
+        if result['uncovered']:
+            messages.warning(request, f"{len(result['uncovered'])} flights still need crew: "
+                                      f"{', '.join(f.flight_number for f in result['uncovered'][:20])}")
+        messages.success(request, f"Rostered {result['assigned']} crew assignments across {result['pairings']} pairings.")
+        return redirect(f"{reverse('airline:crew_rosters')}?year={year}&month={month}")
+    
+    broadcast_form = CrewBroadcastForm(request.POST if request.POST.get('action') == 'message_crew' else None)
+    if broadcast_form.is_bound and broadcast_form.is_valid():
+        data = broadcast_form.cleaned_data
+        try:
+            message = broadcast(request.user, data['subject'], data['body'], data['audience'], role=data['role'],
+                                flight=data.get('flight'), aircraft_type=data['aircraft_type'],
+                                priority=data['priority'])
+        except ValueError as e:
+            messages.error(request, str(e))
+        else:
+            # Log the action
+            AuditLog.objects.create(
+                user=request.user,
+                action_type='create',
+                model_name='CrewMessage',
+                object_id=str(message.id),
+                description=f'Messaged {message.recipient_count} crew ({message.audience_label}): {message.subject}',
+                portal_used='airline'
+            )
+            
+            messages.success(request, f'Message sent to {message.recipient_count} crew members.')
+            return redirect('airline:crew_rosters')
+    
+    year, month, months = roster_period(request.GET)
+    validate = request.GET.get('validate') == '1'
+    
+    # Per-crew monthly rosters come from the roster cache in one batch
+    rows = fleet_roster(year, month)
+    
+    # Block hours per month across the requested span, summed in one query
+    last_year, last_month = add_months(year, month, months - 1)
+    span_start, _ = month_bounds(year, month)
+    _, span_end = month_bounds(last_year, last_month)
+    monthly = monthly_block_hours([staff.id for staff, _ in rows], span_start, span_end)
+    month_starts = [date(*add_months(year, month, offset), 1) for offset in range(months)]
+    
+    # Flight time and rest violations of the first month, checked for all crew in one pass on request;
+    # the check reads a year of legs, which the cached rosters would otherwise save
+    violations = {}
+    if validate:
+        first_day, last_day = month_bounds(year, month)
+        for violation in validate_assignments(
+            timezone.make_aware(datetime.combine(first_day, datetime.min.time())),
+            timezone.make_aware(datetime.combine(last_day + timedelta(days=1), datetime.min.time())),
+            [staff.id for staff, _ in rows],
+        ):
+            violations.setdefault(violation.staff_id, []).append(violation)
+    
+    crew = [
+        {
+            'staff': staff,
+            'roster': roster,
+            'months': [monthly[staff.id].get(start, (0.0, 0))[0] for start in month_starts],
+            'violations': violations.get(staff.id, []),
+        }
+        for staff, roster in rows
+    ]
+    
+    prev_year, prev_month = add_months(year, month, -1)
+    next_year, next_month = add_months(year, month, 1)
+    context = {
+        'crew': crew,
+        'month_starts': month_starts,
+        'current_month': date(year, month, 1),
+        'months': months,
+        'validated': validate,
+        'prev_month': {'year': prev_year, 'month': prev_month},
+        'next_month': {'year': next_year, 'month': next_month},
+        'broadcast_form': broadcast_form,
+    }
+    return render(request, 'airline/crew_rosters.html', context)
+
 @user_passes_test(is_airline_staff)
 def analytics_reporting(request):
     """Analytics & Reporting Suite"""
@@ -235,51 +468,12 @@ def analytics_reporting(request):
     if request.GET.get('end_date'):
         end_date = datetime.strptime(request.GET.get('end_date'), '%Y-%m-%d').date()
     
-    # Performance metrics
-    flights_in_period = Flight.objects.filter(departure_time__date__range=[start_date, end_date])
-    
-    total_flights = flights_in_period.count()
-    on_time_flights = flights_in_period.filter(
-        actual_departure__lte=timezone.F('departure_time')
-    ).count()
-    
-    # Revenue analysis
-    revenue_data = []
-    bookings_in_period = Booking.objects.filter(
-        booking_date__date__range=[start_date, end_date],
-        payment_status=True
-    )
-    
-    total_revenue = sum(booking.total_amount for booking in bookings_in_period)
-    average_ticket_price = bookings_in_period.aggregate(avg_price=Avg('total_amount'))['avg_price'] or 0
-    
-    # Route profitability
-    route_performance = flights_in_period.values(
-        'departure_city', 'arrival_city'
-    ).annotate(
-        flight_count=Count('id'),
-        total_bookings=Count('booking')
-    ).order_by('-flight_count')[:10]
-    
-    # Passenger load factor
-    load_factors = []
-    for flight in flights_in_period:
-        booked_seats = Booking.objects.filter(flight=flight, status__in=['confirmed', 'checked_in']).count()
-        load_factor = (booked_seats / flight.total_seats * 100) if flight.total_seats > 0 else 0
-        load_factors.append(load_factor)
-    
-    average_load_factor = sum(load_factors) / len(load_factors) if load_factors else 0
+    report = flight_performance_report(start_date, end_date)
     
     context = {
         'start_date': start_date,
         'end_date': end_date,
-        'total_flights': total_flights,
-        'on_time_flights': on_time_flights,
-        'on_time_percentage': (on_time_flights / total_flights * 100) if total_flights > 0 else 0,
-        'total_revenue': total_revenue,
-        'average_ticket_price': average_ticket_price,
-        'average_load_factor': average_load_factor,
-        'route_performance': route_performance,
+        **report,
     }
     return render(request, 'airline/analytics_reporting.html', context)
 
@@ -287,36 +481,33 @@ def analytics_reporting(request):
 def live_flight_map(request):
     """Live Flight Tracking Map"""
     # Active flights (in-air)
-    active_flights = Flight.objects.filter(
-        status='departed',
-        actual_departure__isnull=False,
-        arrival_time__gte=timezone.now()
-    )
+    active_flights = airborne_flights()
     
     # Prepare flight data for map
-    flight_data = []
-    for flight in active_flights:
-        # Calculate estimated position (simplified)
-        flight_duration = (flight.arrival_time - flight.departure_time).total_seconds()
-        elapsed_time = (timezone.now() - flight.actual_departure).total_seconds()
-        progress = min(elapsed_time / flight_duration, 1.0) if flight_duration > 0 else 0
-        
-        flight_data.append({
-            'flight_number': flight.flight_number,
-            'departure_city': flight.departure_city,
-            'arrival_city': flight.arrival_city,
-            'progress': progress * 100,
-            'altitude': 35000,  # Simplified
-            'speed': 850,       # Simplified
-            'status': flight.status,
-        })
+    flight_data = flight_positions(active_flights)
     
     context = {
-        'flight_data': json.dumps(flight_data),
+        'flight_data': flight_data,
         'active_flights': active_flights,
     }
     return render(request, 'airline/live_flight_map.html', context)
 
+@user_passes_test(is_airline_staff)
+async def flight_position_stream(request):
+    """Server-sent events stream of airborne flight position deltas"""
+    response = StreamingHttpResponse(broadcaster.stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@user_passes_test(is_airline_staff)
+async def operations_event_stream(request):
+    """Server-sent events stream of alert and flight status changes"""
+    response = StreamingHttpResponse(get_hub().stream(OPERATIONS_EVENTS), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @user_passes_test(is_airline_staff)
 def system_alerts(request):
     """System Alerts and Notifications"""
@@ -366,4 +557,4 @@ def resolve_alert(request, alert_id):
         
         messages.success(request, 'Alert marked as resolved.')
     
-    return redirect('system_alerts')
+    return redirect('airline:system_alerts')
@@ -2,15 +2,26 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.db.models import Q
 from django.core.paginator import Paginator
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_date
+from django.utils.http import http_date
+from django.urls import reverse
 from datetime import datetime, timedelta, date
 import json
 
-from .models import Staff, CrewAssignment, Flight, AuditLog
+from .models import Staff, CrewAssignment, CrewBid, Flight, SwapRequest, AuditLog
 from .forms import PostFlightReportForm, CrewAvailabilityForm
+from .airports import local_time
+from .briefings import briefing_packet
+from .rosters import add_months, crew_roster, roster_period
+from .crew_swaps import accept_swap, cancel_swap, find_matches, open_giveaways, post_swap, swap_cutoff
+from .crew_messaging import INBOX_PAGE_SIZE, delivery_payload, inbox, inbox_stream, mark_read, unread_count
+from .live_events import get_hub
+from .roster_feed import feed_validators, ical_feed, reset_calendar_token
 
 def is_crew_member(user):
     """Check if user is crew member"""
@@ -80,72 +91,83 @@ def my_roster(request):
     """Personal Roster - Interactive Calendar"""
     staff = request.user.staff
     
-    # Get month/year from request or default to current
-    year = int(request.GET.get('year', date.today().year))
-    month = int(request.GET.get('month', date.today().month))
-    
-    # Get assignments for the month
-    start_date = date(year, month, 1)
-    if month == 12:
-        end_date = date(year + 1, 1, 1) - timedelta(days=1)
-    else:
-        end_date = date(year, month + 1, 1) - timedelta(days=1)
+    if request.method == 'POST' and request.POST.get('action') == 'reset_calendar_token':
+        reset_calendar_token(staff)
+        
+        # Log the action
+        AuditLog.objects.create(
+            user=request.user,
+            action_type='update',
+            model_name='Staff',
+            object_id=str(staff.id),
+            description='Created roster calendar feed link',
+            portal_used='crew'
+        )
+        
+        messages.success(request, 'New calendar link created. Subscribe to it in your calendar app.')
+        return redirect('crew:my_roster')
     
-    assignments = CrewAssignment.objects.filter(
-        staff=staff,
-        flight__departure_time__date__range=[start_date, end_date]
-    ).order_by('flight__departure_time')
+    # Get month/year from request or default to current
+    year, month, months = roster_period(request.GET)
     
-    # Organize assignments by date
-    assignments_by_date = {}
-    for assignment in assignments:
-        flight_date = assignment.flight.departure_time.date()
-        if flight_date not in assignments_by_date:
-            assignments_by_date[flight_date] = []
-        assignments_by_date[flight_date].append(assignment)
-    
-    # Calculate total flight hours for the month
-    total_hours = 0
-    for assignment in assignments:
-        if assignment.flight.arrival_time and assignment.flight.departure_time:
-            flight_duration = assignment.flight.arrival_time - assignment.flight.departure_time
-            total_hours += flight_duration.total_seconds() / 3600
+    # Cached per crew member and month; assignments come with their flights
+    rosters = crew_roster(staff, year, month, months)
     
     # Navigation dates
-    if month == 1:
-        prev_month = {'year': year - 1, 'month': 12}
-    else:
-        prev_month = {'year': year, 'month': month - 1}
-    
-    if month == 12:
-        next_month = {'year': year + 1, 'month': 1}
-    else:
-        next_month = {'year': year, 'month': month + 1}
+    prev_year, prev_month = add_months(year, month, -1)
+    next_year, next_month = add_months(year, month, 1)
     
     context = {
         'staff': staff,
-        'assignments': assignments,
-        'assignments_by_date': assignments_by_date,
+        'rosters': rosters,
+        'feed_url': (request.build_absolute_uri(reverse('crew:roster_feed', args=[staff.calendar_token]))
+                     if staff.calendar_token else None),
         'current_month': f"{date(year, month, 1).strftime('%B %Y')}",
-        'total_hours': round(total_hours, 1),
-        'prev_month': prev_month,
-        'next_month': next_month,
+        'total_hours': round(sum(r['total_hours'] for r in rosters), 1),
+        'prev_month': {'year': prev_year, 'month': prev_month},
+        'next_month': {'year': next_year, 'month': next_month},
         'year': year,
         'month': month,
+        'months': len(rosters),
     }
     return render(request, 'crew/my_roster.html', context)
 
+def roster_feed(request, token):
+    """Tokenized iCalendar feed of a crew member's roster for calendar apps
+
+    Answers unchanged polls with 304 from one aggregate query; a changed
+    feed is streamed row by row.
+    """
+    staff = get_object_or_404(Staff, calendar_token=token, is_active=True)
+    etag, last_modified = feed_validators(staff)
+    not_modified = get_conditional_response(
+        request, etag=etag, last_modified=last_modified and int(last_modified.timestamp()))
+    if not_modified is not None:
+        return not_modified
+    
+    host = request.get_host().split(':')[0]
+    response = StreamingHttpResponse(
+        ical_feed(staff, lambda a: request.build_absolute_uri(reverse('crew:flight_briefing', args=[a.id])), host),
+        content_type='text/calendar; charset=utf-8',
+    )
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    response['Cache-Control'] = 'private, max-age=0'
+    response['Content-Disposition'] = f'inline; filename="roster-{staff.employee_id}.ics"'
+    return response
+
 @user_passes_test(is_crew_member)
 def flight_briefing(request, assignment_id):
     """Flight Briefing Packets"""
     staff = request.user.staff
-    assignment = get_object_or_404(CrewAssignment, id=assignment_id, staff=staff)
+    assignment = get_object_or_404(CrewAssignment.objects.select_related('flight'), id=assignment_id, staff=staff)
     flight = assignment.flight
     
     # Mark briefing as completed
     if request.method == 'POST':
         assignment.briefing_completed = True
-        assignment.save()
+        assignment.save(update_fields=['briefing_completed'])
         
         # Log the action
         AuditLog.objects.create(
@@ -158,13 +180,17 @@ def flight_briefing(request, assignment_id):
         )
         
         messages.success(request, 'Flight briefing marked as completed.')
-        return redirect('my_roster')
+        return redirect('crew:my_roster')
     
-    # Generate briefing data
+    # Crew, passenger and route data come from the flight's shared packet
+    packet = briefing_packet(flight).data
+    distance = packet['route']['distance_km']
     briefing_data = {
         'flight_plan': {
-            'route': f"{flight.departure_airport} → {flight.arrival_airport}",
-            'distance': '2,450 km',  # Simplified
+            'route': f"{packet['route']['origin']} → {packet['route']['destination']}",
+            'distance': f"{distance:,} km" if distance is not None else 'Unknown',
+            'departure_local': local_time(flight.departure_time, flight.departure_airport),
+            'arrival_local': local_time(flight.arrival_time, flight.arrival_airport),
             'flight_time': str(flight.arrival_time - flight.departure_time),
             'altitude': '35,000 ft',
             'airspeed': '850 km/h',
@@ -174,21 +200,14 @@ def flight_briefing(request, assignment_id):
             'arrival': 'Partly cloudy, 18°C, Wind: 15 km/h SW',
             'en_route': 'Light turbulence expected over mountain ranges',
         },
-        'passenger_info': {
-            'total_passengers': flight.total_seats - flight.available_seats,
-            'business_class': 12,  # Simplified
-            'economy_class': flight.total_seats - flight.available_seats - 12,
-            'special_assistance': 3,
-            'unaccompanied_minors': 1,
-        },
+        'passenger_info': packet['passengers'],
+        'assistance': packet['assistance'],
         'notams': [
             'RUNWAY 09/27 CLOSED FOR MAINTENANCE 1200-1800 UTC',
             'TEMPORARY RESTRICTED AREA ACTIVE OVER CITY CENTER',
             'VOR STATION XYZ OUT OF SERVICE',
         ],
-        'crew_info': [
-            assignment for assignment in CrewAssignment.objects.filter(flight=flight)
-        ]
+        'crew_info': packet['crew'],
     }
     
     context = {
@@ -203,6 +222,60 @@ def bidding_swaps(request):
     """Bidding & Schedule Swaps"""
     staff = request.user.staff
     
+    if request.method == 'POST' and request.POST.get('action') in ('bid', 'withdraw_bid'):
+        flight = get_object_or_404(Flight, id=request.POST.get('flight_id'))
+        if request.POST['action'] == 'bid':
+            CrewBid.objects.get_or_create(staff=staff, flight=flight)
+            messages.success(request, f'Bid placed for {flight.flight_number}. The rostering engine honours bids where the limits allow.')
+        else:
+            CrewBid.objects.filter(staff=staff, flight=flight).delete()
+            messages.success(request, f'Bid for {flight.flight_number} withdrawn.')
+        return redirect('crew:bidding_swaps')
+    
+    if request.method == 'POST' and request.POST.get('action') == 'post_swap':
+        assignment = get_object_or_404(CrewAssignment, id=request.POST.get('assignment_id'), staff=staff)
+        try:
+            post_swap(
+                assignment,
+                kind='giveaway' if request.POST.get('kind') == 'giveaway' else 'trade',
+                wanted_from=parse_date(request.POST.get('wanted_from') or '') or None,
+                wanted_until=parse_date(request.POST.get('wanted_until') or '') or None,
+                wanted_destination=request.POST.get('wanted_destination', ''),
+            )
+        except ValueError as e:
+            messages.error(request, f'{e}.')
+        else:
+            messages.success(request, f'{assignment.flight.flight_number} is now on offer.')
+        return redirect('crew:bidding_swaps')
+    
+    if request.method == 'POST' and request.POST.get('action') == 'cancel_swap':
+        cancel_swap(get_object_or_404(SwapRequest, id=request.POST.get('swap_id'), requester=staff))
+        messages.success(request, 'Swap request withdrawn.')
+        return redirect('crew:bidding_swaps')
+    
+    if request.method == 'POST' and request.POST.get('action') == 'accept_swap':
+        swap = get_object_or_404(SwapRequest, id=request.POST.get('swap_id'))
+        counter = None
+        if request.POST.get('counter_id'):
+            counter = get_object_or_404(SwapRequest, id=request.POST['counter_id'], requester=staff)
+        try:
+            accept_swap(swap, staff, counter)
+        except ValueError as e:
+            messages.error(request, f'Swap not possible: {e}.')
+        else:
+            # Log the action
+            AuditLog.objects.create(
+                user=request.user,
+                action_type='update',
+                model_name='CrewAssignment',
+                object_id=str(swap.assignment_id),
+                description=f'Accepted {swap.get_kind_display().lower()} of assignment {swap.assignment_id}'
+                            + (f' for assignment {counter.assignment_id}' if counter else ''),
+                portal_used='crew'
+            )
+            messages.success(request, 'Swap completed. Your roster has been updated.')
+        return redirect('crew:bidding_swaps')
+    
     # Available flights for bidding (next month)
     next_month = date.today().replace(day=1) + timedelta(days=32)
     next_month = next_month.replace(day=1)
@@ -210,26 +283,40 @@ def bidding_swaps(request):
     available_flights = Flight.objects.filter(
         departure_time__month=next_month.month,
         departure_time__year=next_month.year
-    ).exclude(
-        id__in=CrewAssignment.objects.filter(
-            flight__departure_time__month=next_month.month,
-            flight__departure_time__year=next_month.year
-        ).values_list('flight_id', flat=True)
-    )[:20]  # Limit for demo
+    ).exclude(status='cancelled').exclude(
+        id__in=CrewAssignment.objects.exclude(status='cancelled').values('flight_id')
+    ).order_by('departure_time')
+    paginator = Paginator(available_flights, 20)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    
+    my_bids = CrewBid.objects.filter(staff=staff, flight__departure_time__gte=timezone.now()).select_related(
+        'flight').order_by('flight__departure_time')
+    bid_flight_ids = {bid.flight_id for bid in my_bids}
     
     # Current assignments available for swap
     my_assignments = CrewAssignment.objects.filter(
         staff=staff,
-        flight__departure_time__gte=timezone.now() + timedelta(days=7),  # Must be at least a week away
+        flight__departure_time__gte=swap_cutoff(),  # Must be at least a week away
         status='scheduled'
-    )
+    ).exclude(swap_requests__status='open').select_related('flight').order_by('flight__departure_time')
     
-    # Swap requests from other crew members
-    swap_requests = []  # Would be implemented with a SwapRequest model
+    # My open offers with the trades that could be exchanged for them
+    my_swaps = [
+        {'swap': swap, 'matches': find_matches(swap) if swap.kind == 'trade' else []}
+        for swap in SwapRequest.objects.filter(requester=staff, status='open').select_related(
+            'assignment__flight', 'requester__user').order_by('departure_date')
+    ]
+    
+    # Giveaways from other crew members this crew member could legally pick up
+    swap_requests = open_giveaways(staff)
     
     context = {
-        'available_flights': available_flights,
+        'page_obj': page_obj,
+        'available_flights': page_obj,
+        'my_bids': my_bids,
+        'bid_flight_ids': bid_flight_ids,
         'my_assignments': my_assignments,
+        'my_swaps': my_swaps,
         'swap_requests': swap_requests,
         'next_month': next_month.strftime('%B %Y'),
     }
@@ -294,7 +381,7 @@ def post_flight_report(request, assignment_id):
     # Only allow reports for completed or current flights
     if assignment.flight.departure_time > timezone.now():
         messages.error(request, 'Cannot submit report for future flights.')
-        return redirect('my_roster')
+        return redirect('crew:my_roster')
     
     if request.method == 'POST':
         form = PostFlightReportForm(request.POST)
@@ -322,7 +409,7 @@ def post_flight_report(request, assignment_id):
             )
             
             messages.success(request, 'Post-flight report submitted successfully.')
-            return redirect('my_roster')
+            return redirect('crew:my_roster')
     else:
         form = PostFlightReportForm()
     
@@ -335,41 +422,52 @@ def post_flight_report(request, assignment_id):
 @user_passes_test(is_crew_member)
 def crew_messages(request):
     """Crew Communication Center"""
-    # This would integrate with a messaging system
-    # For demo purposes, showing static content
-    
-    messages_list = [
-        {
-            'id': 1,
-            'from': 'Crew Scheduling',
-            'subject': 'Schedule Change - Flight AA123',
-            'date': timezone.now() - timedelta(hours=2),
-            'read': False,
-            'priority': 'high'
-        },
-        {
-            'id': 2,
-            'from': 'Training Department',
-            'subject': 'Recurrent Training Reminder',
-            'date': timezone.now() - timedelta(days=1),
-            'read': True,
-            'priority': 'normal'
-        },
-        {
-            'id': 3,
-            'from': 'Operations',
-            'subject': 'Weather Advisory - Route Updates',
-            'date': timezone.now() - timedelta(days=2),
-            'read': True,
-            'priority': 'normal'
-        }
-    ]
+    if request.method == 'POST' and request.POST.get('action') in ('mark_read', 'mark_all_read'):
+        if request.POST['action'] == 'mark_read':
+            delivery_id = request.POST.get('delivery_id', '')
+            if delivery_id.isdigit():
+                mark_read(request.user, [int(delivery_id)])
+            else:
+                messages.error(request, 'Choose a message to mark as read.')
+        else:
+            count = mark_read(request.user)
+            messages.success(request, f'{count} message{"s" if count != 1 else ""} marked as read.')
+        return redirect('crew:messages')
+    
+    before = request.GET.get('before', '')
+    deliveries, next_before = inbox(request.user, before=int(before) if before.isdigit() else None)
     
     context = {
-        'messages': messages_list,
+        'messages_list': deliveries,
+        'next_before': next_before,
+        'unread_count': unread_count(request.user),
     }
     return render(request, 'crew/messages.html', context)
 
+@user_passes_test(is_crew_member)
+def message_inbox(request):
+    """Inbox API, newest first; pass ``before`` from the previous page to read on"""
+    try:
+        limit = int(request.GET.get('limit', INBOX_PAGE_SIZE))
+        before = int(request.GET['before']) if request.GET.get('before') else None
+    except ValueError:
+        return JsonResponse({'error': 'before and limit must be integers'}, status=400)
+    deliveries, next_before = inbox(request.user, before=before, limit=limit)
+    return JsonResponse({
+        'messages': [delivery_payload(d) for d in deliveries],
+        'next_before': next_before,
+        'unread': unread_count(request.user),
+    })
+
+@user_passes_test(is_crew_member)
+async def message_stream(request):
+    """Server-sent events stream of new messages for the signed-in crew member"""
+    user = await request.auser()
+    response = StreamingHttpResponse(inbox_stream(get_hub(), user.id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @user_passes_test(is_crew_member)
 def training_center(request):
     """Training and Certification Center"""
@@ -6,6 +6,7 @@ from django.http import JsonResponse, HttpResponse
 from django.db.models import Q
 from django.core.paginator import Paginator
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from datetime import datetime, timedelta
 import json
 
@@ -152,7 +153,7 @@ def my_bookings(request):
     """User's booking management"""
     try:
         passenger = request.user.passenger
-        bookings = Booking.objects.filter(passenger=passenger).order_by('-booking_date')
+        bookings = Booking.objects.filter(passenger=passenger).select_related('flight').order_by('-booking_date')
     except:
         bookings = []
     
@@ -239,9 +240,18 @@ def live_flight_status(request):
     flight = None
     
     if flight_number:
+        # Flight numbers repeat daily: take the requested date, else the next occurrence
+        occurrences = Flight.objects.filter(flight_number__iexact=flight_number)
         try:
-            flight = Flight.objects.get(flight_number__iexact=flight_number)
-        except Flight.DoesNotExist:
+            service_date = parse_date(request.GET.get('date') or '')
+        except ValueError:
+            service_date = None  # well formed but impossible, e.g. 2024-02-30
+        if service_date:
+            flight = occurrences.filter(service_date=service_date).first()
+        else:
+            flight = (occurrences.filter(service_date__gte=timezone.localdate()).order_by('service_date').first()
+                      or occurrences.order_by('-service_date').first())
+        if flight is None:
             messages.error(request, f'Flight {flight_number} not found.')
     
     context = {
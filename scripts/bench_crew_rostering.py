@@ -0,0 +1,106 @@
+"""
+Crew pairing and rostering benchmark.
+
+Flies 150 aircraft around 25 stations for a month, builds single-duty
+pairings from the legs and rosters 2,000 crew onto them, each with four
+weeks of earlier flying, some fixed duties and a few bids. No database
+access is needed.
+
+Usage: python scripts/bench_crew_rostering.py [crew] [aircraft]
+"""
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'airport_mgmt.settings')
+
+import django
+
+django.setup()
+
+from core.crew_rostering import CrewLeg, CrewMember, CrewRosterSolver, build_pairings, crew_complement
+
+TARGET_SECONDS = 60.0
+HOUR = 3600
+DAY = 24 * HOUR
+DAYS = 30
+
+
+def synthetic_month(aircraft_count, station_count=25, seed=42):
+    rng = random.Random(seed)
+    stations = [f'S{i:02d}' for i in range(station_count)]
+    legs = []
+    for aircraft_id in range(aircraft_count):
+        seats = rng.choice([72, 180, 180, 189, 300])
+        station = rng.choice(stations)
+        for day in range(DAYS):
+            clock = day * DAY + rng.uniform(5, 8) * HOUR
+            for _ in range(rng.randint(3, 6)):
+                destination = rng.choice([s for s in stations if s != station])
+                block = rng.choice([60, 75, 90, 120, 150]) * 60
+                legs.append(CrewLeg(len(legs), station, destination, clock, clock + block, aircraft_id,
+                                    crew_complement(seats)))
+                station = destination
+                clock += block + rng.choice([40, 50, 60, 90]) * 60
+    return legs
+
+
+def synthetic_crew(crew_count, seed=7):
+    rng = random.Random(seed)
+    crew = []
+    for staff_id in range(crew_count):
+        role = 'pilot' if staff_id % 5 == 0 else 'copilot' if staff_id % 5 == 1 else 'cabin_crew'
+        legs = []
+        day = -28 + rng.randrange(3)
+        while day < 0:
+            start = day * DAY + rng.uniform(6, 10) * HOUR
+            legs.append((start, start + rng.choice([2, 3, 4]) * HOUR))
+            day += rng.choice([2, 3, 4])
+        if rng.random() < 0.05:
+            start = rng.randrange(DAYS) * DAY + 9 * HOUR  # a training flight already on the roster
+            legs.append((start, start + 2 * HOUR))
+        valid_until = rng.choice([float('inf')] * 19 + [rng.randrange(DAYS) * DAY])
+        crew.append(CrewMember(staff_id, role, valid_until, legs))
+    return crew
+
+
+def main():
+    crew_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    aircraft_count = int(sys.argv[2]) if len(sys.argv) > 2 else 150
+    legs = synthetic_month(aircraft_count)
+    crew = synthetic_crew(crew_count)
+    rng = random.Random(3)
+    bids = {}
+    for member in rng.sample(crew, crew_count // 10):
+        for leg in rng.sample(legs, 5):
+            bids.setdefault(leg.flight_id, set()).add(member.staff_id)
+
+    started = time.perf_counter()
+    pairings = build_pairings(legs)
+    pairing_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    solver = CrewRosterSolver(crew, bids, period_start=0)
+    uncovered = solver.solve(pairings)
+    solve_seconds = time.perf_counter() - started
+
+    positions = sum(count for p in pairings for _, count in p.complement)
+    open_positions = sum(missing for _, _, missing in uncovered)
+    honoured = sum(1 for p, staff_id, _ in solver.assignments
+                   if any(staff_id in bids.get(leg.flight_id, ()) for leg in p.legs))
+    total = pairing_seconds + solve_seconds
+    print(f'Legs: {len(legs)}  Crew: {crew_count}  Aircraft: {aircraft_count}  Days: {DAYS}')
+    print(f'Pairings:          {pairing_seconds * 1000:8.1f} ms  ({len(pairings)} pairings, '
+          f'{len(legs) / len(pairings):.1f} legs each)')
+    print(f'Rostering:         {solve_seconds * 1000:8.1f} ms  ({positions - open_positions} of {positions} '
+          f'positions filled, {honoured} bids honoured)')
+    print('PASS' if total < TARGET_SECONDS else 'FAIL', f'(target < {TARGET_SECONDS:.0f}s)')
+    return 0 if total < TARGET_SECONDS else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
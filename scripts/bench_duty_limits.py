@@ -0,0 +1,84 @@
+"""
+Flight time limitation benchmark.
+
+Builds a year of history plus a month of planned legs for 3,000 crew,
+validates the month in one vectorized pass and then checks 10,000
+proposed assignments one at a time against per-crew ledgers. No
+database access is needed.
+
+Usage: python scripts/bench_duty_limits.py [crew]
+"""
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'airport_mgmt.settings')
+
+import django
+
+django.setup()
+
+from core.duty_limits import CrewLedger, find_violations
+
+TARGET_SECONDS = 5.0
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+def synthetic_rosters(crew_count, days=365 + 30, seed=42):
+    """Duty days of one to four legs, with the odd short rest and heavy week"""
+    rng = random.Random(seed)
+    staff, starts, ends = [], [], []
+    for staff_id in range(crew_count):
+        day = rng.randrange(3)
+        while day < days:
+            clock = day * DAY + rng.uniform(5, 9) * HOUR
+            for _ in range(rng.choice([1, 2, 2, 3, 4])):
+                block = rng.choice([60, 75, 90, 120, 150, 180]) * 60
+                staff.append(staff_id)
+                starts.append(clock)
+                ends.append(clock + block)
+                clock += block + rng.choice([45, 60, 90, 120]) * 60
+            day += rng.choice([1, 1, 2, 2, 3, 4])
+    return staff, starts, ends
+
+
+def main():
+    crew_count = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    staff, starts, ends = synthetic_rosters(crew_count)
+    month_start = 365 * DAY
+
+    started = time.perf_counter()
+    violations = find_violations(staff, starts, ends, since=month_start)
+    bulk_seconds = time.perf_counter() - started
+
+    legs = {}
+    for staff_id, start, end in zip(staff, starts, ends):
+        legs.setdefault(staff_id, []).append((start, end))
+    started = time.perf_counter()
+    ledgers = {staff_id: CrewLedger(crew_legs) for staff_id, crew_legs in legs.items()}
+    build_seconds = time.perf_counter() - started
+
+    rng = random.Random(7)
+    proposals = [(rng.randrange(crew_count), month_start + rng.uniform(0, 30 * DAY)) for _ in range(10000)]
+    rejected = 0
+    started = time.perf_counter()
+    for staff_id, start in proposals:
+        rejected += bool(ledgers[staff_id].check(start, start + 2 * HOUR))
+    check_seconds = time.perf_counter() - started
+
+    print(f'Crew: {crew_count}  Legs: {len(staff)} (a year of history and a month planned)')
+    print(f'Month validation:  {bulk_seconds * 1000:8.1f} ms  ({len(violations)} violations)')
+    print(f'Ledger build:      {build_seconds * 1000:8.1f} ms')
+    print(f'{len(proposals)} checks:      {check_seconds * 1000:8.1f} ms  ({rejected} rejected, '
+          f'{check_seconds / len(proposals) * 1e6:.0f} us each)')
+    print('PASS' if bulk_seconds < TARGET_SECONDS else 'FAIL', f'(target < {TARGET_SECONDS:.1f}s)')
+    return 0 if bulk_seconds < TARGET_SECONDS else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
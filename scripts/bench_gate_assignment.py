@@ -0,0 +1,87 @@
+"""
+Gate assignment solver benchmark.
+
+Solves a synthetic 1,500-movement day on 120 gates, then re-plans 100
+random delays incrementally. No database access is needed.
+
+Usage: python scripts/bench_gate_assignment.py [movements] [gates]
+"""
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'airport_mgmt.settings')
+
+import django
+
+django.setup()
+
+from core.gate_assignment import (GateAssignmentSolver, GateSlot, Movement,
+                                  REGIONAL, NARROW_BODY, WIDE_BODY)
+
+TARGET_SECONDS = 1.0
+
+
+def synthetic_day(movement_count, gate_count, seed=42):
+    rng = random.Random(seed)
+    gates = []
+    for i in range(gate_count):
+        size_class = WIDE_BODY if i % 5 == 0 else REGIONAL if i % 7 == 0 else NARROW_BODY
+        gates.append(GateSlot(i, size_class, rng.choice([150, 200, 300, 400])))
+
+    movements = []
+    for i in range(movement_count):
+        # Peaks in the morning and evening banks
+        hour = rng.choice([rng.gauss(8, 2), rng.gauss(18, 2.5), rng.uniform(0, 24)])
+        start = max(0.0, min(hour, 23.5)) * 3600
+        size_class = rng.choices([REGIONAL, NARROW_BODY, WIDE_BODY], weights=[2, 6, 2])[0]
+        duration = (70 if size_class == WIDE_BODY else 55) * 60
+        movements.append(Movement(i, start, start + duration, size_class, None, 0))
+    return gates, movements
+
+
+def main():
+    movement_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1500
+    gate_count = int(sys.argv[2]) if len(sys.argv) > 2 else 120
+    gates, movements = synthetic_day(movement_count, gate_count)
+
+    solver = GateAssignmentSolver(gates)
+    started = time.perf_counter()
+    unassigned = solver.solve(movements)
+    solve_seconds = time.perf_counter() - started
+    assigned = len(solver.assignments)
+
+    # Re-solving with the plan as current assignments should change nothing
+    current = [m._replace(current_gate=solver.assignments.get(m.flight_id)) for m in movements]
+    resolver = GateAssignmentSolver(gates)
+    started = time.perf_counter()
+    resolver.solve(current)
+    resolve_seconds = time.perf_counter() - started
+    unchanged = sum(resolver.assignments.get(m.flight_id) == m.current_gate for m in current if m.current_gate is not None)
+
+    rng = random.Random(7)
+    delayed = rng.sample(sorted(solver.assignments), min(100, len(solver.assignments)))
+    changes = 0
+    started = time.perf_counter()
+    for flight_id in delayed:
+        movement = solver.movements[flight_id]
+        delay = rng.choice([15, 30, 45, 90]) * 60
+        before = solver.assignments[flight_id]
+        after = solver.reschedule(flight_id, movement.start + delay, movement.end + delay)
+        changes += before != after
+    delay_seconds = time.perf_counter() - started
+
+    print(f'Movements: {movement_count}  Gates: {gate_count}')
+    print(f'Full solve:        {solve_seconds * 1000:8.1f} ms  ({len(unassigned)} unassigned)')
+    print(f'Warm re-solve:     {resolve_seconds * 1000:8.1f} ms  ({unchanged} of {assigned} kept)')
+    print(f'{len(delayed)} delays:        {delay_seconds * 1000:8.1f} ms  ({changes} gate changes)')
+    print('PASS' if solve_seconds < TARGET_SECONDS else 'FAIL', f'(target < {TARGET_SECONDS:.1f}s)')
+    return 0 if solve_seconds < TARGET_SECONDS else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Schedule import benchmark.
+
+Generates a synthetic CSV timetable and imports it into a throwaway test
+database, reporting rows per second for validation alone and for the
+full import.
+
+Usage: python scripts/bench_schedule_import.py [rows]
+"""
+import io
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'airport_mgmt.settings')
+
+import django
+
+django.setup()
+
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from core.airports import airport_table
+from core.schedule_import import CSV_COLUMNS, import_schedule
+
+TARGET_ROWS_PER_SECOND = 10000
+
+
+def synthetic_csv(row_count, seed=42):
+    rng = random.Random(seed)
+    codes = sorted(airport_table())
+    season_start = datetime(2030, 3, 30)
+    out = io.StringIO()
+    out.write(','.join(CSV_COLUMNS) + '\n')
+    for i in range(row_count):
+        origin, destination = rng.sample(codes, 2)
+        departure = season_start + timedelta(minutes=rng.randrange(0, 180 * 24 * 60, 5))
+        arrival = departure + timedelta(minutes=rng.randrange(60, 600, 5))
+        # Roughly 1% of rows carry an unknown airport to exercise the error path
+        if rng.random() < 0.01:
+            destination = 'ZZZ'
+        out.write(f'BX{i + 1},Bench Air,{origin},{destination},{departure:%Y-%m-%d %H:%M},'
+                  f'{arrival:%Y-%m-%d %H:%M},,Airbus A320,180,4500,9000\n')
+    out.seek(0)
+    return out
+
+
+def main():
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    data = synthetic_csv(row_count).getvalue()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        started = time.perf_counter()
+        result = import_schedule(io.StringIO(data), dry_run=True)
+        validate_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        result = import_schedule(io.StringIO(data))
+        import_seconds = time.perf_counter() - started
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    rate = result.rows / import_seconds
+    print(f'rows:            {result.rows}')
+    print(f'imported:        {result.imported}  rejected: {len(result.errors)}')
+    print(f'validate only:   {validate_seconds:.2f}s ({result.rows / validate_seconds:,.0f} rows/s)')
+    print(f'full import:     {import_seconds:.2f}s ({rate:,.0f} rows/s)')
+    print('PASS' if rate >= TARGET_ROWS_PER_SECOND else 'FAIL')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Crew swap matching benchmark.
+
+Fills a throwaway test database with 3,000 pilots, one flight per
+assignment and an open trade request for every assignment, then times
+finding legal matches for a sample of requests and executing one swap.
+
+Usage: python scripts/bench_swap_matching.py [open requests]
+"""
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'airport_mgmt.settings')
+
+import django
+
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from core.crew_swaps import accept_swap, find_matches
+from core.models import CrewAssignment, Flight, Staff, SwapRequest
+
+TARGET_MS_PER_LOOKUP = 100
+STATIONS = ['DEL', 'BOM', 'BLR', 'MAA', 'CCU', 'HYD', 'GOI', 'COK']
+SAMPLE = 200
+
+
+def populate(request_count, seed=42):
+    rng = random.Random(seed)
+    crew_count = max(1, request_count // 10)
+    users = User.objects.bulk_create([User(username=f'bench{i}') for i in range(crew_count)], batch_size=1000)
+    staff = Staff.objects.bulk_create([
+        Staff(user=user, employee_id=f'B{i:06d}', role='pilot', department='Flight Operations',
+              hire_date=date(2015, 1, 1), salary=Decimal('100000'), phone_number='+919999999999', address='-')
+        for i, user in enumerate(users)
+    ], batch_size=1000)
+
+    start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=10)
+    flights, owners = [], []
+    for i in range(request_count):
+        owner = staff[i % crew_count]
+        # Each pilot flies one leg every third day, so trades are usually legal
+        day = (i // crew_count) * 3 + rng.randrange(2)
+        departure = start + timedelta(days=day, hours=rng.randint(6, 18))
+        origin, destination = rng.sample(STATIONS, 2)
+        flights.append(Flight(
+            flight_number=f'BX{i}', airline='Bench Air', departure_city=origin, arrival_city=destination,
+            departure_airport=origin, arrival_airport=destination, departure_time=departure,
+            arrival_time=departure + timedelta(hours=2), service_date=departure.date(), aircraft_type='A320',
+            total_seats=180, available_seats=180, price=Decimal('5000'),
+        ))
+        owners.append(owner)
+    flights = Flight.objects.bulk_create(flights, batch_size=1000)
+    assignments = CrewAssignment.objects.bulk_create([
+        CrewAssignment(staff=owner, flight=flight, role_on_flight='Captain') for owner, flight in zip(owners, flights)
+    ], batch_size=1000)
+    requests = []
+    for assignment in assignments:
+        flight = assignment.flight
+        wanted_from = flight.departure_time.date() - timedelta(days=rng.randint(0, 10))
+        requests.append(SwapRequest(
+            requester=assignment.staff, assignment=assignment, kind='trade', role='pilot',
+            departure_date=flight.departure_time.date(), origin=flight.departure_airport,
+            destination=flight.arrival_airport, wanted_from=wanted_from,
+            wanted_until=wanted_from + timedelta(days=rng.randint(3, 20)),
+            wanted_destination=rng.choice([''] * 3 + STATIONS),
+        ))
+    SwapRequest.objects.bulk_create(requests, batch_size=1000)
+
+
+def main():
+    request_count = int(sys.argv[1]) if len(sys.argv) > 1 else 30000
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        populate(request_count)
+        rng = random.Random(7)
+        sample = SwapRequest.objects.select_related('assignment__flight', 'requester__user').filter(
+            pk__in=rng.sample(list(SwapRequest.objects.values_list('pk', flat=True)), SAMPLE))
+
+        started = time.perf_counter()
+        results = [(swap, find_matches(swap)) for swap in sample]
+        lookup_seconds = time.perf_counter() - started
+
+        swap, matches = next(((s, m) for s, m in results if m), (None, []))
+        started = time.perf_counter()
+        if matches:
+            accept_swap(matches[0], swap.requester, counter=swap)
+        accept_seconds = time.perf_counter() - started
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    per_lookup = lookup_seconds / SAMPLE * 1000
+    print(f'open requests:   {request_count}')
+    print(f'lookups:         {SAMPLE} in {lookup_seconds:.2f}s ({per_lookup:.1f} ms each, '
+          f'{sum(1 for _, m in results if m)} with legal matches)')
+    print(f'swap executed:   {accept_seconds * 1000:.1f} ms')
+    print('PASS' if per_lookup < TARGET_MS_PER_LOOKUP else 'FAIL', f'(target < {TARGET_MS_PER_LOOKUP} ms per lookup)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Synthetic dataset generation benchmark.
+
+Generates a synthetic operating history into a throwaway test database
+and reports bookings written per second; the target keeps 10M bookings
+(scale 200) under ten minutes.
+
+Usage: python scripts/bench_synthetic_data.py [scale] [days]
+"""
+import os
+import sys
+import time
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'airport_mgmt.settings')
+
+import django
+
+django.setup()
+
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from core.synthetic_data import SCHEDULE_DAYS, SyntheticDataset
+
+TARGET_BOOKINGS_PER_SECOND = 17000
+
+
+def main():
+    scale = float(sys.argv[1]) if len(sys.argv) > 1 else 20
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else SCHEDULE_DAYS
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        started = time.perf_counter()
+        counts = SyntheticDataset(scale=scale, seed=42, days=days).generate()
+        seconds = time.perf_counter() - started
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    rate = counts['bookings'] / seconds
+    print(f'scale:           {scale} over {days} days')
+    print(f'flights:         {counts["flights"]}  passengers: {counts["passengers"]}  crew: {counts["staff"]}')
+    print(f'bookings:        {counts["bookings"]}  check-ins: {counts["checkins"]}')
+    print(f'generated in:    {seconds:.1f}s ({rate:,.0f} bookings/s)')
+    print(f'10M bookings in: {10_000_000 / rate / 60:.1f} min (projected)')
+    print('PASS' if rate >= TARGET_BOOKINGS_PER_SECOND else 'FAIL')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Tail assignment solver benchmark.
+
+Builds a synthetic week of about 10,000 legs by flying a fleet of 300
+aircraft around 25 stations, solves the tail plan from scratch and then
+re-plans 100 random delays one by one. No database access is needed.
+
+Usage: python scripts/bench_tail_assignment.py [aircraft] [days]
+"""
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'airport_mgmt.settings')
+
+import django
+
+django.setup()
+
+from core.tail_assignment import Leg, Tail, TailAssignmentSolver
+
+TARGET_SECONDS = 5.0
+TURN = 95 * 60
+DAY = 24 * 3600
+
+
+def synthetic_week(aircraft_count, days, station_count=25, seed=42):
+    rng = random.Random(seed)
+    stations = [f'S{i:02d}' for i in range(station_count)]
+    horizon = days * DAY
+    tails, legs = [], []
+    for aircraft_id in range(aircraft_count):
+        seats = rng.choice([72, 180, 180, 189, 300])
+        station = rng.choice(stations)
+        maintenance = rng.randrange(days + 30) * DAY
+        tails.append(Tail(aircraft_id, seats, station, 0, maintenance, maintenance + DAY))
+
+        # The rotation this aircraft could fly, so the instance is feasible
+        clock = rng.uniform(5, 9) * 3600
+        while clock < horizon:
+            if maintenance <= clock + 6 * 3600 < maintenance + DAY:
+                clock = maintenance + DAY
+                continue
+            destination = rng.choice([s for s in stations if s != station])
+            block = rng.choice([60, 75, 90, 120, 150, 180]) * 60
+            booked = int(seats * rng.uniform(0.4, 0.95))
+            legs.append(Leg(len(legs), station, destination, clock, clock + block, booked, None, False))
+            station = destination
+            clock += block + TURN + rng.choice([0, 15, 30, 60, 120]) * 60
+            if clock % DAY > 22 * 3600:
+                clock += 7 * 3600  # night stop
+    return tails, legs
+
+
+def main():
+    aircraft_count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+    tails, legs = synthetic_week(aircraft_count, days)
+
+    solver = TailAssignmentSolver(tails, turn=TURN)
+    started = time.perf_counter()
+    unassigned = solver.solve(legs)
+    solve_seconds = time.perf_counter() - started
+
+    rng = random.Random(7)
+    delayed = rng.sample(sorted(solver.assignments), min(100, len(solver.assignments)))
+    moves = 0
+    started = time.perf_counter()
+    for flight_id in delayed:
+        leg = solver.legs[flight_id]
+        delay = rng.choice([15, 30, 45, 90]) * 60
+        moves += len(solver.resolve([leg._replace(departure=leg.departure + delay, arrival=leg.arrival + delay)]))
+    delay_seconds = time.perf_counter() - started
+
+    print(f'Legs: {len(legs)}  Aircraft: {aircraft_count}  Days: {days}')
+    print(f'Full solve:        {solve_seconds * 1000:8.1f} ms  ({len(unassigned)} unassigned, '
+          f'{len(solver.chains())} rotations)')
+    print(f'{len(delayed)} delays:        {delay_seconds * 1000:8.1f} ms  ({moves} tail changes, '
+          f'{delay_seconds / max(len(delayed), 1) * 1000:.1f} ms each)')
+    print('PASS' if solve_seconds < TARGET_SECONDS else 'FAIL', f'(target < {TARGET_SECONDS:.1f}s)')
+    return 0 if solve_seconds < TARGET_SECONDS else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())